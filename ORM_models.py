@@ -1,14 +1,14 @@
-from sqlalchemy import Column, String, DateTime,Integer, ForeignKey, Boolean, UniqueConstraint
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import Column, String, DateTime,Integer, ForeignKey, Boolean, UniqueConstraint, Index, SmallInteger, JSON
+from sqlalchemy.orm import declarative_base, relationship, declared_attr
 from sqlalchemy import create_engine # Für die Engine-Erstellung, falls hier nicht getrennt
 from sqlalchemy.sql import func
-import uuid 
+from db_types import uuid_type, new_uuid, history_key_type, history_key_default
 
 Base = declarative_base()
 
 class Player(Base):
     __tablename__ = 'players'
-    player_id = Column(String(36),primary_key=True,default=lambda: str(uuid.uuid4()))
+    player_id = Column(uuid_type(), primary_key=True, default=new_uuid)
 
     display_name = Column(String(255),nullable=False)
 
@@ -21,10 +21,10 @@ class Player(Base):
 class PlayerDisplayNameHistory(Base):
     __tablename__ = 'player_display_name_history'
 
-    history_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    history_id = Column(history_key_type(), primary_key=True, default=history_key_default())
 
     # Foreign Key zur Player-Tabelle
-    player_id = Column(String(36), ForeignKey('players.player_id'), nullable=False)
+    player_id = Column(uuid_type(), ForeignKey('players.player_id'), nullable=False)
 
     old_display_name = Column(String(255), nullable=False)
     new_display_name = Column(String(255), nullable=False)
@@ -47,7 +47,7 @@ class DiscordAccount(Base):
     __tablename__ = 'discord_accounts'
 
     # discord_account_id: Eindeutige interne ID für jeden Discord-Account (unsere eigene UUID)
-    discord_account_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    discord_account_id = Column(uuid_type(), primary_key=True, default=new_uuid)
 
     # discord_user_id: Die numerische Discord User ID (die stabile ID von Discord)
     # Diese sollte von Discord eindeutig sein, daher UNIQUE
@@ -78,13 +78,13 @@ class PlayerDiscordAccountLink(Base):
     __tablename__ = 'player_discord_account_links'
 
     # link_id: Eindeutige ID für diese spezifische Verknüpfung
-    link_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    link_id = Column(uuid_type(), primary_key=True, default=new_uuid)
 
     # player_id (Foreign Key): Verweist auf Players.player_id
-    player_id = Column(String(36), ForeignKey('players.player_id'), nullable=False)
+    player_id = Column(uuid_type(), ForeignKey('players.player_id'), nullable=False)
 
     # discord_account_id (Foreign Key): Verweist auf DiscordAccounts.discord_account_id
-    discord_account_id = Column(String(36), ForeignKey('discord_accounts.discord_account_id'), nullable=False)
+    discord_account_id = Column(uuid_type(), ForeignKey('discord_accounts.discord_account_id'), nullable=False)
 
     # is_primary_account (Optional): Flag, ob dies der primäre Discord-Account für diesen Spieler ist
     is_primary_account = Column(Boolean, default=False, nullable=False)
@@ -109,7 +109,7 @@ class RiotAccount(Base):
     __tablename__ = 'riot_accounts'
 
     # riot_account_id (Primary Key): Eindeutige interne ID für jeden Riot Account.
-    riot_account_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    riot_account_id = Column(uuid_type(), primary_key=True, default=new_uuid)
 
     # puuid (Unique): Die Persistent Unique ID von Riot (die stabile ID, auch bei Namensänderungen).
     # Dies ist der wichtigste externe Identifikator von Riot.
@@ -144,10 +144,10 @@ class RiotAccountNameHistory(Base):
     __tablename__ = 'riot_account_name_history'
 
     # history_id: Eindeutige ID für jeden Eintrag in dieser Historie-Tabelle
-    history_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    history_id = Column(history_key_type(), primary_key=True, default=history_key_default())
 
     # riot_account_id (Foreign Key): Verweist auf RiotAccounts.riot_account_id
-    riot_account_id = Column(String(36), ForeignKey('riot_accounts.riot_account_id'), nullable=False)
+    riot_account_id = Column(uuid_type(), ForeignKey('riot_accounts.riot_account_id'), nullable=False)
 
     # puuid: Die PUUID des Accounts zum Zeitpunkt der Änderung (kann zur schnelleren Abfrage redundant sein)
     # Nicht als FK, da die FK-Beziehung über riot_account_id läuft. Aber nützlich für direkte Abfragen.
@@ -186,13 +186,14 @@ class PlayerRiotAccountLink(Base):
     __tablename__ = 'player_riot_account_links'
 
     # link_id: Eindeutige ID für diese spezifische Verknüpfung
-    link_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    link_id = Column(uuid_type(), primary_key=True, default=new_uuid)
 
     # player_id (Foreign Key): Verweist auf Players.player_id
-    player_id = Column(String(36), ForeignKey('players.player_id'), nullable=False)
+    # Indiziert, da Ladder- und Profil-Abfragen über diese Spalte joinen
+    player_id = Column(uuid_type(), ForeignKey('players.player_id'), nullable=False, index=True)
 
     # riot_account_id (Foreign Key): Verweist auf RiotAccounts.riot_account_id
-    riot_account_id = Column(String(36), ForeignKey('riot_accounts.riot_account_id'), nullable=False)
+    riot_account_id = Column(uuid_type(), ForeignKey('riot_accounts.riot_account_id'), nullable=False, index=True)
 
     # is_primary_riot_account (Optional): Flag, ob dies der primäre Riot-Account für diesen Spieler ist
     is_primary_riot_account = Column(Boolean, default=False, nullable=False)
@@ -250,7 +251,7 @@ class ServerPlayer(Base):
     __tablename__ = 'server_players'
 
     # server_player_id (Primary Key): Eindeutige ID für diese server-spezifische Spieler-Verbindung.
-    server_player_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    server_player_id = Column(uuid_type(), primary_key=True, default=new_uuid)
 
     # server_id (Foreign Key): Verweist auf DiscordServers.server_id.
     # Verbindet diesen Eintrag mit dem spezifischen Discord-Server.
@@ -258,7 +259,8 @@ class ServerPlayer(Base):
 
     # player_id (Foreign Key): Verweist auf Players.player_id.
     # Verbindet diesen Eintrag mit dem logischen Spieler.
-    player_id = Column(String(36), ForeignKey('players.player_id'), nullable=False)
+    # Der Unique-Constraint deckt nur Abfragen nach server_id ab, daher ein eigener Index.
+    player_id = Column(uuid_type(), ForeignKey('players.player_id'), nullable=False, index=True)
 
     # Zusätzlicher UNIQUE-Constraint, um doppelte Verknüpfungen zu verhindern
     # Ein Paar aus server_id und player_id darf nur einmal vorkommen.
@@ -290,7 +292,7 @@ class Race(Base):
     __tablename__ = 'races'
 
     # race_id (Primary Key): Eindeutige ID für die Race.
-    race_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    race_id = Column(uuid_type(), primary_key=True, default=new_uuid)
 
     # server_id (Foreign Key): Verweist auf DiscordServers.server_id.
     # Verbindet die Race mit dem spezifischen Server, auf dem sie stattfindet.
@@ -310,7 +312,8 @@ class Race(Base):
 
     # status: Aktueller Status der Race (z.B. "planned", "active", "finished", "cancelled").
     # Ein String, der den Status repräsentiert.
-    status = Column(String(50), nullable=False, default="planned")
+    # Index: Race-Engine und Scheduler lesen nur laufende bzw. geplante Races
+    status = Column(String(50), nullable=False, default="planned", index=True)
 
     # race_type (Optional): Art der Race (z.B. "LP Climb", "Top 4 Count", "Placement Average").
     race_type = Column(String(100), nullable=True)
@@ -342,15 +345,15 @@ class RaceParticipant(Base):
     __tablename__ = 'race_participants'
 
     # participant_id (Primary Key): Eindeutige ID für die Race-Teilnahme.
-    participant_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    participant_id = Column(uuid_type(), primary_key=True, default=new_uuid)
 
     # race_id (Foreign Key): Verweist auf Races.race_id.
     # Verbindet diesen Teilnehmer mit der spezifischen Race.
-    race_id = Column(String(36), ForeignKey('races.race_id'), nullable=False)
+    race_id = Column(uuid_type(), ForeignKey('races.race_id'), nullable=False)
 
     # server_player_id (Foreign Key): Verweist auf ServerPlayers.server_player_id.
     # Verbindet den spezifischen Spieler auf dem spezifischen Server mit der Race.
-    server_player_id = Column(String(36), ForeignKey('server_players.server_player_id'), nullable=False)
+    server_player_id = Column(uuid_type(), ForeignKey('server_players.server_player_id'), nullable=False)
 
     # Zusätzlicher UNIQUE-Constraint, um doppelte Teilnahmen zu verhindern
     # Ein Paar aus race_id und server_player_id darf nur einmal vorkommen.
@@ -373,6 +376,13 @@ class RaceParticipant(Base):
     # joined_race_at: Zeitpunkt des Beitritts zur Race.
     joined_race_at = Column(DateTime, default=func.now(), nullable=False)
 
+    # current_value (Optional): Laufender Wert während der Race, gepflegt von race_engine.py.
+    # LP_CLIMB: aktueller Ladder-Score, TOP4_COUNT: Anzahl Top-4, PLACEMENT_AVERAGE: Summe der Platzierungen.
+    current_value = Column(Integer, nullable=True)
+
+    # games_played (Optional): Gezählte Spiele der platzierungsbasierten Race-Typen.
+    games_played = Column(Integer, nullable=True)
+
     # last_progress_update (Optional): Letzter Zeitpunkt der Fortschrittsaktualisierung.
     # Nützlich, um zu wissen, wann die Daten des Teilnehmers das letzte Mal aktualisiert wurden.
     last_progress_update = Column(DateTime, nullable=True)
@@ -391,9 +401,13 @@ class RaceParticipant(Base):
 class RiotAccountLPHistory(Base):
     """Tracks the ranked history (LP, Tier, etc.) of a Riot Account over time."""
     __tablename__ = 'riot_account_lp_history'
+    __table_args__ = (
+        # Deckt "neuester Eintrag pro Account und Queue" ab (Rebuild der current_rank-Tabelle)
+        Index('ix_lp_history_account_queue_time', 'riot_account_id', 'queue_type', 'retrieved_at'),
+    )
 
-    lp_history_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    riot_account_id = Column(String(36), ForeignKey('riot_accounts.riot_account_id'), nullable=False, index=True)
+    lp_history_id = Column(history_key_type(), primary_key=True, default=history_key_default())
+    riot_account_id = Column(uuid_type(), ForeignKey('riot_accounts.riot_account_id'), nullable=False, index=True)
 
     league_points = Column(Integer, nullable=False)
     queue_type = Column(String(50), nullable=True) # z.B. 'RANKED_TFT', 'RANKED_TFT_TURBO'
@@ -402,10 +416,191 @@ class RiotAccountLPHistory(Base):
     wins = Column(Integer, nullable=False)
     losses = Column(Integer, nullable=False)
 
+    # Kompakte Kodierungen (siehe ladder.py), NULL bei unranked
+    tier_code = Column(SmallInteger, nullable=True)      # IRON=0 ... CHALLENGER=9
+    division_code = Column(SmallInteger, nullable=True)  # I=1 ... IV=4
+    ladder_score = Column(Integer, nullable=True, index=True) # tier*400 + Division-Offset + LP
+
     retrieved_at = Column(DateTime, default=func.now(), nullable=False)
 
     riot_account = relationship("RiotAccount", backref="lp_history")
 
     def __repr__(self):
         return (f"<RiotAccountLPHistory(riot_account_id='{self.riot_account_id}', "
-                f"tier='{self.tier}', division='{self.division}', lp={self.league_points})>")
\ No newline at end of file
+                f"tier='{self.tier}', division='{self.division}', lp={self.league_points})>")
+
+class RiotAccountCurrentRank(Base):
+    """
+    Materialized latest rank per Riot Account and queue.
+
+    Mirrors the newest RiotAccountLPHistory entry, so current-rank reads are a
+    single primary-key lookup instead of a scan over the full history.
+    Maintained by database_crud.add_lp_history_entry in the same transaction.
+    """
+    __tablename__ = 'riot_account_current_rank'
+    __table_args__ = (
+        # "Top N" und "Platz von Spieler X" als Index-Range-Abfragen
+        Index('ix_current_rank_queue_score', 'queue_type', 'ladder_score'),
+    )
+
+    riot_account_id = Column(uuid_type(), ForeignKey('riot_accounts.riot_account_id'), primary_key=True)
+    queue_type = Column(String(50), primary_key=True) # z.B. 'RANKED_TFT'
+
+    # Verweis auf den History-Eintrag, aus dem diese Zeile stammt
+    lp_history_id = Column(history_key_type(), ForeignKey('riot_account_lp_history.lp_history_id'), nullable=False)
+
+    league_points = Column(Integer, nullable=False)
+    tier = Column(String(50), nullable=True)
+    division = Column(String(10), nullable=True)
+    wins = Column(Integer, nullable=False)
+    losses = Column(Integer, nullable=False)
+    tier_code = Column(SmallInteger, nullable=True)
+    division_code = Column(SmallInteger, nullable=True)
+    ladder_score = Column(Integer, nullable=True)
+
+    # Zeitpunkt des zugrundeliegenden Snapshots (nicht der Aktualisierung dieser Zeile)
+    retrieved_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+
+    riot_account = relationship("RiotAccount", backref="current_ranks")
+
+    def __repr__(self):
+        return (f"<RiotAccountCurrentRank(riot_account_id='{self.riot_account_id}', queue='{self.queue_type}', "
+                f"tier='{self.tier}', division='{self.division}', lp={self.league_points})>")
+
+
+class _LPRollupColumns:
+    """
+    Shared columns of the LP history rollup tables.
+    One row summarizes all snapshots of an account and queue within one time bucket.
+    """
+    @declared_attr
+    def riot_account_id(cls):
+        return Column(uuid_type(), ForeignKey('riot_accounts.riot_account_id'), primary_key=True)
+
+    queue_type = Column(String(50), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True) # Beginn der Stunde bzw. des Tages
+
+    sample_count = Column(Integer, nullable=False)   # Anzahl zusammengefasster Snapshots
+    first_at = Column(DateTime, nullable=False)      # retrieved_at des ersten Snapshots
+    last_at = Column(DateTime, nullable=False)       # retrieved_at des letzten Snapshots
+
+    first_lp = Column(Integer, nullable=False)
+    last_lp = Column(Integer, nullable=False)
+    min_lp = Column(Integer, nullable=False)
+    max_lp = Column(Integer, nullable=False)
+
+    # Ladder-Scores (siehe ladder.py), NULL wenn im Bucket unranked
+    first_score = Column(Integer, nullable=True)
+    last_score = Column(Integer, nullable=True)
+    min_score = Column(Integer, nullable=True)
+    max_score = Column(Integer, nullable=True)
+
+    last_tier = Column(String(50), nullable=True)
+    last_division = Column(String(10), nullable=True)
+
+    first_wins = Column(Integer, nullable=False)
+    last_wins = Column(Integer, nullable=False)
+    first_losses = Column(Integer, nullable=False)
+    last_losses = Column(Integer, nullable=False)
+    wins_delta = Column(Integer, nullable=False)     # last_wins - first_wins
+    losses_delta = Column(Integer, nullable=False)   # last_losses - first_losses
+
+
+class RiotAccountLPHourlyRollup(_LPRollupColumns, Base):
+    """Hourly summary of LP history snapshots older than the raw retention window."""
+    __tablename__ = 'riot_account_lp_rollup_hourly'
+
+    def __repr__(self):
+        return (f"<RiotAccountLPHourlyRollup(riot_account_id='{self.riot_account_id}', "
+                f"bucket='{self.bucket_start}', lp={self.first_lp}->{self.last_lp})>")
+
+
+class RiotAccountLPDailyRollup(_LPRollupColumns, Base):
+    """Daily summary of hourly rollups older than the hourly retention window."""
+    __tablename__ = 'riot_account_lp_rollup_daily'
+
+    def __repr__(self):
+        return (f"<RiotAccountLPDailyRollup(riot_account_id='{self.riot_account_id}', "
+                f"bucket='{self.bucket_start}', lp={self.first_lp}->{self.last_lp})>")
+
+
+class SyncJob(Base):
+    """
+    Durable queue entry for background sync work (see sync_worker.py).
+
+    Lifecycle: 'queued' -> 'running' (claimed by a worker with a lease) -> deleted on
+    success, or back to 'queued' with a later run_after for a retry, or 'dead' once
+    max_attempts is used up. A 'running' job whose lease expired belongs to a crashed
+    worker and is claimed again.
+    """
+    __tablename__ = 'sync_jobs'
+    __table_args__ = (
+        # Claim-Abfrage: fällige Jobs bzw. abgelaufene Leases
+        Index('ix_sync_jobs_status_run_after', 'status', 'run_after'),
+        Index('ix_sync_jobs_status_lease', 'status', 'lease_expires_at'),
+        # Duplikatprüfung beim Einstellen
+        Index('ix_sync_jobs_kind_dedupe', 'kind', 'dedupe_key'),
+    )
+
+    job_id = Column(uuid_type(), primary_key=True, default=new_uuid)
+    kind = Column(String(50), nullable=False)          # z.B. 'register', 'refresh_rank'
+    payload = Column(JSON, nullable=False)
+    # Solange ein Job mit gleichem kind und dedupe_key wartet oder läuft, wird kein zweiter eingestellt
+    dedupe_key = Column(String(255), nullable=True)
+
+    status = Column(String(20), nullable=False, default='queued') # queued, running, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, default=func.now(), nullable=False)
+
+    lease_owner = Column(String(255), nullable=True)   # worker_id des bearbeitenden Workers
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_error = Column(String(1024), nullable=True)
+
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return (f"<SyncJob(job_id='{self.job_id}', kind='{self.kind}', status='{self.status}', "
+                f"attempts={self.attempts}/{self.max_attempts})>")
+
+
+class SyncPartitionLease(Base):
+    """
+    Ownership of one partition of the rank polling work (see partition_leases.py).
+
+    A partition is a Riot platform (e.g. 'euw1') or a hash bucket of one ('euw1:2').
+    The owner renews its lease by heartbeat; once lease_expires_at has passed,
+    any other worker may take the partition over.
+    """
+    __tablename__ = 'sync_partition_leases'
+
+    partition_key = Column(String(64), primary_key=True)
+    owner = Column(String(255), nullable=True)          # worker_id, NULL = frei
+    lease_expires_at = Column(DateTime, nullable=True)
+    acquired_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    # Ende des letzten vollständigen Poll-Durchlaufs, auch über Besitzerwechsel hinweg
+    last_synced_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return (f"<SyncPartitionLease(partition_key='{self.partition_key}', owner='{self.owner}', "
+                f"expires='{self.lease_expires_at}')>")
+
+
+class SyncWorkerHeartbeat(Base):
+    """
+    Presence of a sync worker that takes part in the partitioning. Workers count
+    each other through this table, also those that do not hold a lease yet.
+    """
+    __tablename__ = 'sync_worker_heartbeats'
+
+    worker_id = Column(String(255), primary_key=True)
+    started_at = Column(DateTime, default=func.now(), nullable=False)
+    heartbeat_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<SyncWorkerHeartbeat(worker_id='{self.worker_id}', expires='{self.expires_at}')>"
+
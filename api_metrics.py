@@ -0,0 +1,186 @@
+# api_metrics.py
+"""
+In-process metrics for the Riot API client (riot_api_handler.py).
+
+Collected:
+    riot_api_request_duration_seconds   Histogram per endpoint and routing host
+    riot_api_responses_total            Counter per endpoint, host and status code
+                                        ('error' for network errors without a response)
+    riot_api_limiter_wait_seconds       Histogram of the time spent waiting in the rate limiter
+    riot_api_rate_budget_remaining      Remaining requests per rate limit window (read at scrape time)
+    riot_api_rate_budget_limit          Configured requests per rate limit window
+
+render_prometheus() returns all metrics in the Prometheus text format.
+start_metrics_server() serves them on http://<host>:<port>/metrics from a
+background thread; the bot starts it when METRICS_PORT is set in .env.
+"""
+import logging
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+USER_PY_LOGGING_PREFIX = "METRICS_"
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+# Bucket-Grenzen in Sekunden
+REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WAIT_BUCKETS = (0.001, 0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    """A cumulative histogram with fixed bucket bounds, like a Prometheus histogram."""
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+_lock = threading.Lock()
+_request_durations: dict[tuple[str, str], Histogram] = {}
+_responses: dict[tuple[str, str, str], int] = {}
+_limiter_wait = Histogram(WAIT_BUCKETS)
+# Liefert beim Abruf [(limit, period_seconds, remaining), ...]
+_budget_source = None
+
+
+def observe_request(endpoint: str, host: str, duration_seconds: float, status: int | str) -> None:
+    """Records one finished API request (status: HTTP status code, or 'error' without a response)."""
+    with _lock:
+        histogram = _request_durations.get((endpoint, host))
+        if histogram is None:
+            histogram = _request_durations[(endpoint, host)] = Histogram(REQUEST_BUCKETS)
+        histogram.observe(duration_seconds)
+        key = (endpoint, host, str(status))
+        _responses[key] = _responses.get(key, 0) + 1
+
+
+def observe_limiter_wait(wait_seconds: float) -> None:
+    """Records how long one request waited in the rate limiter."""
+    with _lock:
+        _limiter_wait.observe(wait_seconds)
+
+
+def set_budget_source(source) -> None:
+    """Registers a callable returning [(limit, period_seconds, remaining), ...], e.g. RateLimiter.remaining."""
+    global _budget_source
+    _budget_source = source
+
+
+def get_snapshot() -> dict:
+    """Returns the current values as plain Python data (for commands and tests)."""
+    with _lock:
+        return {
+            'requests': {key: {'count': h.count, 'sum': h.sum} for key, h in _request_durations.items()},
+            'responses': dict(_responses),
+            'limiter_wait': {'count': _limiter_wait.count, 'sum': _limiter_wait.sum},
+            'budget': _budget_source() if _budget_source else [],
+        }
+
+
+def reset() -> None:
+    """Clears all collected values (the budget source stays registered)."""
+    global _limiter_wait
+    with _lock:
+        _request_durations.clear()
+        _responses.clear()
+        _limiter_wait = Histogram(WAIT_BUCKETS)
+
+
+# --- Prometheus Export ---
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _render_histogram(lines: list[str], name: str, histogram: Histogram, **labels) -> None:
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        lines.append(f"{name}_bucket{_labels(**labels, le=repr(bound))} {count}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+
+def render_prometheus() -> str:
+    """Returns all metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    with _lock:
+        lines.append("# HELP riot_api_request_duration_seconds Duration of Riot API requests.")
+        lines.append("# TYPE riot_api_request_duration_seconds histogram")
+        for (endpoint, host), histogram in sorted(_request_durations.items()):
+            _render_histogram(lines, "riot_api_request_duration_seconds", histogram, endpoint=endpoint, host=host)
+
+        lines.append("# HELP riot_api_responses_total Riot API responses by status code.")
+        lines.append("# TYPE riot_api_responses_total counter")
+        for (endpoint, host, status), count in sorted(_responses.items()):
+            lines.append(f"riot_api_responses_total{_labels(endpoint=endpoint, host=host, status=status)} {count}")
+
+        lines.append("# HELP riot_api_limiter_wait_seconds Time requests waited in the rate limiter.")
+        lines.append("# TYPE riot_api_limiter_wait_seconds histogram")
+        _render_histogram(lines, "riot_api_limiter_wait_seconds", _limiter_wait)
+
+    budget = _budget_source() if _budget_source else []
+    lines.append("# HELP riot_api_rate_budget_remaining Requests left in each rate limit window.")
+    lines.append("# TYPE riot_api_rate_budget_remaining gauge")
+    for limit, period, remaining in budget:
+        lines.append(f"riot_api_rate_budget_remaining{_labels(window=f'{period}s')} {remaining}")
+    lines.append("# HELP riot_api_rate_budget_limit Configured requests per rate limit window.")
+    lines.append("# TYPE riot_api_rate_budget_limit gauge")
+    for limit, period, remaining in budget:
+        lines.append(f"riot_api_rate_budget_limit{_labels(window=f'{period}s')} {limit}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes nicht auf stderr protokollieren
+        logger.debug("Metrics request: " + format, *args, extra={'action': 'METRICS_SCRAPE'})
+
+
+def start_metrics_server(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """
+    Serves /metrics on a daemon thread and returns the server (call shutdown() to stop it).
+    Binds to localhost by default; pass host='0.0.0.0' to expose it.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    logger.info("Serving metrics on http://%s:%s/metrics", host, server.server_address[1],
+                extra={'action': 'METRICS_SERVER_STARTED'})
+    return server
@@ -0,0 +1,89 @@
+"""
+Bulk as-of rank lookup (crud.get_ranks_as_of) against one query per account.
+
+For every size a fresh SQLite database is seeded with that many accounts and
+--snapshots hourly LP snapshots each; the older half of every account's history
+is compacted into hourly rollups by the retention code, so the lookups read both.
+Both variants answer "each account's rank as of T" for all accounts, once at a
+time in the raw range and once in the rollup range.
+
+    python benchmarks/bench_as_of.py --sizes 1000,5000 --snapshots 48
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bench_common import crud, seed_world, summarize, use_temp_database
+import lp_retention
+from sqlalchemy import select
+
+SERVERS = 10
+
+
+def _per_account(account_ids: list[str], as_of: datetime) -> dict:
+    """The N-query pattern: latest entry at or before T, one query per account."""
+    ranks = {}
+    for account_id in account_ids:
+        history = crud.lp_history_selectable('RANKED_TFT', riot_account_ids=[account_id], end=as_of)
+        with crud.session_scope() as session:
+            row = session.execute(
+                select(history).order_by(history.c.retrieved_at.desc()).limit(1)
+            ).first()
+        if row is not None:
+            ranks[account_id] = row
+    return ranks
+
+
+def _time(function, *args, repeats: int) -> tuple[dict, list[float]]:
+    timings, result = [], None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, timings
+
+
+def run(sizes: list[int], snapshots: int = 48, repeats: int = 3) -> dict:
+    results = {}
+    for size in sizes:
+        engine = use_temp_database(f"as_of_{size}")
+        world = seed_world(engine, servers=SERVERS, players=size, snapshots=snapshots)
+        account_ids = world['riot_account_ids']
+        now = datetime.now()
+        # Ältere Hälfte der Historie in Stunden-Rollups verdichten
+        lp_retention.compact_raw_history(now - timedelta(hours=snapshots // 2), max_batches=10**6)
+
+        for label, as_of in (('raw', now - timedelta(hours=2, minutes=30)),
+                             ('rollup', now - timedelta(hours=snapshots - snapshots // 4, minutes=30))):
+            bulk, bulk_timings = _time(crud.get_ranks_as_of, account_ids, as_of, repeats=repeats)
+            if bulk is None:
+                raise RuntimeError(f"get_ranks_as_of failed ({label}, {size} accounts), see the log.")
+            single, single_timings = _time(_per_account, account_ids, as_of, repeats=1)
+            if {key: value['ladder_score'] for key, value in bulk.items()} != \
+                    {key: row.ladder_score for key, row in single.items()}:
+                raise AssertionError(f"Bulk and per-account lookups differ ({label}, {size} accounts).")
+            results[f"as_of.bulk[{label}]@{size}"] = summarize(bulk_timings, sum(bulk_timings) / 1000)
+            results[f"as_of.per_account[{label}]@{size}"] = summarize(single_timings, sum(single_timings) / 1000)
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the bulk as-of rank lookup.")
+    parser.add_argument('--sizes', default="1000,5000", help="Account counts, comma separated.")
+    parser.add_argument('--snapshots', type=int, default=48, help="Hourly LP snapshots per account.")
+    parser.add_argument('--repeats', type=int, default=3, help="Runs of the bulk lookup per case.")
+    args = parser.parse_args(argv)
+
+    results = run([int(size) for size in args.sizes.split(',')], args.snapshots, args.repeats)
+    print(f"{'benchmark':<40} {'p50_ms':>12} {'accounts/s':>12}")
+    for name, stats in results.items():
+        size = int(name.rsplit('@', 1)[1])
+        print(f"{name:<40} {stats['p50_ms']:>12.1f} {size / (stats['p50_ms'] / 1000):>12.0f}")
+    print(json.dumps(results, indent=2), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
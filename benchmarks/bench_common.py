@@ -0,0 +1,233 @@
+"""
+Shared helpers for the benchmark scripts in this directory:
+
+- use_temp_database(): points database_crud at a fresh temp-file SQLite database
+- seed_world(): bulk-inserts players, Riot accounts, links, server memberships and LP history
+- StubRiotTransport: stands in for requests.get, so the real riot_api_handler code
+  (API key fetch, rate limiter, metrics, JSON handling) runs without network access
+- measure(): per-call latency statistics
+- user_path(): resolves a path given on the command line against the caller's directory
+
+The scripts are run from the repository root, e.g. `python benchmarks/run_benchmarks.py`.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest import mock
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+_WORK_DIR = tempfile.mkdtemp(prefix="tft_bench_")
+# Verzeichnis, aus dem das Skript gestartet wurde (vor dem chdir in _WORK_DIR)
+ORIGINAL_CWD = os.getcwd()
+
+
+def _prepare_environment() -> None:
+    """
+    database_crud opens its engine from the .env in the working directory on first use.
+    The benchmarks run in a scratch directory with an SQLite .env, so they never touch
+    the real database, and then switch to their own engines via configure_engine().
+    """
+    with open(os.path.join(_WORK_DIR, '.env'), 'w', encoding='utf-8') as env_file:
+        env_file.write("db_type=sqlite\n")
+    os.environ['SQLITE_DB_FILE'] = os.path.join(_WORK_DIR, 'import.db')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('RIOT_API_GIST', 'https://gist.stub.invalid/key')
+    os.environ.setdefault('RIOT_API_LIMITS', '1000000:1')
+    os.chdir(_WORK_DIR)
+
+
+_prepare_environment()
+
+
+def user_path(path: str) -> str:
+    """
+    Paths from the command line (--output, --baseline) are meant relative to the directory the
+    script was started from, not the scratch directory the benchmarks switch into.
+    """
+    return os.path.join(ORIGINAL_CWD, os.path.expanduser(path))
+
+import sqlalchemy  # noqa: E402
+
+import database_crud as crud  # noqa: E402
+import ladder  # noqa: E402
+from db_types import new_uuid  # noqa: E402
+from ORM_models import (  # noqa: E402
+    Base, DiscordServer, Player, ServerPlayer, RiotAccount, PlayerRiotAccountLink, RiotAccountLPHistory, Race,
+    RaceParticipant
+)
+
+TIERS = ['IRON', 'BRONZE', 'SILVER', 'GOLD', 'PLATINUM', 'EMERALD', 'DIAMOND']
+DIVISIONS = ['IV', 'III', 'II', 'I']
+REGION = 'euw1'
+
+
+def use_temp_database(name: str):
+    """Creates a new SQLite database file with the full schema and makes database_crud use it."""
+    path = os.path.join(_WORK_DIR, f"{name}.db")
+    if os.path.exists(path):
+        os.remove(path)
+    engine = sqlalchemy.create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    crud.configure_engine(engine)
+    return engine
+
+
+def random_snapshot(rng: random.Random) -> dict:
+    tier, division, league_points = rng.choice(TIERS), rng.choice(DIVISIONS), rng.randint(0, 99)
+    return {'tier': tier, 'division': division, 'league_points': league_points,
+            **ladder.encode_snapshot(tier, division, league_points)}
+
+
+def seed_world(engine, servers: int, players: int, snapshots: int = 1, memberships_per_player: int = 1,
+               races_per_server: int = 0, seed: int = 42) -> dict:
+    """
+    Bulk-inserts a synthetic world: `players` players, each with one primary Riot account,
+    `snapshots` LP history entries per account, and memberships on `memberships_per_player`
+    random servers (overlapping between servers). Active races get all members as participants.
+
+    Returns:
+        A dict with the created IDs: server_ids, player_ids, riot_account_ids, puuids,
+        server_player_ids (per server) and race_ids.
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+    server_ids = [str(10**17 + index) for index in range(servers)]
+    world = {'server_ids': server_ids, 'player_ids': [], 'riot_account_ids': [], 'puuids': [],
+             'server_player_ids': {server_id: [] for server_id in server_ids}, 'race_ids': []}
+
+    player_rows, account_rows, link_rows, membership_rows, history_rows = [], [], [], [], []
+    for index in range(players):
+        player_id, riot_account_id, puuid = new_uuid(), new_uuid(), f"stub-puuid-{seed}-{index}"
+        world['player_ids'].append(player_id)
+        world['riot_account_ids'].append(riot_account_id)
+        world['puuids'].append(puuid)
+        player_rows.append({'player_id': player_id, 'display_name': f"Player{index}"})
+        account_rows.append({'riot_account_id': riot_account_id, 'puuid': puuid,
+                             'game_name': f"Bench{index}", 'tag_line': 'EUW', 'region': REGION})
+        link_rows.append({'link_id': new_uuid(), 'player_id': player_id, 'riot_account_id': riot_account_id,
+                          'is_primary_riot_account': True, 'is_active': True})
+        for server_id in rng.sample(server_ids, min(memberships_per_player, servers)):
+            server_player_id = new_uuid()
+            world['server_player_ids'][server_id].append(server_player_id)
+            membership_rows.append({'server_player_id': server_player_id, 'server_id': server_id,
+                                    'player_id': player_id, 'is_active_on_server': True})
+        for snapshot in range(snapshots):
+            history_rows.append({'riot_account_id': riot_account_id, 'queue_type': 'RANKED_TFT',
+                                 'wins': snapshot, 'losses': snapshot,
+                                 'retrieved_at': now - timedelta(hours=snapshots - snapshot),
+                                 **random_snapshot(rng)})
+
+    race_rows, participant_rows = [], []
+    for server_id in server_ids:
+        for race_number in range(races_per_server):
+            race_id = new_uuid()
+            world['race_ids'].append(race_id)
+            race_rows.append({'race_id': race_id, 'server_id': server_id, 'race_name': f"Race {race_number}",
+                              'start_time': now - timedelta(days=1), 'end_time': now + timedelta(days=7),
+                              'status': 'active'})
+            participant_rows.extend({'participant_id': new_uuid(), 'race_id': race_id, 'server_player_id': sp_id}
+                                    for sp_id in world['server_player_ids'][server_id])
+
+    with engine.begin() as connection:
+        connection.execute(DiscordServer.__table__.insert(),
+                           [{'server_id': server_id, 'server_name': f"Guild {server_id}"} for server_id in server_ids])
+        for model, rows in ((Player, player_rows), (RiotAccount, account_rows), (PlayerRiotAccountLink, link_rows),
+                            (ServerPlayer, membership_rows), (RiotAccountLPHistory, history_rows),
+                            (Race, race_rows), (RaceParticipant, participant_rows)):
+            if rows:
+                connection.execute(model.__table__.insert(), rows)
+    if history_rows:
+        crud.rebuild_current_rank_table()
+    return world
+
+
+class _StubResponse:
+    def __init__(self, status_code: int, payload=None, text: str = ''):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = text
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        import requests
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} (stub)", response=self)
+
+
+class StubRiotTransport:
+    """
+    Replaces requests.get for riot_api_handler. Answers the key gist, the account-v1
+    by-riot-id endpoint and the tft-league by-puuid endpoint with deterministic data,
+    after an optional artificial latency.
+    """
+    def __init__(self, latency_seconds: float = 0.0, seed: int = 7):
+        self.latency_seconds = latency_seconds
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if 'gist' in url:
+            return _StubResponse(200, text='RGAPI-stub-key')
+        if '/accounts/by-riot-id/' in url:
+            game_name, tag_line = url.rstrip('/').split('/')[-2:]
+            return _StubResponse(200, {'puuid': f"stub-puuid-{game_name}-{tag_line}",
+                                       'gameName': game_name, 'tagLine': tag_line})
+        if '/tft/league/v1/by-puuid/' in url:
+            snapshot = random_snapshot(self.rng)
+            return _StubResponse(200, [{'queueType': 'RANKED_TFT', 'tier': snapshot['tier'],
+                                        'rank': snapshot['division'], 'leaguePoints': snapshot['league_points'],
+                                        'wins': self.rng.randint(0, 500), 'losses': self.rng.randint(0, 500)}])
+        return _StubResponse(404)
+
+    @contextmanager
+    def installed(self):
+        """Routes riot_api_handler's HTTP calls to this stub while the context is active."""
+        import riot_api_handler
+        with mock.patch.object(riot_api_handler.requests, 'get', self.get):
+            yield self
+
+
+def measure(function, iterations: int, *args_factory) -> dict:
+    """
+    Calls `function` `iterations` times and returns latency statistics in milliseconds.
+    `args_factory` (optional) is called with the iteration number and returns the call arguments.
+    """
+    make_args = args_factory[0] if args_factory else (lambda _: ())
+    timings = []
+    started_total = time.perf_counter()
+    for iteration in range(iterations):
+        args = make_args(iteration)
+        started = time.perf_counter()
+        function(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return summarize(timings, time.perf_counter() - started_total)
+
+
+def summarize(timings_ms: list[float], wall_seconds: float) -> dict:
+    """Latency statistics for a list of per-call timings."""
+    ordered = sorted(timings_ms)
+
+    def percentile(fraction):
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+    return {
+        'iterations': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 4),
+        'p50_ms': round(percentile(0.50), 4),
+        'p95_ms': round(percentile(0.95), 4),
+        'max_ms': round(ordered[-1], 4),
+        'ops_per_sec': round(len(ordered) / wall_seconds, 1) if wall_seconds > 0 else None,
+    }
@@ -0,0 +1,77 @@
+"""
+Latency of the database_crud functions at different table sizes.
+
+For every size a fresh SQLite database is seeded with that many players/accounts
+(one primary link, one server membership and one LP snapshot each, spread over 10 servers),
+then each function is called repeatedly with varying arguments.
+
+Deliberately not part of this suite:
+- Discord accounts and links (add_or_update_discord_account, upsert_discord_accounts,
+  link_player_to_discord_account, deactivate_*_link): rare single-row writes on /register.
+- Bulk and one-off maintenance (upsert_servers, rebuild_current_rank_table, backfill_ladder_scores):
+  run at startup or from scripts, not per request.
+- Race lifecycle (update_race, start_race, finalize_race, finalize_due_races, race progress):
+  one call per race transition, not on a hot path; covered by test_race_engine.
+- Sync jobs, partitions and worker heartbeats (*_sync_job*, *_sync_partition*, *_heartbeat):
+  measured by the load generator under contention, where their cost actually shows.
+- Search index loaders (get_member_search_entries, get_race_search_entries, ...): read once
+  per bot start by prefix_index.SearchIndex.
+- lp_history_selectable / get_ranks_as_of beyond the 100-account case: see bench_as_of.
+"""
+import random
+from datetime import datetime, timedelta
+
+import bench_common
+from bench_common import crud, measure, seed_world, use_temp_database
+
+SERVERS = 10
+
+
+def run(sizes: list[int], iterations: int = 200) -> dict:
+    results = {}
+    for size in sizes:
+        engine = use_temp_database(f"crud_{size}")
+        world = seed_world(engine, servers=SERVERS, players=size, snapshots=1)
+        rng = random.Random(size)
+        server_ids = world['server_ids']
+        player_ids, account_ids, puuids = world['player_ids'], world['riot_account_ids'], world['puuids']
+
+        def pick(values):
+            return lambda _: (rng.choice(values),)
+
+        cases = {
+            # --- Lesen ---
+            'get_player_by_id': (crud.get_player_by_id, pick(player_ids)),
+            'get_player_by_id[player_accounts]': (
+                lambda player_id: crud.get_player_by_id(player_id, profile='player_accounts'), pick(player_ids)),
+            'get_riot_account_by_puuid': (crud.get_riot_account_by_puuid, pick(puuids)),
+            'get_current_rank': (crud.get_current_rank, pick(account_ids)),
+            'get_current_ranks[100]': (crud.get_current_ranks, lambda _: (rng.sample(account_ids, min(100, size)),)),
+            'get_server_ladder[top10]': (crud.get_server_ladder, pick(server_ids)),
+            'get_server_ladder_position': (crud.get_server_ladder_position,
+                                           lambda _: (server_ids[0], rng.choice(account_ids))),
+            'get_server_with_members': (crud.get_server_with_members, pick(server_ids)),
+            'get_lp_history': (crud.get_lp_history, pick(account_ids)),
+            'get_ranks_as_of[100]': (crud.get_ranks_as_of,
+                                     lambda _: (rng.sample(account_ids, min(100, size)), datetime.now())),
+            # --- Schreiben ---
+            'add_player': (crud.add_player, lambda i: (f"NewPlayer{i}",)),
+            'add_or_update_riot_account[update]': (
+                crud.add_or_update_riot_account,
+                lambda i: (puuids[i % size], f"Renamed{i}", 'EUW', bench_common.REGION)),
+            'add_lp_history_entry': (
+                crud.add_lp_history_entry,
+                lambda i: (account_ids[i % size], 'RANKED_TFT', i % 100, 'GOLD', 'II', i, i)),
+            'update_player_display_name': (crud.update_player_display_name,
+                                           lambda i: (player_ids[i % size], f"Display{i}")),
+            'add_or_update_server': (crud.add_or_update_server, lambda i: (server_ids[i % SERVERS], f"Guild {i}")),
+            'add_player_to_server[existing]': (crud.add_player_to_server,
+                                               lambda i: (player_ids[i % size], server_ids[0])),
+            'link_player_to_riot_account[existing]': (crud.link_player_to_riot_account,
+                                                      lambda i: (player_ids[i % size], account_ids[i % size], True)),
+            'create_race': (crud.create_race, lambda i: (server_ids[i % SERVERS], f"Race {i}", datetime.now(),
+                                                         datetime.now() + timedelta(days=7))),
+        }
+        for name, (function, make_args) in cases.items():
+            results[f"crud.{name}@{size}"] = measure(function, iterations, make_args)
+    return results
@@ -0,0 +1,170 @@
+"""
+Compares the two identifier schemas of db_types.py (DB_ID_STORAGE=string / compact)
+on a synthetic SQLite database: file size, size per table/index and the timing of
+the join-heavy ladder and history queries.
+
+    python benchmarks/bench_id_storage.py --accounts 2000 --snapshots 50
+
+Each mode runs in its own subprocess, because the schema mode is fixed when
+ORM_models is imported. Numbers are SQLite-only; on PostgreSQL the compact mode
+uses the native 16-byte UUID type instead of BINARY(16).
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('string', 'compact')
+QUERY_REPEATS = 20
+
+
+def _populate(accounts: int, snapshots: int) -> str:
+    """Fills the benchmark database and returns the ID of the benchmark server."""
+    import database_crud as crud
+    import ladder
+    from db_types import new_uuid
+    from ORM_models import Base, DiscordServer, Player, ServerPlayer, RiotAccount, PlayerRiotAccountLink, RiotAccountLPHistory
+
+    Base.metadata.create_all(crud.get_engine())
+    rng = random.Random(42)
+    server_id = '123456789012345678'
+    now = datetime(2026, 1, 1)
+    tiers = ['IRON', 'BRONZE', 'SILVER', 'GOLD', 'PLATINUM', 'EMERALD', 'DIAMOND']
+    divisions = ['IV', 'III', 'II', 'I']
+
+    players, accounts_rows, links, memberships, history = [], [], [], [], []
+    for index in range(accounts):
+        player_id, riot_account_id = new_uuid(), new_uuid()
+        players.append({'player_id': player_id, 'display_name': f"player{index}"})
+        accounts_rows.append({'riot_account_id': riot_account_id, 'puuid': f"puuid-{index}",
+                              'game_name': f"name{index}", 'tag_line': 'EUW', 'region': 'euw1'})
+        links.append({'link_id': new_uuid(), 'player_id': player_id, 'riot_account_id': riot_account_id,
+                      'is_primary_riot_account': True, 'is_active': True})
+        memberships.append({'server_player_id': new_uuid(), 'server_id': server_id, 'player_id': player_id,
+                            'is_active_on_server': True})
+        tier, division = rng.choice(tiers), rng.choice(divisions)
+        for snapshot in range(snapshots):
+            league_points = rng.randint(0, 99)
+            history.append({'riot_account_id': riot_account_id, 'queue_type': 'RANKED_TFT',
+                            'tier': tier, 'division': division, 'league_points': league_points,
+                            'wins': snapshot, 'losses': snapshot,
+                            'retrieved_at': now - timedelta(hours=snapshots - snapshot),
+                            **ladder.encode_snapshot(tier, division, league_points)})
+
+    with crud.get_engine().begin() as connection:
+        connection.execute(DiscordServer.__table__.insert(), [{'server_id': server_id, 'server_name': 'bench'}])
+        connection.execute(Player.__table__.insert(), players)
+        connection.execute(RiotAccount.__table__.insert(), accounts_rows)
+        connection.execute(PlayerRiotAccountLink.__table__.insert(), links)
+        connection.execute(ServerPlayer.__table__.insert(), memberships)
+        connection.execute(RiotAccountLPHistory.__table__.insert(), history)
+    crud.rebuild_current_rank_table()
+    return server_id
+
+
+def _time_query(function, *args) -> float:
+    """Returns the median runtime of `function(*args)` in milliseconds."""
+    timings = []
+    for _ in range(QUERY_REPEATS):
+        started = time.perf_counter()
+        function(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return round(timings[len(timings) // 2], 3)
+
+
+def run_worker(mode: str, db_file: str, accounts: int, snapshots: int) -> dict:
+    """Runs the benchmark for one mode in this process (DB_ID_STORAGE is already set)."""
+    sys.path.insert(0, REPO_ROOT)
+    import database_crud as crud
+    from sqlalchemy import text
+
+    server_id = _populate(accounts, snapshots)
+    with crud.get_engine().connect() as connection:
+        sample_ids = [row[0] for row in connection.execute(
+            text("SELECT riot_account_id FROM riot_account_current_rank LIMIT 50"))]
+        connection.execute(text("VACUUM"))
+        try:
+            sizes = {row[0]: row[1] for row in connection.execute(
+                text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name ORDER BY name"))}
+        except Exception:
+            # dbstat ist nur verfügbar, wenn SQLite mit SQLITE_ENABLE_DBSTAT_VTAB gebaut wurde
+            sizes = {}
+
+    # Leserichtung wie im Bot: die IDs kommen als Strings aus der API
+    account_id = str(sample_ids[0])
+    timings = {
+        'server_ladder_top10_ms': _time_query(crud.get_server_ladder, server_id, 10),
+        'server_ladder_position_ms': _time_query(crud.get_server_ladder_position, server_id, account_id),
+        'current_ranks_50_ms': _time_query(crud.get_current_ranks, [str(i) for i in sample_ids]),
+        'lp_history_one_account_ms': _time_query(crud.get_lp_history, account_id),
+    }
+    return {
+        'mode': mode,
+        'file_bytes': os.path.getsize(db_file),
+        'object_bytes': sizes,
+        'timings': timings,
+    }
+
+
+def run_mode(mode: str, accounts: int, snapshots: int) -> dict:
+    """Starts a subprocess that benchmarks one mode on a fresh temporary database."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, f"bench_{mode}.db")
+        # sql_functions liest die Verbindungsdaten aus der .env im Arbeitsverzeichnis
+        with open(os.path.join(tmp_dir, '.env'), 'w', encoding='utf-8') as env_file:
+            env_file.write("db_type=sqlite\n")
+        env = dict(os.environ, SQLITE_DB_FILE=db_file, DB_ID_STORAGE=mode, LOG_LEVEL='WARNING')
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', mode, '--db-file', db_file,
+             '--accounts', str(accounts), '--snapshots', str(snapshots)],
+            env=env, cwd=tmp_dir, stdout=subprocess.PIPE, text=True, check=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_comparison(results: dict) -> None:
+    string, compact = results['string'], results['compact']
+
+    def row(label, a, b, unit):
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+        print(f"{label:<55} {a:>14,.3f} {b:>14,.3f} {unit:<3} {change:>8}")
+
+    print(f"{'':<55} {'string':>14} {'compact':>14}")
+    row('database file', string['file_bytes'] / 1024, compact['file_bytes'] / 1024, 'KiB')
+    for name in sorted(set(string['object_bytes']) | set(compact['object_bytes'])):
+        row(f"  {name}", string['object_bytes'].get(name, 0) / 1024,
+            compact['object_bytes'].get(name, 0) / 1024, 'KiB')
+    for name in string['timings']:
+        row(name, string['timings'][name], compact['timings'][name], 'ms')
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark string vs. compact identifier storage.")
+    parser.add_argument('--accounts', type=int, default=2000)
+    parser.add_argument('--snapshots', type=int, default=50, help="LP snapshots per account.")
+    parser.add_argument('--json', action='store_true', help="Print the raw results as JSON.")
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--db-file', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.db_file, args.accounts, args.snapshots)))
+        return 0
+
+    results = {mode: run_mode(mode, args.accounts, args.snapshots) for mode in MODES}
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_comparison(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+RateLimiter.acquire under contention.
+
+The limits are set high enough that acquire() never sleeps, so the numbers show the
+cost of the limiter itself (lock, deque bookkeeping) as more threads compete for it.
+The 'saturated' case uses a real limit and reports how evenly the waiting is spread.
+"""
+import threading
+import time
+
+import bench_common  # noqa: F401  (sets up sys.path and the scratch environment)
+from bench_common import summarize
+from riot_api_handler import RateLimiter
+
+
+def _run_threads(limiter: RateLimiter, threads: int, calls_per_thread: int) -> dict:
+    timings = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        barrier.wait()
+        own = timings[index]
+        for _ in range(calls_per_thread):
+            started = time.perf_counter()
+            limiter.acquire()
+            own.append((time.perf_counter() - started) * 1000)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return summarize([value for own in timings for value in own], time.perf_counter() - started)
+
+
+def run(quick: bool = False) -> dict:
+    results = {}
+    calls = 2_000 if quick else 20_000
+    for threads in (1, 4, 16):
+        # Limits wie bei einem Production-Key, aber so hoch, dass nie gewartet wird
+        limiter = RateLimiter([(10**9, 1), (10**9, 120)])
+        results[f"limiter.acquire.uncapped@{threads}t"] = _run_threads(limiter, threads, calls // threads)
+
+    # Gesättigt: 8 Threads teilen sich 200 Anfragen/Sekunde
+    limiter = RateLimiter([(200, 1)])
+    results["limiter.acquire.saturated@8t"] = _run_threads(limiter, 8, 50 if quick else 75)
+    return results
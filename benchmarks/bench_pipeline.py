@@ -0,0 +1,42 @@
+"""
+End-to-end pipelines against the stubbed Riot API (see bench_common.StubRiotTransport):
+
+- register_new_player_with_riot_id for new Riot IDs (API lookup, account, player, link)
+- a bulk rank refresh: data_manager.sync_tft_rank_for_account for every account of a seeded world
+
+The stub answers instantly by default; pass a latency to include simulated network time.
+"""
+import asyncio
+import time
+
+from bench_common import StubRiotTransport, measure, seed_world, summarize, use_temp_database
+import data_manager
+import database_crud as crud
+from ORM_models import RiotAccount
+
+
+def run(quick: bool = False, api_latency_seconds: float = 0.0) -> dict:
+    results = {}
+    registrations = 50 if quick else 300
+    accounts = 200 if quick else 2_000
+
+    use_temp_database("pipeline_registration")
+    with StubRiotTransport(api_latency_seconds).installed():
+        results['pipeline.register_new_player_with_riot_id'] = measure(
+            lambda index: asyncio.run(data_manager.register_new_player_with_riot_id(f"Bench{index}", "EUW", "euw1")),
+            registrations, lambda index: (index,)
+        )
+
+    engine = use_temp_database("pipeline_rank_refresh")
+    seed_world(engine, servers=10, players=accounts, snapshots=1)
+    with crud.session_scope() as session:
+        riot_accounts = session.query(RiotAccount).all()
+    with StubRiotTransport(api_latency_seconds).installed():
+        timings = []
+        started_total = time.perf_counter()
+        for riot_account in riot_accounts:
+            started = time.perf_counter()
+            data_manager.sync_tft_rank_for_account(riot_account)
+            timings.append((time.perf_counter() - started) * 1000)
+        results[f'pipeline.bulk_rank_refresh@{accounts}'] = summarize(timings, time.perf_counter() - started_total)
+    return results
@@ -0,0 +1,270 @@
+"""
+Synthetic multi-guild load generator for capacity planning.
+
+For every scale step it builds a synthetic world in a fresh SQLite database
+(guilds, players with primary Riot accounts, overlapping server memberships,
+active races), then replays a mix of command and sync traffic from concurrent
+worker threads against the real database_crud / data_manager code and the
+stubbed Riot API, with a real RateLimiter in front of it.
+
+    python benchmarks/load_generator.py --guilds 10,50,200 --players-per-guild 50 --duration 20
+
+Reported per step:
+    throughput       operations per second, overall and per operation type
+    latency          p50/p95 per operation type
+    DB contention    share of worker time spent inside SQL statements, lock errors
+    rate budget      API requests, limiter wait, lowest remaining budget seen, and the
+                     projected time one full rank refresh of all accounts needs at the limit
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_common import StubRiotTransport, seed_world, summarize, use_temp_database, user_path
+import api_metrics
+import data_manager
+import database_crud as crud
+import query_instrumentation
+import riot_api_handler
+import server_analytics
+from ORM_models import RiotAccount
+from sqlalchemy.exc import OperationalError
+
+# Gewichtung der Operationen: überwiegend Lesebefehle, dazu Sync-Verkehr und gelegentliche Registrierungen
+DEFAULT_MIX = {
+    'ladder': 40,
+    'race_view': 15,
+    'stats': 5,
+    'rank_sync': 30,
+    'join_guild': 5,
+    'register': 5,
+}
+
+
+class _World:
+    """IDs of the seeded world plus the mutable bits the traffic needs."""
+    def __init__(self, seeded: dict, accounts: list[RiotAccount]):
+        self.server_ids = seeded['server_ids']
+        self.player_ids = seeded['player_ids']
+        self.race_ids = seeded['race_ids']
+        self.accounts = accounts
+        self.registrations = 0
+        self.lock = threading.Lock()
+
+    def next_registration(self) -> int:
+        with self.lock:
+            self.registrations += 1
+            return self.registrations
+
+
+class _DeadlineLimiter(riot_api_handler.RateLimiter):
+    """
+    Rate limiter that never waits past the end of the step. A request whose slot would
+    only be free after `stop_at` fails at once, and the operation is marked as cut off.
+    """
+    def __init__(self, limits, stop_at: float):
+        super().__init__(limits)
+        self.stop_at = stop_at
+        self.local = threading.local()
+
+    def acquire(self, timeout: float | None = None) -> float:
+        remaining = max(self.stop_at - time.monotonic(), 0.0)
+        try:
+            return super().acquire(timeout=remaining if timeout is None else min(timeout, remaining))
+        except TimeoutError:
+            self.local.cut_off = True
+            raise
+
+
+def _operation(name: str, world: _World, rng: random.Random):
+    if name == 'ladder':
+        return crud.get_server_ladder(rng.choice(world.server_ids), 10)
+    if name == 'race_view':
+        return crud.get_race_with_participants(rng.choice(world.race_ids)) if world.race_ids else None
+    if name == 'stats':
+        return server_analytics.get_server_stats(rng.choice(world.server_ids), 7)
+    if name == 'rank_sync':
+        return data_manager.sync_tft_rank_for_account(rng.choice(world.accounts))
+    if name == 'join_guild':
+        return crud.add_player_to_server(rng.choice(world.player_ids), rng.choice(world.server_ids))
+    if name == 'register':
+        index = world.next_registration()
+        return asyncio.run(data_manager.register_new_player_with_riot_id(f"Load{index}", "GEN", "euw1"))
+    raise ValueError(f"Unknown operation: {name}")
+
+
+def run_step(guilds: int, players_per_guild: int, memberships: int, races_per_guild: int,
+             duration: float, workers: int, mix: dict, api_limits: list[tuple[int, int]],
+             api_latency: float, seed: int = 1) -> dict:
+    """Seeds one world and replays traffic against it for `duration` seconds."""
+    players = guilds * players_per_guild // max(memberships, 1)
+    engine = use_temp_database(f"load_{guilds}")
+    seeded = seed_world(engine, servers=guilds, players=players, snapshots=3,
+                        memberships_per_player=memberships, races_per_server=races_per_guild, seed=seed)
+    with crud.session_scope() as session:
+        accounts = session.query(RiotAccount).all()
+    world = _World(seeded, accounts)
+
+    query_instrumentation.instrument_engine(engine)
+    query_instrumentation.reset_stats()
+    api_metrics.reset()
+    stop_at = time.monotonic() + duration
+    limiter = _DeadlineLimiter(api_limits, stop_at)
+    riot_api_handler.riot_rate_limiter = limiter
+    api_metrics.set_budget_source(limiter.remaining)
+
+    names, weights = list(mix), list(mix.values())
+    timings = defaultdict(list)
+    errors = defaultdict(int)
+    lock_errors = 0
+    cut_off = 0
+    results_lock = threading.Lock()
+    lowest_budget = {f"{period}s": count for count, period in api_limits}
+
+    def worker(worker_id: int):
+        nonlocal lock_errors, cut_off
+        rng = random.Random(seed * 1000 + worker_id)
+        local = defaultdict(list)
+        while time.monotonic() < stop_at:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            limiter.local.cut_off = False
+            try:
+                _operation(name, world, rng)
+            except OperationalError as e:
+                with results_lock:
+                    errors[name] += 1
+                    if 'locked' in str(e).lower():
+                        lock_errors += 1
+                continue
+            except Exception:
+                if not limiter.local.cut_off:
+                    with results_lock:
+                        errors[name] += 1
+                    continue
+            # Nur Operationen zählen, die innerhalb der Laufzeit fertig wurden
+            if limiter.local.cut_off or time.monotonic() > stop_at:
+                with results_lock:
+                    cut_off += 1
+                continue
+            local[name].append((time.perf_counter() - started) * 1000)
+        with results_lock:
+            for name, values in local.items():
+                timings[name].extend(values)
+
+    def budget_monitor():
+        while time.monotonic() < stop_at:
+            for count, period, remaining in limiter.remaining():
+                key = f"{period}s"
+                lowest_budget[key] = min(lowest_budget[key], remaining)
+            time.sleep(0.05)
+
+    with StubRiotTransport(api_latency).installed():
+        monitor = threading.Thread(target=budget_monitor, daemon=True)
+        monitor.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for worker_id in range(workers):
+                pool.submit(worker, worker_id)
+        wall = time.perf_counter() - started
+        monitor.join()
+
+    total_ops = sum(len(values) for values in timings.values())
+    sql_ms = sum(entry['total_ms'] for entry in query_instrumentation.get_query_stats())
+    snapshot = api_metrics.get_snapshot()
+    api_requests = sum(count for (endpoint, _, _), count in snapshot['responses'].items() if endpoint != 'api_key_gist')
+    sustained_rate = min(count / period for count, period in api_limits)
+
+    return {
+        'guilds': guilds,
+        'players': players,
+        'accounts': len(accounts),
+        'memberships': sum(len(ids) for ids in seeded['server_player_ids'].values()),
+        'races': len(seeded['race_ids']),
+        'workers': workers,
+        # Durchsatz bezogen auf die vorgegebene Laufzeit; wall_s zeigt, wie lange der Schritt wirklich lief
+        'duration_s': duration,
+        'wall_s': round(wall, 2),
+        'throughput_ops': round(total_ops / duration, 1),
+        'operations': {name: summarize(values, duration) for name, values in sorted(timings.items())},
+        'errors': dict(errors),
+        'cut_off_at_deadline': cut_off,
+        'db': {
+            'sql_time_share': round(sql_ms / 1000 / (wall * workers), 3),
+            'statements': sum(entry['count'] for entry in query_instrumentation.get_query_stats()),
+            'lock_errors': lock_errors,
+        },
+        'rate_budget': {
+            'api_requests': api_requests,
+            'api_requests_per_s': round(api_requests / duration, 1),
+            'limiter_wait_mean_ms': round(snapshot['limiter_wait']['sum'] / snapshot['limiter_wait']['count'] * 1000, 2)
+                                    if snapshot['limiter_wait']['count'] else 0.0,
+            'lowest_remaining': lowest_budget,
+            # Ein kompletter Rang-Sync braucht eine League-Anfrage pro Account
+            'full_refresh_at_limit_s': round(len(accounts) / sustained_rate, 1),
+        },
+    }
+
+
+def print_report(steps: list[dict]) -> None:
+    print(f"{'guilds':>7} {'accounts':>9} {'ops/s':>8} {'ladder p95':>11} {'sync p95':>9} "
+          f"{'sql share':>10} {'locks':>6} {'api/s':>7} {'wait ms':>8} {'refresh s':>10}")
+    for step in steps:
+        operations = step['operations']
+        ladder_p95 = operations.get('ladder', {}).get('p95_ms', float('nan'))
+        sync_p95 = operations.get('rank_sync', {}).get('p95_ms', float('nan'))
+        budget = step['rate_budget']
+        print(f"{step['guilds']:>7} {step['accounts']:>9} {step['throughput_ops']:>8} {ladder_p95:>11.1f} "
+              f"{sync_p95:>9.1f} {step['db']['sql_time_share']:>10.0%} {step['db']['lock_errors']:>6} "
+              f"{budget['api_requests_per_s']:>7} {budget['limiter_wait_mean_ms']:>8} "
+              f"{budget['full_refresh_at_limit_s']:>10}")
+
+
+def parse_mix(mix_str: str | None) -> dict:
+    if not mix_str:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for pair in mix_str.split(','):
+        name, weight = pair.split('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation in --mix: {name}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay synthetic multi-guild traffic at increasing scale.")
+    parser.add_argument('--guilds', default="10,50,200", help="Guild counts per step, comma separated.")
+    parser.add_argument('--players-per-guild', type=int, default=50)
+    parser.add_argument('--memberships', type=int, default=2, help="Guilds each player is a member of.")
+    parser.add_argument('--races-per-guild', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=20.0, help="Seconds of traffic per step.")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent worker threads.")
+    parser.add_argument('--mix', help="Operation weights, e.g. 'ladder=50,rank_sync=50'.")
+    parser.add_argument('--api-limits', default="20:1,100:120", help="Rate limits like RIOT_API_LIMITS.")
+    parser.add_argument('--api-latency-ms', type=float, default=30.0, help="Simulated Riot API latency.")
+    parser.add_argument('--output', help="Write the full results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    api_limits = riot_api_handler.parse_rate_limits(args.api_limits)
+    mix = parse_mix(args.mix)
+    steps = []
+    for guilds in (int(value) for value in args.guilds.split(',')):
+        print(f"Running step with {guilds} guilds ...", file=sys.stderr)
+        steps.append(run_step(guilds, args.players_per_guild, args.memberships, args.races_per_guild,
+                              args.duration, args.workers, mix, api_limits, args.api_latency_ms / 1000))
+    print_report(steps)
+    if args.output:
+        with open(user_path(args.output), 'w', encoding='utf-8') as output_file:
+            json.dump({'mix': mix, 'api_limits': api_limits, 'steps': steps}, output_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
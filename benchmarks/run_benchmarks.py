@@ -0,0 +1,112 @@
+"""
+Runs the benchmark suite and writes the results as JSON.
+
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --quick --baseline bench.json
+
+Suites: limiter (bench_limiter.py), crud (bench_crud.py), pipeline (bench_pipeline.py).
+Everything runs against temporary SQLite files and a stubbed Riot API, never against
+the configured database or the real API.
+
+With --baseline, every result is compared with the stored one. A benchmark counts as
+a regression when its metric (default p50_ms) is more than --tolerance slower and the
+difference is above --min-delta-ms; the exit code is then 1, so it can gate CI.
+"""
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+
+import bench_common  # noqa: F401  (must be imported before the suites)
+import sqlalchemy
+
+SUITES = ('limiter', 'crud', 'pipeline')
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def run_suites(suites: list[str], sizes: list[int], iterations: int, quick: bool, api_latency: float) -> dict:
+    results = {}
+    if 'limiter' in suites:
+        import bench_limiter
+        results.update(bench_limiter.run(quick))
+    if 'crud' in suites:
+        import bench_crud
+        results.update(bench_crud.run(sizes, iterations))
+    if 'pipeline' in suites:
+        import bench_pipeline
+        results.update(bench_pipeline.run(quick, api_latency))
+    return results
+
+
+def compare(results: dict, baseline: dict, metric: str, tolerance: float, min_delta_ms: float) -> list[str]:
+    """Prints a comparison table and returns the names of regressed benchmarks."""
+    regressions = []
+    print(f"{'benchmark':<60} {'baseline':>11} {'current':>11} {'change':>8}")
+    for name in sorted(results):
+        if name not in baseline:
+            print(f"{name:<60} {'-':>11} {results[name][metric]:>11.4f}      new")
+            continue
+        old, new = baseline[name][metric], results[name][metric]
+        change = (new - old) / old if old else 0.0
+        regressed = change > tolerance and (new - old) > min_delta_ms
+        marker = "  REGRESSION" if regressed else ""
+        print(f"{name:<60} {old:>11.4f} {new:>11.4f} {change:>+7.1%}{marker}")
+        if regressed:
+            regressions.append(name)
+    for name in sorted(set(baseline) - set(results)):
+        print(f"{name:<60} {baseline[name][metric]:>11.4f} {'-':>11}  missing")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the bot's benchmark suite.")
+    parser.add_argument('--suite', action='append', choices=SUITES,
+                        help="Suite to run (repeatable, default: all).")
+    parser.add_argument('--sizes', default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Table sizes for the CRUD suite, comma separated.")
+    parser.add_argument('--iterations', type=int, default=200, help="Calls per CRUD benchmark.")
+    parser.add_argument('--quick', action='store_true', help="Small sizes and iteration counts (smoke test).")
+    parser.add_argument('--api-latency-ms', type=float, default=0.0, help="Simulated Riot API latency.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', help="Compare against a previous results file.")
+    parser.add_argument('--metric', default='p50_ms', choices=('mean_ms', 'p50_ms', 'p95_ms'))
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown (0.25 = 25%%).")
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help="Ignore slowdowns below this many ms.")
+    args = parser.parse_args(argv)
+
+    sizes = [1_000] if args.quick else [int(size) for size in args.sizes.split(',')]
+    iterations = min(args.iterations, 50) if args.quick else args.iterations
+    results = run_suites(args.suite or list(SUITES), sizes, iterations, args.quick, args.api_latency_ms / 1000)
+
+    report = {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'platform': platform.platform(),
+            'sizes': sizes,
+            'iterations': iterations,
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(bench_common.user_path(args.output), 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if args.baseline:
+        with open(bench_common.user_path(args.baseline), encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = compare(results, baseline, args.metric, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}.")
+            return 1
+        print("\nNo regressions.")
+    elif not args.output:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
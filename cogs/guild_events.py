@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import sys
+import discord
+from discord.ext import commands
+
+USER_PY_LOGGING_PREFIX = "GUILD_EVENTS_COG_"
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+# Nach so vielen Mitgliedern gibt record_guild() den Event-Loop kurz frei
+YIELD_EVERY_MEMBERS = 1000
+
+
+def _discriminator(user: discord.abc.User) -> str | None:
+    # Accounts mit neuem Benutzernamen haben den Discriminator "0"
+    return user.discriminator if user.discriminator and user.discriminator != "0" else None
+
+
+class GuildEvents(commands.Cog):
+    """
+    Feeds guild and member changes from the gateway into the bot's write-behind buffer.
+    Without the members intent (DISCORD_MEMBERS_INTENT) only guilds and the bot's own
+    member entries arrive here.
+    """
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.buffer = bot.event_buffer
+
+    def _record_member(self, member: discord.abc.User) -> None:
+        if not member.bot:
+            self.buffer.record_member(str(member.id), member.name, _discriminator(member))
+
+    async def record_guild(self, guild: discord.Guild) -> None:
+        self.buffer.record_server(str(guild.id), guild.name, str(guild.owner_id) if guild.owner_id else None)
+        for count, member in enumerate(guild.members, start=1):
+            self._record_member(member)
+            if count % YIELD_EVERY_MEMBERS == 0:
+                await asyncio.sleep(0)
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild: discord.Guild):
+        # Beim Start für jeden Server, mit der gecachten Mitgliederliste
+        await self.record_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        logger.info("Joined guild '%s' (%s) with %s members.", guild.name, guild.id, guild.member_count,
+                    extra={'action': 'GUILD_JOINED'})
+        await self.record_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
+        if before.name != after.name or before.owner_id != after.owner_id:
+            self.buffer.record_server(str(after.id), after.name, str(after.owner_id) if after.owner_id else None)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        self._record_member(member)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        # Rollen- und Nickname-Änderungen betreffen die gespeicherten Daten nicht
+        if before.name != after.name or before.discriminator != after.discriminator:
+            self._record_member(after)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        if before.name != after.name or before.discriminator != after.discriminator:
+            self._record_member(after)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(GuildEvents(bot))
+    logger.info("%s Cog erfolgreich geladen und registriert.", USER_PY_LOGGING_PREFIX)
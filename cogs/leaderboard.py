@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import sys
+import discord
+from discord import app_commands
+from discord.ext import commands
+import leaderboard_cache
+
+USER_PY_LOGGING_PREFIX = "LEADERBOARD_COG_"
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+
+def build_embed(page: leaderboard_cache.LeaderboardPage) -> discord.Embed:
+    embed = discord.Embed(
+        title="Server-Rangliste",
+        description=page.text or "Noch keine Spieler mit Rang auf diesem Server.",
+        color=discord.Color.gold()
+    )
+    embed.set_footer(text=f"Seite {page.page}/{page.page_count} · {page.total} Spieler mit Rang")
+    return embed
+
+
+class LeaderboardView(discord.ui.View):
+    """Previous/next buttons; every page comes from the cached ordering."""
+    def __init__(self, cache: leaderboard_cache.LeaderboardCache, server_id: str, page: leaderboard_cache.LeaderboardPage,
+                 owner_id: int):
+        super().__init__(timeout=180)
+        self.cache = cache
+        self.server_id = server_id
+        self.owner_id = owner_id
+        self._update(page)
+
+    def _update(self, page: leaderboard_cache.LeaderboardPage) -> None:
+        self.page = page
+        self.previous_page.disabled = page.page <= 1
+        self.next_page.disabled = page.page >= page.page_count
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Nur wer den Befehl aufgerufen hat, darf blättern
+        return interaction.user.id == self.owner_id
+
+    async def _show(self, interaction: discord.Interaction, page_number: int) -> None:
+        page = await asyncio.to_thread(self.cache.get_page, self.server_id, page_number)
+        if page is None:
+            await interaction.response.send_message("Die Rangliste konnte nicht geladen werden.", ephemeral=True)
+            return
+        self._update(page)
+        await interaction.response.edit_message(embed=build_embed(page), view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page.page - 1)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page.page + 1)
+
+
+class Leaderboard(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.cache = leaderboard_cache.LeaderboardCache()
+        self.cache.subscribe_to_crud()
+
+    async def cog_unload(self):
+        self.cache.unsubscribe_from_crud()
+
+    @app_commands.command(name="leaderboard", description="Zeigt die Rangliste dieses Servers.")
+    @app_commands.describe(page="Seite der Rangliste (Standard: 1)",
+                           player="Springt zur Seite dieses Spielers (Name oder Riot ID)")
+    async def leaderboard(self, interaction: discord.Interaction, page: app_commands.Range[int, 1, 1000] = 1,
+                          player: str | None = None):
+        if interaction.guild_id is None:
+            await interaction.response.send_message("Dieser Befehl funktioniert nur auf einem Server.", ephemeral=True)
+            return
+
+        server_id = str(interaction.guild_id)
+        # Cache-Miss: Laden und Rendern der ganzen Rangliste kann länger als Discords 3 Sekunden dauern
+        if not self.cache.is_cached(server_id):
+            await interaction.response.defer(thinking=True)
+        send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+
+        if player:
+            player_page = await asyncio.to_thread(self._page_of_player, server_id, player)
+            if player_page is None:
+                await send("Dieser Spieler hat auf diesem Server keinen Rang.", ephemeral=True)
+                return
+            page = player_page
+        # Bei einem Cache-Treffer kostet das keine Datenbankabfrage; nur der Neuaufbau läuft im Worker-Thread
+        result = await asyncio.to_thread(self.cache.get_page, server_id, page)
+        if result is None:
+            await send("Die Rangliste konnte nicht geladen werden.", ephemeral=True)
+            return
+
+        view = LeaderboardView(self.cache, server_id, result, interaction.user.id)
+        await send(embed=build_embed(result), view=view)
+
+    def _page_of_player(self, server_id: str, player: str) -> int | None:
+        """
+        Aus dem Autocomplete kommt die player_id; frei eingetippter Text (Name oder Riot ID)
+        wird über den Suchindex aufgelöst, ein exakter Treffer zuerst.
+        """
+        matches = self.bot.search_index.search_members(server_id, player)
+        exact = [player_id for label, player_id in matches if label.casefold() == player.strip().casefold()]
+        for player_id in [player, *exact, *(player_id for _, player_id in matches)]:
+            player_page = self.cache.page_of_player(server_id, player_id)
+            if player_page is not None:
+                return player_page
+        return None
+
+    @leaderboard.autocomplete('player')
+    async def player_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        if interaction.guild_id is None:
+            return []
+        matches = self.bot.search_index.search_members(str(interaction.guild_id), current)
+        return [app_commands.Choice(name=label[:100], value=player_id) for label, player_id in matches]
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Leaderboard(bot))
+    logger.info("%s Cog erfolgreich geladen und registriert.", USER_PY_LOGGING_PREFIX)
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import logging
+import sys
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+import database_crud as crud
+import lp_archive
+import lp_retention
+import profiling_hooks
+import query_instrumentation
+
+USER_PY_LOGGING_PREFIX = "MAINTENANCE_COG_"
+try:
+    import logging_setup 
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+# Intervall der LP-Retention in Minuten (0 deaktiviert den Job)
+LP_RETENTION_INTERVAL_MINUTES = float(os.getenv("LP_RETENTION_INTERVAL_MINUTES", "60"))
+
+class Maintenance(commands.Cog):
+    """Background jobs that keep the database small and fast."""
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        if LP_RETENTION_INTERVAL_MINUTES > 0:
+            self.lp_retention_job.change_interval(minutes=LP_RETENTION_INTERVAL_MINUTES)
+            self.lp_retention_job.start()
+
+    async def cog_unload(self):
+        self.lp_retention_job.cancel()
+
+    @tasks.loop(minutes=60)
+    async def lp_retention_job(self):
+        # Die Verdichtung läuft in Batches in einem Worker-Thread, damit der Event-Loop frei bleibt
+        try:
+            with profiling_hooks.profile_block('sync.lp_retention'):
+                if lp_archive.ARCHIVE_DIR:
+                    # Rohdaten archivieren, bevor die Retention sie verdichtet
+                    await asyncio.to_thread(lp_archive.export_lp_history, lp_archive.ARCHIVE_DIR)
+                await asyncio.to_thread(lp_retention.run_retention_cycle)
+        except Exception as e:
+            logger.error("LP retention job failed: %s", e, extra={'action': 'LP_RETENTION_JOB_FAILED'})
+
+    @lp_retention_job.before_loop
+    async def before_lp_retention_job(self):
+        await self.bot.wait_until_ready()
+
+    @app_commands.command(name="dbstats", description="Zeigt die teuersten Datenbank-Abfragen seit dem Start.")
+    @app_commands.default_permissions(administrator=True)
+    async def db_stats(self, interaction: discord.Interaction):
+        summary = query_instrumentation.format_summary(limit=10)
+        # Discord-Nachrichten sind auf 2000 Zeichen begrenzt
+        await interaction.response.send_message(f"```\n{summary[:1900]}\n```", ephemeral=True)
+
+    @app_commands.command(name="profiling", description="Schaltet das Profiling von Befehlen und Sync-Zyklen an oder aus.")
+    @app_commands.describe(enabled="An oder aus (leer = aktuellen Status anzeigen)")
+    @app_commands.default_permissions(administrator=True)
+    async def profiling(self, interaction: discord.Interaction, enabled: bool | None = None):
+        if enabled is not None:
+            profiling_hooks.set_enabled(enabled)
+        state = "an" if profiling_hooks.is_enabled() else "aus"
+        await interaction.response.send_message(
+            f"Profiling ist {state}. Profile werden nach `{profiling_hooks.PROFILING_DIR}` geschrieben.", ephemeral=True
+        )
+
+    @app_commands.command(name="jobqueue", description="Zeigt den Zustand der Job-Queue und des Event-Buffers.")
+    @app_commands.default_permissions(administrator=True)
+    async def job_queue_stats(self, interaction: discord.Interaction):
+        stats = self.bot.job_queue.stats()
+        buffer_stats = self.bot.event_buffer.stats()
+        await interaction.response.send_message(
+            f"Wartend: {stats['queued']}/{stats['max_size']}, laufend: {stats['running']} "
+            f"({stats['workers']} Worker)\n"
+            f"Erledigt: {stats['processed']}, fehlgeschlagen: {stats['failed']}, "
+            f"abgewiesen (doppelt/voll): {stats['rejected_duplicate']}/{stats['rejected_full']}\n"
+            f"Event-Buffer: {buffer_stats['pending_servers']} Server, {buffer_stats['pending_members']} Mitglieder offen, "
+            f"{buffer_stats['written']} geschrieben, {buffer_stats['coalesced']} zusammengefasst, "
+            f"{buffer_stats['failed_flushes']} fehlgeschlagene Flushes",
+            ephemeral=True
+        )
+
+    @app_commands.command(name="syncjobs", description="Zeigt die dauerhafte Sync-Job-Queue des Sync-Workers.")
+    @app_commands.describe(requeue_dead="Fehlgeschlagene (dead) Jobs erneut einplanen")
+    @app_commands.default_permissions(administrator=True)
+    async def sync_jobs(self, interaction: discord.Interaction, requeue_dead: bool = False):
+        requeued = await asyncio.to_thread(crud.requeue_dead_sync_jobs) if requeue_dead else None
+        counts = await asyncio.to_thread(crud.get_sync_job_counts)
+        if counts is None:
+            await interaction.response.send_message("Die Sync-Jobs konnten nicht gelesen werden.", ephemeral=True)
+            return
+        message = (f"Wartend: {counts.get(crud.SYNC_JOB_QUEUED, 0)}, laufend: {counts.get(crud.SYNC_JOB_RUNNING, 0)}, "
+                   f"dead: {counts.get(crud.SYNC_JOB_DEAD, 0)}")
+        leases = await asyncio.to_thread(crud.get_sync_partition_leases)
+        if leases:
+            live = [lease for lease in leases if lease['is_live']]
+            message += (f"\nPartitionen: {len(live)}/{len(leases)} vergeben an "
+                        f"{len({lease['owner'] for lease in live})} Worker")
+        if requeued is not None:
+            message += f"\n{requeued} Jobs erneut eingeplant."
+        await interaction.response.send_message(message, ephemeral=True)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Maintenance(bot))
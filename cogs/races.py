@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import sys
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+import constants
+import profiling_hooks
+import race_engine
+import race_scheduler
+
+USER_PY_LOGGING_PREFIX = "RACES_COG_"
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+STANDINGS_LIMIT = 20
+
+
+def format_progress(race_type: str, progress: float | None) -> str:
+    if progress is None:
+        return "-"
+    if race_type == constants.RACE_TYPE_PLACEMENT_AVERAGE:
+        return f"Ø {progress:.2f}"
+    if race_type == constants.RACE_TYPE_TOP4_COUNT:
+        return f"{progress} Top 4"
+    return f"{progress:+} LP"
+
+
+class Races(commands.Cog):
+    """Runs the race lifecycle (start, end) and keeps the standings of active races up to date."""
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.engine = race_engine.RaceEngine()
+        self.scheduler = race_scheduler.RaceLifecycleScheduler()
+        self._last_reconcile = 0.0
+
+    async def cog_load(self):
+        # Events vor dem ersten Laden gehen nicht verloren: load() gleicht danach alle Accounts ab
+        self.engine.subscribe_to_crud()
+        self.progress_job.change_interval(seconds=race_engine.RACE_ENGINE_FLUSH_SECONDS)
+        self.progress_job.start()
+        await self.scheduler.start()
+
+    async def cog_unload(self):
+        self.progress_job.cancel()
+        await self.scheduler.stop()
+        self.engine.unsubscribe_from_crud()
+
+    @tasks.loop(seconds=2)
+    async def progress_job(self):
+        try:
+            if not self.engine.loaded:
+                await asyncio.to_thread(self.engine.load)
+                self._last_reconcile = asyncio.get_running_loop().time()
+            elif race_engine.RACE_ENGINE_RECONCILE_SECONDS > 0:
+                now = asyncio.get_running_loop().time()
+                if now - self._last_reconcile >= race_engine.RACE_ENGINE_RECONCILE_SECONDS:
+                    self._last_reconcile = now
+                    self.engine.reconcile()
+            with profiling_hooks.profile_block('sync.race_progress'):
+                await asyncio.to_thread(self.engine.flush)
+        except Exception as e:
+            logger.error("Race progress job failed: %s", e, extra={'action': 'RACE_PROGRESS_JOB_FAILED'})
+
+    @app_commands.command(name="race", description="Zeigt den aktuellen Stand eines laufenden Rennens.")
+    @app_commands.describe(race="Das Rennen")
+    async def race(self, interaction: discord.Interaction, race: str):
+        race_state = self.engine.race(race)
+        standings = self.engine.standings(race, limit=STANDINGS_LIMIT)
+        if race_state is None or standings is None or race_state.server_id != str(interaction.guild_id):
+            await interaction.response.send_message("Dieses Rennen läuft gerade nicht.", ephemeral=True)
+            return
+        lines = [
+            f"**{position or '-'}.** {participant.display_name or participant.player_id}: "
+            f"{format_progress(race_state.race_type, progress)}"
+            for position, participant, progress in standings
+        ]
+        embed = discord.Embed(title=race_state.race_name, description="\n".join(lines) or "Noch keine Teilnehmer.",
+                              color=discord.Color.gold())
+        if race_state.target_value is not None:
+            embed.set_footer(text=f"Ziel: {race_state.target_value}")
+        await interaction.response.send_message(embed=embed)
+
+    @race.autocomplete('race')
+    async def race_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        if interaction.guild_id is None:
+            return []
+        matches = self.bot.search_index.search(str(interaction.guild_id), 'races', current)
+        return [app_commands.Choice(name=label[:100], value=race_id) for label, race_id in matches]
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Races(bot))
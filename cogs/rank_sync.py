@@ -0,0 +1,76 @@
+import asyncio
+import os
+import logging
+import sys
+from discord.ext import commands, tasks
+import data_manager
+import database_crud as crud
+import profiling_hooks
+import sharding
+import sync_worker
+
+USER_PY_LOGGING_PREFIX = "RANK_SYNC_COG_"
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+# Intervall des Rang-Syncs in Minuten (0 deaktiviert den Job)
+RANK_SYNC_INTERVAL_MINUTES = float(os.getenv("RANK_SYNC_INTERVAL_MINUTES", "30"))
+
+class RankSync(commands.Cog):
+    """Refreshes the ranks of the Riot accounts owned by this process's shards."""
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        if sync_worker.WORKER_RANK_POLLING:
+            logger.info("Rank polling runs in the sync workers (WORKER_RANK_POLLING), not in the bot.")
+        elif RANK_SYNC_INTERVAL_MINUTES > 0:
+            self.rank_sync_job.change_interval(minutes=RANK_SYNC_INTERVAL_MINUTES)
+            self.rank_sync_job.start()
+
+    async def cog_unload(self):
+        self.rank_sync_job.cancel()
+
+    def _own_shards(self) -> tuple[list[int], int]:
+        shard_count = self.bot.shard_count or 1
+        return (self.bot.shard_ids or list(range(shard_count))), shard_count
+
+    @tasks.loop(minutes=30)
+    async def rank_sync_job(self):
+        shard_ids, shard_count = self._own_shards()
+        try:
+            with profiling_hooks.profile_block('sync.cycle', shard_ids=shard_ids, shard_count=shard_count):
+                tracked_accounts = await asyncio.to_thread(crud.get_tracked_riot_accounts)
+                if tracked_accounts is None:
+                    return
+                owned_accounts = sharding.partition_accounts(tracked_accounts, shard_ids, shard_count)
+                logger.info("Rank sync: %s of %s tracked accounts belong to shards %s.",
+                            len(owned_accounts), len(tracked_accounts), shard_ids,
+                            extra={'action': 'RANK_SYNC_CYCLE_START'})
+                if sync_worker.DURABLE_SYNC_JOBS:
+                    # Der Sync-Worker arbeitet die Jobs ab; Accounts mit offenem Job werden übersprungen
+                    await asyncio.to_thread(crud.enqueue_sync_jobs, 'refresh_rank', [
+                        {'payload': {'puuid': account.puuid}, 'dedupe_key': account.riot_account_id}
+                        for account in owned_accounts
+                    ])
+                    return
+                # Der Rate Limiter bestimmt das Tempo; jeder Account läuft im Worker-Thread
+                for account in owned_accounts:
+                    await asyncio.to_thread(data_manager.sync_tft_rank_for_account, account)
+        except Exception as e:
+            logger.error("Rank sync job failed: %s", e, extra={'action': 'RANK_SYNC_JOB_FAILED'})
+
+    @rank_sync_job.before_loop
+    async def before_rank_sync_job(self):
+        await self.bot.wait_until_ready()
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(RankSync(bot))
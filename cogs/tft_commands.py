@@ -1,9 +1,17 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+import asyncio
 import logging
 import sys
+import constants
 import data_manager
+import database_crud as crud
+import job_queue
+import prefix_index
+import profiling_hooks
+import server_analytics
+import sync_worker
 
 USER_PY_LOGGING_PREFIX = "TFT_COG_"
 try:
@@ -18,15 +26,69 @@ except Exception as e:
     logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
     logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
 
+class RegisterRiotAccountJob(job_queue.Job):
+    """Looks up a Riot ID, registers the player and posts the result as followup."""
+    kind = 'register'
+
+    def __init__(self, interaction: discord.Interaction, game_name: str, tag_line: str, region: str):
+        super().__init__()
+        self.interaction = interaction
+        self.game_name = game_name
+        self.tag_line = tag_line
+        self.region = region
+
+    def key(self) -> tuple:
+        # Dieselbe Riot ID wird nicht parallel registriert, egal von wem
+        return (self.game_name.lower(), self.tag_line.lower(), self.region.lower())
+
+    async def run(self) -> None:
+        with profiling_hooks.profile_block('command.register', guild_id=self.interaction.guild_id):
+            player_riot_account_tuple = await data_manager.register_new_player_with_riot_id(
+                game_name=self.game_name,
+                tag_line=self.tag_line,
+                region=self.region
+            )
+
+        if player_riot_account_tuple:
+            player, riot_account = player_riot_account_tuple
+            success_message = (
+                f"Dein Riot Account **{riot_account.game_name}#{riot_account.tag_line}** "
+                f"wurde erfolgreich als Spieler **'{player.display_name}'** registriert und verknüpft!"
+            )
+            logger.info("Registrierung erfolgreich für Spieler '%s' (%s).", player.display_name, player.player_id)
+            await self.interaction.followup.send(success_message, ephemeral=True) # followup, da bereits geantwortet wurde
+        else:
+            error_message = (
+                f"Fehler bei der Registrierung von **{self.game_name}#{self.tag_line}**."
+                "Bitte überprüfe den Namen, die Tag Line und die Region. "
+                "Es könnte auch ein Problem mit der Riot API vorliegen oder der Account ist bereits verknüpft."
+            )
+            logger.error("Registrierung fehlgeschlagen für '%s#%s'.", self.game_name, self.tag_line)
+            await self.interaction.followup.send(error_message, ephemeral=True)
+
+    async def on_error(self, error: Exception) -> None:
+        await self.interaction.followup.send(
+            f"Bei der Registrierung von **{self.game_name}#{self.tag_line}** ist ein unerwarteter Fehler aufgetreten.",
+            ephemeral=True
+        )
+
+    async def on_cancel(self) -> None:
+        await self.interaction.followup.send(
+            f"Die Registrierung von **{self.game_name}#{self.tag_line}** wurde abgebrochen, weil der Bot neu startet. "
+            "Bitte versuche es gleich noch einmal.",
+            ephemeral=True
+        )
+
+
 class TFTCommands(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        logger.info(f"{USER_PY_LOGGING_PREFIX} Cog initialisiert.") # Log, wenn der Cog initialisiert wird
+        logger.info("%s Cog initialisiert.", USER_PY_LOGGING_PREFIX) # Log, wenn der Cog initialisiert wird
 
     # Optional: Ein einfacher Listener, der beim Verbinden des Cogs ausgelöst wird
     @commands.Cog.listener()
     async def on_connect(self):
-        logger.info(f"{USER_PY_LOGGING_PREFIX} hat sich mit Discord verbunden.")
+        logger.info("%s hat sich mit Discord verbunden.", USER_PY_LOGGING_PREFIX)
 
     @app_commands.command(name="register", description="Registriert deinen Riot Account für TFT-Tracking.")
     @app_commands.describe(
@@ -37,42 +99,117 @@ class TFTCommands(commands.Cog):
     async def register_riot_account(self, interaction: discord.Interaction, game_name: str, tag_line: str, region: str):
         """
         Registriert einen neuen Spieler und verknüpft ihn mit einem Riot Account.
+        Die eigentliche Arbeit läuft als Job in der Job-Queue des Bots (bzw. mit DURABLE_SYNC_JOBS
+        im separaten Sync-Worker), der Handler kehrt sofort zurück.
         """
-        logger.info(f"'{interaction.user.name}' versucht Riot Account '{game_name}#{tag_line}' in Region '{region}' zu registrieren.")
+        logger.info("'%s' versucht Riot Account '%s#%s' in Region '%s' zu registrieren.", interaction.user.name, game_name, tag_line, region)
+        # 'EUW1' und 'euw' sind dieselbe Region: für Dedupe-Schlüssel und Datenbank normalisieren
+        region = constants.normalize_region(region)
 
-        # Zuerst eine temporäre Antwort senden, da die API-Anfrage etwas dauern kann
-        await interaction.response.send_message(
-            f"Versuche, Riot Account **{game_name}#{tag_line}** ({region}) zu registrieren...",
-            ephemeral=True # Nur der Befehlsausführende sieht diese Nachricht
-        )
+        # Sofort bestätigen, da die API-Anfrage etwas dauern kann; die Antwort kommt als Followup vom Worker
+        await interaction.response.defer(ephemeral=True, thinking=True)
 
-        # Die Orchestrierungsfunktion aus data_manager aufrufen
-        player_riot_account_tuple = await data_manager.register_new_player_with_riot_id(
-            game_name=game_name,
-            tag_line=tag_line,
-            region=region
-        )
+        if sync_worker.DURABLE_SYNC_JOBS:
+            await self._enqueue_durable_registration(interaction, game_name, tag_line, region)
+            return
 
-        if player_riot_account_tuple:
-            player, riot_account = player_riot_account_tuple
-            success_message = (
-                f"Dein Riot Account **{riot_account.game_name}#{riot_account.tag_line}** "
-                f"wurde erfolgreich als Spieler **'{player.display_name}'** registriert und verknüpft!"
+        status = self.bot.job_queue.submit(RegisterRiotAccountJob(interaction, game_name, tag_line, region))
+        if status == job_queue.DUPLICATE:
+            await interaction.followup.send(
+                f"Die Registrierung von **{game_name}#{tag_line}** läuft bereits. Bitte warte auf das Ergebnis.",
+                ephemeral=True
             )
-            logger.info(f"Registrierung erfolgreich für Spieler '{player.display_name}' ({player.player_id}).")
-            await interaction.followup.send(success_message, ephemeral=True) # followup, da bereits geantwortet wurde
-        else:
-            error_message = (
-                f"Fehler bei der Registrierung von **{game_name}#{tag_line}**."
-                "Bitte überprüfe den Namen, die Tag Line und die Region. "
-                "Es könnte auch ein Problem mit der Riot API vorliegen oder der Account ist bereits verknüpft."
+        elif status == job_queue.QUEUE_FULL:
+            await interaction.followup.send(
+                "Der Bot ist gerade ausgelastet. Bitte versuche es in ein paar Minuten erneut.", ephemeral=True
+            )
+
+    async def _enqueue_durable_registration(self, interaction: discord.Interaction, game_name: str, tag_line: str,
+                                            region: str) -> None:
+        # Der Worker antwortet über den Interaction-Token, ohne eigene Gateway-Verbindung
+        payload = {'game_name': game_name, 'tag_line': tag_line, 'region': region,
+                   'application_id': str(interaction.application_id), 'interaction_token': interaction.token}
+        dedupe_key = f"{game_name.lower()}#{tag_line.lower()}@{region.lower()}"
+        queued = await asyncio.to_thread(crud.enqueue_sync_job, 'register', payload, dedupe_key)
+        if queued is None:
+            await interaction.followup.send(
+                "Die Registrierung konnte nicht gestartet werden. Bitte versuche es später erneut.", ephemeral=True
+            )
+        elif not queued:
+            await interaction.followup.send(
+                f"Die Registrierung von **{game_name}#{tag_line}** läuft bereits. Bitte warte auf das Ergebnis.",
+                ephemeral=True
+            )
+
+    @register_riot_account.autocomplete('region')
+    async def region_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        return [app_commands.Choice(name=label, value=value) for label, value in prefix_index.REGION_INDEX.search(current)]
+
+    @app_commands.command(name="stats", description="Zeigt die Statistiken der Spieler dieses Servers.")
+    @app_commands.describe(
+        days="Zeitraum in Tagen (Standard: 7)",
+        sort_by="Wonach sortiert werden soll"
+    )
+    @app_commands.choices(sort_by=[
+        app_commands.Choice(name="LP gewonnen", value="lp_gained"),
+        app_commands.Choice(name="Winrate", value="win_rate"),
+        app_commands.Choice(name="LP pro Tag", value="velocity_per_day"),
+        app_commands.Choice(name="Spiele", value="games"),
+    ])
+    async def server_stats(self, interaction: discord.Interaction,
+                           days: app_commands.Range[int, 1, 365] = 7,
+                           sort_by: app_commands.Choice[str] | None = None):
+        """
+        Zeigt die Top-Spieler des Servers nach LP-Gewinn, Winrate oder Klettergeschwindigkeit.
+        """
+        if interaction.guild_id is None:
+            await interaction.response.send_message("Dieser Befehl funktioniert nur auf einem Server.", ephemeral=True)
+            return
+
+        sort_column = sort_by.value if sort_by else "lp_gained"
+        await interaction.response.defer(thinking=True)
+
+        # Die Auswertung läuft in einem Worker-Thread, damit der Event-Loop nicht blockiert
+        try:
+            with profiling_hooks.profile_block('command.stats', guild_id=interaction.guild_id, days=days):
+                stats = await asyncio.to_thread(
+                    server_analytics.get_server_stats, str(interaction.guild_id), days, sort_column
+                )
+        except ImportError as e:
+            logger.error("Server stats need pandas and numpy: %s", e, extra={'action': 'SERVER_STATS_MISSING_DEPENDENCY'})
+            await interaction.followup.send("Die Statistiken sind auf diesem Bot nicht verfügbar.")
+            return
+        except Exception as e:
+            logger.error("Computing server stats for guild %s failed: %s", interaction.guild_id, e,
+                         extra={'action': 'SERVER_STATS_FAILED', 'guild_id': interaction.guild_id})
+            await interaction.followup.send("Die Statistiken konnten gerade nicht berechnet werden. "
+                                            "Bitte versuche es später erneut.")
+            return
+
+        if stats.empty:
+            await interaction.followup.send(f"Keine Ranglisten-Daten für die letzten {days} Tage gefunden.")
+            return
+
+        lines = []
+        for row in stats.head(10).itertuples(index=False):
+            win_rate = "-" if row.win_rate != row.win_rate else f"{row.win_rate:.0%}" # NaN-Check
+            velocity = "-" if row.velocity_per_day != row.velocity_per_day else f"{row.velocity_per_day:+.1f}"
+            lines.append(
+                f"**{row.rank}.** {row.display_name} ({row.game_name}#{row.tag_line}) — "
+                f"{row.lp_gained:+.0f} LP, {row.games:.0f} Spiele, Winrate {win_rate}, {velocity} LP/Tag"
             )
-            logger.error(f"Registrierung fehlgeschlagen für '{game_name}#{tag_line}'.")
-            await interaction.followup.send(error_message, ephemeral=True)
+
+        embed = discord.Embed(
+            title=f"Server-Statistiken (letzte {days} Tage)",
+            description="\n".join(lines),
+            color=discord.Color.gold()
+        )
+        embed.set_footer(text=f"{len(stats)} Spieler ausgewertet")
+        await interaction.followup.send(embed=embed)
 
 
 # Diese Async-Setup-Funktion ist erforderlich, damit der Cog vom Bot geladen werden kann
 async def setup(bot: commands.Bot):
     """Fügt den TFTCommands Cog zum Bot hinzu."""
     await bot.add_cog(TFTCommands(bot))
-    logger.info(f"{USER_PY_LOGGING_PREFIX} Cog erfolgreich geladen und registriert.")    
\ No newline at end of file
+    logger.info("%s Cog erfolgreich geladen und registriert.", USER_PY_LOGGING_PREFIX)    
\ No newline at end of file
@@ -22,4 +22,43 @@ REGION_CORRECTIONS = {
     "tr": "tr1",
     "ru": "ru",
     "me": "me1"
-}
\ No newline at end of file
+}
+
+
+def normalize_region(region: str) -> str:
+    """Platform-ID in der Form der API ('EUW1', ' euw ' -> 'euw1'); unbekannte Werte nur klein geschrieben."""
+    normalized_region = region.lower().strip()
+    return REGION_CORRECTIONS.get(normalized_region, normalized_region)
+
+# Ranglisten-Tiers in aufsteigender Reihenfolge (Index = kompakter Tier-Code)
+TIER_ORDER = [
+    'IRON', 'BRONZE', 'SILVER', 'GOLD', 'PLATINUM', 'EMERALD', 'DIAMOND',
+    'MASTER', 'GRANDMASTER', 'CHALLENGER'
+]
+
+# Apex-Tiers haben keine Divisionen, die LP laufen dort offen nach oben
+APEX_TIERS = {'MASTER', 'GRANDMASTER', 'CHALLENGER'}
+
+# Kompakte Division-Codes (die API liefert die Division im Feld 'rank')
+DIVISION_CODES = {
+    'I': 1,
+    'II': 2,
+    'III': 3,
+    'IV': 4
+}
+
+# Punkte pro Tier im Ladder-Score (4 Divisionen x 100 LP)
+LADDER_POINTS_PER_TIER = 400
+
+# Race-Typen (Race.race_type); None wird wie LP_CLIMB behandelt
+RACE_TYPE_LP_CLIMB = 'LP_CLIMB'                     # Gewonnener Ladder-Score seit dem Start
+RACE_TYPE_TOP4_COUNT = 'TOP4_COUNT'                 # Anzahl Top-4-Platzierungen
+RACE_TYPE_PLACEMENT_AVERAGE = 'PLACEMENT_AVERAGE'   # Durchschnittliche Platzierung (niedriger ist besser)
+RACE_TYPES = (RACE_TYPE_LP_CLIMB, RACE_TYPE_TOP4_COUNT, RACE_TYPE_PLACEMENT_AVERAGE)
+
+# Race-Status (Race.status)
+RACE_STATUS_PLANNED = 'planned'
+RACE_STATUS_ACTIVE = 'active'
+RACE_STATUS_FINISHED = 'finished'
+RACE_STATUS_CANCELLED = 'cancelled'
+
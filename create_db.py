@@ -1,10 +1,10 @@
+from dotenv import load_dotenv
+load_dotenv()  # DB_ID_STORAGE muss gesetzt sein, bevor ORM_models importiert wird
+
 from ORM_models import Base # Importiere nur Base, da alle Modelle daran registriert sind
 from sql_functions import get_engine_alchemy
 import logging
-from dotenv import load_dotenv
-
-
-load_dotenv()
+import sys
 
 logger = None
 USER_PY_LOGGING_PREFIX = "DB_INIT_"
@@ -35,7 +35,7 @@ def create_database_tables():
         print("Database and tables created successfully!")
 
     except Exception as e:
-        logger.critical(f"FATAL ERROR during database creation: {e}", extra={'action': 'DB_TABLE_CREATION_FAILED'})
+        logger.critical("FATAL ERROR during database creation: %s", e, extra={'action': 'DB_TABLE_CREATION_FAILED'})
         print(f"ERROR: Failed to create database tables. Check logs for details: {e}")
 
 # --- Hauptausführung ---
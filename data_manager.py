@@ -1,8 +1,10 @@
+import asyncio
 import logging
 import sys
 
 # Lokale Module importieren
 import database_crud as crud
+import profiling_hooks
 import riot_api_handler as api
 from ORM_models import RiotAccount,  Player, PlayerRiotAccountLink, RiotAccountLPHistory
 # --- Logging Setup ---
@@ -35,13 +37,13 @@ async def sync_riot_account_by_riot_id(game_name: str, tag_line: str, region: st
     Returns:
         Das RiotAccount-Objekt aus der Datenbank oder None bei einem Fehler.
     """
-    logger.info(f"Starting sync for Riot account: {game_name}#{tag_line}")
+    logger.info("Starting sync for Riot account: %s#%s", game_name, tag_line)
     
-    # 1. Daten von der Riot API abrufen
-    api_data = await api.get_account_by_riot_id(game_name, tag_line, region)
+    # 1. Daten von der Riot API abrufen (blockierender HTTP-Aufruf, daher in einem Worker-Thread)
+    api_data = await asyncio.to_thread(api.get_account_by_riot_id, game_name, tag_line, region)
     
     if not api_data:
-        logger.error(f"Could not retrieve Riot account data for {game_name}#{tag_line} from API.")
+        logger.error("Could not retrieve Riot account data for %s#%s from API.", game_name, tag_line)
         return None
         
     # 2. Relevante Daten aus der API-Antwort extrahieren
@@ -63,9 +65,9 @@ async def sync_riot_account_by_riot_id(game_name: str, tag_line: str, region: st
     )
     
     if db_riot_account:
-        logger.info(f"Successfully synced Riot account for PUUID {puuid} to database.")
+        logger.info("Successfully synced Riot account for PUUID %s to database.", puuid)
     else:
-        logger.error(f"Failed to sync Riot account for PUUID {puuid} to database.")
+        logger.error("Failed to sync Riot account for PUUID %s to database.", puuid)
         
     return db_riot_account
 
@@ -81,7 +83,7 @@ def link_player_to_riot_account_by_id(player_id: str, riot_account_id: str, is_p
     Returns:
         Das PlayerRiotAccountLink-Objekt bei Erfolg, sonst None.
     """
-    logger.info(f"Attempting to link player {player_id} to Riot account {riot_account_id}")
+    logger.info("Attempting to link player %s to Riot account %s", player_id, riot_account_id)
 
     # Rufe die CRUD-Funktion auf, um die Verknüpfung zu erstellen
     link = crud.link_player_to_riot_account(
@@ -95,12 +97,17 @@ def sync_tft_rank_for_account(riot_account: RiotAccount) -> RiotAccountLPHistory
     Ruft die aktuellen Ranglistendaten für einen Riot Account ab und speichert sie in der History.
     Dieser Prozess wurde durch die API-Änderung vereinfacht.
     """
-    logger.info(f"Starting TFT rank sync for Riot account: {riot_account.game_name}")
+    # Innerhalb eines bereits profilierten Sync-Zyklus ist dieser Block Teil des äußeren Profils
+    with profiling_hooks.profile_block('sync.rank_account', riot_account_id=riot_account.riot_account_id):
+        return _sync_tft_rank_for_account(riot_account)
+
+def _sync_tft_rank_for_account(riot_account: RiotAccount) -> RiotAccountLPHistory | None:
+    logger.info("Starting TFT rank sync for Riot account: %s", riot_account.game_name)
 
     # 1. Ranglisten-Daten direkt mit der PUUID abrufen
     league_entries = api.get_tft_league_entry_by_puuid(riot_account.puuid, riot_account.region)
     if not league_entries:
-        logger.warning(f"No ranked TFT league entries found for PUUID {riot_account.puuid}. Account might be unranked.")
+        logger.warning("No ranked TFT league entries found for PUUID %s. Account might be unranked.", riot_account.puuid)
         return None
 
     # Finde den relevanten Eintrag (normalerweise 'RANKED_TFT')
@@ -111,7 +118,7 @@ def sync_tft_rank_for_account(riot_account: RiotAccount) -> RiotAccountLPHistory
             break
     
     if not ranked_tft_entry:
-        logger.info(f"No 'RANKED_TFT' queue entry found for PUUID {riot_account.puuid}.")
+        logger.info("No 'RANKED_TFT' queue entry found for PUUID %s.", riot_account.puuid)
         return None
 
     # 2. Neuen History-Eintrag mit der CRUD-Funktion erstellen
@@ -126,9 +133,9 @@ def sync_tft_rank_for_account(riot_account: RiotAccount) -> RiotAccountLPHistory
     )
 
     if new_history_entry:
-        logger.info(f"Successfully created new LP history entry for {riot_account.game_name}.")
+        logger.info("Successfully created new LP history entry for %s.", riot_account.game_name)
     else:
-        logger.error(f"Failed to create LP history entry for {riot_account.game_name}.")
+        logger.error("Failed to create LP history entry for %s.", riot_account.game_name)
 
     return new_history_entry
 
@@ -152,7 +159,7 @@ async def register_new_player_with_riot_id(game_name: str, tag_line: str, region
         A tuple containing the new Player and RiotAccount objects on success, otherwise None.
     """
     action_details = {'game_name': game_name, 'tag_line': tag_line, 'region': region}
-    logger.info(f"Starting new player registration for {game_name}#{tag_line}.",
+    logger.info("Starting new player registration for %s#%s.", game_name, tag_line,
                 extra={'action': 'PLAYER_REGISTRATION_START', **action_details})
 
     # --- Step 1: Get or Create the Riot Account ---
@@ -166,11 +173,12 @@ async def register_new_player_with_riot_id(game_name: str, tag_line: str, region
     # --- Step 2: Create the Player ---
     # If no specific display name is given, we use the Riot game name as a default.
     if riot_account.player_links:
-        # The backref 'player_links' gives us the link objects. We get the player from the first active link.
+        # add_or_update_riot_account loads the active links and their players eagerly
+        # (loading profile 'account_players'), so this works on the detached object.
         for link in riot_account.player_links:
             if link.is_active:
                 existing_player = link.player
-                logger.warning(f"Registration stopped: Riot account '{riot_account.game_name}' is already linked to player '{existing_player.display_name}'.",
+                logger.warning("Registration stopped: Riot account '%s' is already linked to player '%s'.", riot_account.game_name, existing_player.display_name,
                                extra={'action': 'PLAYER_REGISTRATION_ALREADY_LINKED', 'player_id': existing_player.player_id})
                 return existing_player, riot_account # Return the existing player instead of creating a new one
 
@@ -180,7 +188,7 @@ async def register_new_player_with_riot_id(game_name: str, tag_line: str, region
 
     new_player = crud.add_player(display_name=player_display_name)
     if not new_player:
-        logger.error(f"Player registration failed: Could not create player profile for '{player_display_name}'.",
+        logger.error("Player registration failed: Could not create player profile for '%s'.", player_display_name,
                      extra={'action': 'PLAYER_REGISTRATION_FAIL_ADD_PLAYER', **action_details})
         return None
     
@@ -195,13 +203,13 @@ async def register_new_player_with_riot_id(game_name: str, tag_line: str, region
     if not link:
         # This is a critical failure, though unlikely if the previous steps succeeded.
         # We might want to consider rolling back the player creation in a real-world scenario.
-        logger.critical(f"Player registration failed at the final linking step.",
+        logger.critical("Player registration failed at the final linking step.",
                         extra={'action': 'PLAYER_REGISTRATION_FAIL_LINKING', 'player_id': new_player.player_id, 'riot_account_id': riot_account.riot_account_id})
         # For now, we'll signal failure. A more robust implementation could delete the created player.
         return None
 
-    logger.info(f"Successfully registered new player '{new_player.display_name}' (ID: {new_player.player_id}) "
-                f"and linked to Riot account '{riot_account.game_name}#{riot_account.tag_line}'.",
+    logger.info("Successfully registered new player '%s' (ID: %s) and linked to Riot account '%s#%s'.",
+                new_player.display_name, new_player.player_id, riot_account.game_name, riot_account.tag_line,
                 extra={'action': 'PLAYER_REGISTRATION_SUCCESS', 'player_id': new_player.player_id})
     
     return new_player, riot_account
\ No newline at end of file
@@ -1,18 +1,24 @@
 import uuid
 import sys
+import threading
 from contextlib import contextmanager
-from sqlalchemy.orm import sessionmaker, joinedload
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, insert, delete, update, union_all, literal, and_, or_, case, null
+from sqlalchemy.orm import sessionmaker, selectinload
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from sqlalchemy.sql import func
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # --- Local Imports ---
+import constants
+import ladder
+import profiling_hooks
 from sql_functions import get_engine_and_session_factory
 from ORM_models import (
     Base, Player, PlayerDisplayNameHistory, DiscordAccount,
     PlayerDiscordAccountLink, RiotAccount, RiotAccountNameHistory, RiotAccountLPHistory,PlayerRiotAccountLink, 
-    DiscordServer, ServerPlayer, Race, RaceParticipant
+    DiscordServer, ServerPlayer, Race, RaceParticipant, RiotAccountCurrentRank,
+    RiotAccountLPHourlyRollup, RiotAccountLPDailyRollup, SyncJob, SyncPartitionLease, SyncWorkerHeartbeat
 )
 
 # --- Initial Setup ---
@@ -31,57 +37,206 @@ except Exception as e:
     logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback') # Optional: Make fallback name more specific
 
 
-engine, Session = get_engine_and_session_factory()
+# Die Engine wird erst bei der ersten Datenbankabfrage erzeugt, nicht beim Import
+_engine = None
+_Session = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Returns the engine of all CRUD functions, creating it from the .env on first use."""
+    global _engine, _Session
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine, _Session = get_engine_and_session_factory()
+    return _engine
+
+def configure_engine(new_engine) -> None:
+    """
+    Points all CRUD functions at another engine, e.g. a migration target
+    or a benchmark database.
+    """
+    global _engine, _Session
+    with _engine_lock:
+        _engine = new_engine
+        _Session = sessionmaker(bind=new_engine, expire_on_commit=False)
+
+# --- Change Events ---
+# CRUD functions record change events on their session with _emit(); session_scope
+# delivers them to the subscribers only after the transaction has committed.
+# Subscribers run synchronously in the committing thread and must be cheap.
+
+RANK_CHANGED = 'rank_changed'                      # riot_account_id (None = all accounts), queue_type
+SERVER_MEMBERS_CHANGED = 'server_members_changed'  # server_id, player_id
+PLAYER_CHANGED = 'player_changed'                  # player_id (display name or Riot account links)
+RIOT_ACCOUNT_CHANGED = 'riot_account_changed'      # riot_account_id (game name or tag line)
+RACE_CHANGED = 'race_changed'                      # race_id, server_id
+
+_subscribers: dict[str, list] = {}
+
+def subscribe(event_name: str, callback) -> None:
+    """Registers `callback(**payload)` for a change event."""
+    _subscribers.setdefault(event_name, []).append(callback)
+
+def unsubscribe(event_name: str, callback) -> None:
+    if callback in _subscribers.get(event_name, []):
+        _subscribers[event_name].remove(callback)
+
+def _emit(session, event_name: str, **payload) -> None:
+    """Queues a change event; it is delivered after the session's transaction commits."""
+    session.info.setdefault('pending_events', []).append((event_name, payload))
+
+def _dispatch_events(events: list) -> None:
+    for event_name, payload in events:
+        for callback in list(_subscribers.get(event_name, [])):
+            try:
+                callback(**payload)
+            except Exception as e:
+                logger.error("Subscriber for event '%s' failed: %s", event_name, e,
+                             extra={'action': 'EVENT_SUBSCRIBER_FAILED'})
 
 @contextmanager
 def session_scope():
     """Provide a transactional scope around a series of operations."""
-    session = Session()
-    try:
-        yield session
-        session.commit()
-    except SQLAlchemyError as e:
-        logger.error(f"Database transaction failed: {e.orig}", extra={'action': 'SESSION_ROLLBACK'})
-        session.rollback()
-        raise
-    finally:
-        session.close()
+    get_engine()
+    session = _Session()
+    with profiling_hooks.phase('db'):
+        try:
+            yield session
+            session.commit()
+            events = session.info.pop('pending_events', None)
+            if events:
+                _dispatch_events(events)
+        except SQLAlchemyError as e:
+            logger.error("Database transaction failed: %s", e.orig, extra={'action': 'SESSION_ROLLBACK'})
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+def get_database_time() -> datetime:
+    """Returns the database's current timestamp, the clock used by all func.now() defaults."""
+    with session_scope() as session:
+        return session.execute(select(func.now())).scalar()
+
+# SQLite erlaubt standardmäßig höchstens 999 Parameter pro Statement
+_IN_CHUNK_SIZE = 500
+
+def _chunks(values: list, size: int = _IN_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+# --- Loading Profiles ---
+# Named eager-loading shapes for the common reads. Every profile loads its whole
+# object graph with a fixed number of queries (selectinload for collections,
+# joinedload for many-to-one), independent of the number of rows. The returned
+# objects can therefore be used after the session is closed without lazy loads.
+# Link and membership collections loaded by a profile only contain active rows.
+
+def _active_links():
+    return PlayerRiotAccountLink.is_active == True
+
+def _primary_links():
+    return (PlayerRiotAccountLink.is_active == True, PlayerRiotAccountLink.is_primary_riot_account == True)
+
+def _account_players_profile() -> list:
+    # RiotAccount -> aktive Links -> Player (2 Queries)
+    return [
+        selectinload(RiotAccount.player_links.and_(_active_links()))
+        .joinedload(PlayerRiotAccountLink.player)
+    ]
+
+def _player_accounts_profile() -> list:
+    # Player -> aktive Links -> RiotAccount (2 Queries)
+    return [
+        selectinload(Player.riot_account_links.and_(_active_links()))
+        .joinedload(PlayerRiotAccountLink.riot_account)
+    ]
+
+def _server_members_profile() -> list:
+    # DiscordServer -> aktive ServerPlayer + Player -> primärer Link + RiotAccount (3 Queries)
+    return [
+        selectinload(DiscordServer.server_players.and_(ServerPlayer.is_active_on_server == True))
+        .joinedload(ServerPlayer.player)
+        .selectinload(Player.riot_account_links.and_(*_primary_links()))
+        .joinedload(PlayerRiotAccountLink.riot_account)
+    ]
+
+def _race_standings_profile() -> list:
+    # Race -> Teilnehmer + ServerPlayer + Player -> primärer Link + RiotAccount -> aktuelle Ränge (4 Queries)
+    return [
+        selectinload(Race.participants)
+        .joinedload(RaceParticipant.server_player)
+        .joinedload(ServerPlayer.player)
+        .selectinload(Player.riot_account_links.and_(*_primary_links()))
+        .joinedload(PlayerRiotAccountLink.riot_account)
+        .selectinload(RiotAccount.current_ranks)
+    ]
+
+LOAD_PROFILES = {
+    'account_players': (RiotAccount, _account_players_profile),
+    'player_accounts': (Player, _player_accounts_profile),
+    'server_members': (DiscordServer, _server_members_profile),
+    'race_standings': (Race, _race_standings_profile),
+}
+
+def load_profile(name: str, model) -> list:
+    """
+    Returns the loader options of a named loading profile.
+
+    Args:
+        name: The profile name (a key of LOAD_PROFILES).
+        model: The model being queried, must match the profile's root model.
+
+    Raises:
+        ValueError: If the profile does not exist or does not fit the model.
+    """
+    if name not in LOAD_PROFILES:
+        raise ValueError(f"Unknown loading profile: {name}")
+    profile_model, build_options = LOAD_PROFILES[name]
+    if profile_model is not model:
+        raise ValueError(f"Loading profile '{name}' is for {profile_model.__name__}, not {model.__name__}.")
+    return build_options()
 
 def add_player(display_name:str) -> Player | None:
-    logger.info(f"Attempting to add new player '{display_name}'.", extra={'action': 'ADD_PLAYER_ATTEMPT'})
+    logger.info("Attempting to add new player '%s'.", display_name, extra={'action': 'ADD_PLAYER_ATTEMPT'})
     try:
         with session_scope() as session:
             new_player = Player(display_name=display_name)
             session.add(new_player)
             session.flush() # Assigns the default values like player_id from the DB
-            logger.info(f"Successfully added player '{new_player.display_name}' with ID '{new_player.player_id}'.",
+            logger.info("Successfully added player '%s' with ID '%s'.", new_player.display_name, new_player.player_id,
                          extra={'action': 'ADD_PLAYER_SUCCESS', 'entity_id': new_player.player_id})
             return new_player
     except SQLAlchemyError:
         # The error is already logged by session_scope, so we just return None.
         return None
     
-def get_player_by_id(player_id: str, load_options: list = None) -> Player | None:
+def get_player_by_id(player_id: str, load_options: list = None, profile: str | None = None) -> Player | None:
     """
     Retrieves a player from the database by their unique player_id.
 
     Args:
         player_id: The UUID of the player to retrieve.
         load_options (optional): A list of SQLAlchemy loader options for eager loading.
+        profile (optional): A named loading profile, e.g. 'player_accounts'.
 
     Returns:
         The Player object if found, otherwise None.
     """
-    logger.debug(f"Querying for player with ID '{player_id}'.", extra={'action': 'GET_PLAYER_BY_ID'})
+    logger.debug("Querying for player with ID '%s'.", player_id, extra={'action': 'GET_PLAYER_BY_ID'})
     try:
         with session_scope() as session:
             query = session.query(Player)
+            if profile:
+                query = query.options(*load_profile(profile, Player))
             if load_options:
                 query = query.options(*load_options)
             
             player = query.filter_by(player_id=player_id).first()
             if player:
-                logger.debug(f"Found player '{player.display_name}'.", extra={'entity_id': player_id})
+                logger.debug("Found player '%s'.", player.display_name, extra={'action': 'GET_PLAYER_BY_ID', 'entity_id': player_id})
             return player
     except SQLAlchemyError:
         return None
@@ -98,7 +253,7 @@ def update_player_display_name(player_id: str, new_display_name: str, changed_by
     Returns:
         True if the name was updated, False otherwise (e.g., player not found or name is the same).
     """
-    logger.info(f"Attempting to update name for player '{player_id}' to '{new_display_name}'.",
+    logger.info("Attempting to update name for player '%s' to '%s'.", player_id, new_display_name,
                 extra={'action': 'UPDATE_PLAYER_NAME_ATTEMPT', 'entity_id': player_id})
 
     try:
@@ -106,13 +261,13 @@ def update_player_display_name(player_id: str, new_display_name: str, changed_by
             player = session.query(Player).filter_by(player_id=player_id).first()
 
             if not player:
-                logger.warning(f"Player with ID '{player_id}' not found for name update.",
+                logger.warning("Player with ID '%s' not found for name update.", player_id,
                                extra={'action': 'UPDATE_PLAYER_NAME_NOT_FOUND', 'entity_id': player_id})
                 return False
 
             old_display_name = player.display_name
             if old_display_name == new_display_name:
-                logger.info(f"Player '{player_id}' name is already '{new_display_name}'. No update needed.",
+                logger.info("Player '%s' name is already '%s'. No update needed.", player_id, new_display_name,
                             extra={'action': 'UPDATE_PLAYER_NAME_NO_CHANGE', 'entity_id': player_id})
                 return False
 
@@ -127,8 +282,9 @@ def update_player_display_name(player_id: str, new_display_name: str, changed_by
                 changed_by=changed_by
             )
             session.add(history_entry)
+            _emit(session, PLAYER_CHANGED, player_id=player_id)
 
-            logger.info(f"Updated player '{player_id}' name from '{old_display_name}' to '{new_display_name}'.",
+            logger.info("Updated player '%s' name from '%s' to '%s'.", player_id, old_display_name, new_display_name,
                         extra={'action': 'UPDATE_PLAYER_NAME_SUCCESS', 'entity_id': player_id,
                                'old_value': old_display_name, 'new_value': new_display_name})
             return True
@@ -146,20 +302,23 @@ def add_or_update_riot_account(puuid: str, game_name: str, tag_line: str, region
         puuid: The Riot account's unique PUUID.
         game_name: The current game name.
         tag_line: The current tag line.
-        region: The account's region (e.g., 'EUW1').
+        region: The account's region as typed (e.g., 'EUW1' or 'euw'); stored as the
+                normalized platform ID ('euw1').
 
     Returns:
-        The created or updated RiotAccount object, or None on error.
+        The created or updated RiotAccount object with its active player_links
+        (and their players) loaded, or None on error.
     """
+    region = constants.normalize_region(region)
     action_details = {'puuid': puuid, 'game_name': game_name, 'tag_line': tag_line}
-    logger.info(f"Attempting to add/update Riot account for PUUID '{puuid}'.",
+    logger.info("Attempting to add/update Riot account for PUUID '%s'.", puuid,
                 extra={'action': 'ADD_UPDATE_RIOT_ACCOUNT_ATTEMPT', **action_details})
 
     try:
         with session_scope() as session:
-            # Check if the account already exists and eager load relationships
+            # Check if the account already exists and eager load its active links with their players
             account = session.query(RiotAccount).options(
-                        joinedload(RiotAccount.player_links).joinedload(PlayerRiotAccountLink.player)
+                        *load_profile('account_players', RiotAccount)
                         ).filter_by(puuid=puuid).first()
 
             if not account:
@@ -172,7 +331,7 @@ def add_or_update_riot_account(puuid: str, game_name: str, tag_line: str, region
                 )
                 session.add(new_account)
                 session.flush() # Ensure riot_account_id is available
-                logger.info(f"Created new Riot account for '{game_name}#{tag_line}'.",
+                logger.info("Created new Riot account for '%s#%s'.", game_name, tag_line,
                             extra={'action': 'ADD_RIOT_ACCOUNT_SUCCESS', 'entity_id': new_account.riot_account_id, **action_details})
                 
                 new_account.player_links = []
@@ -180,8 +339,11 @@ def add_or_update_riot_account(puuid: str, game_name: str, tag_line: str, region
                 return new_account
             else:
                 # --- Update Existing Account ---
+                if account.region != region:
+                    # Alte Einträge wurden so gespeichert, wie sie eingegeben wurden
+                    account.region = region
                 if account.game_name == game_name and account.tag_line == tag_line:
-                    logger.debug(f"Riot account for '{puuid}' is already up to date.",
+                    logger.debug("Riot account for '%s' is already up to date.", puuid,
                                  extra={'action': 'UPDATE_RIOT_ACCOUNT_NO_CHANGE', 'entity_id': account.riot_account_id})
                     return account
 
@@ -203,8 +365,9 @@ def add_or_update_riot_account(puuid: str, game_name: str, tag_line: str, region
                 # Update the account object
                 account.game_name = game_name
                 account.tag_line = tag_line
+                _emit(session, RIOT_ACCOUNT_CHANGED, riot_account_id=account.riot_account_id)
 
-                logger.info(f"Updated Riot account name from '{old_name}' to '{new_name}'.",
+                logger.info("Updated Riot account name from '%s' to '%s'.", old_name, new_name,
                             extra={'action': 'UPDATE_RIOT_ACCOUNT_SUCCESS', 'entity_id': account.riot_account_id,
                                    'old_value': old_name, 'new_value': new_name})
                 return account
@@ -213,27 +376,30 @@ def add_or_update_riot_account(puuid: str, game_name: str, tag_line: str, region
         return None
 
 
-def get_riot_account_by_puuid(puuid: str, load_options: list = None) -> RiotAccount | None:
+def get_riot_account_by_puuid(puuid: str, load_options: list = None, profile: str | None = None) -> RiotAccount | None:
     """
     Retrieves a Riot account from the database by its unique PUUID.
 
     Args:
         puuid: The PUUID of the account to retrieve.
         load_options (optional): A list of SQLAlchemy loader options for eager loading.
+        profile (optional): A named loading profile, e.g. 'account_players'.
 
     Returns:
         The RiotAccount object if found, otherwise None.
     """
-    logger.debug(f"Querying for Riot account with PUUID '{puuid}'.", extra={'action': 'GET_RIOT_BY_PUUID'})
+    logger.debug("Querying for Riot account with PUUID '%s'.", puuid, extra={'action': 'GET_RIOT_BY_PUUID'})
     try:
         with session_scope() as session:
             query = session.query(RiotAccount)
+            if profile:
+                query = query.options(*load_profile(profile, RiotAccount))
             if load_options:
                 query = query.options(*load_options)
             
             account = query.filter_by(puuid=puuid).first()
             if account:
-                logger.debug(f"Found Riot account '{account.game_name}#{account.tag_line}'.", extra={'entity_id': account.riot_account_id})
+                logger.debug("Found Riot account '%s#%s'.", account.game_name, account.tag_line, extra={'action': 'GET_RIOT_BY_PUUID', 'entity_id': account.riot_account_id})
             return account
     except SQLAlchemyError:
         return None
@@ -252,7 +418,7 @@ def link_player_to_riot_account(player_id: str, riot_account_id: str, is_primary
         The PlayerRiotAccountLink object if the link was created or already existed, otherwise None.
     """
     action_details = {'player_id': player_id, 'riot_account_id': riot_account_id}
-    logger.info(f"Attempting to link player to Riot account.",
+    logger.info("Attempting to link player to Riot account.",
                 extra={'action': 'LINK_PLAYER_RIOT_ATTEMPT', **action_details})
 
     try:
@@ -277,6 +443,7 @@ def link_player_to_riot_account(player_id: str, riot_account_id: str, is_primary
             )
             session.add(new_link)
             session.flush() # To get the link_id
+            _emit(session, PLAYER_CHANGED, player_id=player_id)
             logger.info("Successfully linked player to Riot account.",
                         extra={'action': 'LINK_PLAYER_RIOT_SUCCESS', 'entity_id': new_link.link_id, **action_details})
             return new_link
@@ -297,7 +464,7 @@ def deactivate_riot_link(player_id: str, riot_account_id: str) -> bool:
         True if the link was successfully deactivated, False otherwise.
     """
     action_details = {'player_id': player_id, 'riot_account_id': riot_account_id}
-    logger.info(f"Attempting to deactivate link between player and Riot account.",
+    logger.info("Attempting to deactivate link between player and Riot account.",
                 extra={'action': 'DEACTIVATE_RIOT_LINK_ATTEMPT', **action_details})
     try:
         with session_scope() as session:
@@ -315,6 +482,7 @@ def deactivate_riot_link(player_id: str, riot_account_id: str) -> bool:
             # Update the link instead of deleting it
             link_to_update.is_active = False
             link_to_update.unlinked_at = func.now() # from sqlalchemy.sql
+            _emit(session, PLAYER_CHANGED, player_id=player_id)
 
             logger.info("Successfully deactivated link between player and Riot account.",
                         extra={'action': 'DEACTIVATE_RIOT_LINK_SUCCESS', **action_details})
@@ -339,7 +507,7 @@ def add_or_update_discord_account(discord_user_id: str, username: str, discrimin
         The created or updated DiscordAccount object, or None on error.
     """
     action_details = {'discord_user_id': discord_user_id, 'username': username}
-    logger.info(f"Attempting to add/update Discord account for user ID '{discord_user_id}'.",
+    logger.info("Attempting to add/update Discord account for user ID '%s'.", discord_user_id,
                 extra={'action': 'ADD_UPDATE_DISCORD_ACCOUNT_ATTEMPT', **action_details})
 
     try:
@@ -358,7 +526,7 @@ def add_or_update_discord_account(discord_user_id: str, username: str, discrimin
                 )
                 session.add(new_account)
                 session.flush()
-                logger.info(f"Created new Discord account for '{username}'.",
+                logger.info("Created new Discord account for '%s'.", username,
                             extra={'action': 'ADD_DISCORD_ACCOUNT_SUCCESS', 'entity_id': new_account.discord_account_id, **action_details})
                 
                 new_account.player_links = []
@@ -367,18 +535,65 @@ def add_or_update_discord_account(discord_user_id: str, username: str, discrimin
             else:
                 # --- Update Existing Account ---
                 if account.discord_username == username and account.discriminator == discriminator:
-                    logger.debug(f"Discord account for '{discord_user_id}' is already up to date.",
+                    logger.debug("Discord account for '%s' is already up to date.", discord_user_id,
                                  extra={'action': 'UPDATE_DISCORD_ACCOUNT_NO_CHANGE', 'entity_id': account.discord_account_id})
                     return account
 
                 account.discord_username = username
                 account.discriminator = discriminator
-                logger.info(f"Updated Discord account for user ID '{discord_user_id}'.",
+                logger.info("Updated Discord account for user ID '%s'.", discord_user_id,
                             extra={'action': 'UPDATE_DISCORD_ACCOUNT_SUCCESS', 'entity_id': account.discord_account_id, **action_details})
                 return account
 
     except SQLAlchemyError:
         return None
+
+
+def upsert_discord_accounts(accounts: list[dict]) -> int | None:
+    """
+    Adds or updates many Discord accounts in one transaction; the batched form of
+    add_or_update_discord_account(). Unchanged accounts are not written.
+
+    Args:
+        accounts: Dicts with 'discord_user_id', 'username' and optionally 'discriminator'.
+
+    Returns:
+        The number of inserted or updated accounts, or None on error.
+    """
+    rows_by_user = {row['discord_user_id']: row for row in accounts}
+    if not rows_by_user:
+        return 0
+    try:
+        with session_scope() as session:
+            existing = {}
+            for chunk in _chunks(list(rows_by_user)):
+                for account_id, user_id, username, discriminator in session.execute(
+                    select(DiscordAccount.discord_account_id, DiscordAccount.discord_user_id,
+                           DiscordAccount.discord_username, DiscordAccount.discriminator)
+                    .where(DiscordAccount.discord_user_id.in_(chunk))
+                ):
+                    existing[user_id] = (account_id, username, discriminator)
+
+            new_rows, changed_rows = [], []
+            for user_id, row in rows_by_user.items():
+                stored = existing.get(user_id)
+                if stored is None:
+                    new_rows.append({'discord_user_id': user_id, 'discord_username': row['username'],
+                                     'discriminator': row.get('discriminator')})
+                elif (row['username'], row.get('discriminator')) != stored[1:]:
+                    changed_rows.append({'discord_account_id': stored[0], 'discord_username': row['username'],
+                                         'discriminator': row.get('discriminator')})
+
+            if new_rows:
+                session.execute(insert(DiscordAccount), new_rows)
+            if changed_rows:
+                session.execute(update(DiscordAccount), changed_rows)
+            logger.info("Upserted Discord accounts: %s new, %s updated, %s unchanged.", len(new_rows), len(changed_rows),
+                        len(rows_by_user) - len(new_rows) - len(changed_rows),
+                        extra={'action': 'UPSERT_DISCORD_ACCOUNTS_SUCCESS'})
+            return len(new_rows) + len(changed_rows)
+    except SQLAlchemyError:
+        return None
     
 def link_player_to_discord_account(player_id: str, discord_account_id: str, is_primary: bool = False) -> PlayerDiscordAccountLink | None:
     """
@@ -394,7 +609,7 @@ def link_player_to_discord_account(player_id: str, discord_account_id: str, is_p
         The PlayerDiscordAccountLink object if the link was created or already existed, otherwise None.
     """
     action_details = {'player_id': player_id, 'discord_account_id': discord_account_id}
-    logger.info(f"Attempting to link player to Discord account.",
+    logger.info("Attempting to link player to Discord account.",
                 extra={'action': 'LINK_PLAYER_DISCORD_ATTEMPT', **action_details})
 
     try:
@@ -439,7 +654,7 @@ def deactivate_discord_link(player_id: str, discord_account_id: str) -> bool:
         True if the link was successfully deactivated, False otherwise.
     """
     action_details = {'player_id': player_id, 'discord_account_id': discord_account_id}
-    logger.info(f"Attempting to deactivate link between player and Discord account.",
+    logger.info("Attempting to deactivate link between player and Discord account.",
                 extra={'action': 'DEACTIVATE_DISCORD_LINK_ATTEMPT', **action_details})
     try:
         with session_scope() as session:
@@ -480,7 +695,7 @@ def add_or_update_server(server_id: str, server_name: str, owner_id: str | None
         The created or updated DiscordServer object, or None on error.
     """
     action_details = {'server_id': server_id, 'server_name': server_name}
-    logger.info(f"Attempting to add/update server '{server_name}'.",
+    logger.info("Attempting to add/update server '%s'.", server_name,
                 extra={'action': 'ADD_UPDATE_SERVER_ATTEMPT', **action_details})
     try:
         with session_scope() as session:
@@ -506,6 +721,76 @@ def add_or_update_server(server_id: str, server_name: str, owner_id: str | None
         return None
 
 
+def upsert_servers(servers: list[dict]) -> int | None:
+    """
+    Adds or updates many Discord servers in one transaction; the batched form of
+    add_or_update_server(). Unchanged servers are not written.
+
+    Args:
+        servers: Dicts with 'server_id', 'server_name' and optionally 'owner_id'.
+                 A missing or None owner_id keeps the stored owner.
+
+    Returns:
+        The number of inserted or updated servers, or None on error.
+    """
+    rows_by_id = {row['server_id']: row for row in servers}
+    if not rows_by_id:
+        return 0
+    try:
+        with session_scope() as session:
+            existing = {}
+            for chunk in _chunks(list(rows_by_id)):
+                existing.update(
+                    (server_id, (server_name, owner_id)) for server_id, server_name, owner_id in session.execute(
+                        select(DiscordServer.server_id, DiscordServer.server_name, DiscordServer.owner_discord_user_id)
+                        .where(DiscordServer.server_id.in_(chunk))
+                    )
+                )
+
+            new_rows, changed_rows = [], []
+            for server_id, row in rows_by_id.items():
+                stored = existing.get(server_id)
+                if stored is None:
+                    new_rows.append({'server_id': server_id, 'server_name': row['server_name'],
+                                     'owner_discord_user_id': row.get('owner_id')})
+                    continue
+                owner_id = row.get('owner_id') or stored[1]
+                if (row['server_name'], owner_id) != stored:
+                    changed_rows.append({'server_id': server_id, 'server_name': row['server_name'],
+                                         'owner_discord_user_id': owner_id})
+
+            if new_rows:
+                session.execute(insert(DiscordServer), new_rows)
+            if changed_rows:
+                # ORM-Bulk-Update über den Primärschlüssel (executemany)
+                session.execute(update(DiscordServer), changed_rows)
+            logger.info("Upserted servers: %s new, %s updated, %s unchanged.", len(new_rows), len(changed_rows),
+                        len(rows_by_id) - len(new_rows) - len(changed_rows), extra={'action': 'UPSERT_SERVERS_SUCCESS'})
+            return len(new_rows) + len(changed_rows)
+    except SQLAlchemyError:
+        return None
+
+
+def get_server_with_members(server_id: str) -> DiscordServer | None:
+    """
+    Retrieves a server with its active members, their players and the players'
+    primary Riot accounts (loading profile 'server_members', 3 queries).
+
+    Args:
+        server_id: The Discord guild ID of the server.
+
+    Returns:
+        The DiscordServer object if found, otherwise None.
+    """
+    logger.debug("Querying for server '%s' with members.", server_id, extra={'action': 'GET_SERVER_WITH_MEMBERS'})
+    try:
+        with session_scope() as session:
+            return session.query(DiscordServer).options(
+                *load_profile('server_members', DiscordServer)
+            ).filter_by(server_id=server_id).first()
+    except SQLAlchemyError:
+        return None
+
 def add_player_to_server(player_id: str, server_id: str) -> ServerPlayer | None:
     """
     Links a player to a specific server, creating a ServerPlayer record.
@@ -518,7 +803,7 @@ def add_player_to_server(player_id: str, server_id: str) -> ServerPlayer | None:
         The ServerPlayer object if the link was created or already existed, otherwise None.
     """
     action_details = {'player_id': player_id, 'server_id': server_id}
-    logger.info(f"Attempting to add player to server.",
+    logger.info("Attempting to add player to server.",
                 extra={'action': 'ADD_PLAYER_TO_SERVER_ATTEMPT', **action_details})
     try:
         with session_scope() as session:
@@ -532,6 +817,7 @@ def add_player_to_server(player_id: str, server_id: str) -> ServerPlayer | None:
                 # If the player was marked as inactive, reactivate them.
                 if not existing_server_player.is_active_on_server:
                     existing_server_player.is_active_on_server = True
+                    _emit(session, SERVER_MEMBERS_CHANGED, server_id=server_id, player_id=player_id)
                     logger.info("Reactivated player on server.",
                                 extra={'action': 'REACTIVATE_SERVER_PLAYER_SUCCESS', **action_details})
                 else:
@@ -545,6 +831,7 @@ def add_player_to_server(player_id: str, server_id: str) -> ServerPlayer | None:
             )
             session.add(new_server_player)
             session.flush()
+            _emit(session, SERVER_MEMBERS_CHANGED, server_id=server_id, player_id=player_id)
             logger.info("Successfully added player to server.",
                         extra={'action': 'ADD_PLAYER_TO_SERVER_SUCCESS',
                                'entity_id': new_server_player.server_player_id, **action_details})
@@ -569,7 +856,7 @@ def create_race(server_id: str, name: str, start_time: datetime, end_time: datet
         The newly created Race object, or None on error.
     """
     action_details = {'server_id': server_id, 'race_name': name}
-    logger.info(f"Attempting to create new race '{name}'.",
+    logger.info("Attempting to create new race '%s'.", name,
                 extra={'action': 'CREATE_RACE_ATTEMPT', **action_details})
 
     try:
@@ -588,6 +875,7 @@ def create_race(server_id: str, name: str, start_time: datetime, end_time: datet
             )
             session.add(new_race)
             session.flush()
+            _emit(session, RACE_CHANGED, race_id=new_race.race_id, server_id=server_id)
             logger.info("Successfully created new race.",
                         extra={'action': 'CREATE_RACE_SUCCESS', 'entity_id': new_race.race_id, **action_details})
             return new_race
@@ -595,6 +883,64 @@ def create_race(server_id: str, name: str, start_time: datetime, end_time: datet
     except SQLAlchemyError:
         return None
     
+_EDITABLE_RACE_FIELDS = ('race_name', 'description', 'start_time', 'end_time', 'status', 'race_type', 'target_value')
+
+def update_race(race_id: str, **fields) -> Race | None:
+    """
+    Changes fields of a race. The change event lets the lifecycle scheduler, the
+    race engine and the search index pick up new times, status or name.
+
+    Args:
+        race_id: The UUID of the race.
+        **fields: New values for race_name, description, start_time, end_time,
+                  status, race_type or target_value.
+
+    Returns:
+        The updated Race object, or None if it does not exist or on error.
+
+    Raises:
+        ValueError: If a field cannot be edited.
+    """
+    unknown = set(fields) - set(_EDITABLE_RACE_FIELDS)
+    if unknown:
+        raise ValueError(f"Race fields cannot be edited: {', '.join(sorted(unknown))}")
+    action_details = {'race_id': race_id, 'fields': sorted(fields)}
+    logger.info("Attempting to update race '%s'.", race_id, extra={'action': 'UPDATE_RACE_ATTEMPT', **action_details})
+    try:
+        with session_scope() as session:
+            race = session.get(Race, race_id)
+            if race is None:
+                logger.warning("Race '%s' not found for update.", race_id,
+                               extra={'action': 'UPDATE_RACE_NOT_FOUND', **action_details})
+                return None
+            for name, value in fields.items():
+                setattr(race, name, value)
+            _emit(session, RACE_CHANGED, race_id=race_id, server_id=race.server_id)
+            logger.info("Successfully updated race.", extra={'action': 'UPDATE_RACE_SUCCESS', **action_details})
+            return race
+    except SQLAlchemyError:
+        return None
+
+def get_race_with_participants(race_id: str) -> Race | None:
+    """
+    Retrieves a race with its participants, their players, primary Riot accounts
+    and current ranks (loading profile 'race_standings', 4 queries).
+
+    Args:
+        race_id: The UUID of the race.
+
+    Returns:
+        The Race object if found, otherwise None.
+    """
+    logger.debug("Querying for race '%s' with participants.", race_id, extra={'action': 'GET_RACE_WITH_PARTICIPANTS'})
+    try:
+        with session_scope() as session:
+            return session.query(Race).options(
+                *load_profile('race_standings', Race)
+            ).filter_by(race_id=race_id).first()
+    except SQLAlchemyError:
+        return None
+
 def add_participant_to_race(race_id: str, server_player_id: str, **kwargs) -> RaceParticipant | None:
     """
     Adds a player (via their ServerPlayer ID) as a participant in a race.
@@ -609,7 +955,7 @@ def add_participant_to_race(race_id: str, server_player_id: str, **kwargs) -> Ra
         The RaceParticipant object if created or already existing, otherwise None.
     """
     action_details = {'race_id': race_id, 'server_player_id': server_player_id}
-    logger.info(f"Attempting to add participant to race.",
+    logger.info("Attempting to add participant to race.",
                 extra={'action': 'ADD_PARTICIPANT_ATTEMPT', **action_details})
     try:
         with session_scope() as session:
@@ -632,6 +978,8 @@ def add_participant_to_race(race_id: str, server_player_id: str, **kwargs) -> Ra
             )
             session.add(new_participant)
             session.flush()
+            server_id = session.execute(select(Race.server_id).where(Race.race_id == race_id)).scalar()
+            _emit(session, RACE_CHANGED, race_id=race_id, server_id=server_id)
             logger.info("Successfully added new participant to race.",
                         extra={'action': 'ADD_PARTICIPANT_SUCCESS',
                                'entity_id': new_participant.participant_id, **action_details})
@@ -640,6 +988,275 @@ def add_participant_to_race(race_id: str, server_player_id: str, **kwargs) -> Ra
     except SQLAlchemyError:
         return None
     
+def get_race_progress_entries(race_id: str | None = None) -> list | None:
+    """
+    Retrieves the participants of races with everything the race engine needs, in one query:
+    race_id, race_name, server_id, race_type, target_value, status, participant_id,
+    server_player_id, player_id, display_name, riot_account_id (primary account, None without one),
+    starting_value, current_value, games_played and is_disqualified.
+
+    Args:
+        race_id (optional): Only this race, in any status. Without it, all active races.
+
+    Returns:
+        A list of rows, or None on error.
+    """
+    query = (
+        select(Race.race_id, Race.race_name, Race.server_id, Race.race_type, Race.target_value, Race.status,
+               RaceParticipant.participant_id, RaceParticipant.server_player_id, ServerPlayer.player_id,
+               Player.display_name, PlayerRiotAccountLink.riot_account_id, RaceParticipant.starting_value,
+               RaceParticipant.current_value, RaceParticipant.games_played, RaceParticipant.is_disqualified)
+        .join(RaceParticipant, RaceParticipant.race_id == Race.race_id)
+        .join(ServerPlayer, ServerPlayer.server_player_id == RaceParticipant.server_player_id)
+        .join(Player, Player.player_id == ServerPlayer.player_id)
+        .outerjoin(PlayerRiotAccountLink, and_(PlayerRiotAccountLink.player_id == ServerPlayer.player_id,
+                                               *_primary_links()))
+    )
+    if race_id is not None:
+        query = query.where(Race.race_id == race_id)
+    else:
+        query = query.where(Race.status == constants.RACE_STATUS_ACTIVE)
+    try:
+        with session_scope() as session:
+            return session.execute(query).all()
+    except SQLAlchemyError:
+        return None
+
+def update_race_progress(progress: list[dict]) -> int | None:
+    """
+    Writes the running values of many race participants in one transaction (executemany).
+
+    Args:
+        progress: Dicts with participant_id, starting_value, current_value and games_played.
+
+    Returns:
+        The number of updated participants, or None on error.
+    """
+    if not progress:
+        return 0
+    try:
+        with session_scope() as session:
+            now = session.execute(select(func.now())).scalar()
+            session.execute(update(RaceParticipant), [{**row, 'last_progress_update': now} for row in progress])
+            logger.debug("Updated the progress of %s race participants.", len(progress),
+                         extra={'action': 'UPDATE_RACE_PROGRESS'})
+            return len(progress)
+    except SQLAlchemyError:
+        return None
+
+def get_race_schedule(race_id: str | None = None) -> list | None:
+    """
+    Retrieves the times of races for the lifecycle scheduler: rows with race_id,
+    server_id, status, start_time and end_time.
+
+    Args:
+        race_id (optional): Only this race, in any status. Without it, all planned and active races.
+
+    Returns:
+        A list of rows, or None on error.
+    """
+    query = select(Race.race_id, Race.server_id, Race.status, Race.start_time, Race.end_time)
+    if race_id is not None:
+        query = query.where(Race.race_id == race_id)
+    else:
+        query = query.where(Race.status.in_((constants.RACE_STATUS_PLANNED, constants.RACE_STATUS_ACTIVE)))
+    try:
+        with session_scope() as session:
+            return session.execute(query).all()
+    except SQLAlchemyError:
+        return None
+
+def _primary_accounts_of_race(race_id: str):
+    """Select of the primary Riot account of every participant of a race."""
+    return (
+        select(RaceParticipant.participant_id, PlayerRiotAccountLink.riot_account_id)
+        .join(ServerPlayer, ServerPlayer.server_player_id == RaceParticipant.server_player_id)
+        .join(PlayerRiotAccountLink, and_(PlayerRiotAccountLink.player_id == ServerPlayer.player_id,
+                                          *_primary_links()))
+        .where(RaceParticipant.race_id == race_id)
+    )
+
+def start_race(race_id: str, queue_type: str = 'RANKED_TFT') -> int | None:
+    """
+    Sets a planned race whose start_time has passed to 'active' and snapshots the
+    starting_value of every participant without one: the last ladder score at or
+    before start_time. Participants without such a snapshot keep None; the race
+    engine then uses their first known score.
+
+    Args:
+        race_id: The UUID of the race.
+        queue_type: The queue LP races are measured in (default 'RANKED_TFT').
+
+    Returns:
+        The number of snapshotted participants, False if the race is not a due
+        planned race (e.g. already started by another process), or None on error.
+    """
+    action_details = {'race_id': race_id}
+    try:
+        with session_scope() as session:
+            race = session.get(Race, race_id, with_for_update=True)
+            if race is None or race.status != constants.RACE_STATUS_PLANNED:
+                logger.debug("Race '%s' is not planned; not starting.", race_id,
+                             extra={'action': 'START_RACE_SKIPPED', **action_details})
+                return False
+            if race.start_time > session.execute(select(func.now())).scalar():
+                logger.warning("Race '%s' has not reached its start time; not starting.", race_id,
+                               extra={'action': 'START_RACE_SKIPPED', **action_details})
+                return False
+
+            participants = _primary_accounts_of_race(race_id).where(
+                RaceParticipant.starting_value.is_(None)).subquery('participants')
+            scores = _ranks_as_of_query(queue_type, select(participants.c.riot_account_id),
+                                        race.start_time).subquery('scores')
+            rows = session.execute(
+                select(participants.c.participant_id, scores.c.ladder_score)
+                .join(scores, scores.c.riot_account_id == participants.c.riot_account_id)
+                .where(scores.c.ladder_score.isnot(None))
+            ).all()
+            if rows:
+                session.execute(update(RaceParticipant), [
+                    {'participant_id': row.participant_id, 'starting_value': row.ladder_score} for row in rows
+                ])
+            race.status = constants.RACE_STATUS_ACTIVE
+            _emit(session, RACE_CHANGED, race_id=race_id, server_id=race.server_id)
+            logger.info("Started race '%s'; snapshotted %s starting values.", race_id, len(rows),
+                        extra={'action': 'START_RACE_SUCCESS', **action_details})
+            return len(rows)
+    except SQLAlchemyError:
+        return None
+
+def _race_final_values_query(race: Race, queue_type: str):
+    """
+    One statement computing starting_value, final_value, is_disqualified and final_rank
+    of every participant of a race. LP races read each account's last ladder score at or
+    before end_time (and, without a stored starting_value, the one at start_time, else the
+    first one after it) with window functions over the LP history including rollups.
+    Placement races use the running values kept by the race engine.
+    """
+    link = PlayerRiotAccountLink
+    participants = (
+        select(RaceParticipant.participant_id, RaceParticipant.starting_value, RaceParticipant.current_value,
+               RaceParticipant.games_played, RaceParticipant.is_disqualified, ServerPlayer.is_active_on_server,
+               link.riot_account_id)
+        .join(ServerPlayer, ServerPlayer.server_player_id == RaceParticipant.server_player_id)
+        .outerjoin(link, and_(link.player_id == ServerPlayer.player_id, *_primary_links()))
+        .where(RaceParticipant.race_id == race.race_id)
+    ).subquery('participants')
+    # Ausgeschlossen: manuell disqualifiziert, Server verlassen oder kein primärer Riot-Account
+    disqualified = or_(participants.c.is_disqualified == True, participants.c.is_active_on_server == False,
+                       participants.c.riot_account_id.is_(None))
+
+    descending = True
+    source = participants
+    if race.race_type == constants.RACE_TYPE_TOP4_COUNT:
+        starting, final_value = participants.c.starting_value, participants.c.current_value
+        progress = func.coalesce(participants.c.current_value, 0)
+    elif race.race_type == constants.RACE_TYPE_PLACEMENT_AVERAGE:
+        starting, final_value = participants.c.starting_value, participants.c.current_value
+        progress = case((participants.c.games_played > 0,
+                         participants.c.current_value * 1.0 / participants.c.games_played))
+        descending = False
+    else:
+        history = lp_history_selectable(queue_type, riot_account_ids=select(participants.c.riot_account_id),
+                                        end=race.end_time)
+        before_start = history.c.retrieved_at <= race.start_time
+        snapshots = select(
+            history.c.riot_account_id,
+            history.c.ladder_score,
+            func.row_number().over(partition_by=history.c.riot_account_id,
+                                   order_by=history.c.retrieved_at.desc()).label('final_rn'),
+            func.row_number().over(partition_by=history.c.riot_account_id,
+                                   order_by=(case((before_start, 0), else_=1),
+                                             case((before_start, history.c.retrieved_at)).desc(),
+                                             history.c.retrieved_at)).label('start_rn')
+        ).where(history.c.ladder_score.isnot(None)).subquery('snapshots')
+        as_of = select(
+            snapshots.c.riot_account_id,
+            func.max(case((snapshots.c.final_rn == 1, snapshots.c.ladder_score))).label('final_score'),
+            func.max(case((snapshots.c.start_rn == 1, snapshots.c.ladder_score))).label('start_score')
+        ).where(or_(snapshots.c.final_rn == 1, snapshots.c.start_rn == 1)).group_by(
+            snapshots.c.riot_account_id).subquery('as_of')
+        source = participants.outerjoin(as_of, as_of.c.riot_account_id == participants.c.riot_account_id)
+        starting = func.coalesce(participants.c.starting_value, as_of.c.start_score)
+        final_value = as_of.c.final_score
+        progress = final_value - starting
+
+    scored = select(participants.c.participant_id, starting.label('starting_value'),
+                    final_value.label('final_value'), disqualified.label('is_disqualified'),
+                    progress.label('progress')).select_from(source).subquery('scored')
+    unranked = or_(scored.c.is_disqualified == True, scored.c.progress.is_(None))
+    rank = func.rank().over(order_by=(case((unranked, 1), else_=0),
+                                      scored.c.progress.desc() if descending else scored.c.progress.asc()))
+    return select(scored.c.participant_id, scored.c.starting_value, scored.c.final_value,
+                  scored.c.is_disqualified, case((unranked, null()), else_=rank).label('final_rank'))
+
+def finalize_race(race_id: str, queue_type: str = 'RANKED_TFT') -> int | None:
+    """
+    Fills in final_value, final_rank and the disqualifications of every participant of a
+    finished race and sets its status to 'finished', all in one transaction.
+    The values are computed as of end_time, so running it again gives the same result.
+    Equal progress shares a rank; disqualified participants and those without progress get none.
+
+    Args:
+        race_id: The UUID of the race.
+        queue_type: The queue LP races are measured in (default 'RANKED_TFT').
+
+    Returns:
+        The number of finalized participants, False if the race does not exist,
+        was cancelled or has not ended yet, or None on error.
+    """
+    action_details = {'race_id': race_id}
+    try:
+        with session_scope() as session:
+            # Zeilensperre: zwei Prozesse finalisieren dieselbe Race nicht gleichzeitig
+            race = session.get(Race, race_id, with_for_update=True)
+            if race is None or race.status == constants.RACE_STATUS_CANCELLED:
+                logger.warning("Race '%s' does not exist or was cancelled; not finalizing.", race_id,
+                               extra={'action': 'FINALIZE_RACE_SKIPPED', **action_details})
+                return False
+            if race.end_time > session.execute(select(func.now())).scalar():
+                logger.warning("Race '%s' has not ended yet; not finalizing.", race_id,
+                               extra={'action': 'FINALIZE_RACE_SKIPPED', **action_details})
+                return False
+
+            rows = session.execute(_race_final_values_query(race, queue_type)).all()
+            if rows:
+                session.execute(update(RaceParticipant), [
+                    {'participant_id': row.participant_id, 'starting_value': row.starting_value,
+                     'final_value': row.final_value, 'final_rank': row.final_rank,
+                     'is_disqualified': bool(row.is_disqualified)}
+                    for row in rows
+                ])
+            race.status = constants.RACE_STATUS_FINISHED
+            _emit(session, RACE_CHANGED, race_id=race_id, server_id=race.server_id)
+            logger.info("Finalized race '%s' with %s participants.", race_id, len(rows),
+                        extra={'action': 'FINALIZE_RACE_SUCCESS', **action_details})
+            return len(rows)
+    except SQLAlchemyError:
+        return None
+
+def finalize_due_races(queue_type: str = 'RANKED_TFT') -> list[str] | None:
+    """
+    Finalizes every planned or active race whose end_time has passed.
+
+    Returns:
+        The IDs of the finalized races, or None on error.
+    """
+    try:
+        with session_scope() as session:
+            race_ids = session.execute(
+                select(Race.race_id).where(Race.status.in_((constants.RACE_STATUS_PLANNED, constants.RACE_STATUS_ACTIVE)), Race.end_time <= func.now())
+            ).scalars().all()
+    except SQLAlchemyError:
+        return None
+    finalized = []
+    for race_id in race_ids:
+        # False: inzwischen abgesagt oder von einem anderen Prozess erledigt; None: DB-Fehler
+        result = finalize_race(race_id, queue_type)
+        if result is not None and result is not False:
+            finalized.append(race_id)
+    return finalized
+
 def add_lp_history_entry(riot_account_id: str, queue_type: str, league_points: int, tier: str, division: str, wins: int, losses: int) -> RiotAccountLPHistory | None:
     """
     Adds a new League Points history entry for a specific Riot account.
@@ -661,7 +1278,7 @@ def add_lp_history_entry(riot_account_id: str, queue_type: str, league_points: i
         'queue_type': queue_type,
         'lp': league_points
     }
-    logger.info(f"Attempting to add LP history entry for Riot account '{riot_account_id}'.",
+    logger.info("Attempting to add LP history entry for Riot account '%s'.", riot_account_id,
                 extra={'action': 'ADD_LP_HISTORY_ATTEMPT', **action_details})
 
     try:
@@ -673,11 +1290,951 @@ def add_lp_history_entry(riot_account_id: str, queue_type: str, league_points: i
                 tier=tier,
                 division=division,
                 wins=wins,
-                losses=losses
+                losses=losses,
+                **ladder.encode_snapshot(tier, division, league_points)
             )
             session.add(new_entry)
+            session.flush() # Assigns lp_history_id and retrieved_at
+
+            # Keep the materialized current rank in the same transaction
+            if _upsert_current_rank(session, new_entry):
+                _emit(session, RANK_CHANGED, riot_account_id=riot_account_id, queue_type=queue_type)
+
             logger.info("Successfully added new LP history entry.",
                         extra={'action': 'ADD_LP_HISTORY_SUCCESS', **action_details})
             return new_entry
     except SQLAlchemyError:
-        return None
\ No newline at end of file
+        return None
+
+def _upsert_current_rank(session, entry: RiotAccountLPHistory) -> bool:
+    """
+    Mirrors an LP history entry into riot_account_current_rank, unless a newer
+    snapshot is already stored for that account and queue.
+    Must be called inside an open session so both writes share one transaction.
+
+    The first snapshot of an account and queue is inserted in a savepoint: if a concurrent
+    writer inserted the row first, only the savepoint is rolled back and the stored row
+    is updated instead, so the LP history entry itself is kept.
+
+    Returns:
+        True if the ladder position inputs (tier, division, LP) changed, False otherwise.
+    """
+    if entry.queue_type is None:
+        logger.debug("LP history entry has no queue type, current rank not updated.",
+                     extra={'action': 'UPSERT_CURRENT_RANK_SKIPPED', 'entity_id': entry.riot_account_id})
+        return False
+
+    key = (entry.riot_account_id, entry.queue_type)
+    current = session.get(RiotAccountCurrentRank, key, with_for_update=True)
+    if current is None:
+        try:
+            with session.begin_nested():
+                session.add(_copy_snapshot(RiotAccountCurrentRank(riot_account_id=entry.riot_account_id,
+                                                                  queue_type=entry.queue_type), entry))
+            return True
+        except IntegrityError:
+            current = session.get(RiotAccountCurrentRank, key, with_for_update=True, populate_existing=True)
+            if current is None:
+                # Kein Konflikt auf dem Primärschlüssel (z.B. unbekannter Account)
+                raise
+            logger.debug("Current rank row was inserted concurrently, updating it instead.",
+                         extra={'action': 'UPSERT_CURRENT_RANK_CONFLICT', 'entity_id': entry.riot_account_id})
+
+    if current.retrieved_at > entry.retrieved_at:
+        logger.debug("Stored current rank is newer than the new LP history entry. No update needed.",
+                     extra={'action': 'UPSERT_CURRENT_RANK_STALE', 'entity_id': entry.riot_account_id})
+        return False
+
+    rank_changed = (current.ladder_score, current.tier, current.division, current.league_points) != \
+                   (entry.ladder_score, entry.tier, entry.division, entry.league_points)
+    _copy_snapshot(current, entry)
+    return rank_changed
+
+def _copy_snapshot(current: RiotAccountCurrentRank, entry: RiotAccountLPHistory) -> RiotAccountCurrentRank:
+    """Copies the snapshot columns of an LP history entry onto a current-rank row."""
+    current.lp_history_id = entry.lp_history_id
+    current.league_points = entry.league_points
+    current.tier = entry.tier
+    current.division = entry.division
+    current.wins = entry.wins
+    current.losses = entry.losses
+    current.tier_code = entry.tier_code
+    current.division_code = entry.division_code
+    current.ladder_score = entry.ladder_score
+    current.retrieved_at = entry.retrieved_at
+    return current
+
+def get_current_rank(riot_account_id: str, queue_type: str = 'RANKED_TFT') -> RiotAccountCurrentRank | None:
+    """
+    Retrieves the latest known rank of a Riot account in a queue.
+
+    Args:
+        riot_account_id: The UUID of the Riot account.
+        queue_type: The queue to look up (default 'RANKED_TFT').
+
+    Returns:
+        The RiotAccountCurrentRank row if the account has a snapshot in that queue, otherwise None.
+    """
+    logger.debug("Querying current rank for Riot account '%s'.", riot_account_id, extra={'action': 'GET_CURRENT_RANK'})
+    try:
+        with session_scope() as session:
+            return session.get(RiotAccountCurrentRank, (riot_account_id, queue_type))
+    except SQLAlchemyError:
+        return None
+
+def get_current_ranks(riot_account_ids: list[str], queue_type: str = 'RANKED_TFT') -> dict[str, RiotAccountCurrentRank]:
+    """
+    Retrieves the latest known ranks of several Riot accounts in a single query (per 500 accounts).
+
+    Args:
+        riot_account_ids: The UUIDs of the Riot accounts.
+        queue_type: The queue to look up (default 'RANKED_TFT').
+
+    Returns:
+        A dict mapping riot_account_id to its RiotAccountCurrentRank. Accounts without a snapshot are missing.
+    """
+    if not riot_account_ids:
+        return {}
+    logger.debug("Querying current ranks for %s Riot accounts.", len(riot_account_ids), extra={'action': 'GET_CURRENT_RANKS'})
+    try:
+        with session_scope() as session:
+            ranks = {}
+            for chunk in _chunks(list(riot_account_ids)):
+                ranks.update((row.riot_account_id, row) for row in session.query(RiotAccountCurrentRank).filter(
+                    RiotAccountCurrentRank.riot_account_id.in_(chunk),
+                    RiotAccountCurrentRank.queue_type == queue_type
+                ))
+            return ranks
+    except SQLAlchemyError:
+        return {}
+
+def rebuild_current_rank_table() -> int | None:
+    """
+    Rebuilds riot_account_current_rank from the full LP history in one transaction.
+    Used to backfill the table for existing data or to repair it.
+
+    Returns:
+        The number of current-rank rows written, or None on error.
+    """
+    logger.info("Attempting to rebuild the current rank table from LP history.",
+                extra={'action': 'REBUILD_CURRENT_RANK_ATTEMPT'})
+    history = RiotAccountLPHistory
+    columns = ['riot_account_id', 'queue_type', 'lp_history_id', 'league_points', 'tier',
+               'division', 'wins', 'losses', 'tier_code', 'division_code', 'ladder_score', 'retrieved_at']
+    try:
+        with session_scope() as session:
+            ranked = select(
+                *(getattr(history, name) for name in columns),
+                func.row_number().over(
+                    partition_by=(history.riot_account_id, history.queue_type),
+                    order_by=(history.retrieved_at.desc(), history.lp_history_id.desc())
+                ).label('rn')
+            ).where(history.queue_type.isnot(None)).subquery()
+
+            latest = select(*(ranked.c[name] for name in columns), func.now()).where(ranked.c.rn == 1)
+
+            session.execute(delete(RiotAccountCurrentRank))
+            result = session.execute(
+                insert(RiotAccountCurrentRank).from_select(columns + ['updated_at'], latest)
+            )
+            row_count = result.rowcount
+            _emit(session, RANK_CHANGED, riot_account_id=None, queue_type=None)
+            logger.info("Rebuilt current rank table with %s rows.", row_count,
+                        extra={'action': 'REBUILD_CURRENT_RANK_SUCCESS', 'row_count': row_count})
+            return row_count
+    except SQLAlchemyError:
+        return None
+
+def normalize_riot_account_regions() -> int | None:
+    """
+    Rewrites regions stored as typed ('EUW1', 'euw') to the normalized platform ID ('euw1'),
+    so partitioning and region filters see one spelling per platform.
+
+    Returns:
+        The number of updated accounts, or None on error.
+    """
+    logger.info("Attempting to normalize stored Riot account regions.",
+                extra={'action': 'NORMALIZE_REGIONS_ATTEMPT'})
+    try:
+        with session_scope() as session:
+            rows = session.execute(select(RiotAccount.riot_account_id, RiotAccount.region)).all()
+            changes = [{'riot_account_id': riot_account_id, 'region': constants.normalize_region(region)}
+                       for riot_account_id, region in rows if constants.normalize_region(region) != region]
+            if changes:
+                session.execute(update(RiotAccount), changes)
+            logger.info("Normalized the region of %s Riot accounts.", len(changes),
+                        extra={'action': 'NORMALIZE_REGIONS_SUCCESS', 'row_count': len(changes)})
+            return len(changes)
+    except SQLAlchemyError:
+        return None
+
+def backfill_ladder_scores() -> int | None:
+    """
+    Fills tier_code, division_code and ladder_score for LP history rows written
+    before these columns existed. Runs as one set-based UPDATE.
+
+    Returns:
+        The number of updated history rows, or None on error.
+    """
+    logger.info("Attempting to backfill ladder scores in LP history.", extra={'action': 'BACKFILL_LADDER_SCORE_ATTEMPT'})
+    history = RiotAccountLPHistory
+    try:
+        with session_scope() as session:
+            result = session.execute(
+                update(history)
+                .where(history.tier.isnot(None), history.tier_code.is_(None))
+                .values(
+                    tier_code=ladder.tier_code_expression(history.tier),
+                    division_code=ladder.division_code_expression(history.division),
+                    ladder_score=ladder.ladder_score_expression(history.tier, history.division, history.league_points)
+                )
+            )
+            row_count = result.rowcount
+            logger.info("Backfilled ladder scores for %s LP history rows.", row_count,
+                        extra={'action': 'BACKFILL_LADDER_SCORE_SUCCESS', 'row_count': row_count})
+            return row_count
+    except SQLAlchemyError:
+        return None
+
+# --- Ladder Functions ---
+
+def _server_ladder_query(session, server_id: str, queue_type: str):
+    """
+    Base query for a server ladder: the current rank of every active player's
+    primary Riot account, restricted to ranked entries.
+    """
+    return (
+        session.query(Player, RiotAccount, RiotAccountCurrentRank)
+        .join(ServerPlayer, ServerPlayer.player_id == Player.player_id)
+        .join(PlayerRiotAccountLink, PlayerRiotAccountLink.player_id == Player.player_id)
+        .join(RiotAccount, RiotAccount.riot_account_id == PlayerRiotAccountLink.riot_account_id)
+        .join(RiotAccountCurrentRank, RiotAccountCurrentRank.riot_account_id == RiotAccount.riot_account_id)
+        .filter(
+            ServerPlayer.server_id == server_id,
+            ServerPlayer.is_active_on_server == True,
+            PlayerRiotAccountLink.is_active == True,
+            PlayerRiotAccountLink.is_primary_riot_account == True,
+            RiotAccountCurrentRank.queue_type == queue_type,
+            RiotAccountCurrentRank.ladder_score.isnot(None)
+        )
+    )
+
+def get_server_ladder(server_id: str, limit: int = 10, offset: int = 0,
+                      queue_type: str = 'RANKED_TFT') -> list[tuple[Player, RiotAccount, RiotAccountCurrentRank]]:
+    """
+    Retrieves the top of a server's ladder, sorted by ladder score in the database.
+
+    Args:
+        server_id: The ID of the server.
+        limit: The maximum number of entries to return.
+        offset: The number of top entries to skip (for pagination).
+        queue_type: The queue to rank by (default 'RANKED_TFT').
+
+    Returns:
+        A list of (Player, RiotAccount, RiotAccountCurrentRank) tuples, best first.
+    """
+    logger.debug("Querying ladder for server '%s' (limit=%s, offset=%s).", server_id, limit, offset,
+                 extra={'action': 'GET_SERVER_LADDER'})
+    try:
+        with session_scope() as session:
+            rows = (
+                _server_ladder_query(session, server_id, queue_type)
+                .order_by(RiotAccountCurrentRank.ladder_score.desc(), RiotAccountCurrentRank.retrieved_at.asc())
+                .offset(offset)
+                .limit(limit)
+                .all()
+            )
+            return [tuple(row) for row in rows]
+    except SQLAlchemyError:
+        return []
+
+def get_server_ladder_position(server_id: str, riot_account_id: str, queue_type: str = 'RANKED_TFT') -> int | None:
+    """
+    Computes the 1-based position of a Riot account on a server's ladder.
+    Entries with an equal score share the same position.
+
+    Args:
+        server_id: The ID of the server.
+        riot_account_id: The UUID of the Riot account.
+        queue_type: The queue to rank by (default 'RANKED_TFT').
+
+    Returns:
+        The position, or None if the account is not ranked on this server.
+    """
+    logger.debug("Querying ladder position of Riot account '%s' on server '%s'.", riot_account_id, server_id,
+                 extra={'action': 'GET_SERVER_LADDER_POSITION'})
+    try:
+        with session_scope() as session:
+            own_entry = (
+                _server_ladder_query(session, server_id, queue_type)
+                .filter(RiotAccount.riot_account_id == riot_account_id)
+                .first()
+            )
+            if not own_entry:
+                return None
+            own_score = own_entry[2].ladder_score
+
+            better_count = (
+                _server_ladder_query(session, server_id, queue_type)
+                .filter(RiotAccountCurrentRank.ladder_score > own_score)
+                .count()
+            )
+            return better_count + 1
+    except SQLAlchemyError:
+        return None
+
+def get_server_leaderboard(server_id: str, queue_type: str = 'RANKED_TFT') -> list | None:
+    """
+    Retrieves the complete ladder of a server as plain rows in one query, for caching.
+    Active members without a primary Riot account or without a rank in the queue are
+    included at the end with ladder_score None, so a cache knows every player and
+    account that can enter the ladder.
+
+    Args:
+        server_id: The ID of the server.
+        queue_type: The queue to rank by (default 'RANKED_TFT').
+
+    Returns:
+        A list of rows with player_id, display_name, riot_account_id, game_name, tag_line,
+        tier, division, league_points and ladder_score, best first; None on error.
+    """
+    logger.debug("Querying full leaderboard for server '%s'.", server_id, extra={'action': 'GET_SERVER_LEADERBOARD'})
+    try:
+        with session_scope() as session:
+            statement = (
+                select(Player.player_id, Player.display_name, RiotAccount.riot_account_id, RiotAccount.game_name,
+                       RiotAccount.tag_line, RiotAccountCurrentRank.tier, RiotAccountCurrentRank.division,
+                       RiotAccountCurrentRank.league_points, RiotAccountCurrentRank.ladder_score)
+                .join(ServerPlayer, ServerPlayer.player_id == Player.player_id)
+                .outerjoin(PlayerRiotAccountLink,
+                           and_(PlayerRiotAccountLink.player_id == Player.player_id, *_primary_links()))
+                .outerjoin(RiotAccount, RiotAccount.riot_account_id == PlayerRiotAccountLink.riot_account_id)
+                .outerjoin(RiotAccountCurrentRank,
+                           and_(RiotAccountCurrentRank.riot_account_id == RiotAccount.riot_account_id,
+                                RiotAccountCurrentRank.queue_type == queue_type))
+                .where(ServerPlayer.server_id == server_id, ServerPlayer.is_active_on_server == True)
+                .order_by(RiotAccountCurrentRank.ladder_score.is_(None), RiotAccountCurrentRank.ladder_score.desc(),
+                          RiotAccountCurrentRank.retrieved_at.asc())
+            )
+            return session.execute(statement).all()
+    except SQLAlchemyError:
+        return None
+
+# --- Sync Read Functions ---
+
+def get_tracked_riot_accounts(regions: list[str] | None = None) -> list[tuple[RiotAccount, set[str]]] | None:
+    """
+    Retrieves every Riot account that is actively linked to an active server member,
+    together with the servers it is tracked on, in one query.
+
+    Args:
+        regions (optional): Only accounts on these platforms (e.g. ['euw1']). Rows stored
+                            before regions were normalized ('EUW1', 'euw') match as well.
+
+    Returns:
+        A list of (RiotAccount, set of server_ids) tuples, or None on error.
+    """
+    logger.debug("Querying tracked Riot accounts with their servers.", extra={'action': 'GET_TRACKED_RIOT_ACCOUNTS'})
+    try:
+        with session_scope() as session:
+            query = (
+                select(RiotAccount, ServerPlayer.server_id)
+                .join(PlayerRiotAccountLink, PlayerRiotAccountLink.riot_account_id == RiotAccount.riot_account_id)
+                .join(ServerPlayer, ServerPlayer.player_id == PlayerRiotAccountLink.player_id)
+                .where(_active_links(), ServerPlayer.is_active_on_server == True)
+            )
+            if regions is not None:
+                platforms = {constants.normalize_region(region) for region in regions}
+                spellings = platforms | {alias for alias, platform in constants.REGION_CORRECTIONS.items()
+                                         if platform in platforms}
+                query = query.where(func.lower(func.trim(RiotAccount.region)).in_(spellings))
+            rows = session.execute(query).all()
+            servers_by_account: dict[str, tuple[RiotAccount, set]] = {}
+            for account, server_id in rows:
+                servers_by_account.setdefault(account.riot_account_id, (account, set()))[1].add(server_id)
+            return list(servers_by_account.values())
+    except SQLAlchemyError:
+        return None
+
+# --- Autocomplete Read Functions ---
+
+def get_member_search_entries(server_id: str | None = None, player_ids: list[str] | None = None) -> list | None:
+    """
+    Retrieves the searchable names of active server members in one query: the display
+    name and the Riot IDs of all actively linked accounts. Members without a linked
+    account are included with riot_account_id None.
+
+    Args:
+        server_id: Restrict to one server (default: all servers).
+        player_ids: Restrict to these players (default: all players).
+
+    Returns:
+        A list of rows with server_id, player_id, display_name, riot_account_id, game_name
+        and tag_line; None on error.
+    """
+    logger.debug("Querying member search entries (server=%s, players=%s).", server_id,
+                 len(player_ids) if player_ids is not None else 'all', extra={'action': 'GET_MEMBER_SEARCH_ENTRIES'})
+    try:
+        with session_scope() as session:
+            statement = (
+                select(ServerPlayer.server_id, Player.player_id, Player.display_name, RiotAccount.riot_account_id,
+                       RiotAccount.game_name, RiotAccount.tag_line)
+                .join(Player, Player.player_id == ServerPlayer.player_id)
+                .outerjoin(PlayerRiotAccountLink, and_(PlayerRiotAccountLink.player_id == Player.player_id,
+                                                       _active_links()))
+                .outerjoin(RiotAccount, RiotAccount.riot_account_id == PlayerRiotAccountLink.riot_account_id)
+                .where(ServerPlayer.is_active_on_server == True)
+            )
+            if server_id is not None:
+                statement = statement.where(ServerPlayer.server_id == server_id)
+            if player_ids is not None:
+                statement = statement.where(Player.player_id.in_(player_ids))
+            return session.execute(statement).all()
+    except SQLAlchemyError:
+        return None
+
+def get_player_ids_for_riot_account(riot_account_id: str) -> list[str] | None:
+    """Returns the IDs of all players actively linked to a Riot account, or None on error."""
+    try:
+        with session_scope() as session:
+            return list(session.execute(
+                select(PlayerRiotAccountLink.player_id)
+                .where(PlayerRiotAccountLink.riot_account_id == riot_account_id, _active_links())
+            ).scalars())
+    except SQLAlchemyError:
+        return None
+
+def get_race_search_entries(server_id: str | None = None, race_id: str | None = None) -> list | None:
+    """
+    Retrieves race names for autocomplete.
+
+    Returns:
+        A list of rows with server_id, race_id, race_name and status; None on error.
+    """
+    try:
+        with session_scope() as session:
+            statement = select(Race.server_id, Race.race_id, Race.race_name, Race.status)
+            if server_id is not None:
+                statement = statement.where(Race.server_id == server_id)
+            if race_id is not None:
+                statement = statement.where(Race.race_id == race_id)
+            return session.execute(statement).all()
+    except SQLAlchemyError:
+        return None
+
+# --- LP History Read Functions ---
+
+def lp_history_selectable(queue_type: str, riot_account_ids=None, end: datetime | None = None):
+    """
+    One selectable over raw snapshots and both rollup tables with a common set of columns.
+    The retention job moves data between the tables without overlap, so the union
+    covers the whole history exactly once. Rollups are represented by their last snapshot.
+
+    riot_account_ids (a list or a select of IDs) and end restrict every part of the
+    union, so each part can use its index on (riot_account_id, queue_type, ...).
+    """
+    raw = RiotAccountLPHistory
+
+    def restrict(query, model, time_column):
+        if riot_account_ids is not None:
+            query = query.where(model.riot_account_id.in_(riot_account_ids))
+        if end is not None:
+            query = query.where(time_column <= end)
+        return query
+
+    sources = [
+        restrict(select(
+            raw.riot_account_id.label('riot_account_id'),
+            raw.retrieved_at.label('retrieved_at'),
+            raw.league_points.label('league_points'),
+            raw.league_points.label('min_league_points'),
+            raw.league_points.label('max_league_points'),
+            raw.tier.label('tier'),
+            raw.division.label('division'),
+            raw.wins.label('wins'),
+            raw.losses.label('losses'),
+            raw.ladder_score.label('ladder_score'),
+            literal('raw').label('resolution')
+        ).where(raw.queue_type == queue_type), raw, raw.retrieved_at)
+    ]
+    for rollup, resolution in ((RiotAccountLPHourlyRollup, 'hour'), (RiotAccountLPDailyRollup, 'day')):
+        sources.append(restrict(
+            select(
+                rollup.riot_account_id,
+                rollup.last_at,
+                rollup.last_lp,
+                rollup.min_lp,
+                rollup.max_lp,
+                rollup.last_tier,
+                rollup.last_division,
+                rollup.last_wins,
+                rollup.last_losses,
+                rollup.last_score,
+                literal(resolution)
+            ).where(rollup.queue_type == queue_type), rollup, rollup.last_at
+        ))
+    return union_all(*sources).subquery('lp_history_union')
+
+def get_lp_history(riot_account_id: str, start: datetime | None = None, end: datetime | None = None,
+                   queue_type: str = 'RANKED_TFT') -> list[dict]:
+    """
+    Retrieves the LP history of a Riot account for a time range. Recent data comes
+    from raw snapshots, older data transparently from hourly or daily rollups.
+
+    Args:
+        riot_account_id: The UUID of the Riot account.
+        start (optional): Only include points at or after this timestamp.
+        end (optional): Only include points at or before this timestamp.
+        queue_type: The queue to read (default 'RANKED_TFT').
+
+    Returns:
+        A list of dicts ordered by 'retrieved_at', each with the keys retrieved_at, league_points,
+        min_league_points, max_league_points, tier, division, wins, losses, ladder_score
+        and resolution ('raw', 'hour' or 'day').
+    """
+    logger.debug("Querying LP history for Riot account '%s' (%s - %s).", riot_account_id, start, end,
+                 extra={'action': 'GET_LP_HISTORY'})
+    history = lp_history_selectable(queue_type)
+    query = select(history).where(history.c.riot_account_id == riot_account_id)
+    if start is not None:
+        query = query.where(history.c.retrieved_at >= start)
+    if end is not None:
+        query = query.where(history.c.retrieved_at <= end)
+    query = query.order_by(history.c.retrieved_at)
+    try:
+        with session_scope() as session:
+            return [dict(row._mapping) for row in session.execute(query)]
+    except SQLAlchemyError:
+        return []
+
+# Die Account-IDs stehen in jedem der drei Teile der Union (roh, Stunde, Tag): 3 x 300 IDs
+# plus queue_type und as_of je Teil bleiben unter den 999 Parametern von SQLite
+_AS_OF_CHUNK_SIZE = 300
+
+def _ranks_as_of_query(queue_type: str, riot_account_ids, as_of: datetime):
+    """
+    Each account's last snapshot at or before `as_of`: ROW_NUMBER() per account over the
+    union of raw snapshots and rollups, restricted to the accounts and time in every part.
+    """
+    history = lp_history_selectable(queue_type, riot_account_ids=riot_account_ids, end=as_of)
+    latest = select(
+        history,
+        func.row_number().over(partition_by=history.c.riot_account_id,
+                               order_by=history.c.retrieved_at.desc()).label('row_number')
+    ).subquery('latest')
+    return select(*[column for column in latest.c if column.name != 'row_number']).where(latest.c.row_number == 1)
+
+def get_ranks_as_of(riot_account_ids: list[str], as_of: datetime, queue_type: str = 'RANKED_TFT') -> dict[str, dict] | None:
+    """
+    Retrieves the rank of several Riot accounts at a point in time in a single query
+    (per 300 accounts): each account's last snapshot at or before `as_of`. Ranges that
+    the retention job has already compacted are answered from the hourly or daily rollups.
+
+    Args:
+        riot_account_ids: The UUIDs of the Riot accounts.
+        as_of: The point in time.
+        queue_type: The queue to look up (default 'RANKED_TFT').
+
+    Returns:
+        A dict mapping riot_account_id to a dict with the keys of get_lp_history()
+        (retrieved_at, league_points, ..., ladder_score, resolution).
+        Accounts without a snapshot before `as_of` are missing. None on error.
+    """
+    if not riot_account_ids:
+        return {}
+    logger.debug("Querying ranks of %s Riot accounts as of %s.", len(riot_account_ids), as_of,
+                 extra={'action': 'GET_RANKS_AS_OF'})
+    try:
+        with session_scope() as session:
+            ranks = {}
+            for chunk in _chunks(list(riot_account_ids), _AS_OF_CHUNK_SIZE):
+                for row in session.execute(_ranks_as_of_query(queue_type, chunk, as_of)):
+                    rank = dict(row._mapping)
+                    ranks[rank.pop('riot_account_id')] = rank
+            return ranks
+    except SQLAlchemyError:
+        return None
+
+# --- Sync Job Queue ---
+# Durable job queue for sync_worker.py. All timestamps come from the database clock,
+# so workers on different hosts agree on due times and lease expiry. Claims use a
+# conditional UPDATE per job instead of row locks, which works on every backend:
+# only one worker's UPDATE matches the job's old state.
+
+SYNC_JOB_QUEUED = 'queued'
+SYNC_JOB_RUNNING = 'running'
+SYNC_JOB_DEAD = 'dead'
+
+def _active_sync_job_keys(session, kind: str, dedupe_keys: list[str]) -> set[str]:
+    active = set()
+    for chunk in _chunks(dedupe_keys):
+        active.update(session.execute(
+            select(SyncJob.dedupe_key).where(
+                SyncJob.kind == kind,
+                SyncJob.dedupe_key.in_(chunk),
+                SyncJob.status.in_((SYNC_JOB_QUEUED, SYNC_JOB_RUNNING))
+            )
+        ).scalars())
+    return active
+
+def enqueue_sync_jobs(kind: str, jobs: list[dict], delay_seconds: float = 0, max_attempts: int = 5) -> int | None:
+    """
+    Adds many jobs of one kind in one transaction. Jobs whose dedupe_key matches a
+    queued or running job of the same kind are skipped.
+
+    Args:
+        kind: The job kind, i.e. the handler in sync_worker.py.
+        jobs: Dicts with 'payload' (JSON-serializable dict) and optionally 'dedupe_key'.
+        delay_seconds: Earliest start, relative to now.
+        max_attempts: Runs before the job is dead-lettered.
+
+    Returns:
+        The number of jobs added, or None on error.
+    """
+    if not jobs:
+        return 0
+    try:
+        with session_scope() as session:
+            dedupe_keys = [job['dedupe_key'] for job in jobs if job.get('dedupe_key') is not None]
+            skip = _active_sync_job_keys(session, kind, dedupe_keys) if dedupe_keys else set()
+            run_after = session.execute(select(func.now())).scalar() + timedelta(seconds=delay_seconds)
+            rows = []
+            for job in jobs:
+                dedupe_key = job.get('dedupe_key')
+                if dedupe_key is not None:
+                    if dedupe_key in skip:
+                        continue
+                    skip.add(dedupe_key)
+                rows.append({'kind': kind, 'payload': job['payload'], 'dedupe_key': dedupe_key,
+                             'status': SYNC_JOB_QUEUED, 'attempts': 0, 'max_attempts': max_attempts,
+                             'run_after': run_after})
+            if rows:
+                session.execute(insert(SyncJob), rows)
+            logger.info("Enqueued %s '%s' sync jobs (%s duplicates skipped).", len(rows), kind, len(jobs) - len(rows),
+                        extra={'action': 'ENQUEUE_SYNC_JOBS'})
+            return len(rows)
+    except SQLAlchemyError:
+        return None
+
+def enqueue_sync_job(kind: str, payload: dict, dedupe_key: str | None = None, delay_seconds: float = 0,
+                     max_attempts: int = 5) -> bool | None:
+    """
+    Adds one job; see enqueue_sync_jobs().
+
+    Returns:
+        True if queued, False if a job with the same dedupe_key is already queued or running, None on error.
+    """
+    added = enqueue_sync_jobs(kind, [{'payload': payload, 'dedupe_key': dedupe_key}], delay_seconds, max_attempts)
+    return None if added is None else added == 1
+
+def claim_sync_jobs(worker_id: str, limit: int, lease_seconds: float, kinds: list[str] | None = None) -> list[SyncJob]:
+    """
+    Leases up to `limit` due jobs to a worker: queued jobs whose run_after has passed,
+    and running jobs whose lease expired (their worker crashed). Each claim counts as an attempt;
+    expired jobs without attempts left are dead-lettered instead.
+
+    Returns:
+        The claimed jobs (detached), oldest first. Empty on error.
+    """
+    if limit <= 0:
+        return []
+    try:
+        with session_scope() as session:
+            now = session.execute(select(func.now())).scalar()
+            expired = and_(SyncJob.status == SYNC_JOB_RUNNING, SyncJob.lease_expires_at < now)
+            dead = session.execute(
+                update(SyncJob).where(expired, SyncJob.attempts >= SyncJob.max_attempts)
+                .values(status=SYNC_JOB_DEAD, lease_owner=None, lease_expires_at=None,
+                        last_error='Lease expired after the last attempt.')
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if dead:
+                logger.warning("Dead-lettered %s sync jobs whose last attempt never finished.", dead,
+                               extra={'action': 'SYNC_JOBS_LEASE_DEAD'})
+
+            claimable = ((SyncJob.status == SYNC_JOB_QUEUED) & (SyncJob.run_after <= now)) | expired
+            query = select(SyncJob.job_id).where(claimable)
+            if kinds:
+                query = query.where(SyncJob.kind.in_(kinds))
+            candidates = session.execute(query.order_by(SyncJob.run_after).limit(limit)).scalars().all()
+
+            claimed = []
+            lease_expires_at = now + timedelta(seconds=lease_seconds)
+            for job_id in candidates:
+                result = session.execute(
+                    update(SyncJob).where(SyncJob.job_id == job_id, claimable)
+                    .values(status=SYNC_JOB_RUNNING, lease_owner=worker_id, lease_expires_at=lease_expires_at,
+                            attempts=SyncJob.attempts + 1)
+                    .execution_options(synchronize_session=False)
+                )
+                # rowcount 0: ein anderer Worker war schneller
+                if result.rowcount == 1:
+                    claimed.append(job_id)
+            if not claimed:
+                return []
+            jobs = session.execute(
+                select(SyncJob).where(SyncJob.job_id.in_(claimed)).order_by(SyncJob.run_after)
+            ).scalars().all()
+            logger.debug("Worker '%s' claimed %s sync jobs.", worker_id, len(jobs), extra={'action': 'SYNC_JOBS_CLAIMED'})
+            return jobs
+    except SQLAlchemyError:
+        return []
+
+def renew_sync_job_leases(worker_id: str, job_ids: list[str], lease_seconds: float) -> int | None:
+    """
+    Heartbeat: extends the leases a worker still holds.
+
+    Returns:
+        The number of renewed leases (fewer than len(job_ids) if a lease was lost), or None on error.
+    """
+    if not job_ids:
+        return 0
+    try:
+        with session_scope() as session:
+            now = session.execute(select(func.now())).scalar()
+            renewed = 0
+            for chunk in _chunks(list(job_ids)):
+                renewed += session.execute(
+                    update(SyncJob).where(SyncJob.job_id.in_(chunk), SyncJob.lease_owner == worker_id,
+                                          SyncJob.status == SYNC_JOB_RUNNING)
+                    .values(lease_expires_at=now + timedelta(seconds=lease_seconds))
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+            return renewed
+    except SQLAlchemyError:
+        return None
+
+def complete_sync_job(job_id: str, worker_id: str) -> bool:
+    """Removes a finished job. Returns False if the worker no longer holds its lease."""
+    try:
+        with session_scope() as session:
+            deleted = session.execute(
+                delete(SyncJob).where(SyncJob.job_id == job_id, SyncJob.lease_owner == worker_id,
+                                      SyncJob.status == SYNC_JOB_RUNNING)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            return deleted == 1
+    except SQLAlchemyError:
+        return False
+
+def fail_sync_job(job_id: str, worker_id: str, error: str, retry_delay_seconds: float,
+                  give_up: bool = False) -> str | None:
+    """
+    Records a failed attempt: the job is queued again after `retry_delay_seconds`,
+    or dead-lettered if it has no attempts left (or `give_up` is set).
+
+    Returns:
+        The new status, or None if the worker no longer holds the lease or on error.
+    """
+    try:
+        with session_scope() as session:
+            job = session.execute(
+                select(SyncJob).where(SyncJob.job_id == job_id, SyncJob.lease_owner == worker_id,
+                                      SyncJob.status == SYNC_JOB_RUNNING)
+            ).scalar_one_or_none()
+            if job is None:
+                return None
+            now = session.execute(select(func.now())).scalar()
+            job.last_error = error[:1024]
+            job.lease_owner = None
+            job.lease_expires_at = None
+            if give_up or job.attempts >= job.max_attempts:
+                job.status = SYNC_JOB_DEAD
+                logger.error("Sync job %s (%s) failed %s times and was dead-lettered: %s", job.job_id, job.kind,
+                             job.attempts, error, extra={'action': 'SYNC_JOB_DEAD'})
+            else:
+                job.status = SYNC_JOB_QUEUED
+                job.run_after = now + timedelta(seconds=retry_delay_seconds)
+            return job.status
+    except SQLAlchemyError:
+        return None
+
+def requeue_dead_sync_jobs(kind: str | None = None) -> int | None:
+    """Gives dead-lettered jobs a fresh set of attempts. Returns the number of requeued jobs, or None on error."""
+    try:
+        with session_scope() as session:
+            query = update(SyncJob).where(SyncJob.status == SYNC_JOB_DEAD)
+            if kind is not None:
+                query = query.where(SyncJob.kind == kind)
+            requeued = session.execute(
+                query.values(status=SYNC_JOB_QUEUED, attempts=0, run_after=func.now())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            logger.info("Requeued %s dead sync jobs.", requeued, extra={'action': 'SYNC_JOBS_REQUEUED'})
+            return requeued
+    except SQLAlchemyError:
+        return None
+
+def get_sync_job_counts() -> dict[str, int] | None:
+    """Returns the number of jobs per status, or None on error."""
+    try:
+        with session_scope() as session:
+            rows = session.execute(select(SyncJob.status, func.count()).group_by(SyncJob.status))
+            return {status: count for status, count in rows}
+    except SQLAlchemyError:
+        return None
+
+# --- Sync Partition Leases ---
+# Coordination of the rank polling across worker nodes (see partition_leases.py).
+# Like the job queue, leases use the database clock and conditional UPDATEs.
+
+def ensure_sync_partitions(partition_keys: list[str]) -> bool:
+    """Creates the lease rows of partitions that do not exist yet. Returns False on error."""
+    try:
+        with session_scope() as session:
+            existing = set()
+            for chunk in _chunks(list(partition_keys)):
+                existing.update(session.execute(
+                    select(SyncPartitionLease.partition_key).where(SyncPartitionLease.partition_key.in_(chunk))
+                ).scalars())
+            missing = [{'partition_key': key} for key in partition_keys if key not in existing]
+            if missing:
+                session.execute(insert(SyncPartitionLease), missing)
+            return True
+    except SQLAlchemyError:
+        # Meist hat ein anderer Worker die Zeilen gleichzeitig angelegt; der nächste Versuch findet sie
+        return False
+
+def get_sync_partition_leases(partition_keys: list[str] | None = None) -> list[dict] | None:
+    """
+    Returns the lease rows as dicts, each with an additional 'is_live' flag
+    (the lease has an owner and has not expired), or None on error.
+    """
+    try:
+        with session_scope() as session:
+            now = session.execute(select(func.now())).scalar()
+            query = select(SyncPartitionLease).order_by(SyncPartitionLease.partition_key)
+            if partition_keys is not None:
+                query = query.where(SyncPartitionLease.partition_key.in_(partition_keys))
+            return [
+                {'partition_key': lease.partition_key, 'owner': lease.owner, 'lease_expires_at': lease.lease_expires_at,
+                 'heartbeat_at': lease.heartbeat_at, 'last_synced_at': lease.last_synced_at,
+                 'is_live': lease.owner is not None and lease.lease_expires_at is not None and lease.lease_expires_at >= now}
+                for lease in session.execute(query).scalars()
+            ]
+    except SQLAlchemyError:
+        return None
+
+def renew_sync_partition_leases(owner: str, lease_seconds: float) -> list[str] | None:
+    """
+    Heartbeat: extends every unexpired lease of `owner`.
+
+    Returns:
+        The partition keys the owner still holds, or None on error.
+    """
+    try:
+        with session_scope() as session:
+            now = session.execute(select(func.now())).scalar()
+            held = and_(SyncPartitionLease.owner == owner, SyncPartitionLease.lease_expires_at >= now)
+            session.execute(
+                update(SyncPartitionLease).where(held)
+                .values(lease_expires_at=now + timedelta(seconds=lease_seconds), heartbeat_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            return list(session.execute(
+                select(SyncPartitionLease.partition_key).where(held).order_by(SyncPartitionLease.partition_key)
+            ).scalars())
+    except SQLAlchemyError:
+        return None
+
+def acquire_sync_partitions(owner: str, partition_keys: list[str], lease_seconds: float) -> list[str] | None:
+    """
+    Tries to take over free or expired partitions, in the given order.
+
+    Returns:
+        The partition keys acquired by this call, or None on error.
+    """
+    try:
+        with session_scope() as session:
+            now = session.execute(select(func.now())).scalar()
+            acquired = []
+            for partition_key in partition_keys:
+                result = session.execute(
+                    update(SyncPartitionLease)
+                    .where(SyncPartitionLease.partition_key == partition_key,
+                           (SyncPartitionLease.owner == None) | (SyncPartitionLease.lease_expires_at < now))
+                    .values(owner=owner, lease_expires_at=now + timedelta(seconds=lease_seconds),
+                            acquired_at=now, heartbeat_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount == 1:
+                    acquired.append(partition_key)
+            if acquired:
+                logger.info("Worker '%s' acquired partitions %s.", owner, acquired,
+                            extra={'action': 'SYNC_PARTITIONS_ACQUIRED'})
+            return acquired
+    except SQLAlchemyError:
+        return None
+
+def release_sync_partitions(owner: str, partition_keys: list[str] | None = None) -> int | None:
+    """Gives up leases of `owner` (all of them if partition_keys is None). Returns the number released."""
+    try:
+        with session_scope() as session:
+            query = update(SyncPartitionLease).where(SyncPartitionLease.owner == owner)
+            if partition_keys is not None:
+                query = query.where(SyncPartitionLease.partition_key.in_(partition_keys))
+            released = session.execute(
+                query.values(owner=None, lease_expires_at=None).execution_options(synchronize_session=False)
+            ).rowcount
+            if released:
+                logger.info("Worker '%s' released %s partitions.", owner, released,
+                            extra={'action': 'SYNC_PARTITIONS_RELEASED'})
+            return released
+    except SQLAlchemyError:
+        return None
+
+def mark_sync_partition_synced(owner: str, partition_key: str) -> bool:
+    """Records a finished polling pass; only succeeds while `owner` holds the lease."""
+    try:
+        with session_scope() as session:
+            now = session.execute(select(func.now())).scalar()
+            return session.execute(
+                update(SyncPartitionLease)
+                .where(SyncPartitionLease.partition_key == partition_key, SyncPartitionLease.owner == owner,
+                       SyncPartitionLease.lease_expires_at >= now)
+                .values(last_synced_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount == 1
+    except SQLAlchemyError:
+        return False
+
+def record_sync_worker_heartbeat(worker_id: str, lease_seconds: float) -> list[str] | None:
+    """
+    Marks a worker as alive for `lease_seconds` and removes long-expired workers.
+
+    Returns:
+        The IDs of all live workers (including this one), or None on error.
+    """
+    try:
+        with session_scope() as session:
+            now = session.execute(select(func.now())).scalar()
+            expires_at = now + timedelta(seconds=lease_seconds)
+            updated = session.execute(
+                update(SyncWorkerHeartbeat).where(SyncWorkerHeartbeat.worker_id == worker_id)
+                .values(heartbeat_at=now, expires_at=expires_at)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not updated:
+                session.add(SyncWorkerHeartbeat(worker_id=worker_id, heartbeat_at=now, expires_at=expires_at))
+            # Abgestürzte Worker nach einer Stunde aufräumen
+            session.execute(
+                delete(SyncWorkerHeartbeat).where(SyncWorkerHeartbeat.expires_at < now - timedelta(hours=1))
+                .execution_options(synchronize_session=False)
+            )
+            session.flush()
+            return list(session.execute(
+                select(SyncWorkerHeartbeat.worker_id).where(SyncWorkerHeartbeat.expires_at >= now)
+                .order_by(SyncWorkerHeartbeat.worker_id)
+            ).scalars())
+    except SQLAlchemyError:
+        return None
+
+def remove_sync_worker_heartbeat(worker_id: str) -> bool:
+    try:
+        with session_scope() as session:
+            session.execute(delete(SyncWorkerHeartbeat).where(SyncWorkerHeartbeat.worker_id == worker_id)
+                            .execution_options(synchronize_session=False))
+            return True
+    except SQLAlchemyError:
+        return False
+
@@ -0,0 +1,172 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import logging
+import sys
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import CreateColumn
+
+import database_crud as crud
+import lp_archive
+import lp_retention
+from ORM_models import Base
+
+USER_PY_LOGGING_PREFIX = "DB_MAINTENANCE_"
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+
+def _add_missing_columns(engine):
+    """
+    Adds nullable columns that exist on a model but not yet in the database.
+    Base.metadata.create_all() never alters existing tables.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            if not column.nullable:
+                logger.error("Cannot add NOT NULL column '%s.%s' automatically.", table.name, column.name,
+                             extra={'action': 'DB_ADD_COLUMN_SKIPPED'})
+                continue
+            column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            with engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+            logger.info("Added column '%s.%s'.", table.name, column.name, extra={'action': 'DB_ADD_COLUMN_SUCCESS'})
+
+
+def ensure_schema():
+    """
+    Creates missing tables, missing nullable columns and missing indexes on existing tables.
+    Base.metadata.create_all() only creates indexes together with new tables,
+    so indexes added to existing models have to be created separately.
+    """
+    engine = crud.get_engine()
+    Base.metadata.create_all(engine)
+    _add_missing_columns(engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    logger.info("Schema is up to date.", extra={'action': 'DB_ENSURE_SCHEMA_SUCCESS'})
+
+
+def rebuild_current_ranks():
+    """Backfills riot_account_current_rank from the LP history."""
+    row_count = crud.rebuild_current_rank_table()
+    if row_count is None:
+        print("ERROR: Rebuilding the current rank table failed. Check logs for details.")
+        return False
+    print(f"Current rank table rebuilt with {row_count} rows.")
+    return True
+
+
+def backfill_ladder_scores():
+    """Fills the ladder score columns of LP history rows written before they existed."""
+    row_count = crud.backfill_ladder_scores()
+    if row_count is None:
+        print("ERROR: Backfilling ladder scores failed. Check logs for details.")
+        return False
+    print(f"Ladder scores backfilled for {row_count} LP history rows.")
+    return True
+
+
+def normalize_regions():
+    """Rewrites Riot account regions stored as typed to the normalized platform IDs."""
+    row_count = crud.normalize_riot_account_regions()
+    if row_count is None:
+        print("ERROR: Normalizing regions failed. Check logs for details.")
+        return False
+    print(f"Region normalized for {row_count} Riot accounts.")
+    return True
+
+
+def run_lp_retention(archive_dir: str | None = None):
+    """
+    Runs one LP history retention pass (raw -> hourly -> daily rollups).
+    With an archive directory the raw snapshots are exported first, like the bot's retention job;
+    if that export fails, nothing is compacted.
+    """
+    if archive_dir and not export_lp_archive(archive_dir):
+        print("ERROR: Archiving failed, LP retention was not run so no raw snapshots are lost.")
+        return False
+    result = lp_retention.run_retention_cycle()
+    print(f"LP retention finished: {result['raw_compacted']} raw snapshots and "
+          f"{result['hourly_compacted']} hourly rollups compacted.")
+    if result['failed']:
+        print("ERROR: A compaction batch failed, the run stopped early. Check logs for details.")
+        return False
+    return True
+
+
+def export_lp_archive(archive_dir: str):
+    """Exports LP history older than the raw retention cutoff into the columnar archive."""
+    try:
+        row_count = lp_archive.export_lp_history(archive_dir)
+    except (RuntimeError, OSError, SQLAlchemyError) as e:
+        print(f"ERROR: Archiving LP history failed: {e}")
+        return False
+    print(f"Archived {row_count} LP history rows to '{archive_dir}'.")
+    return True
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintenance tasks for the TFT ladder database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("ensure-schema", help="Create missing tables and indexes.")
+    subparsers.add_parser("rebuild-current-ranks", help="Rebuild riot_account_current_rank from LP history.")
+    subparsers.add_parser("backfill-ladder-scores",
+                          help="Fill ladder scores for old LP history rows and rebuild current ranks.")
+    subparsers.add_parser("normalize-regions", help="Store Riot account regions as platform IDs ('euw1').")
+    retention_parser = subparsers.add_parser("lp-retention", help="Compact old LP history into hourly and daily rollups.")
+    retention_parser.add_argument("--archive-dir", default=lp_archive.ARCHIVE_DIR,
+                                  help="Archive raw snapshots here first (default: LP_ARCHIVE_DIR from .env).")
+    archive_parser = subparsers.add_parser("archive-lp-history", help="Export old LP history to Parquet files.")
+    archive_parser.add_argument("--archive-dir", default=lp_archive.ARCHIVE_DIR,
+                                help="Archive directory (default: LP_ARCHIVE_DIR from .env).")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "ensure-schema":
+        ensure_schema()
+        return 0
+    if args.command == "rebuild-current-ranks":
+        ensure_schema()
+        return 0 if rebuild_current_ranks() else 1
+    if args.command == "backfill-ladder-scores":
+        ensure_schema()
+        return 0 if backfill_ladder_scores() and rebuild_current_ranks() else 1
+    if args.command == "normalize-regions":
+        ensure_schema()
+        return 0 if normalize_regions() else 1
+    if args.command == "lp-retention":
+        ensure_schema()
+        return 0 if run_lp_retention(args.archive_dir) else 1
+    if args.command == "archive-lp-history":
+        if not args.archive_dir:
+            print("ERROR: No archive directory given (--archive-dir or LP_ARCHIVE_DIR).")
+            return 1
+        return 0 if export_lp_archive(args.archive_dir) else 1
+    return 1
+
+
+# --- Hauptausführung ---
+if __name__ == "__main__":
+    sys.exit(main())
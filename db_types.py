@@ -0,0 +1,80 @@
+# db_types.py
+"""
+Column types for identifiers, selected by the schema mode DB_ID_STORAGE (.env):
+
+    string   (default) UUIDs as 36-character strings, history tables keyed by UUID strings.
+    compact  UUIDs as native UUID on PostgreSQL and 16-byte binary on MySQL/SQLite,
+             history tables keyed by integer surrogate keys.
+
+In both modes the Python side sees UUIDs as plain strings, so the API of
+database_crud does not change. Existing databases are converted with migrate_id_storage.py.
+"""
+import os
+import uuid
+from sqlalchemy import String, Integer, BigInteger, BINARY
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TypeDecorator
+
+ID_STORAGE_STRING = 'string'
+ID_STORAGE_COMPACT = 'compact'
+
+ID_STORAGE = os.getenv("DB_ID_STORAGE", ID_STORAGE_STRING).lower()
+if ID_STORAGE not in (ID_STORAGE_STRING, ID_STORAGE_COMPACT):
+    raise ValueError(f"Unsupported DB_ID_STORAGE: {ID_STORAGE}")
+
+
+class CompactUUID(TypeDecorator):
+    """
+    Stores a UUID string as native UUID (PostgreSQL) or as 16 raw bytes (all other databases).
+    Values are bound and returned as canonical 36-character strings.
+    """
+    impl = BINARY(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=False))
+        return dialect.type_descriptor(BINARY(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name == 'postgresql':
+            return str(value)
+        return uuid.UUID(str(value)).bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name == 'postgresql':
+            return str(value)
+        return str(uuid.UUID(bytes=bytes(value)))
+
+
+def new_uuid() -> str:
+    return str(uuid.uuid4())
+
+
+def uuid_type():
+    """Column type for UUID identifiers and the foreign keys referencing them."""
+    if ID_STORAGE == ID_STORAGE_COMPACT:
+        return CompactUUID()
+    return String(36)
+
+
+def history_key_type():
+    """
+    Column type for the keys of append-only history tables (and foreign keys to them).
+    Compact mode uses an auto-incrementing BIGINT (INTEGER on SQLite, which only
+    auto-increments INTEGER PRIMARY KEY columns).
+    """
+    if ID_STORAGE == ID_STORAGE_COMPACT:
+        return BigInteger().with_variant(Integer, 'sqlite')
+    return String(36)
+
+
+def history_key_default():
+    """Python-side default for history keys: a new UUID string, or None to let the database assign one."""
+    if ID_STORAGE == ID_STORAGE_COMPACT:
+        return None
+    return new_uuid
@@ -1,17 +1,45 @@
+import time
+# Startzeit für den Startup-Report, vor allen anderen Imports
+_IMPORT_STARTED = time.perf_counter()
+
+from dotenv import load_dotenv
+# .env wird nur in den Einstiegspunkten geladen; die Module lesen ihre Einstellungen beim Import aus os.environ
+load_dotenv()
+
+import hashlib
+import json
 import os
 import discord
 from discord.ext import commands
-from dotenv import load_dotenv
 import logging
 import sys
+import asyncio
+import api_metrics
+import event_buffer
+import job_queue
+import prefix_index
+import profiling_hooks
+import riot_api_handler
+import sharding
 
-load_dotenv()
+startup_timer = profiling_hooks.StartupTimer(_IMPORT_STARTED)
+startup_timer.add('imports', time.perf_counter() - _IMPORT_STARTED)
 
 
 # --- Logger Setup ---
 
 BOT_LOGGING_PREFIX = "DISCORD_BOT_"
 DISCORD_BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN')
+# Optional: Port für den Prometheus-Endpunkt /metrics (leer = aus)
+METRICS_PORT = os.getenv('METRICS_PORT')
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+# Optional: Slash-Commands nur auf diesem Server registrieren (sofort sichtbar, zum Testen)
+DISCORD_GUILD_ID = os.getenv('DISCORD_GUILD_ID')
+# Hash der zuletzt synchronisierten Befehle; unveränderte Befehle werden beim Start nicht neu synchronisiert
+COMMAND_SYNC_STATE_FILE = os.getenv('COMMAND_SYNC_STATE_FILE', '.command_sync_state.json')
+FORCE_COMMAND_SYNC = os.getenv('FORCE_COMMAND_SYNC', '0').lower() in ('1', 'true', 'yes')
+# Privilegierter Intent, muss im Developer Portal freigeschaltet sein: Mitgliederlisten und -Updates
+DISCORD_MEMBERS_INTENT = os.getenv('DISCORD_MEMBERS_INTENT', '0').lower() in ('1', 'true', 'yes')
 
 try:
     import logging_setup 
@@ -26,34 +54,141 @@ except Exception as e:
     logger = logging.getLogger(f'{BOT_LOGGING_PREFIX}SetupErrorFallback') # Optional: Make fallback name more specific
 
 intents = discord.Intents.default()
+intents.members = DISCORD_MEMBERS_INTENT
+
+
+def command_tree_hash(tree: discord.app_commands.CommandTree, guild: discord.abc.Snowflake | None) -> str:
+    """Hashes the payload tree.sync() would upload for this scope."""
+    payload = sorted((command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+                     key=lambda command: (command.get('type', 1), command['name']))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _load_sync_state() -> dict:
+    try:
+        with open(COMMAND_SYNC_STATE_FILE, encoding='utf-8') as state_file:
+            return json.load(state_file)
+    except (OSError, ValueError):
+        return {}
+
 
-class MyBot(commands.Bot):
+def _save_sync_state(state: dict) -> None:
+    try:
+        with open(COMMAND_SYNC_STATE_FILE, 'w', encoding='utf-8') as state_file:
+            json.dump(state, state_file, indent=2)
+    except OSError as e:
+        logger.warning("Could not save the command sync state: %s", e)
+
+
+class MyBot(commands.AutoShardedBot):
     def __init__(self):
-        super().__init__(command_prefix='!', intents=intents) # Prefix isn't used for slash commands but is required
+        # Ohne DISCORD_SHARD_COUNT/DISCORD_SHARD_IDS wählt discord.py die Shard-Anzahl und startet alle Shards
+        super().__init__(command_prefix='!', intents=intents, # Prefix isn't used for slash commands but is required
+                         shard_count=sharding.SHARD_COUNT, shard_ids=sharding.SHARD_IDS)
+        # Langsame Befehle (z.B. /register) laufen als Jobs in dieser Queue
+        self.job_queue = job_queue.JobQueue()
+        # Server- und Mitglieder-Events werden gesammelt und gebündelt geschrieben
+        self.event_buffer = event_buffer.WriteBehindBuffer()
+        # Autocomplete-Daten aller Server im Speicher, über CRUD-Events aktuell gehalten
+        self.search_index = prefix_index.SearchIndex()
+        self._search_index_task: asyncio.Task | None = None
+        self._login_started = time.perf_counter()
+        self._setup_finished = time.perf_counter()
+        self._startup_reported = False
 
     async def setup_hook(self):
         """This is called when the bot logs in, to load cogs."""
+        startup_timer.add('login', time.perf_counter() - self._login_started)
+        self.job_queue.start()
+        self.event_buffer.start()
+        if sharding.SHARD_IDS is not None:
+            # Mehrere Prozesse teilen sich einen API-Key: jeder bekommt seinen Anteil am Limit
+            riot_api_handler.configure_rate_limits(
+                sharding.rate_limit_share(riot_api_handler.RATE_LIMITS, sharding.SHARD_IDS, sharding.SHARD_COUNT)
+            )
+        self.search_index.subscribe_to_crud()
+        # Der Index lädt im Hintergrund; bis dahin liefert Autocomplete nur keine Vorschläge
+        self._search_index_task = asyncio.create_task(self._run_search_index())
+        if METRICS_PORT:
+            try:
+                api_metrics.start_metrics_server(int(METRICS_PORT), METRICS_HOST)
+            except (OSError, ValueError) as e:
+                logger.error("Could not start the metrics server on port %s: %s", METRICS_PORT, e)
+
         logger.info("--- Loading Cogs ---")
-        for filename in os.listdir('./cogs'):
+        for filename in sorted(os.listdir('./cogs')):
             if filename.endswith('.py'):
                 cog_name = f'cogs.{filename[:-3]}'
                 try:
-                    await self.load_extension(cog_name)
-                    logger.info(f"Successfully loaded cog: {cog_name}")
+                    with startup_timer.phase(f'load {cog_name}'):
+                        await self.load_extension(cog_name)
+                    logger.info("Successfully loaded cog: %s", cog_name)
                 except Exception as e:
-                    logger.error(f"Failed to load cog {cog_name}: {e}")
-        
-        # This syncs the slash commands to Discord.
-        # You can specify a guild_id to make updates instant during testing.
-        GUILD_ID = discord.Object(id=os.getenv("DISCORD_GUILD_ID")) # Optional: Add your server ID to .env
-        self.tree.copy_global_to(guild=GUILD_ID)
-        await self.tree.sync(guild=GUILD_ID)
-        #await self.tree.sync() # Sync globally
+                    logger.error("Failed to load cog %s: %s", cog_name, e)
+
+        with startup_timer.phase('command sync'):
+            await self.sync_command_tree()
+        self._setup_finished = time.perf_counter()
+
+    async def _run_search_index(self):
+        with startup_timer.phase('search index (background)'):
+            await asyncio.to_thread(self.search_index.load)
+        # Die CRUD-Events merken Änderungen nur vor; nachgeladen wird hier im Worker-Thread
+        while True:
+            await asyncio.sleep(prefix_index.PREFIX_INDEX_FLUSH_SECONDS)
+            try:
+                if not self.search_index.loaded:
+                    await asyncio.to_thread(self.search_index.load)
+                else:
+                    await asyncio.to_thread(self.search_index.flush)
+            except Exception as e:
+                logger.exception("Search index update failed: %s", e)
+
+    async def sync_command_tree(self):
+        """
+        Syncs the slash commands to Discord, but only if they changed since the last sync.
+        tree.sync() is rate limited, so restarts with unchanged commands skip it.
+        With DISCORD_GUILD_ID the commands are registered on that server only (instant updates).
+        """
+        guild = discord.Object(id=int(DISCORD_GUILD_ID)) if DISCORD_GUILD_ID else None
+        if guild is not None:
+            self.tree.copy_global_to(guild=guild)
+        scope = f"{self.application_id}:{guild.id if guild else 'global'}"
+        digest = command_tree_hash(self.tree, guild)
+
+        state = _load_sync_state()
+        if state.get(scope) == digest and not FORCE_COMMAND_SYNC:
+            logger.info("Slash commands unchanged (%s), skipping sync.", scope)
+            return
+        await self.tree.sync(guild=guild)
+        state[scope] = digest
+        _save_sync_state(state)
+        logger.info("Synced slash commands (%s).", scope)
+
+    async def login(self, token: str):
+        self._login_started = time.perf_counter()
+        await super().login(token)
+
+    async def close(self):
+        if self._search_index_task is not None:
+            self._search_index_task.cancel()
+        await self.job_queue.stop()
+        try:
+            await super().close()
+        finally:
+            # Erst nach dem Gateway schließen, damit keine Events mehr nachkommen
+            await self.event_buffer.stop()
 
     async def on_ready(self):
         """Event that runs when the bot is ready."""
-        logger.info(f'Bot logged in as {self.user.name} (ID:{self.user.id})')
+        logger.info("Bot logged in as %s (ID:%s)", self.user.name, self.user.id)
+        logger.info("Running shards %s of %s.", self.shard_ids or list(range(self.shard_count or 1)), self.shard_count)
         logger.info('Bot is ready and online')
+        if not self._startup_reported:
+            # on_ready kommt auch nach Reconnects; der Report betrifft nur den ersten Start
+            self._startup_reported = True
+            startup_timer.add('gateway connect', time.perf_counter() - self._setup_finished)
+            logger.info(startup_timer.report())
         print("------")
 
 bot = MyBot()
@@ -71,4 +206,8 @@ if __name__ == "__main__":
         except discord.errors.LoginFailure:
             logger.critical("FATAL: Failed to log in. Is the DISCORD_BOT_TOKEN correct?")
         except Exception as e:
-            logger.critical(f"An unexpected error occurred: {e}")
+            logger.critical("An unexpected error occurred: %s", e)
+        finally:
+            # Restliche Log-Einträge aus der Queue schreiben (nicht im Fallback ohne logging_setup)
+            if 'logging_setup' in globals():
+                logging_setup.shutdown_logging()
@@ -0,0 +1,169 @@
+# event_buffer.py
+"""
+Write-behind buffer for Discord guild and member events.
+
+Gateway handlers call record_server() / record_member(), which only update a
+dict in memory and never wait for the database. Repeated updates of the same
+guild or user are coalesced: only the latest state per ID is kept.
+
+A background task flushes the buffer with the bulk upserts of database_crud
+(upsert_servers, upsert_discord_accounts) in a worker thread, every
+EVENT_BUFFER_FLUSH_SECONDS or as soon as EVENT_BUFFER_MAX_BATCH IDs are
+pending. A large guild's member list therefore costs a few transactions instead
+of one per member. Rows of a failed flush stay pending (newer updates recorded
+in the meantime win) and are retried with the next flush. stop() flushes what
+is left.
+
+Configuration (.env):
+    EVENT_BUFFER_MAX_BATCH       Pending IDs that trigger a flush; also rows per transaction (default 500)
+    EVENT_BUFFER_FLUSH_SECONDS   Maximum time an update waits in the buffer (default 5)
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import database_crud as crud
+
+USER_PY_LOGGING_PREFIX = "EVENT_BUFFER_"
+
+EVENT_BUFFER_MAX_BATCH = int(os.getenv("EVENT_BUFFER_MAX_BATCH", "500"))
+EVENT_BUFFER_FLUSH_SECONDS = float(os.getenv("EVENT_BUFFER_FLUSH_SECONDS", "5"))
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+
+class WriteBehindBuffer:
+    """
+    Coalescing in-memory buffer with a background flush task.
+    record_*() must be called from the event loop thread.
+    """
+    def __init__(self, max_batch: int = EVENT_BUFFER_MAX_BATCH, flush_seconds: float = EVENT_BUFFER_FLUSH_SECONDS,
+                 server_writer=None, account_writer=None):
+        self.max_batch = max(max_batch, 1)
+        self.flush_seconds = flush_seconds
+        self.server_writer = server_writer or crud.upsert_servers
+        self.account_writer = account_writer or crud.upsert_discord_accounts
+        # Letzter Stand pro ID, noch nicht geschrieben
+        self._servers: dict[str, dict] = {}
+        self._accounts: dict[str, dict] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._flush_lock: asyncio.Lock | None = None
+        self._task: asyncio.Task | None = None
+        self.counters = {'recorded': 0, 'coalesced': 0, 'written': 0, 'flushes': 0, 'failed_flushes': 0}
+
+    # --- Aufnehmen ---
+
+    def record_server(self, server_id: str, server_name: str, owner_id: str | None = None) -> None:
+        self._record(self._servers, server_id, {'server_id': server_id, 'server_name': server_name,
+                                                'owner_id': owner_id})
+
+    def record_member(self, discord_user_id: str, username: str, discriminator: str | None = None) -> None:
+        self._record(self._accounts, discord_user_id, {'discord_user_id': discord_user_id, 'username': username,
+                                                       'discriminator': discriminator})
+
+    def _record(self, pending: dict, key: str, row: dict) -> None:
+        self.counters['recorded'] += 1
+        if key in pending:
+            self.counters['coalesced'] += 1
+        pending[key] = row
+        if self._wakeup is not None and self.pending() >= self.max_batch:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        return len(self._servers) + len(self._accounts)
+
+    def stats(self) -> dict:
+        return {'pending_servers': len(self._servers), 'pending_members': len(self._accounts), **self.counters}
+
+    # --- Schreiben ---
+
+    def start(self) -> None:
+        """Starts the flush task; must be called from a running event loop."""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run(), name="event-buffer-flush")
+
+    async def stop(self) -> None:
+        """Stops the flush task and writes everything still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if not await self.flush():
+            logger.error("Lost %s buffered guild/member updates on shutdown.", self.pending(),
+                         extra={'action': 'EVENT_BUFFER_SHUTDOWN_LOSS'})
+
+    async def flush(self) -> bool:
+        """
+        Writes all pending updates in batches of max_batch rows, in a worker thread.
+
+        Returns:
+            True if everything was written; otherwise the unwritten rows stay pending.
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            servers, self._servers = self._servers, {}
+            accounts, self._accounts = self._accounts, {}
+            if not servers and not accounts:
+                return True
+            started = time.perf_counter()
+            failed_servers, failed_accounts, written = await asyncio.to_thread(self._write, servers, accounts)
+            self.counters['flushes'] += 1
+            self.counters['written'] += written
+
+            # Neuere Updates aus der Zwischenzeit haben Vorrang vor den fehlgeschlagenen
+            for pending, failed in ((self._servers, failed_servers), (self._accounts, failed_accounts)):
+                for key, row in failed.items():
+                    pending.setdefault(key, row)
+            if failed_servers or failed_accounts:
+                self.counters['failed_flushes'] += 1
+                logger.warning("Flush failed, %s servers and %s members stay buffered.", len(failed_servers),
+                               len(failed_accounts), extra={'action': 'EVENT_BUFFER_FLUSH_FAILED'})
+                return False
+            logger.debug("Flushed %s servers and %s members (%s changed) in %.3fs.", len(servers), len(accounts),
+                         written, time.perf_counter() - started, extra={'action': 'EVENT_BUFFER_FLUSHED'})
+            return True
+
+    def _write(self, servers: dict, accounts: dict) -> tuple[dict, dict, int]:
+        """Runs in a worker thread. Returns the rows that could not be written and the number of changed rows."""
+        written = 0
+        failed = []
+        for writer, rows in ((self.server_writer, servers), (self.account_writer, accounts)):
+            keys = list(rows)
+            for start in range(0, len(keys), self.max_batch):
+                result = writer([rows[key] for key in keys[start:start + self.max_batch]])
+                if result is None:
+                    # Der Rest dieser Art bleibt für den nächsten Flush liegen
+                    failed.append({key: rows[key] for key in keys[start:]})
+                    break
+                written += result
+            else:
+                failed.append({})
+        return failed[0], failed[1], written
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception("Event buffer flush raised: %s", e, extra={'action': 'EVENT_BUFFER_FLUSH_ERROR'})
@@ -0,0 +1,180 @@
+# job_queue.py
+"""
+Bounded background job queue for slash commands.
+
+Commands defer their interaction, submit a job and return right away. A fixed
+pool of worker coroutines processes the jobs and posts the followup, so a burst
+of commands queues up here (with back-pressure once the queue is full) instead
+of piling up as concurrent handlers on the event loop.
+
+A job is a subclass of Job with a `kind`, a dedupe key and an async run().
+While a job with the same (kind, key) is queued or running, further
+submissions are rejected as duplicates. On shutdown every job that will not
+finish (queued or interrupted) gets on_cancel(), so its deferred interaction
+is answered instead of left hanging.
+
+Configuration (.env):
+    JOB_QUEUE_WORKERS    Number of worker coroutines (default 4)
+    JOB_QUEUE_MAX_SIZE   Maximum number of queued jobs (default 100)
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+USER_PY_LOGGING_PREFIX = "JOB_QUEUE_"
+
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "4"))
+JOB_QUEUE_MAX_SIZE = int(os.getenv("JOB_QUEUE_MAX_SIZE", "100"))
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+# Ergebnisse von JobQueue.submit()
+QUEUED = 'queued'
+DUPLICATE = 'duplicate'
+QUEUE_FULL = 'queue_full'
+
+
+class Job:
+    """
+    Base class for queued work. Subclasses set `kind` and implement key() and run().
+    """
+    kind = 'job'
+
+    def __init__(self):
+        self.submitted_at = time.monotonic()
+
+    def key(self) -> tuple:
+        """Identifies duplicate submissions within the same kind."""
+        raise NotImplementedError
+
+    async def run(self) -> None:
+        raise NotImplementedError
+
+    async def on_error(self, error: Exception) -> None:
+        """Called when run() raised; e.g. to tell the user. Errors raised here are only logged."""
+
+    async def on_cancel(self) -> None:
+        """Called when the queue stops before the job finished. Errors raised here are only logged."""
+
+
+class JobQueue:
+    """
+    An asyncio.Queue with a fixed number of worker coroutines and duplicate detection.
+    """
+    def __init__(self, max_size: int = JOB_QUEUE_MAX_SIZE, workers: int = JOB_QUEUE_WORKERS):
+        self.max_size = max_size
+        self.worker_count = max(workers, 1)
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        # (kind, key) aller Jobs, die warten oder gerade laufen
+        self._active_keys: set[tuple] = set()
+        self._running = 0
+        self.counters = {'processed': 0, 'failed': 0, 'rejected_duplicate': 0, 'rejected_full': 0}
+
+    def start(self) -> None:
+        """Starts the worker coroutines; must be called from a running event loop."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [asyncio.create_task(self._worker(index), name=f"job-worker-{index}")
+                         for index in range(self.worker_count)]
+        logger.info("Job queue started with %s workers (max %s queued jobs).", self.worker_count, self.max_size,
+                    extra={'action': 'JOB_QUEUE_STARTED'})
+
+    async def stop(self) -> None:
+        """Answers the queued jobs with on_cancel(), then cancels the workers (running jobs are cancelled too)."""
+        queued = []
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            self._queue.task_done()
+            self._active_keys.discard((job.kind, job.key()))
+            queued.append(job)
+        # Vor dem Abbrechen der Worker: die Followups brauchen die noch offene Gateway-Session
+        await asyncio.gather(*(self._cancel_job(job) for job in queued))
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Job queue stopped, %s queued jobs cancelled.", len(queued), extra={'action': 'JOB_QUEUE_STOPPED'})
+
+    async def _cancel_job(self, job: Job) -> None:
+        try:
+            await job.on_cancel()
+        except Exception as e:
+            logger.error("Cancel handler of %s job failed: %s", job.kind, e, extra={'action': 'JOB_CANCEL_HANDLER_FAILED'})
+
+    def submit(self, job: Job) -> str:
+        """
+        Queues a job without waiting.
+
+        Returns:
+            QUEUED, DUPLICATE (same job is already queued or running) or QUEUE_FULL.
+        """
+        if self._queue is None:
+            raise RuntimeError("JobQueue.start() has not been called.")
+        dedupe_key = (job.kind, job.key())
+        if dedupe_key in self._active_keys:
+            self.counters['rejected_duplicate'] += 1
+            logger.info("Rejected duplicate %s job %s.", job.kind, job.key(), extra={'action': 'JOB_DUPLICATE'})
+            return DUPLICATE
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counters['rejected_full'] += 1
+            logger.warning("Job queue full (%s jobs), rejected %s job.", self.depth(), job.kind,
+                           extra={'action': 'JOB_QUEUE_FULL'})
+            return QUEUE_FULL
+        self._active_keys.add(dedupe_key)
+        logger.debug("Queued %s job %s (depth %s).", job.kind, job.key(), self.depth(), extra={'action': 'JOB_QUEUED'})
+        return QUEUED
+
+    def depth(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> dict:
+        return {'queued': self.depth(), 'running': self._running, 'workers': len(self._workers),
+                'max_size': self.max_size, **self.counters}
+
+    async def join(self) -> None:
+        """Waits until every queued job has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await self._queue.get()
+            self._running += 1
+            try:
+                waited = time.monotonic() - job.submitted_at
+                logger.debug("Worker %s runs %s job after %.2fs in the queue.", index, job.kind, waited,
+                             extra={'action': 'JOB_STARTED'})
+                await job.run()
+                self.counters['processed'] += 1
+            except asyncio.CancelledError:
+                await self._cancel_job(job)
+                raise
+            except Exception as e:
+                self.counters['failed'] += 1
+                logger.exception("%s job %s failed: %s", job.kind, job.key(), e, extra={'action': 'JOB_FAILED'})
+                try:
+                    await job.on_error(e)
+                except Exception as handler_error:
+                    logger.error("Error handler of %s job failed: %s", job.kind, handler_error,
+                                 extra={'action': 'JOB_ERROR_HANDLER_FAILED'})
+            finally:
+                self._running -= 1
+                self._active_keys.discard((job.kind, job.key()))
+                self._queue.task_done()
@@ -0,0 +1,94 @@
+# ladder.py
+"""
+Integer encodings for ranked standings.
+
+The ladder score folds tier, division and LP into one sortable integer:
+
+    tier_code * 400 + division offset + LP
+
+Division IV adds 0, division I adds 300. Apex tiers (Master and above) share
+one base, because their LP is a single open-ended scale across all three tiers.
+Unranked entries have no score (None).
+"""
+from sqlalchemy import case, literal, func
+
+import constants
+
+TIER_CODES = {tier: code for code, tier in enumerate(constants.TIER_ORDER)}
+APEX_BASE_SCORE = TIER_CODES['MASTER'] * constants.LADDER_POINTS_PER_TIER
+_DIVISION_COUNT = len(constants.DIVISION_CODES)
+
+
+def encode_tier(tier: str | None) -> int | None:
+    """Returns the small-int code of a tier ('IRON' -> 0, ..., 'CHALLENGER' -> 9)."""
+    if not tier:
+        return None
+    return TIER_CODES.get(tier.upper())
+
+
+def encode_division(division: str | None) -> int | None:
+    """Returns the small-int code of a division ('I' -> 1, ..., 'IV' -> 4)."""
+    if not division:
+        return None
+    return constants.DIVISION_CODES.get(division.upper())
+
+
+def decode_tier(tier_code: int | None) -> str | None:
+    if tier_code is None or not 0 <= tier_code < len(constants.TIER_ORDER):
+        return None
+    return constants.TIER_ORDER[tier_code]
+
+
+def compute_ladder_score(tier: str | None, division: str | None, league_points: int | None) -> int | None:
+    """
+    Computes the integer ladder score of a ranked snapshot.
+
+    Returns:
+        The score, or None if the tier is unknown (e.g. unranked).
+    """
+    tier_code = encode_tier(tier)
+    if tier_code is None or league_points is None:
+        return None
+    if constants.TIER_ORDER[tier_code] in constants.APEX_TIERS:
+        return APEX_BASE_SCORE + league_points
+
+    division_code = encode_division(division)
+    if division_code is None:
+        return None
+    division_offset = (_DIVISION_COUNT - division_code) * 100
+    return tier_code * constants.LADDER_POINTS_PER_TIER + division_offset + league_points
+
+
+def encode_snapshot(tier: str | None, division: str | None, league_points: int | None) -> dict:
+    """Returns the tier_code, division_code and ladder_score columns for a snapshot."""
+    return {
+        'tier_code': encode_tier(tier),
+        'division_code': encode_division(division),
+        'ladder_score': compute_ladder_score(tier, division, league_points),
+    }
+
+
+# --- SQL expressions (for set-based backfills) ---
+
+def tier_code_expression(tier_column):
+    """SQL CASE expression equivalent to encode_tier()."""
+    return case(TIER_CODES, value=func.upper(tier_column), else_=None)
+
+
+def division_code_expression(division_column):
+    """SQL CASE expression equivalent to encode_division()."""
+    return case(constants.DIVISION_CODES, value=func.upper(division_column), else_=None)
+
+
+def ladder_score_expression(tier_column, division_column, lp_column):
+    """SQL CASE expression equivalent to compute_ladder_score()."""
+    tier_code = tier_code_expression(tier_column)
+    division_code = division_code_expression(division_column)
+    apex_tiers = list(constants.APEX_TIERS)
+    return case(
+        (func.upper(tier_column).in_(apex_tiers), literal(APEX_BASE_SCORE) + lp_column),
+        (tier_code.is_(None) | division_code.is_(None), None),
+        else_=(tier_code * constants.LADDER_POINTS_PER_TIER
+               + (literal(_DIVISION_COUNT) - division_code) * 100
+               + lp_column)
+    )
@@ -0,0 +1,265 @@
+# leaderboard_cache.py
+"""
+Per-guild cache for the /leaderboard command.
+
+For every (server, queue) the cache keeps the complete sorted ladder from one
+database query (database_crud.get_server_leaderboard) and the rendered text of
+every page that was requested. Pagination is served from the cached ordering.
+
+The cache subscribes to the change events of database_crud and drops only the
+ladders that contain the changed member:
+
+    RANK_CHANGED            ladders containing the Riot account (only if tier/division/LP changed)
+    RIOT_ACCOUNT_CHANGED    ladders containing the Riot account (name or tag line)
+    PLAYER_CHANGED          ladders containing the player (display name, account links)
+    SERVER_MEMBERS_CHANGED  the ladders of that server
+
+Events only reach the cache of the same process, so entries also expire after
+LEADERBOARD_CACHE_TTL_SECONDS as a safety net for writes from other processes.
+
+Configuration (.env):
+    LEADERBOARD_PAGE_SIZE           Entries per page (default 10)
+    LEADERBOARD_CACHE_MAX_GUILDS    Cached ladders before the least recently used is dropped (default 500)
+    LEADERBOARD_CACHE_TTL_SECONDS   Maximum age of a cached ladder, 0 = no expiry (default 900)
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import database_crud as crud
+
+USER_PY_LOGGING_PREFIX = "LEADERBOARD_"
+
+LEADERBOARD_PAGE_SIZE = int(os.getenv("LEADERBOARD_PAGE_SIZE", "10"))
+LEADERBOARD_CACHE_MAX_GUILDS = int(os.getenv("LEADERBOARD_CACHE_MAX_GUILDS", "500"))
+LEADERBOARD_CACHE_TTL_SECONDS = float(os.getenv("LEADERBOARD_CACHE_TTL_SECONDS", "900"))
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+
+class LeaderboardPage:
+    """One rendered page of a cached ladder."""
+    __slots__ = ('text', 'page', 'page_count', 'total')
+
+    def __init__(self, text: str, page: int, page_count: int, total: int):
+        self.text = text
+        self.page = page
+        self.page_count = page_count
+        self.total = total
+
+
+class _Entry:
+    """The sorted ladder of one server and queue, plus what it depends on."""
+    def __init__(self, rows: list):
+        ranked = [row for row in rows if row.ladder_score is not None]
+        self.rows = ranked
+        # Gleiche Punktzahl = gleiche Position, wie get_server_ladder_position()
+        self.positions = []
+        for index, row in enumerate(ranked):
+            if index and row.ladder_score == ranked[index - 1].ladder_score:
+                self.positions.append(self.positions[-1])
+            else:
+                self.positions.append(index + 1)
+        self.player_ids = {row.player_id for row in rows}
+        self.riot_account_ids = {row.riot_account_id for row in rows if row.riot_account_id is not None}
+        self.pages: dict[int, str] = {}
+        self.built_at = time.monotonic()
+
+
+def render_rows(rows: list, positions: list[int]) -> str:
+    """Renders ladder rows as the embed description of one page."""
+    return "\n".join(
+        f"**{position}.** {row.display_name} ({row.game_name}#{row.tag_line}) — "
+        f"{row.tier} {row.division}, {row.league_points} LP"
+        for row, position in zip(rows, positions)
+    )
+
+
+class LeaderboardCache:
+    """
+    Thread-safe: pages are built in worker threads (asyncio.to_thread) and the
+    CRUD events arrive in whichever thread committed the change.
+    """
+    def __init__(self, loader=None, page_size: int = LEADERBOARD_PAGE_SIZE,
+                 max_guilds: int = LEADERBOARD_CACHE_MAX_GUILDS, ttl_seconds: float = LEADERBOARD_CACHE_TTL_SECONDS):
+        self.loader = loader or crud.get_server_leaderboard
+        self.page_size = max(page_size, 1)
+        self.max_guilds = max_guilds
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        # Wird bei jeder Invalidierung erhöht, damit ein paralleler Neuaufbau keine veralteten Daten speichert
+        self._generation = 0
+        self._keys_by_account: dict[str, set] = {}
+        self._keys_by_player: dict[str, set] = {}
+        self.counters = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    # --- Lesen ---
+
+    def get_page(self, server_id: str, page: int = 1, queue_type: str = 'RANKED_TFT') -> LeaderboardPage | None:
+        """
+        Returns one page of a server's ladder (pages start at 1, out-of-range pages are clamped).
+        Builds the ladder with one query on a cache miss; call it via asyncio.to_thread().
+
+        Returns:
+            The page, or None if the ladder could not be loaded.
+        """
+        key = (server_id, queue_type)
+        entry = self._get_entry(key)
+        if entry is None:
+            return None
+        page_count = max((len(entry.rows) + self.page_size - 1) // self.page_size, 1)
+        page = min(max(page, 1), page_count)
+        text = entry.pages.get(page)
+        if text is None:
+            start = (page - 1) * self.page_size
+            text = render_rows(entry.rows[start:start + self.page_size], entry.positions[start:start + self.page_size])
+            entry.pages[page] = text
+        return LeaderboardPage(text, page, page_count, len(entry.rows))
+
+    def is_cached(self, server_id: str, queue_type: str = 'RANKED_TFT') -> bool:
+        """True if the ladder is cached and fresh, i.e. get_page() will not query the database."""
+        with self._lock:
+            entry = self._entries.get((server_id, queue_type))
+            return entry is not None and not (self.ttl_seconds and time.monotonic() - entry.built_at > self.ttl_seconds)
+
+    def page_of_player(self, server_id: str, player_id: str, queue_type: str = 'RANKED_TFT') -> int | None:
+        """Returns the page showing a player, or None if the player is not ranked on this server."""
+        entry = self._get_entry((server_id, queue_type))
+        if entry is None:
+            return None
+        for index, row in enumerate(entry.rows):
+            if row.player_id == player_id:
+                return index // self.page_size + 1
+        return None
+
+    def _get_entry(self, key: tuple) -> _Entry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.monotonic() - entry.built_at > self.ttl_seconds:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return entry
+            self.counters['misses'] += 1
+            generation = self._generation
+
+        rows = self.loader(*key)
+        if rows is None:
+            return None
+        entry = _Entry(rows)
+
+        with self._lock:
+            # Während des Ladens invalidiert: Ergebnis ausliefern, aber nicht cachen
+            if self._generation != generation:
+                return entry
+            self._drop(key)
+            self._entries[key] = entry
+            for riot_account_id in entry.riot_account_ids:
+                self._keys_by_account.setdefault(riot_account_id, set()).add(key)
+            for player_id in entry.player_ids:
+                self._keys_by_player.setdefault(player_id, set()).add(key)
+            while len(self._entries) > self.max_guilds:
+                self._drop(next(iter(self._entries)))
+        logger.debug("Built leaderboard for server '%s' with %s ranked entries.", key[0], len(entry.rows),
+                     extra={'action': 'LEADERBOARD_BUILT'})
+        return entry
+
+    # --- Invalidierung ---
+
+    def _drop(self, key: tuple) -> None:
+        """Removes one entry and its reverse index references. Caller holds the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for index, ids in ((self._keys_by_account, entry.riot_account_ids), (self._keys_by_player, entry.player_ids)):
+            for entity_id in ids:
+                keys = index.get(entity_id)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del index[entity_id]
+
+    def _invalidate(self, keys) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in list(keys):
+                if key in self._entries:
+                    self._drop(key)
+                    self.counters['invalidations'] += 1
+
+    def invalidate_server(self, server_id: str) -> None:
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == server_id]
+        self._invalidate(keys)
+
+    def invalidate_account(self, riot_account_id: str | None, queue_type: str | None = None) -> None:
+        """Drops the ladders containing the account (all ladders if riot_account_id is None)."""
+        with self._lock:
+            if riot_account_id is None:
+                keys = set(self._entries)
+            else:
+                keys = set(self._keys_by_account.get(riot_account_id, ()))
+            if queue_type is not None:
+                keys = {key for key in keys if key[1] == queue_type}
+        self._invalidate(keys)
+
+    def invalidate_player(self, player_id: str) -> None:
+        with self._lock:
+            keys = set(self._keys_by_player.get(player_id, ()))
+        self._invalidate(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in list(self._entries):
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'cached_ladders': len(self._entries), **self.counters}
+
+    # --- CRUD-Events ---
+
+    def _on_rank_changed(self, riot_account_id, queue_type):
+        self.invalidate_account(riot_account_id, queue_type)
+
+    def _on_riot_account_changed(self, riot_account_id):
+        self.invalidate_account(riot_account_id)
+
+    def _on_player_changed(self, player_id):
+        self.invalidate_player(player_id)
+
+    def _on_server_members_changed(self, server_id, player_id=None):
+        self.invalidate_server(server_id)
+
+    def _subscriptions(self) -> list:
+        return [
+            (crud.RANK_CHANGED, self._on_rank_changed),
+            (crud.RIOT_ACCOUNT_CHANGED, self._on_riot_account_changed),
+            (crud.PLAYER_CHANGED, self._on_player_changed),
+            (crud.SERVER_MEMBERS_CHANGED, self._on_server_members_changed),
+        ]
+
+    def subscribe_to_crud(self) -> None:
+        for event_name, callback in self._subscriptions():
+            crud.subscribe(event_name, callback)
+
+    def unsubscribe_from_crud(self) -> None:
+        for event_name, callback in self._subscriptions():
+            crud.unsubscribe(event_name, callback)
@@ -0,0 +1,190 @@
+# logging_setup.py
+"""
+Central logging configuration for all modules of the bot.
+
+Every module calls setup_project_logger(env_prefix=...) and gets its own logger.
+All loggers share one non-blocking backend:
+
+- The calling thread only creates the LogRecord and puts it into a bounded queue.
+  Formatting (message interpolation, timestamps) and all handler I/O happen on a
+  dedicated listener thread, so the event loop never waits for log output.
+- If the queue is full, records are dropped and counted instead of blocking.
+- High-volume actions can be sampled per 'action' tag (see LOG_SAMPLE_RATES).
+  Warnings and errors are never sampled.
+- shutdown_logging() (also registered with atexit) drains the queue and flushes all handlers.
+
+Configuration (.env):
+    LOG_LEVEL                Default level for all loggers (default INFO)
+    <PREFIX>LOG_LEVEL        Level for one module, e.g. CRUD_LOG_LEVEL=DEBUG
+    LOG_FILE                 Optional log file (rotated at LOG_FILE_MAX_BYTES, LOG_FILE_BACKUPS kept)
+    LOG_QUEUE_SIZE           Capacity of the log queue (default 10000)
+    LOG_SAMPLE_RATES         e.g. "GET_PLAYER_BY_ID=0.01,GET_RIOT_BY_PUUID=0.1"
+"""
+import atexit
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(action)s] %(message)s'
+DEFAULT_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE")
+LOG_FILE_MAX_BYTES = int(os.getenv("LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_FILE_BACKUPS = int(os.getenv("LOG_FILE_BACKUPS", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Wie lange shutdown_logging() höchstens auf das Leeren der Queue wartet
+SHUTDOWN_TIMEOUT_SECONDS = 5.0
+
+
+def parse_sample_rates(rates_str: str | None) -> dict[str, float]:
+    """
+    Parses a string like "GET_PLAYER_BY_ID=0.01,GET_RIOT_BY_PUUID=0.1" into a dict.
+    Invalid entries are ignored (and reported on stderr).
+    """
+    rates = {}
+    if not rates_str:
+        return rates
+    for pair in rates_str.split(','):
+        if not pair.strip():
+            continue
+        try:
+            action, rate = pair.split('=')
+            rates[action.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            print(f"Ignoring invalid LOG_SAMPLE_RATES entry: '{pair}'", file=sys.stderr)
+    return rates
+
+
+class ActionSamplingFilter(logging.Filter):
+    """
+    Lets only a fraction of the records of high-volume actions through.
+    Runs on the calling thread, before the record is queued.
+    """
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, 'action', None))
+        if rate is None:
+            return True
+        return random.random() < rate
+
+
+class _ActionDefaultFilter(logging.Filter):
+    """Gives records without an 'action' extra a placeholder, so LOG_FORMAT always works."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'action'):
+            record.action = '-'
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks the caller and never formats on the caller's thread.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock QueueHandler formats the message here. We hand the record over
+        # unformatted; the listener thread does the formatting.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _DrainingQueueListener(QueueListener):
+    """QueueListener whose stop() waits for space instead of failing on a full queue."""
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel, timeout=SHUTDOWN_TIMEOUT_SECONDS)
+
+
+_lock = threading.Lock()
+_queue_handler: NonBlockingQueueHandler | None = None
+_listener: _DrainingQueueListener | None = None
+
+
+def _create_output_handlers() -> list[logging.Handler]:
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if LOG_FILE:
+        handlers.append(RotatingFileHandler(LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES,
+                                            backupCount=LOG_FILE_BACKUPS, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(_ActionDefaultFilter())
+    return handlers
+
+
+def _ensure_backend() -> NonBlockingQueueHandler:
+    """Starts the shared queue and listener thread on first use."""
+    global _queue_handler, _listener
+    with _lock:
+        if _queue_handler is None:
+            log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+            _queue_handler = NonBlockingQueueHandler(log_queue)
+            _queue_handler.addFilter(ActionSamplingFilter(parse_sample_rates(os.getenv("LOG_SAMPLE_RATES"))))
+            _listener = _DrainingQueueListener(log_queue, *_create_output_handlers(), respect_handler_level=True)
+            _listener.start()
+            atexit.register(shutdown_logging)
+        return _queue_handler
+
+
+def setup_project_logger(env_prefix: str = "") -> logging.Logger:
+    """
+    Returns the logger of a module, attached to the shared non-blocking backend.
+
+    Args:
+        env_prefix: The module's prefix (e.g. "CRUD_"). It names the logger and
+                    selects the level variable (e.g. CRUD_LOG_LEVEL).
+    """
+    handler = _ensure_backend()
+    logger = logging.getLogger(env_prefix.rstrip('_') or 'APP')
+    logger.setLevel(os.getenv(f"{env_prefix}LOG_LEVEL", DEFAULT_LEVEL).upper())
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+    # Records go only through the queue, not additionally through root handlers
+    logger.propagate = False
+    return logger
+
+
+def get_dropped_count() -> int:
+    """Returns how many records were dropped because the log queue was full."""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+def shutdown_logging() -> None:
+    """
+    Drains the log queue, stops the listener thread and flushes all handlers.
+    Safe to call more than once.
+    """
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is None:
+        return
+    try:
+        listener.stop()
+    except queue.Full:
+        print("Log queue did not drain in time during shutdown.", file=sys.stderr)
+    for handler in listener.handlers:
+        try:
+            handler.flush()
+            handler.close()
+        except (OSError, ValueError):
+            # Stream wurde bereits geschlossen (z.B. durch den Test-Runner)
+            pass
+    dropped = get_dropped_count()
+    if dropped:
+        print(f"{dropped} log records were dropped because the log queue was full.", file=sys.stderr)
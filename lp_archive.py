@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime
+from sqlalchemy import select
+
+import database_crud as crud
+import lp_retention
+from ORM_models import RiotAccountLPHistory, RiotAccount
+
+# Optionale Abhängigkeit, nur fürs Archivieren nötig; wird erst bei Bedarf importiert,
+# da pyarrow den Bot-Start sonst spürbar verlangsamt
+pa = None
+pq = None
+
+# --- Konfiguration ---
+
+USER_PY_LOGGING_PREFIX = "LP_ARCHIVE_"
+
+# Zielverzeichnis des Archivs (leer = Archivierung deaktiviert)
+ARCHIVE_DIR = os.getenv("LP_ARCHIVE_DIR")
+# Anzahl Zeilen, die pro Chunk aus der DB gestreamt werden
+CHUNK_SIZE = int(os.getenv("LP_ARCHIVE_CHUNK_SIZE", "50000"))
+COMPRESSION = os.getenv("LP_ARCHIVE_COMPRESSION", "zstd")
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+
+# Name der Tabelle im Archiv (Unterverzeichnis und Schlüssel im Manifest)
+LP_HISTORY_TABLE = 'lp_history'
+
+
+def _lp_history_schema():
+    return pa.schema([
+        ('lp_history_id', pa.string()),
+        ('riot_account_id', pa.string()),
+        ('region', pa.string()),
+        ('queue_type', pa.string()),
+        ('tier', pa.string()),
+        ('division', pa.string()),
+        ('league_points', pa.int32()),
+        ('wins', pa.int32()),
+        ('losses', pa.int32()),
+        ('tier_code', pa.int16()),
+        ('division_code', pa.int16()),
+        ('ladder_score', pa.int32()),
+        ('retrieved_at', pa.timestamp('us')),
+    ])
+
+
+def _require_pyarrow():
+    global pa, pq
+    if pa is not None:
+        return
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("The LP archive needs the optional 'pyarrow' package (pip install pyarrow).")
+    pa, pq = pyarrow, pyarrow.parquet
+
+
+# --- Manifest ---
+
+def load_manifest(archive_dir: str) -> dict:
+    """Loads the archive manifest, or returns an empty one for a new archive."""
+    path = os.path.join(archive_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'version': MANIFEST_VERSION, 'tables': {}}
+    with open(path, encoding='utf-8') as manifest_file:
+        return json.load(manifest_file)
+
+
+def _save_manifest(archive_dir: str, manifest: dict) -> None:
+    # Erst in eine temporäre Datei schreiben, damit ein Abbruch kein halbes Manifest hinterlässt
+    path = os.path.join(archive_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(tmp_path, path)
+
+
+# --- Export ---
+
+def _write_partition(archive_dir: str, table_name: str, month: str, region: str,
+                     file_stem: str, columns: dict, schema) -> dict:
+    """Writes one chunk of one month/region partition and returns its manifest entry."""
+    relative_dir = os.path.join(table_name, f"month={month}", f"region={region}")
+    os.makedirs(os.path.join(archive_dir, relative_dir), exist_ok=True)
+    relative_path = os.path.join(relative_dir, f"{file_stem}.parquet")
+
+    table = pa.Table.from_pydict(columns, schema=schema)
+    pq.write_table(table, os.path.join(archive_dir, relative_path), compression=COMPRESSION)
+    retrieved_at = columns['retrieved_at']
+    return {
+        'path': relative_path,
+        'month': month,
+        'region': region,
+        'rows': table.num_rows,
+        'min_time': min(retrieved_at).isoformat(),
+        'max_time': max(retrieved_at).isoformat(),
+    }
+
+
+def export_lp_history(archive_dir: str, before: datetime | None = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Streams LP history snapshots older than `before` into compressed Parquet files,
+    partitioned by month and region, and records them in the archive manifest.
+
+    Exports are incremental: only rows at or after the previous run's
+    'exported_until' watermark are read, so re-runs do not duplicate data.
+    The live tables are not modified.
+
+    Args:
+        archive_dir: The archive root directory.
+        before (optional): Upper bound (exclusive). Defaults to the raw retention cutoff,
+                           i.e. exactly the rows the next retention run will compact.
+        chunk_size: Number of rows fetched from the database per chunk.
+
+    Returns:
+        The number of exported rows.
+    """
+    _require_pyarrow()
+    before = before or lp_retention.get_retention_cutoffs()[0]
+    manifest = load_manifest(archive_dir)
+    table_state = manifest['tables'].setdefault(LP_HISTORY_TABLE, {'exported_until': None, 'files': []})
+    since = datetime.fromisoformat(table_state['exported_until']) if table_state['exported_until'] else None
+    if since is not None and since >= before:
+        logger.info("LP history archive is already up to date.", extra={'action': 'LP_ARCHIVE_UP_TO_DATE'})
+        return 0
+
+    schema = _lp_history_schema()
+    history = RiotAccountLPHistory
+    query = (
+        select(*(getattr(history, name) for name in schema.names if name != 'region'), RiotAccount.region)
+        .join(RiotAccount, RiotAccount.riot_account_id == history.riot_account_id)
+        .where(history.retrieved_at < before)
+        .order_by(history.retrieved_at, history.lp_history_id)
+    )
+    if since is not None:
+        query = query.where(history.retrieved_at >= since)
+
+    # Zeitstempel plus Zufallsteil: zwei Exporte in derselben Sekunde überschreiben sich nicht
+    export_id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    logger.info("Starting LP history export to '%s' (from %s to %s).", archive_dir, since, before,
+                extra={'action': 'LP_ARCHIVE_EXPORT_START'})
+    exported = 0
+    with crud.session_scope() as session:
+        result = session.execute(query.execution_options(yield_per=chunk_size))
+        for chunk_number, chunk in enumerate(result.partitions()):
+            # Chunk nach Monat und Region aufteilen
+            partitions = {}
+            for row in chunk:
+                mapping = row._mapping
+                key = (mapping['retrieved_at'].strftime('%Y-%m'), (mapping['region'] or 'unknown').lower())
+                columns = partitions.setdefault(key, {name: [] for name in schema.names})
+                for name in schema.names:
+                    columns[name].append(mapping[name])
+                # Im kompakten Schema ist die History-ID ein Integer, im Archiv immer ein String
+                columns['lp_history_id'][-1] = str(mapping['lp_history_id'])
+
+            for (month, region), columns in partitions.items():
+                entry = _write_partition(archive_dir, LP_HISTORY_TABLE, month, region,
+                                         f"part-{export_id}-{chunk_number:05d}", columns, schema)
+                table_state['files'].append(entry)
+                exported += entry['rows']
+
+    table_state['exported_until'] = before.isoformat()
+    _save_manifest(archive_dir, manifest)
+    logger.info("Exported %s LP history rows to the archive.", exported,
+                extra={'action': 'LP_ARCHIVE_EXPORT_SUCCESS', 'row_count': exported})
+    return exported
+
+
+# --- Reader ---
+
+def read_lp_archive(archive_dir: str, start: datetime | None = None, end: datetime | None = None,
+                    columns: list[str] | None = None, regions: list[str] | None = None):
+    """
+    Loads archived LP history for a time range without touching the database.
+    Only files whose month, region and time range overlap the request are opened,
+    and only the requested columns are read from them.
+
+    Args:
+        archive_dir: The archive root directory.
+        start (optional): Only include rows at or after this timestamp.
+        end (optional): Only include rows before this timestamp.
+        columns (optional): The columns to load (default: all).
+        regions (optional): Only include these regions (e.g. ['euw1']).
+
+    Returns:
+        A pandas DataFrame ordered by retrieved_at.
+    """
+    _require_pyarrow()
+    schema = _lp_history_schema()
+    manifest = load_manifest(archive_dir)
+    files = manifest['tables'].get(LP_HISTORY_TABLE, {}).get('files', [])
+    wanted_regions = {region.lower() for region in regions} if regions else None
+
+    selected = [
+        entry for entry in files
+        if (wanted_regions is None or entry['region'] in wanted_regions)
+        and (start is None or datetime.fromisoformat(entry['max_time']) >= start)
+        and (end is None or datetime.fromisoformat(entry['min_time']) < end)
+    ]
+
+    requested = list(columns) if columns else list(schema.names)
+    read_columns = requested if 'retrieved_at' in requested else requested + ['retrieved_at']
+    filters = []
+    if start is not None:
+        filters.append(('retrieved_at', '>=', start))
+    if end is not None:
+        filters.append(('retrieved_at', '<', end))
+
+    tables = [
+        pq.read_table(os.path.join(archive_dir, entry['path']), columns=read_columns, filters=filters or None)
+        for entry in selected
+    ]
+    if not tables:
+        table = schema.empty_table().select(read_columns)
+    else:
+        table = pa.concat_tables(tables)
+    table = table.sort_by('retrieved_at').select(requested)
+    return table.to_pandas()
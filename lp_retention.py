@@ -0,0 +1,242 @@
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+
+import database_crud as crud
+from ORM_models import (
+    RiotAccountLPHistory, RiotAccountCurrentRank, RiotAccountLPHourlyRollup, RiotAccountLPDailyRollup
+)
+
+# --- Konfiguration ---
+
+USER_PY_LOGGING_PREFIX = "LP_RETENTION_"
+
+# Rohe Snapshots werden so lange behalten, danach in Stunden-Rollups verdichtet
+RAW_RETENTION_DAYS = int(os.getenv("LP_RAW_RETENTION_DAYS", "14"))
+# Stunden-Rollups werden so lange behalten, danach in Tages-Rollups verdichtet
+HOURLY_RETENTION_DAYS = int(os.getenv("LP_HOURLY_RETENTION_DAYS", "90"))
+# Maximale Anzahl Zeilen, die in einer Transaktion verdichtet werden
+BATCH_SIZE = int(os.getenv("LP_RETENTION_BATCH_SIZE", "2000"))
+# Obergrenze an Batches pro Durchlauf, damit ein Durchlauf die DB nicht zu lange belegt
+MAX_BATCHES_PER_RUN = int(os.getenv("LP_RETENTION_MAX_BATCHES", "50"))
+
+# Platzhalter für History-Einträge ohne queue_type (Rollups brauchen einen Schlüssel)
+UNKNOWN_QUEUE = 'UNKNOWN'
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+
+def _floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _summary_from_snapshot(entry: RiotAccountLPHistory) -> dict:
+    """Builds a one-sample rollup summary from a raw LP history entry."""
+    return {
+        'sample_count': 1,
+        'first_at': entry.retrieved_at, 'last_at': entry.retrieved_at,
+        'first_lp': entry.league_points, 'last_lp': entry.league_points,
+        'min_lp': entry.league_points, 'max_lp': entry.league_points,
+        'first_score': entry.ladder_score, 'last_score': entry.ladder_score,
+        'min_score': entry.ladder_score, 'max_score': entry.ladder_score,
+        'last_tier': entry.tier, 'last_division': entry.division,
+        'first_wins': entry.wins, 'last_wins': entry.wins,
+        'first_losses': entry.losses, 'last_losses': entry.losses,
+    }
+
+
+def _summary_from_rollup(rollup) -> dict:
+    """Reads the summary columns of an existing rollup row."""
+    return {name: getattr(rollup, name) for name in (
+        'sample_count', 'first_at', 'last_at', 'first_lp', 'last_lp', 'min_lp', 'max_lp',
+        'first_score', 'last_score', 'min_score', 'max_score', 'last_tier', 'last_division',
+        'first_wins', 'last_wins', 'first_losses', 'last_losses'
+    )}
+
+
+def _optional_min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _optional_max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _merge_summaries(a: dict, b: dict) -> dict:
+    """
+    Merges two summaries of the same bucket. The result does not depend on the
+    merge order, so batches can be compacted in any order and re-runs are safe.
+    """
+    first = a if a['first_at'] <= b['first_at'] else b
+    last = a if a['last_at'] >= b['last_at'] else b
+    return {
+        'sample_count': a['sample_count'] + b['sample_count'],
+        'first_at': first['first_at'], 'last_at': last['last_at'],
+        'first_lp': first['first_lp'], 'last_lp': last['last_lp'],
+        'min_lp': min(a['min_lp'], b['min_lp']), 'max_lp': max(a['max_lp'], b['max_lp']),
+        'first_score': first['first_score'], 'last_score': last['last_score'],
+        'min_score': _optional_min(a['min_score'], b['min_score']),
+        'max_score': _optional_max(a['max_score'], b['max_score']),
+        'last_tier': last['last_tier'], 'last_division': last['last_division'],
+        'first_wins': first['first_wins'], 'last_wins': last['last_wins'],
+        'first_losses': first['first_losses'], 'last_losses': last['last_losses'],
+    }
+
+
+def _write_buckets(session, rollup_model, buckets: dict) -> None:
+    """Merges aggregated buckets into the rollup table (insert or combine with the stored row)."""
+    keys = list(buckets.keys())
+    existing_rows = session.query(rollup_model).filter(
+        tuple_(rollup_model.riot_account_id, rollup_model.queue_type, rollup_model.bucket_start).in_(keys)
+    ).all()
+    existing = {(row.riot_account_id, row.queue_type, row.bucket_start): row for row in existing_rows}
+
+    for key, summary in buckets.items():
+        row = existing.get(key)
+        if row is None:
+            row = rollup_model(riot_account_id=key[0], queue_type=key[1], bucket_start=key[2])
+            session.add(row)
+        else:
+            summary = _merge_summaries(_summary_from_rollup(row), summary)
+        for name, value in summary.items():
+            setattr(row, name, value)
+        row.wins_delta = summary['last_wins'] - summary['first_wins']
+        row.losses_delta = summary['last_losses'] - summary['first_losses']
+
+
+def compact_raw_history(cutoff: datetime, batch_size: int = BATCH_SIZE, max_batches: int = MAX_BATCHES_PER_RUN) -> int:
+    """
+    Moves raw LP snapshots older than `cutoff` into hourly rollups.
+    Each batch (rollup upsert + delete of the raw rows) is its own transaction.
+    Snapshots still referenced by riot_account_current_rank are kept raw.
+
+    Returns:
+        The number of raw snapshots compacted.
+    """
+    return _compact_raw_history(cutoff, batch_size, max_batches)[0]
+
+
+def _compact_raw_history(cutoff: datetime, batch_size: int, max_batches: int) -> tuple[int, bool]:
+    """Returns (compacted snapshots, whether a batch failed)."""
+    history = RiotAccountLPHistory
+    compacted = 0
+    for _ in range(max_batches):
+        try:
+            with crud.session_scope() as session:
+                entries = session.query(history).filter(
+                    history.retrieved_at < cutoff,
+                    ~history.lp_history_id.in_(select(RiotAccountCurrentRank.lp_history_id))
+                ).limit(batch_size).all()
+                if not entries:
+                    break
+
+                buckets = {}
+                for entry in entries:
+                    key = (entry.riot_account_id, entry.queue_type or UNKNOWN_QUEUE, _floor_hour(entry.retrieved_at))
+                    summary = _summary_from_snapshot(entry)
+                    buckets[key] = _merge_summaries(buckets[key], summary) if key in buckets else summary
+
+                _write_buckets(session, RiotAccountLPHourlyRollup, buckets)
+                session.execute(
+                    delete(history).where(history.lp_history_id.in_([entry.lp_history_id for entry in entries]))
+                )
+                compacted += len(entries)
+        except SQLAlchemyError:
+            logger.error("Compacting raw LP history failed, stopping this run.",
+                         extra={'action': 'LP_RETENTION_RAW_FAILED'})
+            return compacted, True
+        if len(entries) < batch_size:
+            break
+    return compacted, False
+
+
+def compact_hourly_rollups(cutoff: datetime, batch_size: int = BATCH_SIZE, max_batches: int = MAX_BATCHES_PER_RUN) -> int:
+    """
+    Moves hourly rollups whose bucket starts before `cutoff` into daily rollups,
+    one bounded transaction per batch.
+
+    Returns:
+        The number of hourly rollups compacted.
+    """
+    return _compact_hourly_rollups(cutoff, batch_size, max_batches)[0]
+
+
+def _compact_hourly_rollups(cutoff: datetime, batch_size: int, max_batches: int) -> tuple[int, bool]:
+    """Returns (compacted rollups, whether a batch failed)."""
+    hourly = RiotAccountLPHourlyRollup
+    compacted = 0
+    for _ in range(max_batches):
+        try:
+            with crud.session_scope() as session:
+                rollups = session.query(hourly).filter(hourly.bucket_start < cutoff).limit(batch_size).all()
+                if not rollups:
+                    break
+
+                buckets = {}
+                for rollup in rollups:
+                    key = (rollup.riot_account_id, rollup.queue_type, _floor_day(rollup.bucket_start))
+                    summary = _summary_from_rollup(rollup)
+                    buckets[key] = _merge_summaries(buckets[key], summary) if key in buckets else summary
+
+                _write_buckets(session, RiotAccountLPDailyRollup, buckets)
+                for rollup in rollups:
+                    session.delete(rollup)
+                compacted += len(rollups)
+        except SQLAlchemyError:
+            logger.error("Compacting hourly LP rollups failed, stopping this run.",
+                         extra={'action': 'LP_RETENTION_HOURLY_FAILED'})
+            return compacted, True
+        if len(rollups) < batch_size:
+            break
+    return compacted, False
+
+
+def get_retention_cutoffs(now: datetime | None = None) -> tuple[datetime, datetime]:
+    """
+    Returns (raw_cutoff, hourly_cutoff). Cutoffs are aligned to bucket boundaries,
+    so only complete hours and days are compacted.
+    """
+    now = now or crud.get_database_time()
+    raw_cutoff = _floor_hour(now - timedelta(days=RAW_RETENTION_DAYS))
+    hourly_cutoff = _floor_day(now - timedelta(days=HOURLY_RETENTION_DAYS))
+    return raw_cutoff, hourly_cutoff
+
+
+def run_retention_cycle(now: datetime | None = None) -> dict:
+    """
+    Runs one retention pass: raw snapshots -> hourly rollups -> daily rollups.
+
+    Returns:
+        A dict with the number of compacted raw snapshots and hourly rollups,
+        and 'failed' = True if a batch failed and the run stopped early.
+    """
+    raw_cutoff, hourly_cutoff = get_retention_cutoffs(now)
+    logger.info("Starting LP retention run (raw before %s, hourly before %s).", raw_cutoff, hourly_cutoff,
+                extra={'action': 'LP_RETENTION_START'})
+    raw_compacted, raw_failed = _compact_raw_history(raw_cutoff, BATCH_SIZE, MAX_BATCHES_PER_RUN)
+    hourly_compacted, hourly_failed = _compact_hourly_rollups(hourly_cutoff, BATCH_SIZE, MAX_BATCHES_PER_RUN)
+    result = {
+        'raw_compacted': raw_compacted,
+        'hourly_compacted': hourly_compacted,
+        'failed': raw_failed or hourly_failed,
+    }
+    logger.info("LP retention run finished: %s.", result, extra={'action': 'LP_RETENTION_SUCCESS', **result})
+    return result
+
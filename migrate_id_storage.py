@@ -0,0 +1,119 @@
+"""
+Copies a database that uses string identifiers into a new database that uses
+the compact identifier schema (see db_types.py).
+
+    python migrate_id_storage.py --source-url sqlite:///tft_players.db --target-url sqlite:///tft_players_compact.db
+
+UUID values are converted on insert by the CompactUUID column type. History
+tables get fresh integer keys (in retrieved_at/changed_at order), and
+riot_account_current_rank is rebuilt from the migrated history afterwards.
+The source database is only read. When the target is verified, switch
+DB_ID_STORAGE=compact in .env and point the connection settings at it.
+"""
+import argparse
+import logging
+import os
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+# Das Zielschema muss im kompakten Modus erzeugt werden, bevor die Modelle importiert werden
+os.environ["DB_ID_STORAGE"] = "compact"
+
+import sqlalchemy
+from sqlalchemy import MetaData, select
+
+import database_crud as crud
+from ORM_models import Base
+
+USER_PY_LOGGING_PREFIX = "ID_MIGRATION_"
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+# History-Tabellen, deren String-Schlüssel durch neue Integer-Schlüssel ersetzt werden
+HISTORY_KEYS = {
+    'player_display_name_history': ('history_id', 'changed_at'),
+    'riot_account_name_history': ('history_id', 'changed_at'),
+    'riot_account_lp_history': ('lp_history_id', 'retrieved_at'),
+}
+# Tabellen, die nach der Migration aus anderen Tabellen neu aufgebaut werden
+DERIVED_TABLES = {'riot_account_current_rank'}
+
+
+def migrate_table(source_engine, target_engine, source_table, target_table, chunk_size: int) -> int:
+    """Copies one table in chunks of `chunk_size` rows, one target transaction per chunk."""
+    key_column, order_column = HISTORY_KEYS.get(target_table.name, (None, None))
+    columns = [column.name for column in target_table.columns
+               if column.name in source_table.c and column.name != key_column]
+
+    query = select(*(source_table.c[name] for name in columns))
+    if order_column:
+        query = query.order_by(source_table.c[order_column])
+
+    copied = 0
+    with source_engine.connect() as source:
+        result = source.execution_options(yield_per=chunk_size).execute(query)
+        for partition in result.partitions():
+            rows = [dict(row._mapping) for row in partition]
+            with target_engine.begin() as target:
+                target.execute(target_table.insert(), rows)
+            copied += len(rows)
+    return copied
+
+
+def migrate(source_url: str, target_url: str, chunk_size: int = 5000) -> bool:
+    source_engine = sqlalchemy.create_engine(source_url)
+    target_engine = sqlalchemy.create_engine(target_url)
+
+    source_metadata = MetaData()
+    source_metadata.reflect(source_engine)
+    Base.metadata.create_all(target_engine)
+
+    for target_table in Base.metadata.sorted_tables:
+        if target_table.name in DERIVED_TABLES:
+            continue
+        source_table = source_metadata.tables.get(target_table.name)
+        if source_table is None:
+            logger.info("Table '%s' does not exist in the source, skipping.", target_table.name,
+                        extra={'action': 'ID_MIGRATION_TABLE_SKIPPED'})
+            continue
+        try:
+            copied = migrate_table(source_engine, target_engine, source_table, target_table, chunk_size)
+        except (ValueError, sqlalchemy.exc.SQLAlchemyError) as e:
+            # ValueError: ein Wert in einer UUID-Spalte ist keine gültige UUID
+            logger.critical("Migrating table '%s' failed: %s", target_table.name, e,
+                            extra={'action': 'ID_MIGRATION_TABLE_FAILED'})
+            return False
+        logger.info("Migrated %s rows of table '%s'.", copied, target_table.name,
+                    extra={'action': 'ID_MIGRATION_TABLE_SUCCESS'})
+        print(f"{target_table.name}: {copied} rows")
+
+    crud.configure_engine(target_engine)
+    rebuilt = crud.rebuild_current_rank_table()
+    if rebuilt is None:
+        return False
+    print(f"riot_account_current_rank: {rebuilt} rows (rebuilt)")
+    return True
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Migrate a database to the compact identifier schema.")
+    parser.add_argument("--source-url", required=True, help="SQLAlchemy URL of the existing (string ID) database.")
+    parser.add_argument("--target-url", required=True, help="SQLAlchemy URL of the new (compact ID) database.")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per copy transaction.")
+    args = parser.parse_args(argv)
+    return 0 if migrate(args.source_url, args.target_url, args.chunk_size) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
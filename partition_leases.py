@@ -0,0 +1,197 @@
+# partition_leases.py
+"""
+Lease-based partitioning of the rank polling across sync workers on several hosts.
+
+The polling work is split into partitions: one per Riot platform from
+constants.RIOT_ROUTING (e.g. 'euw1'), optionally split further into
+SYNC_PARTITION_BUCKETS hash buckets of the riot_account_id ('euw1:0', 'euw1:1', ...).
+The platform is the natural key because Riot enforces its rate limits per
+platform. With one bucket per platform a worker that owns 'euw1' can spend the
+whole EUW budget there; with more buckets several workers poll the same platform,
+so each one scales its rate limiter down to its share of the buckets
+(rate_limit_share()) and together they stay within the key's limits.
+
+Each partition has a lease row in the shared database (sync_partition_leases).
+Every worker also keeps a presence row (sync_worker_heartbeats), so workers
+that do not hold a partition yet are counted too. A PartitionCoordinator heartbeat
+    1. renews its presence and the leases it holds,
+    2. counts the live workers and computes a fair share (partitions / workers),
+    3. takes over free or expired partitions up to that share, and
+    4. releases partitions above it, so a newly started worker gets some.
+A crashed worker stops renewing; its partitions expire after the lease time and
+are taken over by the others. All expiry checks use the database clock.
+
+Configuration (.env):
+    SYNC_PARTITION_BUCKETS         Hash buckets per platform (default 1 = one partition per platform)
+    SYNC_PARTITION_LEASE_SECONDS   Lease duration; renewed every third of it (default 30)
+"""
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+
+import constants
+import database_crud as crud
+
+USER_PY_LOGGING_PREFIX = "PARTITION_LEASES_"
+
+SYNC_PARTITION_BUCKETS = int(os.getenv("SYNC_PARTITION_BUCKETS", "1"))
+SYNC_PARTITION_LEASE_SECONDS = float(os.getenv("SYNC_PARTITION_LEASE_SECONDS", "30"))
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+
+def all_partitions(buckets: int = SYNC_PARTITION_BUCKETS) -> list[str]:
+    """All partition keys: every platform of RIOT_ROUTING (except esports), times the buckets."""
+    platforms = sorted(platform for routing, platforms in constants.RIOT_ROUTING.items()
+                       if routing != 'esports' for platform in platforms)
+    if buckets <= 1:
+        return platforms
+    return [f"{platform}:{bucket}" for platform in platforms for bucket in range(buckets)]
+
+
+def partition_for_account(region: str, riot_account_id: str, buckets: int = SYNC_PARTITION_BUCKETS) -> str:
+    """
+    The partition a Riot account belongs to. Stable across processes (CRC32, not hash()).
+    The region is normalized first, so 'EUW1' and 'euw' land in 'euw1' like the API routing does.
+    """
+    region = constants.normalize_region(region)
+    if buckets <= 1:
+        return region
+    return f"{region}:{zlib.crc32(str(riot_account_id).encode('utf-8')) % buckets}"
+
+
+def platform_of(partition_key: str) -> str:
+    return partition_key.split(':', 1)[0]
+
+
+def rate_limit_share(limits: list[tuple[int, int]], held_partitions,
+                     buckets: int = SYNC_PARTITION_BUCKETS) -> list[tuple[int, int]]:
+    """
+    Scales the Riot API limits to this worker's share of the platforms it polls.
+
+    The worker has one limiter for all platforms, so it uses the smallest share it
+    holds of any platform's buckets: then the workers polling one platform never
+    exceed its budget together. Without buckets (or partitions) the full limits apply.
+    """
+    if buckets <= 1 or not held_partitions:
+        return list(limits)
+    held_per_platform = Counter(platform_of(key) for key in held_partitions)
+    share = min(held_per_platform.values()) / buckets
+    return [(max(int(count * share), 1), period) for count, period in limits]
+
+
+class PartitionCoordinator:
+    """
+    Holds a fair share of the partition leases for one worker.
+    heartbeat() is called periodically (start() runs it in a background thread).
+    on_change(held_partitions) is called whenever the held partitions change.
+    """
+    def __init__(self, owner: str, partitions: list[str] | None = None,
+                 lease_seconds: float = SYNC_PARTITION_LEASE_SECONDS, on_change=None):
+        self.owner = owner
+        self.on_change = on_change
+        self.partitions = sorted(partitions if partitions is not None else all_partitions())
+        self.lease_seconds = lease_seconds
+        self._held: set[str] = set()
+        # Lokale Frist (monotonic), bis zu der die Leases sicher gültig sind
+        self._valid_until = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._ensured = False
+
+    # --- Abfragen ---
+
+    def owned(self) -> list[str]:
+        """The partitions this worker may poll right now."""
+        with self._lock:
+            if time.monotonic() >= self._valid_until:
+                return []
+            return sorted(self._held)
+
+    def holds(self, partition_key: str) -> bool:
+        with self._lock:
+            return partition_key in self._held and time.monotonic() < self._valid_until
+
+    # --- Heartbeat ---
+
+    def heartbeat(self) -> list[str]:
+        """Renews, acquires and releases leases. Returns the partitions held afterwards."""
+        # Vor dem Renew gemessen: die Leases laufen frühestens lease_seconds danach ab
+        started = time.monotonic()
+        if not self._ensured:
+            self._ensured = crud.ensure_sync_partitions(self.partitions)
+
+        live_workers = crud.record_sync_worker_heartbeat(self.owner, self.lease_seconds)
+        held = crud.renew_sync_partition_leases(self.owner, self.lease_seconds)
+        leases = crud.get_sync_partition_leases(self.partitions)
+        if live_workers is None or held is None or leases is None:
+            # Datenbank nicht erreichbar: die alten Leases gelten nur bis zu ihrer lokalen Frist
+            return self.owned()
+        held = [key for key in held if key in self.partitions]
+
+        live_owners = set(live_workers) | {lease['owner'] for lease in leases if lease['is_live']} | {self.owner}
+        fair_share = math.ceil(len(self.partitions) / len(live_owners))
+
+        if len(held) < fair_share:
+            free = [lease['partition_key'] for lease in leases if not lease['is_live']]
+            acquired = crud.acquire_sync_partitions(self.owner, free[:fair_share - len(held)], self.lease_seconds)
+            held += acquired or []
+        elif len(held) > fair_share:
+            surplus = sorted(held)[fair_share:]
+            if crud.release_sync_partitions(self.owner, surplus):
+                held = sorted(held)[:fair_share]
+
+        with self._lock:
+            changed = set(held) != self._held
+            self._held = set(held)
+            self._valid_until = started + self.lease_seconds
+        if changed:
+            logger.info("Worker '%s' now holds %s of %s partitions (%s live workers): %s", self.owner, len(held),
+                        len(self.partitions), len(live_owners), sorted(held), extra={'action': 'PARTITIONS_CHANGED'})
+            if self.on_change is not None:
+                self.on_change(sorted(held))
+        return sorted(held)
+
+    def start(self) -> None:
+        """Runs heartbeat() every third of the lease time in a daemon thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="partition-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the heartbeat and releases all leases, so other workers take over at once."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._held = set()
+            self._valid_until = 0.0
+        crud.release_sync_partitions(self.owner)
+        crud.remove_sync_worker_heartbeat(self.owner)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.exception("Partition heartbeat failed: %s", e, extra={'action': 'PARTITION_HEARTBEAT_FAILED'})
+            self._stop.wait(self.lease_seconds / 3)
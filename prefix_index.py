@@ -0,0 +1,326 @@
+# prefix_index.py
+"""
+In-memory prefix search for slash-command autocomplete.
+
+PrefixIndex keeps (normalized name, entry id) pairs in a sorted list; a lookup is
+a bisect to the first name >= the prefix plus a short scan, so autocomplete
+callbacks never touch the database.
+
+SearchIndex holds one PrefixIndex per guild and kind:
+    'players'   display names of active members        (value: player_id)
+    'riot_ids'  "GameName#TAG" of their linked accounts  (value: player_id)
+    'races'     race names                             (value: race_id)
+
+It is loaded once at startup (load()) and then kept current through the change
+events of database_crud. The event callbacks run in the committing thread, so they
+only mark the affected players and races; flush(), called periodically from a
+worker thread, re-reads them with one small query each. Events that arrive while
+load() runs stay marked and are replayed by the first flush after it.
+
+Configuration (.env):
+    PREFIX_INDEX_FLUSH_SECONDS   Interval of the background flush (default 1)
+"""
+import logging
+import os
+import sys
+import threading
+from bisect import bisect_left, insort
+
+import constants
+import database_crud as crud
+
+USER_PY_LOGGING_PREFIX = "PREFIX_INDEX_"
+
+# Discord erlaubt höchstens 25 Autocomplete-Vorschläge
+MAX_SUGGESTIONS = 25
+PREFIX_INDEX_FLUSH_SECONDS = float(os.getenv("PREFIX_INDEX_FLUSH_SECONDS", "1"))
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+class PrefixIndex:
+    """
+    A sorted array of (normalized label, value) with bisect lookups.
+    One value can have several labels (e.g. a player with two Riot IDs).
+    Not thread-safe on its own; SearchIndex serializes access.
+    """
+    def __init__(self):
+        self._keys: list[tuple[str, str]] = []
+        self._labels: dict[tuple[str, str], str] = {}
+        self._keys_by_value: dict[str, set] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, label: str, value: str) -> None:
+        key = (normalize(label), value)
+        if key in self._labels:
+            return
+        insort(self._keys, key)
+        self._labels[key] = label
+        self._keys_by_value.setdefault(value, set()).add(key)
+
+    def remove_value(self, value: str) -> None:
+        """Removes every label of a value."""
+        for key in self._keys_by_value.pop(value, ()):
+            index = bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+            del self._labels[key]
+
+    def search(self, prefix: str, limit: int = MAX_SUGGESTIONS) -> list[tuple[str, str]]:
+        """
+        Returns up to `limit` (label, value) pairs whose label starts with `prefix`
+        (case-insensitive), in alphabetical order.
+        """
+        normalized = normalize(prefix)
+        results = []
+        index = bisect_left(self._keys, (normalized, ''))
+        while index < len(self._keys) and len(results) < limit:
+            key = self._keys[index]
+            if not key[0].startswith(normalized):
+                break
+            results.append((self._labels[key], key[1]))
+            index += 1
+        return results
+
+
+# Regionen ändern sich nicht und sind für alle Server gleich
+# 'esports' ist eine Routing-Gruppe ohne Spieler-Accounts und daher keine Region für /register
+REGION_INDEX = PrefixIndex()
+for _routing, _platforms in constants.RIOT_ROUTING.items():
+    if _routing == 'esports':
+        continue
+    for _platform in _platforms:
+        REGION_INDEX.add(_platform, _platform)
+
+
+class SearchIndex:
+    """
+    Per-guild prefix indexes over player names, Riot IDs and race names.
+    Thread-safe: events arrive in the committing threads, flush() runs in a worker thread.
+    """
+    KINDS = ('players', 'riot_ids', 'races')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes: dict[tuple[str, str], PrefixIndex] = {}
+        # Rückwärtsindizes für inkrementelle Updates
+        self._guilds_by_player: dict[str, set] = {}
+        self._players_by_account: dict[str, set] = {}
+        self._accounts_by_player: dict[str, set] = {}
+        # Von CRUD-Events vorgemerkt, von flush() nachgeladen
+        self._pending_players: set[str] = set()
+        self._pending_accounts: set[str] = set()
+        self._pending_races: dict[str, str] = {}
+        self.loaded = False
+        self.counters = {'flushes': 0, 'players_refreshed': 0, 'races_refreshed': 0, 'failed_refreshes': 0}
+
+    def _index(self, server_id: str, kind: str) -> PrefixIndex:
+        index = self._indexes.get((server_id, kind))
+        if index is None:
+            index = self._indexes[(server_id, kind)] = PrefixIndex()
+        return index
+
+    # --- Suche ---
+
+    def search(self, server_id: str, kind: str, prefix: str, limit: int = MAX_SUGGESTIONS) -> list[tuple[str, str]]:
+        """Returns up to `limit` (label, value) pairs of one guild and kind."""
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown search index kind: {kind}")
+        with self._lock:
+            index = self._indexes.get((server_id, kind))
+            return index.search(prefix, limit) if index is not None else []
+
+    def search_members(self, server_id: str, prefix: str, limit: int = MAX_SUGGESTIONS) -> list[tuple[str, str]]:
+        """Searches display names and Riot IDs together; each player is suggested once."""
+        seen, results = set(), []
+        for label, player_id in (self.search(server_id, 'players', prefix, limit) +
+                                 self.search(server_id, 'riot_ids', prefix, limit)):
+            if player_id not in seen:
+                seen.add(player_id)
+                results.append((label, player_id))
+        return results[:limit]
+
+    # --- Laden und Aktualisieren ---
+
+    def load(self) -> bool:
+        """
+        Builds the indexes of all guilds from the database (two queries).
+        CRUD events that arrive meanwhile stay marked and are applied by the next flush().
+        """
+        members = crud.get_member_search_entries()
+        races = crud.get_race_search_entries()
+        if members is None or races is None:
+            logger.error("Could not load the autocomplete index.", extra={'action': 'PREFIX_INDEX_LOAD_FAILED'})
+            return False
+        with self._lock:
+            self._indexes.clear()
+            self._guilds_by_player.clear()
+            self._players_by_account.clear()
+            self._accounts_by_player.clear()
+            self._add_members(members)
+            for row in races:
+                self._index(row.server_id, 'races').add(row.race_name, row.race_id)
+            self.loaded = True
+        logger.info("Loaded autocomplete index with %s member rows and %s races.", len(members), len(races),
+                    extra={'action': 'PREFIX_INDEX_LOADED'})
+        return True
+
+    def _add_members(self, rows) -> None:
+        for row in rows:
+            self._index(row.server_id, 'players').add(row.display_name, row.player_id)
+            self._guilds_by_player.setdefault(row.player_id, set()).add(row.server_id)
+            if row.riot_account_id is not None:
+                self._index(row.server_id, 'riot_ids').add(f"{row.game_name}#{row.tag_line}", row.player_id)
+                self._players_by_account.setdefault(row.riot_account_id, set()).add(row.player_id)
+                self._accounts_by_player.setdefault(row.player_id, set()).add(row.riot_account_id)
+
+    def _remove_player(self, player_id: str) -> None:
+        for server_id in self._guilds_by_player.pop(player_id, ()):
+            for kind in ('players', 'riot_ids'):
+                index = self._indexes.get((server_id, kind))
+                if index is not None:
+                    index.remove_value(player_id)
+        for riot_account_id in self._accounts_by_player.pop(player_id, ()):
+            players = self._players_by_account.get(riot_account_id)
+            if players is not None:
+                players.discard(player_id)
+                if not players:
+                    del self._players_by_account[riot_account_id]
+
+    def refresh_players(self, player_ids: list[str]) -> bool:
+        """Re-reads the entries of some players in all their guilds. Returns False on a database error."""
+        if not player_ids:
+            return True
+        rows = crud.get_member_search_entries(player_ids=list(player_ids))
+        if rows is None:
+            return False
+        with self._lock:
+            for player_id in player_ids:
+                self._remove_player(player_id)
+            self._add_members(rows)
+        return True
+
+    def refresh_race(self, race_id: str, server_id: str) -> bool:
+        """Re-reads the name of one race. Returns False on a database error."""
+        rows = crud.get_race_search_entries(race_id=race_id)
+        if rows is None:
+            return False
+        with self._lock:
+            index = self._index(server_id, 'races')
+            index.remove_value(race_id)
+            for row in rows:
+                index.add(row.race_name, row.race_id)
+        return True
+
+    def flush(self) -> int:
+        """
+        Re-reads everything marked by CRUD events since the last flush. Call it from a
+        worker thread. Does nothing before load() succeeded, so the marks survive the load.
+        Failed refreshes stay marked for the next flush.
+
+        Returns:
+            The number of refreshed players and races.
+        """
+        with self._lock:
+            if not self.loaded:
+                return 0
+            player_ids, self._pending_players = self._pending_players, set()
+            accounts, self._pending_accounts = self._pending_accounts, set()
+            races, self._pending_races = self._pending_races, {}
+            unknown_accounts = []
+            for riot_account_id in accounts:
+                known = self._players_by_account.get(riot_account_id)
+                if known:
+                    player_ids.update(known)
+                else:
+                    unknown_accounts.append(riot_account_id)
+        if not (player_ids or unknown_accounts or races):
+            return 0
+
+        failed_accounts = []
+        for riot_account_id in unknown_accounts:
+            # Neu verknüpfter Account: die Spieler stehen noch nicht im Rückwärtsindex
+            linked = crud.get_player_ids_for_riot_account(riot_account_id)
+            if linked is None:
+                failed_accounts.append(riot_account_id)
+            else:
+                player_ids.update(linked)
+        if failed_accounts:
+            self.counters['failed_refreshes'] += 1
+            with self._lock:
+                self._pending_accounts.update(failed_accounts)
+        refreshed = 0
+        if self.refresh_players(list(player_ids)):
+            refreshed += len(player_ids)
+            self.counters['players_refreshed'] += len(player_ids)
+        else:
+            self.counters['failed_refreshes'] += 1
+            with self._lock:
+                self._pending_players.update(player_ids)
+        for race_id, server_id in races.items():
+            if self.refresh_race(race_id, server_id):
+                refreshed += 1
+                self.counters['races_refreshed'] += 1
+            else:
+                self.counters['failed_refreshes'] += 1
+                with self._lock:
+                    self._pending_races.setdefault(race_id, server_id)
+        self.counters['flushes'] += 1
+        return refreshed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'pending_players': len(self._pending_players) + len(self._pending_accounts),
+                    'pending_races': len(self._pending_races), **self.counters}
+
+    # --- CRUD-Events ---
+    # Laufen im schreibenden Thread: nur vormerken, keine Datenbankabfragen
+
+    def _on_player_changed(self, player_id):
+        with self._lock:
+            self._pending_players.add(player_id)
+
+    def _on_server_members_changed(self, server_id, player_id=None):
+        if player_id is not None:
+            with self._lock:
+                self._pending_players.add(player_id)
+
+    def _on_riot_account_changed(self, riot_account_id):
+        with self._lock:
+            self._pending_accounts.add(riot_account_id)
+
+    def _on_race_changed(self, race_id, server_id):
+        with self._lock:
+            self._pending_races[race_id] = server_id
+
+    def _subscriptions(self) -> list:
+        return [
+            (crud.PLAYER_CHANGED, self._on_player_changed),
+            (crud.SERVER_MEMBERS_CHANGED, self._on_server_members_changed),
+            (crud.RIOT_ACCOUNT_CHANGED, self._on_riot_account_changed),
+            (crud.RACE_CHANGED, self._on_race_changed),
+        ]
+
+    def subscribe_to_crud(self) -> None:
+        for event_name, callback in self._subscriptions():
+            crud.subscribe(event_name, callback)
+
+    def unsubscribe_from_crud(self) -> None:
+        for event_name, callback in self._subscriptions():
+            crud.unsubscribe(event_name, callback)
@@ -0,0 +1,277 @@
+# profiling_hooks.py
+"""
+Opt-in profiling for slash commands and sync cycles.
+
+A profiled block (profile_block('command.register')) runs under cProfile and
+collects a wall-time breakdown by phase. The phases are marked where the time
+is spent:
+
+    limiter_wait    riot_api_handler, waiting in the rate limiter
+    api             riot_api_handler, HTTP requests (including the API key fetch)
+    serialization   riot_api_handler, decoding JSON responses
+    db              database_crud.session_scope, the whole transaction
+
+Phases are tracked with a ContextVar, so they also count work that runs in
+asyncio.to_thread() (which copies the context). cProfile itself only sees the
+thread that entered the block, and only one block is profiled at a time;
+concurrent blocks still get their phase breakdown. A block entered on the event
+loop (around awaits) gets only the phase breakdown: cProfile would also record
+every other coroutine and gateway callback that runs while it waits.
+
+Each block name is written at most once per PROFILING_MIN_INTERVAL_SECONDS (blocks
+in between are not profiled at all), and only the newest PROFILING_MAX_PROFILES
+profiles are kept, so frequent blocks such as 'sync.race_progress' or per-account
+rank syncs cannot fill the disk.
+
+When profiling is off, profile_block() and phase() only read a flag / ContextVar.
+
+On exit each block writes into PROFILING_DIR:
+    <timestamp>-<name>.prof   cProfile data (snakeviz, pstats, ...)
+    <timestamp>-<name>.txt    top functions by cumulative time
+    <timestamp>-<name>.json   wall time and phase breakdown
+
+Configuration (.env):
+    PROFILING_ENABLED   1 enables profiling at startup (default 0); toggle at runtime via /profiling
+    PROFILING_DIR                   Output directory (default 'profiles')
+    PROFILING_MIN_INTERVAL_SECONDS  Minimum time between two profiles of the same block (default 60)
+    PROFILING_MAX_PROFILES          Profiles kept in PROFILING_DIR, oldest deleted first (default 200)
+"""
+import asyncio
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+USER_PY_LOGGING_PREFIX = "PROFILING_"
+
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+PROFILING_MIN_INTERVAL_SECONDS = float(os.getenv("PROFILING_MIN_INTERVAL_SECONDS", "60"))
+PROFILING_MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", "200"))
+# Anzahl Funktionen im Text-Report
+REPORT_TOP_FUNCTIONS = 40
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+_enabled = os.getenv("PROFILING_ENABLED", "0").lower() in ("1", "true", "yes")
+# Es kann immer nur ein cProfile-Profiler gleichzeitig aktiv sein
+_profiler_lock = threading.Lock()
+_current = contextvars.ContextVar('profiling_session', default=None)
+_NULL_CONTEXT = nullcontext()
+# Blockname -> Zeitpunkt des letzten Profils (time.monotonic())
+_last_profiled: dict[str, float] = {}
+_last_profiled_lock = threading.Lock()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(enabled: bool) -> None:
+    """Turns profiling on or off at runtime (affects blocks started afterwards)."""
+    global _enabled
+    _enabled = enabled
+    logger.info("Profiling %s.", "enabled" if enabled else "disabled", extra={'action': 'PROFILING_TOGGLED'})
+
+
+class _ProfileSession:
+    """Collects the phase timings of one profiled block."""
+    def __init__(self, name: str):
+        self.name = name
+        self.phases: dict[str, list] = {}
+        self.lock = threading.Lock()
+
+    def add(self, phase_name: str, seconds: float) -> None:
+        with self.lock:
+            entry = self.phases.setdefault(phase_name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+
+class _PhaseTimer:
+    __slots__ = ('session', 'name', 'started')
+
+    def __init__(self, session: _ProfileSession, name: str):
+        self.session = session
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.session.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def phase(name: str):
+    """
+    Marks a phase inside a profiled block: `with profiling_hooks.phase('db'): ...`.
+    Outside of a profiled block this is a shared no-op context manager.
+    """
+    session = _current.get()
+    if session is None:
+        return _NULL_CONTEXT
+    return _PhaseTimer(session, name)
+
+
+def _claim_profile_slot(name: str) -> bool:
+    """True if `name` was not profiled within the last PROFILING_MIN_INTERVAL_SECONDS; reserves the slot."""
+    now = time.monotonic()
+    with _last_profiled_lock:
+        last = _last_profiled.get(name)
+        if last is not None and now - last < PROFILING_MIN_INTERVAL_SECONDS:
+            return False
+        _last_profiled[name] = now
+        return True
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _prune_profiles() -> None:
+    """Deletes the oldest profiles beyond PROFILING_MAX_PROFILES (a profile = all files with one stem)."""
+    stems = {}
+    for file_name in os.listdir(PROFILING_DIR):
+        stem, extension = os.path.splitext(file_name)
+        if extension in ('.json', '.prof', '.txt'):
+            stems.setdefault(stem, []).append(file_name)
+    # Der Zeitstempel vorne im Namen sortiert chronologisch
+    for stem in sorted(stems)[:max(len(stems) - PROFILING_MAX_PROFILES, 0)]:
+        for file_name in stems[stem]:
+            try:
+                os.remove(os.path.join(PROFILING_DIR, file_name))
+            except OSError:
+                pass
+
+
+def _safe_file_stem(name: str) -> str:
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    return f"{stamp}-{re.sub(r'[^A-Za-z0-9_.-]+', '_', name)}"
+
+
+def _write_results(session: _ProfileSession, wall_seconds: float, profiler: cProfile.Profile | None,
+                   metadata: dict) -> str:
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    base_path = os.path.join(PROFILING_DIR, _safe_file_stem(session.name))
+
+    phases = {name: {'ms': round(seconds * 1000, 3), 'count': count}
+              for name, (seconds, count) in sorted(session.phases.items())}
+    # Phasen können sich bei Threads überlappen, daher nicht negativ werden lassen
+    other_ms = max(wall_seconds * 1000 - sum(entry['ms'] for entry in phases.values()), 0.0)
+    summary = {
+        'name': session.name,
+        'wall_ms': round(wall_seconds * 1000, 3),
+        'phases': phases,
+        'other_ms': round(other_ms, 3),
+        'cprofile': profiler is not None,
+        **metadata,
+    }
+    with open(base_path + ".json", 'w', encoding='utf-8') as summary_file:
+        json.dump(summary, summary_file, indent=2)
+
+    if profiler is not None:
+        profiler.dump_stats(base_path + ".prof")
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(REPORT_TOP_FUNCTIONS)
+        with open(base_path + ".txt", 'w', encoding='utf-8') as report_file:
+            report_file.write(report.getvalue())
+    return base_path
+
+
+@contextmanager
+def profile_block(name: str, force: bool = False, **metadata):
+    """
+    Profiles the enclosed block if profiling is enabled (or `force` is set).
+    Nested blocks are part of the outer block and are not profiled separately.
+    On the event loop only the phase breakdown is collected, not cProfile data.
+
+    Args:
+        name: Name of the block, used in the file names (e.g. 'command.register').
+        force: Profile even if profiling is disabled, and regardless of the per-name interval.
+        **metadata: Extra values stored in the JSON summary (e.g. user or guild IDs).
+    """
+    if not (_enabled or force) or _current.get() is not None or not (force or _claim_profile_slot(name)):
+        yield
+        return
+
+    session = _ProfileSession(name)
+    token = _current.set(session)
+    use_cprofile = not _on_event_loop()
+    profiler = cProfile.Profile() if use_cprofile and _profiler_lock.acquire(blocking=False) else None
+    started = time.perf_counter()
+    if profiler is not None:
+        try:
+            profiler.enable()
+        except ValueError:
+            # Ein anderes Profiling-Tool ist bereits aktiv
+            _profiler_lock.release()
+            profiler = None
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+        wall_seconds = time.perf_counter() - started
+        _current.reset(token)
+        try:
+            path = _write_results(session, wall_seconds, profiler, metadata)
+            _prune_profiles()
+            logger.info("Profiled '%s' in %.1f ms, written to %s.*", name, wall_seconds * 1000, path,
+                        extra={'action': 'PROFILING_WRITTEN'})
+        except OSError as e:
+            logger.error("Could not write profile for '%s': %s", name, e, extra={'action': 'PROFILING_WRITE_FAILED'})
+
+
+class StartupTimer:
+    """
+    Wall-time breakdown of the bot startup. `with timer.phase('cogs'):` times one
+    step; report() lists all steps with the total since `started`.
+    """
+    def __init__(self, started: float | None = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.phases: list[tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        phase_started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - phase_started))
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases.append((name, seconds))
+
+    def report(self) -> str:
+        total = time.perf_counter() - self.started
+        width = max((len(name) for name, _ in self.phases), default=0)
+        lines = [f"Startup took {total:.2f}s:"]
+        lines.extend(f"  {name:<{width}}  {seconds:7.3f}s" for name, seconds in self.phases)
+        lines.append(f"  {'other':<{width}}  {max(total - sum(s for _, s in self.phases), 0.0):7.3f}s")
+        return "\n".join(lines)
+
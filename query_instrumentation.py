@@ -0,0 +1,208 @@
+# query_instrumentation.py
+"""
+Instrumentation for everything the bot sends to the database, attached to an
+engine through SQLAlchemy events (see sql_functions.get_engine_and_session_factory).
+
+For every statement it records the runtime and the row count reported by the
+driver (affected rows for DML, usually unavailable for SELECT), tagged with the
+calling function (e.g. 'database_crud.get_server_ladder'). On top of that:
+
+- Slow-query log: statements slower than SQL_SLOW_QUERY_MS are logged and kept
+  in a bounded in-memory list.
+- N+1 detector: within one transaction, the same statement (same SQL text,
+  IN-lists collapsed) issued SQL_N_PLUS_ONE_THRESHOLD times or more is reported.
+- Aggregated statistics per (tag, statement), readable at runtime via
+  get_query_stats(), get_slow_queries(), get_n_plus_one_reports() and format_summary().
+
+Configuration (.env):
+    SQL_INSTRUMENTATION        1 enables the instrumentation (default 0)
+    SQL_SLOW_QUERY_MS          Slow-query threshold in milliseconds (default 200)
+    SQL_N_PLUS_ONE_THRESHOLD   Repetitions per transaction that count as N+1 (default 10)
+    SQL_SLOW_LOG_SIZE          Number of slow queries / N+1 reports kept (default 100)
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from sqlalchemy import event
+
+USER_PY_LOGGING_PREFIX = "SQL_INSTR_"
+
+ENABLED = os.getenv("SQL_INSTRUMENTATION", "0").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+SLOW_LOG_SIZE = int(os.getenv("SQL_SLOW_LOG_SIZE", "100"))
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+# Module, die beim Bestimmen des Aufrufers übersprungen werden
+_SKIPPED_MODULE_PREFIXES = ('sqlalchemy', 'contextlib', 'pandas', __name__)
+# session_scope() committet beim Verlassen, der eigentliche Aufrufer ist die CRUD-Funktion darüber
+_SKIPPED_FUNCTIONS = {'session_scope'}
+# Schlüssel in Connection.info
+_START_TIMES_KEY = 'sql_instr_start_times'
+_TRANSACTION_KEY = 'sql_instr_transaction'
+
+_IN_LIST = re.compile(r"IN\s*\((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_stats: dict[tuple[str, str], dict] = {}
+_slow_queries: deque = deque(maxlen=SLOW_LOG_SIZE)
+_n_plus_one_reports: deque = deque(maxlen=SLOW_LOG_SIZE)
+_instrumented_engines = set()
+
+
+def fingerprint(statement: str) -> str:
+    """Normalizes a SQL statement so that executions with different IN-list lengths count as the same statement."""
+    return _IN_LIST.sub("IN (...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _calling_function() -> str:
+    """Walks the stack to the first frame outside SQLAlchemy and returns 'module.function'."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if not module.startswith(_SKIPPED_MODULE_PREFIXES) and frame.f_code.co_name not in _SKIPPED_FUNCTIONS:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+# --- Event Handlers ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_START_TIMES_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get(_START_TIMES_KEY)
+    if not start_times:
+        return
+    elapsed_ms = (time.perf_counter() - start_times.pop()) * 1000
+    rowcount = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+    tag = _calling_function()
+    key = (tag, fingerprint(statement))
+
+    with _lock:
+        entry = _stats.get(key)
+        if entry is None:
+            entry = _stats[key] = {'tag': tag, 'statement': key[1], 'count': 0,
+                                   'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0}
+        entry['count'] += 1
+        entry['total_ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+        entry['rows'] += rowcount or 0
+        if elapsed_ms >= SLOW_QUERY_MS:
+            _slow_queries.append({'tag': tag, 'statement': key[1], 'duration_ms': round(elapsed_ms, 3),
+                                  'rowcount': rowcount, 'at': time.time()})
+
+    transaction = conn.info.get(_TRANSACTION_KEY)
+    if transaction is not None:
+        transaction[key] += 1
+
+    if elapsed_ms >= SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms, %s rows) from %s: %s", elapsed_ms, rowcount, tag, key[1][:500],
+                       extra={'action': 'SQL_SLOW_QUERY', 'duration_ms': elapsed_ms, 'tag': tag})
+
+
+def _begin(conn):
+    conn.info[_TRANSACTION_KEY] = Counter()
+
+
+def _end_transaction(conn):
+    transaction = conn.info.pop(_TRANSACTION_KEY, None)
+    if not transaction:
+        return
+    for (tag, statement), count in transaction.items():
+        if count < N_PLUS_ONE_THRESHOLD:
+            continue
+        with _lock:
+            _n_plus_one_reports.append({'tag': tag, 'statement': statement, 'count': count, 'at': time.time()})
+        logger.warning("Possible N+1: %s issued the same statement %s times in one transaction: %s",
+                       tag, count, statement[:500],
+                       extra={'action': 'SQL_N_PLUS_ONE', 'tag': tag, 'count': count})
+
+
+def instrument_engine(engine) -> None:
+    """Attaches the instrumentation to an engine. Calling it twice for the same engine has no effect."""
+    with _lock:
+        if engine in _instrumented_engines:
+            return
+        _instrumented_engines.add(engine)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "begin", _begin)
+    event.listen(engine, "commit", _end_transaction)
+    event.listen(engine, "rollback", _end_transaction)
+    logger.info("SQL instrumentation enabled (slow query threshold %s ms, N+1 threshold %s).",
+                SLOW_QUERY_MS, N_PLUS_ONE_THRESHOLD, extra={'action': 'SQL_INSTRUMENTATION_ENABLED'})
+
+
+# --- Runtime Access ---
+
+def get_query_stats(limit: int | None = None, sort_by: str = 'total_ms') -> list[dict]:
+    """
+    Returns the aggregated statistics per (calling function, statement).
+
+    Args:
+        limit (optional): Only return the top `limit` entries.
+        sort_by: 'total_ms', 'max_ms', 'count' or 'rows'.
+
+    Returns:
+        A list of dicts with tag, statement, count, total_ms, avg_ms, max_ms and rows.
+    """
+    with _lock:
+        entries = [dict(entry) for entry in _stats.values()]
+    for entry in entries:
+        entry['avg_ms'] = entry['total_ms'] / entry['count']
+    entries.sort(key=lambda entry: entry[sort_by], reverse=True)
+    return entries[:limit] if limit else entries
+
+
+def get_slow_queries() -> list[dict]:
+    """Returns the most recent slow queries (oldest first)."""
+    with _lock:
+        return list(_slow_queries)
+
+
+def get_n_plus_one_reports() -> list[dict]:
+    """Returns the most recent N+1 reports (oldest first)."""
+    with _lock:
+        return list(_n_plus_one_reports)
+
+
+def reset_stats() -> None:
+    """Clears all collected statistics, slow queries and N+1 reports."""
+    with _lock:
+        _stats.clear()
+        _slow_queries.clear()
+        _n_plus_one_reports.clear()
+
+
+def format_summary(limit: int = 10) -> str:
+    """Returns a short plain-text summary of the most expensive statements per calling function."""
+    if not _instrumented_engines:
+        return "SQL instrumentation is disabled (set SQL_INSTRUMENTATION=1)."
+    lines = []
+    for entry in get_query_stats(limit):
+        lines.append(f"{entry['tag']}: {entry['count']}x, {entry['total_ms']:.1f} ms total, "
+                     f"{entry['avg_ms']:.2f} ms avg, {entry['max_ms']:.1f} ms max, {entry['rows']} rows "
+                     f"| {entry['statement'][:80]}")
+    if not lines:
+        lines.append("No statements recorded yet.")
+    lines.append(f"Slow queries: {len(get_slow_queries())}, N+1 reports: {len(get_n_plus_one_reports())}")
+    return "\n".join(lines)
@@ -0,0 +1,362 @@
+# race_engine.py
+"""
+Incremental progress of active races.
+
+The engine keeps the standings of every active race in memory and updates
+only the participants affected by a change:
+
+    RANK_CHANGED    (crud event)  the participants whose primary Riot account changed rank
+    record_match_result()         placement-based races of that account
+    RACE_CHANGED    (crud event)  re-reads that one race (status, new participants)
+
+Events only mark work as pending, because crud delivers them in the committing
+thread. flush() then reads the new ranks of all pending accounts with one query,
+applies them in memory and writes the changed participants' running values
+(RaceParticipant.current_value, games_played, last_progress_update) with one
+executemany UPDATE.
+
+Progress per race type (constants.RACE_TYPES):
+    LP_CLIMB           current_value = ladder score (ladder.py), progress = current - starting value
+    TOP4_COUNT         current_value = number of top-4 placements, progress = current_value
+    PLACEMENT_AVERAGE  current_value = sum of placements, progress = current_value / games_played (lower is better)
+
+Snapshots written by other processes (e.g. sync workers) do not raise events
+here; reconcile() compares all tracked accounts with their current ranks and is
+run every RACE_ENGINE_RECONCILE_SECONDS.
+
+Configuration (.env):
+    RACE_ENGINE_FLUSH_SECONDS       Maximum delay between a change and the updated standings (default 2)
+    RACE_ENGINE_RECONCILE_SECONDS   Interval of the full comparison, 0 = off (default 60)
+"""
+import logging
+import os
+import sys
+import threading
+from bisect import bisect_left, insort
+
+import constants
+import database_crud as crud
+
+USER_PY_LOGGING_PREFIX = "RACE_ENGINE_"
+
+RACE_ENGINE_FLUSH_SECONDS = float(os.getenv("RACE_ENGINE_FLUSH_SECONDS", "2"))
+RACE_ENGINE_RECONCILE_SECONDS = float(os.getenv("RACE_ENGINE_RECONCILE_SECONDS", "60"))
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+PLACEMENT_RACE_TYPES = (constants.RACE_TYPE_TOP4_COUNT, constants.RACE_TYPE_PLACEMENT_AVERAGE)
+
+
+def race_progress(race_type: str | None, starting_value: int | None, current_value: int | None,
+                  games_played: int | None) -> float | None:
+    """The progress of one participant, or None if there is nothing to rank yet."""
+    if race_type == constants.RACE_TYPE_TOP4_COUNT:
+        return current_value or 0
+    if race_type == constants.RACE_TYPE_PLACEMENT_AVERAGE:
+        return current_value / games_played if games_played and current_value is not None else None
+    if starting_value is None or current_value is None:
+        return None
+    return current_value - starting_value
+
+
+class Participant:
+    __slots__ = ('participant_id', 'server_player_id', 'player_id', 'display_name', 'riot_account_id',
+                 'starting_value', 'current_value', 'games_played', 'is_disqualified')
+
+    def __init__(self, row):
+        for name in self.__slots__:
+            setattr(self, name, getattr(row, name))
+
+
+class RaceStandings:
+    """The participants of one race in ranking order, kept sorted on every update."""
+    def __init__(self, race_id: str, race_name: str, server_id: str, race_type: str | None,
+                 target_value: int | None):
+        self.race_id = race_id
+        self.race_name = race_name
+        self.server_id = server_id
+        self.race_type = race_type or constants.RACE_TYPE_LP_CLIMB
+        self.target_value = target_value
+        self.participants: dict[str, Participant] = {}
+        self._order: list[tuple] = []
+        self._keys: dict[str, tuple] = {}
+
+    def progress(self, participant: Participant) -> float | None:
+        return race_progress(self.race_type, participant.starting_value, participant.current_value,
+                             participant.games_played)
+
+    def _sort_key(self, participant: Participant) -> tuple:
+        progress = self.progress(participant)
+        if participant.is_disqualified or progress is None:
+            return (1, 0, participant.participant_id)
+        # Bei PLACEMENT_AVERAGE ist ein kleinerer Wert besser
+        ordered = progress if self.race_type == constants.RACE_TYPE_PLACEMENT_AVERAGE else -progress
+        return (0, ordered, participant.participant_id)
+
+    def put(self, participant: Participant) -> None:
+        """Adds a participant or moves it to its new position (O(log n) search + list shift)."""
+        old_key = self._keys.get(participant.participant_id)
+        if old_key is not None:
+            index = bisect_left(self._order, old_key)
+            del self._order[index]
+        key = self._sort_key(participant)
+        insort(self._order, key)
+        self._keys[participant.participant_id] = key
+        self.participants[participant.participant_id] = participant
+
+    def standings(self, limit: int | None = None) -> list[tuple[int | None, Participant, float | None]]:
+        """
+        Returns (position, participant, progress) in ranking order. Equal progress shares a
+        position; participants without progress or disqualified have position None.
+        """
+        result = []
+        previous_progress, position = None, 0
+        for index, key in enumerate(self._order[:limit] if limit else self._order):
+            participant = self.participants[key[2]]
+            progress = self.progress(participant)
+            if key[0] == 1:
+                result.append((None, participant, progress))
+                continue
+            if index == 0 or progress != previous_progress:
+                position = index + 1
+            previous_progress = progress
+            result.append((position, participant, progress))
+        return result
+
+
+class RaceEngine:
+    """
+    Thread-safe: events arrive in the committing threads, flush() runs in a worker thread.
+    """
+    def __init__(self, queue_type: str = 'RANKED_TFT'):
+        self.queue_type = queue_type
+        self._lock = threading.Lock()
+        self._races: dict[str, RaceStandings] = {}
+        self._participants_by_account: dict[str, set[tuple[str, str]]] = {}
+        self._pending_accounts: set[str] = set()
+        self._pending_all_accounts = False
+        self._pending_races: set[str] = set()
+        self._pending_matches: list[tuple[str, int]] = []
+        # Geänderte, noch nicht gespeicherte Teilnehmer
+        self._dirty: dict[str, Participant] = {}
+        self.loaded = False
+        self.counters = {'flushes': 0, 'participants_written': 0, 'failed_writes': 0}
+
+    # --- Laden ---
+
+    def load(self) -> bool:
+        """Loads all active races from the database (one query)."""
+        rows = crud.get_race_progress_entries()
+        if rows is None:
+            logger.error("Could not load the active races.", extra={'action': 'RACE_ENGINE_LOAD_FAILED'})
+            return False
+        with self._lock:
+            self._races.clear()
+            self._participants_by_account.clear()
+            self._add_rows(rows)
+            self.loaded = True
+            # Seit dem letzten Lauf geschriebene Ränge einarbeiten
+            self._pending_all_accounts = True
+        logger.info("Race engine loaded %s active races with %s participants.", len(self._races), len(rows),
+                    extra={'action': 'RACE_ENGINE_LOADED'})
+        return True
+
+    def _add_rows(self, rows) -> None:
+        for row in rows:
+            race = self._races.get(row.race_id)
+            if race is None:
+                race = self._races[row.race_id] = RaceStandings(row.race_id, row.race_name, row.server_id,
+                                                             row.race_type, row.target_value)
+            participant = Participant(row)
+            race.put(participant)
+            if participant.riot_account_id is not None:
+                self._participants_by_account.setdefault(participant.riot_account_id, set()).add(
+                    (row.race_id, participant.participant_id))
+
+    def _drop_race(self, race_id: str) -> None:
+        race = self._races.pop(race_id, None)
+        if race is None:
+            return
+        for participant in race.participants.values():
+            entries = self._participants_by_account.get(participant.riot_account_id)
+            if entries is not None:
+                entries.discard((race_id, participant.participant_id))
+                if not entries:
+                    del self._participants_by_account[participant.riot_account_id]
+            self._dirty.pop(participant.participant_id, None)
+
+    def _refresh_race(self, race_id: str) -> None:
+        rows = crud.get_race_progress_entries(race_id=race_id)
+        if rows is None:
+            return
+        with self._lock:
+            # Noch nicht geschriebene Teilnehmer (z.B. nach einem fehlgeschlagenen Write): ihre Werte sind
+            # neuer als die Datenbank, bei Platzierungsrennen fehlen dort sonst die Spiele
+            old_race = self._races.get(race_id)
+            unsaved = {participant_id: self._dirty[participant_id]
+                       for participant_id in (old_race.participants if old_race is not None else ())
+                       if participant_id in self._dirty}
+            self._drop_race(race_id)
+            active = [row for row in rows if row.status == constants.RACE_STATUS_ACTIVE]
+            self._add_rows(active)
+            race = self._races.get(race_id)
+            for participant_id, previous in unsaved.items():
+                participant = race.participants.get(participant_id) if race is not None else None
+                if participant is None:
+                    continue
+                participant.current_value = previous.current_value
+                participant.games_played = previous.games_played
+                if participant.starting_value is None:
+                    participant.starting_value = previous.starting_value
+                race.put(participant)
+                self._dirty[participant_id] = participant
+            self._pending_accounts.update(row.riot_account_id for row in active if row.riot_account_id is not None)
+
+    # --- Eingänge ---
+
+    def notify_rank_changed(self, riot_account_id: str | None) -> None:
+        with self._lock:
+            if riot_account_id is None:
+                self._pending_all_accounts = True
+            elif riot_account_id in self._participants_by_account:
+                self._pending_accounts.add(riot_account_id)
+
+    def record_match_result(self, riot_account_id: str, placement: int) -> None:
+        """Counts one finished game (placement 1-8) for the placement-based races of an account."""
+        with self._lock:
+            if riot_account_id in self._participants_by_account:
+                self._pending_matches.append((riot_account_id, placement))
+
+    def notify_race_changed(self, race_id: str) -> None:
+        with self._lock:
+            self._pending_races.add(race_id)
+
+    def reconcile(self) -> None:
+        """Marks every tracked account for comparison with its current rank in the next flush."""
+        with self._lock:
+            self._pending_all_accounts = True
+
+    # --- Verarbeitung ---
+
+    def flush(self) -> int:
+        """
+        Applies all pending changes and writes the changed participants.
+        Call it from a worker thread. Returns the number of participants written.
+        """
+        with self._lock:
+            races, self._pending_races = self._pending_races, set()
+        for race_id in races:
+            self._refresh_race(race_id)
+
+        with self._lock:
+            if self._pending_all_accounts:
+                accounts = set(self._participants_by_account)
+                self._pending_all_accounts = False
+            else:
+                accounts = self._pending_accounts
+            self._pending_accounts = set()
+            matches, self._pending_matches = self._pending_matches, []
+
+        ranks = crud.get_current_ranks(list(accounts), self.queue_type) if accounts else {}
+
+        with self._lock:
+            for riot_account_id, rank in ranks.items():
+                if rank.ladder_score is not None:
+                    self._apply(riot_account_id, constants.RACE_TYPE_LP_CLIMB, rank.ladder_score)
+            for riot_account_id, placement in matches:
+                for race_type in PLACEMENT_RACE_TYPES:
+                    self._apply(riot_account_id, race_type, placement)
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return 0
+
+        progress = [{'participant_id': participant.participant_id, 'starting_value': participant.starting_value,
+                     'current_value': participant.current_value, 'games_played': participant.games_played}
+                    for participant in dirty.values()]
+        self.counters['flushes'] += 1
+        if crud.update_race_progress(progress) is None:
+            self.counters['failed_writes'] += 1
+            with self._lock:
+                # Beim nächsten Flush erneut schreiben (neuere Änderungen haben Vorrang)
+                for participant_id, participant in dirty.items():
+                    self._dirty.setdefault(participant_id, participant)
+            return 0
+        self.counters['participants_written'] += len(progress)
+        return len(progress)
+
+    def _apply(self, riot_account_id: str, race_type: str, value: int) -> None:
+        """Updates the participants of one account in races of one type. Caller holds the lock."""
+        for race_id, participant_id in self._participants_by_account.get(riot_account_id, ()):
+            race = self._races[race_id]
+            if race.race_type != race_type:
+                continue
+            participant = race.participants[participant_id]
+            if race_type == constants.RACE_TYPE_LP_CLIMB:
+                if participant.current_value == value and participant.starting_value is not None:
+                    continue
+                if participant.starting_value is None:
+                    # Ohne Start-Snapshot zählt der erste bekannte Wert als Start
+                    participant.starting_value = value
+                participant.current_value = value
+            else:
+                participant.games_played = (participant.games_played or 0) + 1
+                if race_type == constants.RACE_TYPE_TOP4_COUNT:
+                    participant.current_value = (participant.current_value or 0) + (1 if value <= 4 else 0)
+                else:
+                    participant.current_value = (participant.current_value or 0) + value
+            race.put(participant)
+            self._dirty[participant_id] = participant
+
+    # --- Lesen ---
+
+    def standings(self, race_id: str, limit: int | None = None) -> list | None:
+        """The in-memory standings of an active race, or None if the race is not tracked."""
+        with self._lock:
+            race = self._races.get(race_id)
+            return race.standings(limit) if race is not None else None
+
+    def race(self, race_id: str) -> RaceStandings | None:
+        with self._lock:
+            return self._races.get(race_id)
+
+    def race_ids(self) -> list[str]:
+        with self._lock:
+            return list(self._races)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'races': len(self._races), 'accounts': len(self._participants_by_account),
+                    'pending_accounts': len(self._pending_accounts), **self.counters}
+
+    # --- CRUD-Events ---
+
+    def _on_rank_changed(self, riot_account_id, queue_type):
+        if queue_type in (None, self.queue_type):
+            self.notify_rank_changed(riot_account_id)
+
+    def _on_race_changed(self, race_id, server_id):
+        self.notify_race_changed(race_id)
+
+    def _subscriptions(self) -> list:
+        return [
+            (crud.RANK_CHANGED, self._on_rank_changed),
+            (crud.RACE_CHANGED, self._on_race_changed),
+        ]
+
+    def subscribe_to_crud(self) -> None:
+        for event_name, callback in self._subscriptions():
+            crud.subscribe(event_name, callback)
+
+    def unsubscribe_from_crud(self) -> None:
+        for event_name, callback in self._subscriptions():
+            crud.unsubscribe(event_name, callback)
@@ -0,0 +1,261 @@
+# race_scheduler.py
+"""
+In-process lifecycle scheduler for races: planned -> active -> finished.
+
+All upcoming start_time and end_time events are kept in a heap. One asyncio task
+sleeps until the earliest one is due and then runs the transition in a worker
+thread:
+
+    start   crud.start_race()     status 'active', snapshots the starting values
+    end     crud.finalize_race()  final values and ranks, status 'finished'
+
+RACE_CHANGED events (create_race, update_race, the transitions themselves) reload
+the schedule of that one race; older heap entries of the race are skipped
+(version number). At startup every planned and active race is loaded, so
+transitions missed while the bot was down fire at once, in time order.
+A full reload every RACE_SCHEDULER_RESYNC_MINUTES catches transitions done or
+missed by other processes. The transitions are conditional in the database,
+so several processes running the scheduler do not start or finalize a race twice.
+A transition that fails with a database error is retried with a growing backoff
+(RACE_SCHEDULER_RETRY_SECONDS, doubled per attempt up to RACE_SCHEDULER_MAX_RETRY_SECONDS).
+
+Due times are measured against the database clock (the clock of all func.now()
+defaults and of the transition checks), not the local one.
+
+Configuration (.env):
+    RACE_SCHEDULER_RESYNC_MINUTES     Interval of the full reload (default 60)
+    RACE_SCHEDULER_RETRY_SECONDS      First retry delay after a database error (default 5)
+    RACE_SCHEDULER_MAX_RETRY_SECONDS  Upper bound of the retry delay (default 300)
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import sys
+import threading
+
+import constants
+import database_crud as crud
+
+USER_PY_LOGGING_PREFIX = "RACE_SCHEDULER_"
+
+RACE_SCHEDULER_RESYNC_MINUTES = float(os.getenv("RACE_SCHEDULER_RESYNC_MINUTES", "60"))
+RACE_SCHEDULER_RETRY_SECONDS = float(os.getenv("RACE_SCHEDULER_RETRY_SECONDS", "5"))
+RACE_SCHEDULER_MAX_RETRY_SECONDS = float(os.getenv("RACE_SCHEDULER_MAX_RETRY_SECONDS", "300"))
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+TRANSITION_START = 'start'
+TRANSITION_END = 'end'
+
+
+class RaceLifecycleScheduler:
+    """
+    The crud functions are parameters so the scheduler can be tested without a database.
+    """
+    def __init__(self, schedule_loader=crud.get_race_schedule, starter=crud.start_race,
+                 finalizer=crud.finalize_race, clock=crud.get_database_time,
+                 resync_seconds: float = RACE_SCHEDULER_RESYNC_MINUTES * 60,
+                 retry_seconds: float = RACE_SCHEDULER_RETRY_SECONDS,
+                 max_retry_seconds: float = RACE_SCHEDULER_MAX_RETRY_SECONDS):
+        self.schedule_loader = schedule_loader
+        self.transitions = {TRANSITION_START: starter, TRANSITION_END: finalizer}
+        self.clock = clock
+        self.resync_seconds = resync_seconds
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        # (fällig als loop.time(), laufende Nummer, race_id, Version, Übergang)
+        self._heap: list[tuple] = []
+        self._versions: dict[str, int] = {}
+        self._sequence = itertools.count()
+        # RACE_CHANGED kommt aus beliebigen Threads
+        self._lock = threading.Lock()
+        self._changed_races: set[str] = set()
+        # Fehlversuche pro (race_id, Übergang) für das Backoff
+        self._attempts: dict[tuple[str, str], int] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self.counters = {'started': 0, 'finalized': 0, 'skipped': 0, 'failed': 0, 'retried': 0}
+
+    # --- Start/Stop ---
+
+    async def start(self) -> None:
+        """Subscribes to race changes and starts the scheduling task (loads the schedule first)."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        crud.subscribe(crud.RACE_CHANGED, self._on_race_changed)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        crud.unsubscribe(crud.RACE_CHANGED, self._on_race_changed)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # --- Änderungen ---
+
+    def notify_race_changed(self, race_id: str) -> None:
+        """Reloads the schedule of a race. Thread-safe."""
+        with self._lock:
+            self._changed_races.add(race_id)
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _on_race_changed(self, race_id, server_id):
+        self.notify_race_changed(race_id)
+
+    # --- Planung ---
+
+    def _schedule(self, rows, database_now, loop_now: float) -> None:
+        for row in rows:
+            version = self._versions.get(row.race_id, 0) + 1
+            self._versions[row.race_id] = version
+            transitions = []
+            if row.status == constants.RACE_STATUS_PLANNED:
+                transitions = [(TRANSITION_START, row.start_time), (TRANSITION_END, row.end_time)]
+            elif row.status == constants.RACE_STATUS_ACTIVE:
+                transitions = [(TRANSITION_END, row.end_time)]
+            for transition, due_at in transitions:
+                due = loop_now + (due_at - database_now).total_seconds()
+                heapq.heappush(self._heap, (due, next(self._sequence), row.race_id, version, transition))
+
+    async def reload(self, race_ids: list[str] | None = None) -> bool:
+        """Loads the schedule of the given races, or of all planned and active races."""
+        if race_ids is None:
+            rows = await asyncio.to_thread(self.schedule_loader)
+        else:
+            rows = []
+            for race_id in race_ids:
+                race_rows = await asyncio.to_thread(self.schedule_loader, race_id)
+                if race_rows is None:
+                    rows = None
+                    break
+                # Gelöschte Races: nur die Version erhöhen, damit alte Einträge verfallen
+                rows.extend(race_rows or [_Removed(race_id)])
+        if rows is None:
+            logger.error("Could not load the race schedule.", extra={'action': 'RACE_SCHEDULE_LOAD_FAILED'})
+            return False
+        database_now = await asyncio.to_thread(self.clock)
+        loop_now = asyncio.get_running_loop().time()
+        if race_ids is None:
+            self._heap.clear()
+            self._versions.clear()
+        self._schedule(rows, database_now, loop_now)
+        if race_ids is None:
+            logger.info("Race scheduler loaded %s planned or active races (%s transitions).",
+                        len(rows), len(self._heap), extra={'action': 'RACE_SCHEDULE_LOADED'})
+        return True
+
+    def pending(self) -> list[tuple[str, str]]:
+        """The valid scheduled (race_id, transition) pairs in due order."""
+        return [(race_id, transition) for _, _, race_id, version, transition in sorted(self._heap)
+                if self._versions.get(race_id) == version]
+
+    # --- Ausführung ---
+
+    async def run_due(self) -> int:
+        """Runs every transition that is due. Returns the number of transitions run."""
+        ran = 0
+        loop = asyncio.get_running_loop()
+        while self._heap and self._heap[0][0] <= loop.time():
+            _, _, race_id, version, transition = heapq.heappop(self._heap)
+            if self._versions.get(race_id) != version:
+                continue
+            await self._fire(race_id, version, transition)
+            ran += 1
+        return ran
+
+    async def _fire(self, race_id: str, version: int, transition: str) -> None:
+        try:
+            result = await asyncio.to_thread(self.transitions[transition], race_id)
+        except Exception as e:
+            logger.exception("Race transition '%s' of race '%s' failed: %s", transition, race_id, e,
+                             extra={'action': 'RACE_TRANSITION_FAILED'})
+            result = None
+        if result is None:
+            # DB-Fehler: derselbe Eintrag kommt mit Backoff wieder in den Heap
+            self._retry(race_id, version, transition)
+            return
+        self._attempts.pop((race_id, transition), None)
+        if result is False:
+            # Bereits von einem anderen Prozess erledigt, abgesagt oder noch nicht fällig
+            self.counters['skipped'] += 1
+            logger.info("Race transition '%s' of race '%s' did not apply.", transition, race_id,
+                        extra={'action': 'RACE_TRANSITION_SKIPPED'})
+            return
+        self.counters['started' if transition == TRANSITION_START else 'finalized'] += 1
+        logger.info("Race '%s': transition '%s' done (%s participants).", race_id, transition, result,
+                    extra={'action': 'RACE_TRANSITION_DONE'})
+
+    def _retry(self, race_id: str, version: int, transition: str) -> None:
+        attempts = self._attempts.get((race_id, transition), 0) + 1
+        self._attempts[(race_id, transition)] = attempts
+        delay = min(self.retry_seconds * 2 ** (attempts - 1), self.max_retry_seconds)
+        self.counters['failed'] += 1
+        self.counters['retried'] += 1
+        logger.warning("Race transition '%s' of race '%s' failed (attempt %s), retrying in %.0f s.",
+                       transition, race_id, attempts, delay, extra={'action': 'RACE_TRANSITION_RETRY'})
+        heapq.heappush(self._heap, (asyncio.get_running_loop().time() + delay, next(self._sequence),
+                                    race_id, version, transition))
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_resync = loop.time()
+        while True:
+            try:
+                if loop.time() >= next_resync:
+                    with self._lock:
+                        self._changed_races.clear()
+                    if await self.reload():
+                        next_resync = loop.time() + self.resync_seconds
+                    else:
+                        next_resync = loop.time() + min(60.0, self.resync_seconds)
+                with self._lock:
+                    changed, self._changed_races = self._changed_races, set()
+                if changed:
+                    await self.reload(sorted(changed))
+                await self.run_due()
+            except Exception as e:
+                logger.exception("Race scheduler iteration failed: %s", e, extra={'action': 'RACE_SCHEDULER_FAILED'})
+
+            timeout = next_resync - loop.time()
+            if self._heap:
+                timeout = min(timeout, self._heap[0][0] - loop.time())
+            self._wake.clear()
+            with self._lock:
+                if self._changed_races:
+                    continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {'scheduled': len(self.pending()), **self.counters}
+
+
+class _Removed:
+    """Schedule row of a race that no longer exists."""
+    __slots__ = ('race_id', 'status')
+
+    def __init__(self, race_id: str):
+        self.race_id = race_id
+        self.status = None
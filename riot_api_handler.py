@@ -1,12 +1,16 @@
+import contextlib
+import contextvars
 import requests
 import os
+import sys
 import logging
-from dotenv import load_dotenv
 import time
 from collections import deque # KORREKTUR: Fehlender Import hinzugefügt
 from threading import Lock
+from urllib.parse import urlparse
+import api_metrics
 import constants
-load_dotenv()
+import profiling_hooks
 
 # --- Konfiguration ---
 
@@ -49,6 +53,28 @@ def parse_rate_limits(limits_str: str | None) -> list[tuple[int, int]]:
                      limits_str, e, default_limits)
         return default_limits
     
+class RiotAPIUnavailableError(Exception):
+    """The Riot API failed temporarily (429, 5xx, timeout or no API key); the same request may succeed later."""
+
+# Normalerweise liefern die API-Funktionen bei jedem Fehler None. Innerhalb von
+# raise_on_transient_errors() werfen sie bei vorübergehenden Fehlern stattdessen
+# RiotAPIUnavailableError, damit ein Aufrufer (z.B. der Sync-Worker) sie von einem 404 unterscheiden kann.
+_raise_transient = contextvars.ContextVar('riot_api_raise_transient', default=False)
+
+@contextlib.contextmanager
+def raise_on_transient_errors():
+    """Makes API calls in this context (including asyncio.to_thread workers) raise RiotAPIUnavailableError."""
+    token = _raise_transient.set(True)
+    try:
+        yield
+    finally:
+        _raise_transient.reset(token)
+
+def _transient_failure(message: str) -> None:
+    if _raise_transient.get():
+        raise RiotAPIUnavailableError(message)
+    return None
+
 RIOT_API_LIMITS_STR = os.getenv("RIOT_API_LIMITS")
 RATE_LIMITS = parse_rate_limits(RIOT_API_LIMITS_STR)
 
@@ -70,122 +96,179 @@ class RateLimiter:
         self.history = [deque() for _ in self.limits]
         self.lock = Lock()
 
-    def acquire(self):
+    def acquire(self, timeout: float | None = None) -> float:
         """
         Blockiert, bis eine Anfrage sicher gesendet werden kann, und reserviert dann den Slot.
+
+        Args:
+            timeout (optional): Maximale Wartezeit in Sekunden.
+
+        Returns:
+            Die Wartezeit in Sekunden (inklusive Warten auf den Lock).
+
+        Raises:
+            TimeoutError: Wenn der Slot erst nach `timeout` frei würde (es wird nichts reserviert).
         """
-        with self.lock:
-            while True:
+        started = time.monotonic()
+        while True:
+            with self.lock:
                 now = time.time()
                 wait_duration = 0
 
                 for i, (count, period) in enumerate(self.limits):
                     while self.history[i] and self.history[i][0] <= now - period:
                         self.history[i].popleft()
-                    
+
                     if len(self.history[i]) >= count:
                         time_to_wait = self.history[i][0] + period - now
                         if time_to_wait > wait_duration:
                             wait_duration = time_to_wait
-                
-                if wait_duration > 0:
-                    logger.debug(f"Rate limit active. Waiting for {wait_duration:.2f}s.")
-                    time.sleep(wait_duration + 0.01)
-                    continue
-                else:
+
+                if wait_duration <= 0:
                     for i in range(len(self.limits)):
                         self.history[i].append(now)
                     break
+            if timeout is not None and time.monotonic() - started + wait_duration > timeout:
+                raise TimeoutError(f"Rate limit slot not free within {timeout:.2f}s.")
+            # Ohne Lock schlafen, damit remaining() (Metrics) und andere Threads nicht blockieren
+            logger.debug("Rate limit active. Waiting for %.2fs.", wait_duration)
+            time.sleep(wait_duration + 0.01)
+        return time.monotonic() - started
+
+    def remaining(self) -> list[tuple[int, int, int]]:
+        """
+        Gibt das verbleibende Budget pro Zeitfenster zurück, ohne einen Slot zu reservieren.
+
+        Returns:
+            Eine Liste von (Anzahl, Sekunden, verbleibend) pro Limit.
+        """
+        with self.lock:
+            now = time.time()
+            return [
+                (count, period, max(count - sum(1 for sent in self.history[i] if sent > now - period), 0))
+                for i, (count, period) in enumerate(self.limits)
+            ]
 
 # Erstelle eine Instanz des RateLimiters mit den (aus der .env) geladenen Limits
 riot_rate_limiter = RateLimiter(RATE_LIMITS)
+api_metrics.set_budget_source(riot_rate_limiter.remaining)
+
+def configure_rate_limits(limits: list[tuple[int, int]]) -> None:
+    """Replaces the process-wide rate limiter, e.g. with this process's share of the key's limits."""
+    global riot_rate_limiter
+    riot_rate_limiter = RateLimiter(limits)
+    api_metrics.set_budget_source(riot_rate_limiter.remaining)
+    logger.info("Rate limits set to %s.", limits)
 
 def _get_latest_api_key() -> str |None:
+    started = time.perf_counter()
     try:
-        response = requests.get(GIST_RAW_URL, timeout=10)
-        
+        with profiling_hooks.phase('api'):
+            response = requests.get(GIST_RAW_URL, timeout=10)
+        api_metrics.observe_request('api_key_gist', urlparse(GIST_RAW_URL).hostname or 'unknown',
+                                    time.perf_counter() - started, response.status_code)
+
         if response.status_code == 200:
             return response.text.strip()
         else:
-            logger.error(f"Could not fetch API key from Gist. Status code: {response.status_code}")
+            logger.error("Could not fetch API key from Gist. Status code: %s", response.status_code)
             return None
             
     except requests.RequestException as e:
-        logger.error(f"Network error while fetching API key from Gist: {e}")
+        api_metrics.observe_request('api_key_gist', urlparse(GIST_RAW_URL or '').hostname or 'unknown',
+                                    time.perf_counter() - started, 'error')
+        logger.error("Network error while fetching API key from Gist: %s", e)
         return None
     
 def _get_routing_value(region:str) -> str |None:
 
-    normalized_region = region.lower().strip()
-    if normalized_region in constants.REGION_CORRECTIONS:
-        corrected_region = constants.REGION_CORRECTIONS[normalized_region] 
-        logger.info(f"Region '{region}' korrigiert zu '{corrected_region}'.",
-                    extra={'action': 'REGION_CORRECTION', 'original': region, 'corrected': corrected_region})
-        normalized_region = corrected_region
+    normalized_region = constants.normalize_region(region)
+    if normalized_region != region.lower().strip():
+        logger.info("Region '%s' korrigiert zu '%s'.", region, normalized_region,
+                    extra={'action': 'REGION_CORRECTION', 'original': region, 'corrected': normalized_region})
 
     for route, platforms in constants.RIOT_ROUTING.items(): 
         if normalized_region in platforms:
             return route
-    logger.error(f"Could not find a routing value for region: {region}")
+    logger.error("Could not find a routing value for region: %s", region)
     return None
 
-def _make_api_request(url: str) -> dict | list | None:
-    """Führt eine Anfrage an die Riot-API aus, fügt den API-Schlüssel hinzu und behandelt Fehler."""
+def _make_api_request(url: str, endpoint: str = 'unknown') -> dict | list | None:
+    """
+    Führt eine Anfrage an die Riot-API aus, fügt den API-Schlüssel hinzu und behandelt Fehler.
+    Wartet vorher im Rate Limiter; Dauer, Statuscode und Wartezeit landen in api_metrics.
+
+    Args:
+        url: Die vollständige URL.
+        endpoint: Name des Endpunkts für die Metriken (z.B. 'tft_league_by_puuid').
+    """
     api_key = _get_latest_api_key()
     if not api_key:
         logger.critical("Cannot make API request without an API key.")
-        return None
+        return _transient_failure("No Riot API key available.")
     
     headers = {"X-Riot-Token": api_key}
-    
+    host = urlparse(url).hostname or 'unknown'
+    with profiling_hooks.phase('limiter_wait'):
+        api_metrics.observe_limiter_wait(riot_rate_limiter.acquire())
+
+    started = time.perf_counter()
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        with profiling_hooks.phase('api'):
+            response = requests.get(url, headers=headers, timeout=10)
+        api_metrics.observe_request(endpoint, host, time.perf_counter() - started, response.status_code)
         if response.status_code == 429:
             logger.warning("Rate limit exceeded. Waiting for a moment...")
-            return None
+            return _transient_failure(f"Rate limit exceeded for {endpoint}.")
         response.raise_for_status()
-        return response.json()
+        with profiling_hooks.phase('serialization'):
+            return response.json()
     except requests.exceptions.HTTPError as http_err:
-        logger.error(f"HTTP Error for URL {url}: {http_err}")
+        logger.error("HTTP Error for URL %s: %s", url, http_err)
+        # 404 & Co. sind endgültig, Serverfehler nicht
+        if http_err.response is not None and http_err.response.status_code >= 500:
+            return _transient_failure(f"Riot API error {http_err.response.status_code} for {endpoint}.")
     except requests.exceptions.RequestException as req_err:
-        logger.error(f"Request Exception for URL {url}: {req_err}")
+        api_metrics.observe_request(endpoint, host, time.perf_counter() - started, 'error')
+        logger.error("Request Exception for URL %s: %s", url, req_err)
+        return _transient_failure(f"{type(req_err).__name__} for {endpoint}.")
     return None
 
 def get_account_by_riot_id(game_name: str, tag_line: str, region: str) -> dict | None:
     """Fragt die Riot API nach einem Account anhand der Riot ID und der Region ab."""
-    logger.info(f"Querying Riot account for {game_name}#{tag_line} in region {region}")
+    logger.info("Querying Riot account for %s#%s in region %s", game_name, tag_line, region)
     routing_value = _get_routing_value(region)
     if not routing_value:
         return None
     
     url = f"https://{routing_value}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}"
-    return _make_api_request(url)
+    return _make_api_request(url, 'account_by_riot_id')
 
 def get_tft_league_entry_by_puuid(puuid: str, region: str) -> list[dict] | None:
     """
     Fragt die TFT-API nach den Ranglisten-Einträgen eines Spielers direkt über die PUUID ab.
     """
-    logger.info(f"Querying TFT league entry for PUUID {puuid} in region {region}")
+    logger.info("Querying TFT league entry for PUUID %s in region %s", puuid, region)
     # Der Endpunkt wurde von .../by-summoner/{summonerId} auf .../by-puuid/{puuid} geändert
     url = f"https://{region}.api.riotgames.com/tft/league/v1/by-puuid/{puuid}"
-    return _make_api_request(url)
+    return _make_api_request(url, 'tft_league_by_puuid')
     
 def get_tft_match_ids_by_puuid(puuid: str, region: str, count: int = 20) -> list[str] | None:
     """Fragt die letzten Match-IDs eines Spielers anhand seiner PUUID ab."""
-    logger.info(f"Querying last {count} TFT match IDs for PUUID {puuid} in region {region}")
+    logger.info("Querying last %s TFT match IDs for PUUID %s in region %s", count, puuid, region)
     routing_value = _get_routing_value(region)
     if not routing_value:
         return None
         
     url = f"https://{routing_value}.api.riotgames.com/tft/match/v1/matches/by-puuid/{puuid}/ids?count={count}"
-    return _make_api_request(url)
+    return _make_api_request(url, 'tft_match_ids_by_puuid')
 
 def get_tft_match_details(match_id: str, region: str) -> dict | None:
     """Fragt die Details zu einem spezifischen Match anhand der Match-ID ab."""
-    logger.info(f"Querying TFT match details for match ID {match_id} in region {region}")
+    logger.info("Querying TFT match details for match ID %s in region %s", match_id, region)
     routing_value = _get_routing_value(region)
     if not routing_value:
         return None
         
     url = f"https://{routing_value}.api.riotgames.com/tft/match/v1/matches/{match_id}"
-    return _make_api_request(url)
\ No newline at end of file
+    return _make_api_request(url, 'tft_match_details')
\ No newline at end of file
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import logging
+import sys
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+from sqlalchemy import select
+
+import database_crud as crud
+from ORM_models import ServerPlayer, Player, PlayerRiotAccountLink, RiotAccount
+
+USER_PY_LOGGING_PREFIX = "ANALYTICS_"
+
+# Wie weit vor dem Zeitraum nach einem Ausgangswert gesucht wird
+BASELINE_LOOKBACK = timedelta(days=7)
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+else:
+    # pandas/numpy brauchen ca. 0,5 s zum Importieren und werden erst bei der ersten Auswertung geladen
+    np = None
+    pd = None
+
+
+def _load_dataframe_libs() -> None:
+    global np, pd
+    if pd is None:
+        import numpy
+        import pandas
+        np, pd = numpy, pandas
+
+
+STAT_COLUMNS = [
+    'riot_account_id', 'display_name', 'game_name', 'tag_line', 'current_score',
+    'lp_gained', 'games', 'wins', 'win_rate', 'velocity_per_day', 'rank'
+]
+
+
+def _server_members_query(server_id: str):
+    """Active players of a server with their primary Riot account."""
+    return (
+        select(
+            RiotAccount.riot_account_id,
+            Player.display_name,
+            RiotAccount.game_name,
+            RiotAccount.tag_line
+        )
+        .join(PlayerRiotAccountLink, PlayerRiotAccountLink.riot_account_id == RiotAccount.riot_account_id)
+        .join(Player, Player.player_id == PlayerRiotAccountLink.player_id)
+        .join(ServerPlayer, ServerPlayer.player_id == Player.player_id)
+        .where(
+            ServerPlayer.server_id == server_id,
+            ServerPlayer.is_active_on_server == True,
+            PlayerRiotAccountLink.is_active == True,
+            PlayerRiotAccountLink.is_primary_riot_account == True
+        )
+    )
+
+
+def load_server_history(server_id: str, start: datetime, end: datetime,
+                        queue_type: str = 'RANKED_TFT') -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Loads the LP history of all active members of a server in one columnar query.
+    Raw snapshots and retention rollups are read together.
+
+    Returns:
+        (members, history): members has one row per account with its names,
+        history has riot_account_id, retrieved_at, ladder_score, wins, losses,
+        sorted by account and time. History starts up to BASELINE_LOOKBACK before
+        `start` so every account has a baseline.
+    """
+    _load_dataframe_libs()
+    members_query = _server_members_query(server_id)
+    history = crud.lp_history_selectable(queue_type)
+    member_ids = members_query.with_only_columns(RiotAccount.riot_account_id)
+    history_query = (
+        select(
+            history.c.riot_account_id,
+            history.c.retrieved_at,
+            history.c.ladder_score,
+            history.c.wins,
+            history.c.losses
+        )
+        .where(
+            history.c.riot_account_id.in_(member_ids),
+            history.c.retrieved_at >= start - BASELINE_LOOKBACK,
+            history.c.retrieved_at <= end,
+            history.c.ladder_score.isnot(None)
+        )
+        .order_by(history.c.riot_account_id, history.c.retrieved_at)
+    )
+    with crud.get_engine().connect() as connection:
+        members = pd.read_sql(members_query, connection)
+        points = pd.read_sql(history_query, connection, parse_dates=['retrieved_at'])
+    return members, points
+
+
+def compute_account_stats(points: pd.DataFrame, start: datetime) -> pd.DataFrame:
+    """
+    Computes per-account statistics for the period since `start`, fully vectorized.
+
+    The baseline of each account is its last point at or before `start`
+    (or its first point in the period if it has none before).
+
+    Returns:
+        A DataFrame indexed by riot_account_id with current_score, lp_gained, games,
+        wins, win_rate and velocity_per_day (least-squares slope of the ladder score in LP/day).
+    """
+    _load_dataframe_libs()
+    points = points.sort_values(['riot_account_id', 'retrieved_at'])
+    grouped = points.groupby('riot_account_id', sort=False)
+
+    # Ausgangswert: letzter Punkt <= start, sonst erster Punkt im Zeitraum
+    before_start = points[points['retrieved_at'] <= start].groupby('riot_account_id').last()
+    first_in_period = points[points['retrieved_at'] > start].groupby('riot_account_id').first()
+    baseline = before_start.combine_first(first_in_period)
+    last = grouped.last()
+
+    in_period = points[points['retrieved_at'] >= start]
+    games = (last['wins'] + last['losses']) - (baseline['wins'] + baseline['losses'])
+    wins = last['wins'] - baseline['wins']
+
+    stats = pd.DataFrame({
+        'current_score': last['ladder_score'],
+        'lp_gained': last['ladder_score'] - baseline['ladder_score'],
+        'games': games,
+        'wins': wins,
+        'win_rate': (wins / games.where(games > 0)).astype(float),
+        'velocity_per_day': _score_slope_per_day(in_period),
+    })
+    return stats
+
+
+def _score_slope_per_day(points: pd.DataFrame) -> pd.Series:
+    """Least-squares slope of ladder_score over time per account, via grouped moments."""
+    if points.empty:
+        return pd.Series(dtype=float)
+    days = (points['retrieved_at'] - points['retrieved_at'].min()).dt.total_seconds().to_numpy() / 86400.0
+    score = points['ladder_score'].to_numpy(dtype=float)
+    moments = pd.DataFrame({
+        'riot_account_id': points['riot_account_id'].to_numpy(),
+        't': days, 'y': score, 'tt': days * days, 'ty': days * score,
+    }).groupby('riot_account_id').agg(n=('t', 'size'), t=('t', 'mean'), y=('y', 'mean'),
+                                      tt=('tt', 'mean'), ty=('ty', 'mean'))
+    variance = moments['tt'] - moments['t'] ** 2
+    slope = (moments['ty'] - moments['t'] * moments['y']) / variance.where(variance > 1e-12)
+    return slope.where(moments['n'] > 1)
+
+
+def compute_daily_trends(points: pd.DataFrame, window_days: int = 7) -> pd.DataFrame:
+    """
+    Resamples every account to one point per day and computes rolling windows.
+
+    Returns:
+        A DataFrame with riot_account_id, day, ladder_score (last of the day),
+        lp_change_rolling and win_rate_rolling over the last `window_days` days with data.
+    """
+    _load_dataframe_libs()
+    if points.empty:
+        return pd.DataFrame(columns=['riot_account_id', 'day', 'ladder_score',
+                                     'lp_change_rolling', 'win_rate_rolling'])
+    daily = (
+        points.assign(day=points['retrieved_at'].dt.floor('D'))
+        .groupby(['riot_account_id', 'day'])[['ladder_score', 'wins', 'losses']]
+        .last()
+        .reset_index()
+    )
+    by_account = daily.groupby('riot_account_id', sort=False)
+    wins_window = by_account['wins'].diff(window_days)
+    games_window = wins_window + by_account['losses'].diff(window_days)
+    daily['lp_change_rolling'] = by_account['ladder_score'].diff(window_days)
+    daily['win_rate_rolling'] = wins_window / games_window.where(games_window > 0)
+    return daily
+
+
+def get_server_stats(server_id: str, days: int = 7, sort_by: str = 'lp_gained',
+                     queue_type: str = 'RANKED_TFT', end: datetime | None = None) -> pd.DataFrame:
+    """
+    Computes the statistics of all active members of a server over the last `days` days.
+
+    Args:
+        server_id: The ID of the server.
+        days: Length of the period in days.
+        sort_by: Column to rank by ('lp_gained', 'win_rate', 'velocity_per_day' or 'games').
+        queue_type: The queue to evaluate (default 'RANKED_TFT').
+        end (optional): End of the period (default: now, database time).
+
+    Returns:
+        A DataFrame with STAT_COLUMNS, sorted by `rank` (1 = best).
+    """
+    _load_dataframe_libs()
+    end = end or crud.get_database_time()
+    start = end - timedelta(days=days)
+    logger.debug("Computing stats for server '%s' over %s days.", server_id, days, extra={'action': 'GET_SERVER_STATS'})
+
+    members, points = load_server_history(server_id, start, end, queue_type)
+    if members.empty or points.empty:
+        return pd.DataFrame(columns=STAT_COLUMNS)
+    stats = compute_account_stats(points, start)
+
+    result = members.drop_duplicates('riot_account_id').set_index('riot_account_id').join(stats, how='inner')
+    result['rank'] = result[sort_by].rank(ascending=False, method='min', na_option='bottom').astype(np.int64)
+    result = result.sort_values(['rank', 'display_name']).reset_index()
+    return result[STAT_COLUMNS]
@@ -0,0 +1,97 @@
+# sharding.py
+"""
+Shard configuration and shard-aware partitioning of background work.
+
+Discord assigns a guild to shard (guild_id >> 22) % shard_count. A bot process
+runs some or all shards; background sync work is partitioned the same way, so
+each process refreshes only the Riot accounts of members of its own guilds.
+
+A Riot account tracked on guilds of several shards is owned by the lowest of
+those shard IDs. Every process computes the same owner from the same data, so
+such an account is refreshed exactly once per cycle, without coordination.
+
+Configuration (.env):
+    DISCORD_SHARD_COUNT   Total number of shards (default: recommended by Discord)
+    DISCORD_SHARD_IDS     Shards run by this process, e.g. "0,1" (default: all shards).
+                          Requires DISCORD_SHARD_COUNT.
+"""
+import logging
+import os
+import sys
+
+USER_PY_LOGGING_PREFIX = "SHARDING_"
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+
+def parse_shard_config(count_str: str | None, ids_str: str | None) -> tuple[int | None, list[int] | None]:
+    """
+    Parses DISCORD_SHARD_COUNT and DISCORD_SHARD_IDS.
+
+    Returns:
+        (shard_count, shard_ids); None values let discord.py choose.
+
+    Raises:
+        ValueError: If the values are malformed or inconsistent.
+    """
+    shard_count = int(count_str) if count_str else None
+    shard_ids = [int(value) for value in ids_str.split(',') if value.strip()] if ids_str else None
+    if shard_count is not None and shard_count < 1:
+        raise ValueError("DISCORD_SHARD_COUNT must be at least 1.")
+    if shard_ids is not None:
+        if shard_count is None:
+            raise ValueError("DISCORD_SHARD_IDS requires DISCORD_SHARD_COUNT.")
+        invalid = [shard_id for shard_id in shard_ids if not 0 <= shard_id < shard_count]
+        if invalid:
+            raise ValueError(f"Shard IDs {invalid} are outside 0..{shard_count - 1}.")
+        shard_ids = sorted(set(shard_ids))
+    return shard_count, shard_ids
+
+
+SHARD_COUNT, SHARD_IDS = parse_shard_config(os.getenv("DISCORD_SHARD_COUNT"), os.getenv("DISCORD_SHARD_IDS"))
+
+
+def shard_for_guild(guild_id: int | str, shard_count: int) -> int:
+    """The shard Discord routes a guild to."""
+    return (int(guild_id) >> 22) % shard_count
+
+
+def owner_shard(guild_ids, shard_count: int) -> int:
+    """The shard responsible for an account tracked on these guilds: the lowest of their shards."""
+    return min(shard_for_guild(guild_id, shard_count) for guild_id in guild_ids)
+
+
+def partition_accounts(tracked_accounts: list, shard_ids, shard_count: int) -> list:
+    """
+    Selects the accounts this process has to refresh.
+
+    Args:
+        tracked_accounts: (account, guild_ids) tuples, as returned by crud.get_tracked_riot_accounts().
+        shard_ids: The shards run by this process.
+        shard_count: The total number of shards.
+
+    Returns:
+        The accounts whose owner shard is one of `shard_ids`.
+    """
+    own_shards = set(shard_ids)
+    return [account for account, guild_ids in tracked_accounts
+            if guild_ids and owner_shard(guild_ids, shard_count) in own_shards]
+
+
+def rate_limit_share(limits: list[tuple[int, int]], shard_ids, shard_count: int) -> list[tuple[int, int]]:
+    """
+    Scales the Riot API limits to this process's share of the shards, so that
+    processes sharing one API key stay within its limits together.
+    """
+    share = len(shard_ids) / shard_count
+    return [(max(int(count * share), 1), period) for count, period in limits]
@@ -1,18 +1,23 @@
 from dotenv import dotenv_values
+from functools import lru_cache
 import sqlalchemy
 from sqlalchemy.orm import sessionmaker
 import os
-import pandas as pd
+import query_instrumentation
+
+@lru_cache(maxsize=1)
+def _read_sql_config() -> tuple:
+    needed_keys = ['host', 'port', 'dbname', 'user', 'password', 'db_type']
+    dotenv_dict = dotenv_values(".env")
+    return tuple((key, dotenv_dict.get(key)) for key in needed_keys)
 
 def get_sql_config():
     '''
         Function loads credentials from .env file and
         returns a dictionary containing the data.
+        The file is read once per process.
     '''
-    needed_keys = ['host', 'port', 'dbname', 'user', 'password', 'db_type']
-    dotenv_dict = dotenv_values(".env")
-    sql_config = {key: dotenv_dict.get(key) for key in needed_keys}
-    return sql_config
+    return dict(_read_sql_config())
 
 def get_engine_and_session_factory():
     """
@@ -38,6 +43,13 @@ def get_engine_and_session_factory():
         raise ValueError(f"Unsupported database type: {db_type}")
 
     engine = sqlalchemy.create_engine(db_url)
+    if query_instrumentation.ENABLED:
+        query_instrumentation.instrument_engine(engine)
     SessionFactory = sessionmaker(bind=engine, expire_on_commit=False)
 
-    return engine, SessionFactory
\ No newline at end of file
+    return engine, SessionFactory
+
+def get_engine_alchemy():
+    """Creates the database engine (without a session factory)."""
+    engine, _ = get_engine_and_session_factory()
+    return engine
\ No newline at end of file
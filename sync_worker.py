@@ -0,0 +1,434 @@
+# sync_worker.py
+"""
+Standalone sync worker: drains the durable job queue (table sync_jobs) that the
+bot fills, so Riot polling runs outside the gateway process and survives restarts.
+
+    python sync_worker.py [--worker-id ID] [--concurrency N] [--poll-ranks]
+
+Each job is leased to one worker for SYNC_WORKER_LEASE_SECONDS and the lease is
+renewed by a heartbeat while the job runs. If a worker dies, its leases expire
+and another worker (or the restarted one) picks the jobs up again. A job that
+raises is retried with exponential backoff; after max_attempts it is moved to
+the dead-letter state ('dead') and kept for inspection
+(crud.requeue_dead_sync_jobs() runs them again). The handlers raise on temporary
+Riot API failures (429, 5xx, timeouts) so these go through the retries, while a
+definite answer such as an unknown Riot ID completes the job. Jobs that answer a
+Discord interaction retry only while its 15-minute token is still valid. Several workers, also on
+different hosts, can drain the same queue in parallel.
+
+Job kinds (handlers in HANDLERS):
+    register      Registers a Riot ID and answers the /register interaction
+    refresh_rank  Refreshes the TFT rank of one Riot account
+
+The bot only enqueues into this queue when DURABLE_SYNC_JOBS is set; otherwise
+it runs registrations and rank refreshes in-process as before.
+
+With WORKER_RANK_POLLING (or --poll-ranks) the workers poll the ranks themselves
+instead of the bot: the work is split into partitions by Riot platform, and each
+worker polls only the partitions it holds a lease on (see partition_leases.py).
+
+Configuration (.env):
+    DURABLE_SYNC_JOBS             1 = the bot enqueues registrations and rank refreshes here (default 0)
+    WORKER_RANK_POLLING           1 = sync workers poll the ranks by partition, the bot does not (default 0)
+    RANK_SYNC_INTERVAL_MINUTES    Time between two polls of the same partition (default 30)
+    SYNC_WORKER_CONCURRENCY       Jobs run in parallel per worker (default 4)
+    SYNC_WORKER_LEASE_SECONDS     Lease duration; renewed every third of it (default 60)
+    SYNC_WORKER_POLL_SECONDS      Wait between polls of an empty queue (default 2)
+    SYNC_JOB_RETRY_BASE_SECONDS   First retry delay, doubled per attempt (default 30)
+    SYNC_JOB_RETRY_MAX_SECONDS    Maximum retry delay (default 1800)
+"""
+from dotenv import load_dotenv
+load_dotenv()  # vor den Projektmodulen, die ihre Konfiguration beim Import lesen
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+import constants
+import data_manager
+import database_crud as crud
+import partition_leases
+import riot_api_handler as api
+
+USER_PY_LOGGING_PREFIX = "SYNC_WORKER_"
+
+DURABLE_SYNC_JOBS = os.getenv("DURABLE_SYNC_JOBS", "0").lower() in ('1', 'true', 'yes')
+WORKER_RANK_POLLING = os.getenv("WORKER_RANK_POLLING", "0").lower() in ('1', 'true', 'yes')
+RANK_SYNC_INTERVAL_MINUTES = float(os.getenv("RANK_SYNC_INTERVAL_MINUTES", "30"))
+SYNC_WORKER_CONCURRENCY = int(os.getenv("SYNC_WORKER_CONCURRENCY", "4"))
+SYNC_WORKER_LEASE_SECONDS = float(os.getenv("SYNC_WORKER_LEASE_SECONDS", "60"))
+SYNC_WORKER_POLL_SECONDS = float(os.getenv("SYNC_WORKER_POLL_SECONDS", "2"))
+SYNC_JOB_RETRY_BASE_SECONDS = float(os.getenv("SYNC_JOB_RETRY_BASE_SECONDS", "30"))
+SYNC_JOB_RETRY_MAX_SECONDS = float(os.getenv("SYNC_JOB_RETRY_MAX_SECONDS", "1800"))
+
+DISCORD_API_BASE = "https://discord.com/api/v10"
+# Interaction-Tokens sind 15 Minuten gültig; der letzte Versuch braucht selbst noch etwas Zeit
+INTERACTION_TOKEN_SECONDS = 15 * 60
+INTERACTION_FOLLOWUP_MARGIN_SECONDS = 60
+
+try:
+    import logging_setup
+    logger = logging_setup.setup_project_logger(env_prefix=USER_PY_LOGGING_PREFIX)
+except ImportError:
+    print(f"Error: Cannot find the 'logging_setup.py' module (for {USER_PY_LOGGING_PREFIX}).", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}Fallback')
+except Exception as e:
+    print(f"Error during logging setup for {USER_PY_LOGGING_PREFIX}: {e}. Using fallback.", file=sys.stderr)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - FALLBACK - %(message)s')
+    logger = logging.getLogger(f'{USER_PY_LOGGING_PREFIX}SetupErrorFallback')
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff after the given number of failed attempts."""
+    return min(SYNC_JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), SYNC_JOB_RETRY_MAX_SECONDS)
+
+
+def send_interaction_followup(application_id: str, interaction_token: str, content: str) -> None:
+    """
+    Posts an ephemeral followup to a deferred interaction. Needs no bot login:
+    the interaction token itself authorizes it, for 15 minutes after the command.
+    """
+    try:
+        response = requests.post(f"{DISCORD_API_BASE}/webhooks/{application_id}/{interaction_token}",
+                                 json={'content': content, 'flags': 64}, timeout=10)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        # Die Antwort ist verloren, der Job selbst war trotzdem erfolgreich
+        logger.warning("Could not send the interaction followup: %s", e, extra={'action': 'SYNC_FOLLOWUP_FAILED'})
+
+
+# --- Handlers ---
+# Ein Handler bekommt das Payload des Jobs. Eine Exception führt zu einem Retry
+# (vorübergehende Riot-Fehler kommen als api.RiotAPIUnavailableError); fachliche
+# Fehlschläge (z.B. unbekannte Riot ID) werden beantwortet und nicht wiederholt.
+# Ein Give-up-Handler läuft, wenn der Job endgültig aufgegeben wird.
+
+def _register_failed_message(payload: dict) -> str:
+    return (f"Fehler bei der Registrierung von **{payload['game_name']}#{payload['tag_line']}**. "
+            "Bitte überprüfe den Namen, die Tag Line und die Region. "
+            "Es könnte auch ein Problem mit der Riot API vorliegen oder der Account ist bereits verknüpft.")
+
+def handle_register(payload: dict) -> None:
+    with api.raise_on_transient_errors():
+        result = asyncio.run(data_manager.register_new_player_with_riot_id(
+            game_name=payload['game_name'], tag_line=payload['tag_line'], region=payload['region']
+        ))
+    if result:
+        player, riot_account = result
+        message = (f"Dein Riot Account **{riot_account.game_name}#{riot_account.tag_line}** "
+                   f"wurde erfolgreich als Spieler **'{player.display_name}'** registriert und verknüpft!")
+    else:
+        message = _register_failed_message(payload)
+    if payload.get('interaction_token'):
+        send_interaction_followup(payload['application_id'], payload['interaction_token'], message)
+
+
+def give_up_register(payload: dict) -> None:
+    # Erst nach dem letzten Versuch antworten, sonst sieht der Nutzer einen Fehler, obwohl der Retry noch klappen kann
+    if payload.get('interaction_token'):
+        send_interaction_followup(payload['application_id'], payload['interaction_token'],
+                                  _register_failed_message(payload))
+
+
+def handle_refresh_rank(payload: dict) -> None:
+    riot_account = crud.get_riot_account_by_puuid(payload['puuid'])
+    if riot_account is None:
+        logger.warning("Riot account with PUUID %s no longer exists, skipping refresh.", payload['puuid'],
+                       extra={'action': 'SYNC_REFRESH_ACCOUNT_MISSING'})
+        return
+    with api.raise_on_transient_errors():
+        data_manager.sync_tft_rank_for_account(riot_account)
+
+
+HANDLERS = {
+    'register': handle_register,
+    'refresh_rank': handle_refresh_rank,
+}
+
+GIVE_UP_HANDLERS = {
+    'register': give_up_register,
+}
+
+
+class SyncWorker:
+    """
+    Claims jobs, runs them in a thread pool and keeps their leases alive.
+    """
+    def __init__(self, worker_id: str | None = None, concurrency: int = SYNC_WORKER_CONCURRENCY,
+                 lease_seconds: float = SYNC_WORKER_LEASE_SECONDS, poll_seconds: float = SYNC_WORKER_POLL_SECONDS,
+                 handlers: dict | None = None, give_up_handlers: dict | None = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.concurrency = max(concurrency, 1)
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.handlers = HANDLERS if handlers is None else handlers
+        self.give_up_handlers = GIVE_UP_HANDLERS if give_up_handlers is None else give_up_handlers
+        self._stop = threading.Event()
+        # Eigenes Signal: der Heartbeat muss die Leases auch während des Drains nach stop() verlängern
+        self._heartbeat_stop = threading.Event()
+        self._running: dict[str, object] = {}  # job_id -> Future
+        self._lock = threading.Lock()
+        self.counters = {'completed': 0, 'retried': 0, 'dead': 0, 'lost_leases': 0}
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_job(self, job) -> None:
+        """Runs one claimed job and records the outcome."""
+        handler = self.handlers.get(job.kind)
+        started = time.perf_counter()
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for sync job kind '{job.kind}'.")
+            handler(job.payload)
+        except Exception as e:
+            delay, give_up = self._retry_plan(job)
+            status = crud.fail_sync_job(job.job_id, self.worker_id, f"{type(e).__name__}: {e}", delay, give_up=give_up)
+            self.counters['dead' if status == crud.SYNC_JOB_DEAD else 'retried'] += 1
+            logger.warning("Sync job %s (%s) failed on attempt %s/%s: %s", job.job_id, job.kind, job.attempts,
+                           job.max_attempts, e, extra={'action': 'SYNC_JOB_FAILED'})
+            if status == crud.SYNC_JOB_DEAD and job.kind in self.give_up_handlers:
+                try:
+                    self.give_up_handlers[job.kind](job.payload)
+                except Exception as give_up_error:
+                    logger.error("Give-up handler of sync job %s failed: %s", job.job_id, give_up_error,
+                                 extra={'action': 'SYNC_JOB_GIVE_UP_FAILED'})
+            return
+        if crud.complete_sync_job(job.job_id, self.worker_id):
+            self.counters['completed'] += 1
+            logger.debug("Sync job %s (%s) done in %.2fs.", job.job_id, job.kind, time.perf_counter() - started,
+                         extra={'action': 'SYNC_JOB_DONE'})
+        else:
+            # Lease verloren (z.B. Heartbeat ausgefallen): ein anderer Worker wiederholt den Job
+            self.counters['lost_leases'] += 1
+            logger.warning("Sync job %s finished after its lease was lost.", job.job_id,
+                           extra={'action': 'SYNC_JOB_LEASE_LOST'})
+
+    def _retry_plan(self, job) -> tuple[float, bool]:
+        """
+        Returns (retry delay, give up now). Jobs that answer an interaction must get their
+        last reply out while the token is valid: the backoff is capped to the time left,
+        and with no time left the job is given up right away.
+        """
+        delay = retry_delay(job.attempts)
+        if not job.payload.get('interaction_token'):
+            return delay, False
+        try:
+            age = (crud.get_database_time() - job.created_at).total_seconds()
+        except Exception:
+            return delay, False
+        time_left = INTERACTION_TOKEN_SECONDS - INTERACTION_FOLLOWUP_MARGIN_SECONDS - age
+        if time_left <= 0:
+            return 0, True
+        return min(delay, time_left), False
+
+    def run_once(self) -> int:
+        """Claims and runs due jobs in the calling thread until none are left. Returns the number run."""
+        count = 0
+        while True:
+            jobs = crud.claim_sync_jobs(self.worker_id, self.concurrency, self.lease_seconds, list(self.handlers))
+            if not jobs:
+                return count
+            for job in jobs:
+                self.run_job(job)
+            count += len(jobs)
+
+    def run_forever(self) -> None:
+        """Polls the queue until stop() is called; running jobs are finished before returning."""
+        logger.info("Sync worker '%s' started (concurrency %s, lease %ss).", self.worker_id, self.concurrency,
+                    self.lease_seconds, extra={'action': 'SYNC_WORKER_STARTED'})
+        heartbeat = threading.Thread(target=self._heartbeat, name="sync-worker-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="sync-job") as pool:
+                while not self._stop.is_set():
+                    with self._lock:
+                        free = self.concurrency - len(self._running)
+                    jobs = crud.claim_sync_jobs(self.worker_id, free, self.lease_seconds, list(self.handlers)) if free else []
+                    for job in jobs:
+                        with self._lock:
+                            self._running[job.job_id] = pool.submit(self._run_tracked, job)
+                    if not jobs:
+                        self._stop.wait(self.poll_seconds)
+        finally:
+            # Erst nach dem Drain: bis hierhin verlängert der Heartbeat die Leases der laufenden Jobs
+            self._heartbeat_stop.set()
+            heartbeat.join()
+        logger.info("Sync worker '%s' stopped: %s", self.worker_id, self.counters, extra={'action': 'SYNC_WORKER_STOPPED'})
+
+    def _run_tracked(self, job) -> None:
+        try:
+            self.run_job(job)
+        finally:
+            with self._lock:
+                self._running.pop(job.job_id, None)
+
+    def _heartbeat(self) -> None:
+        while not self._heartbeat_stop.wait(self.lease_seconds / 3):
+            with self._lock:
+                job_ids = list(self._running)
+            if job_ids:
+                renewed = crud.renew_sync_job_leases(self.worker_id, job_ids, self.lease_seconds)
+                if renewed is not None and renewed < len(job_ids):
+                    logger.warning("Renewed only %s of %s leases.", renewed, len(job_ids),
+                                   extra={'action': 'SYNC_WORKER_HEARTBEAT_PARTIAL'})
+
+
+class PartitionedRankPoller:
+    """
+    Polls the ranks of all tracked accounts in the partitions this worker holds.
+    A partition is polled when its last pass (by any worker) is older than the interval.
+    """
+    def __init__(self, coordinator: partition_leases.PartitionCoordinator,
+                 interval_seconds: float = RANK_SYNC_INTERVAL_MINUTES * 60, check_seconds: float = 10,
+                 sync_account=None):
+        self.coordinator = coordinator
+        self.interval_seconds = interval_seconds
+        self.check_seconds = check_seconds
+        self.sync_account = sync_account or data_manager.sync_tft_rank_for_account
+        self.buckets = partition_leases.SYNC_PARTITION_BUCKETS
+        self._stop = threading.Event()
+        self.counters = {'partitions_polled': 0, 'accounts_polled': 0, 'passes_aborted': 0,
+                         'accounts_unpartitioned': 0}
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def due_partitions(self) -> list[str]:
+        owned = self.coordinator.owned()
+        if not owned:
+            return []
+        leases = crud.get_sync_partition_leases(owned)
+        if leases is None:
+            return []
+        now = crud.get_database_time()
+        return [lease['partition_key'] for lease in leases
+                if lease['last_synced_at'] is None
+                or (now - lease['last_synced_at']).total_seconds() >= self.interval_seconds]
+
+    def poll_partition(self, partition_key: str) -> int | None:
+        """
+        Polls every account of one partition. Stops as soon as the lease is lost.
+
+        Returns:
+            The number of polled accounts, or None if the pass was aborted.
+        """
+        tracked_accounts = crud.get_tracked_riot_accounts(regions=[partition_leases.platform_of(partition_key)])
+        if tracked_accounts is None:
+            return None
+        accounts = [account for account, _ in tracked_accounts
+                    if partition_leases.partition_for_account(account.region, account.riot_account_id,
+                                                              self.buckets) == partition_key]
+        for account in accounts:
+            if self._stop.is_set() or not self.coordinator.holds(partition_key):
+                self.counters['passes_aborted'] += 1
+                logger.info("Stopped polling partition '%s' (lease lost or shutdown).", partition_key,
+                            extra={'action': 'PARTITION_POLL_ABORTED'})
+                return None
+            try:
+                self.sync_account(account)
+            except Exception as e:
+                logger.error("Rank poll of %s failed: %s", account.riot_account_id, e,
+                             extra={'action': 'PARTITION_POLL_ACCOUNT_FAILED'})
+        crud.mark_sync_partition_synced(self.coordinator.owner, partition_key)
+        self.counters['partitions_polled'] += 1
+        self.counters['accounts_polled'] += len(accounts)
+        return len(accounts)
+
+    def check_unpartitioned_accounts(self) -> int | None:
+        """
+        Counts tracked accounts whose region belongs to no partition (e.g. a mistyped region
+        from /register). No worker ever polls them, so they are logged instead of vanishing.
+
+        Returns:
+            The number of such accounts, or None on a database error.
+        """
+        tracked_accounts = crud.get_tracked_riot_accounts()
+        if tracked_accounts is None:
+            return None
+        platforms = set(partition_leases.all_partitions(buckets=1))
+        unpartitioned = [account for account, _ in tracked_accounts
+                         if constants.normalize_region(account.region) not in platforms]
+        self.counters['accounts_unpartitioned'] = len(unpartitioned)
+        if unpartitioned:
+            logger.warning("%s tracked account(s) fall into no partition and are never polled (regions: %s).",
+                           len(unpartitioned), sorted({account.region for account in unpartitioned}),
+                           extra={'action': 'PARTITION_ACCOUNTS_UNPARTITIONED'})
+        return len(unpartitioned)
+
+    def run_once(self) -> int:
+        """Polls all due partitions this worker holds. Returns the number of polled partitions."""
+        polled = 0
+        for partition_key in self.due_partitions():
+            if self._stop.is_set():
+                break
+            if self.poll_partition(partition_key) is not None:
+                polled += 1
+        return polled
+
+    def run_forever(self) -> None:
+        next_check = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() >= next_check:
+                    self.check_unpartitioned_accounts()
+                    next_check = time.monotonic() + self.interval_seconds
+                self.run_once()
+            except Exception as e:
+                logger.exception("Partitioned rank poll failed: %s", e, extra={'action': 'PARTITION_POLL_FAILED'})
+            self._stop.wait(self.check_seconds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Runs background sync jobs from the durable job queue.")
+    parser.add_argument("--worker-id", help="Stable name of this worker (default: host:pid:random).")
+    parser.add_argument("--concurrency", type=int, default=SYNC_WORKER_CONCURRENCY, help="Jobs run in parallel.")
+    parser.add_argument("--poll-ranks", action="store_true", default=WORKER_RANK_POLLING,
+                        help="Also poll the ranks of the partitions this worker holds a lease on.")
+    args = parser.parse_args()
+
+    worker = SyncWorker(worker_id=args.worker_id, concurrency=args.concurrency)
+    coordinator = poller = poller_thread = None
+    if args.poll_ranks:
+        # Mehrere Worker können Buckets derselben Plattform halten: jeder nutzt nur seinen Anteil am Budget
+        coordinator = partition_leases.PartitionCoordinator(
+            worker.worker_id,
+            on_change=lambda held: api.configure_rate_limits(partition_leases.rate_limit_share(api.RATE_LIMITS, held))
+        )
+        poller = PartitionedRankPoller(coordinator)
+        coordinator.start()
+        poller_thread = threading.Thread(target=poller.run_forever, name="rank-poller", daemon=True)
+        poller_thread.start()
+
+    def shutdown(signum, frame):
+        # Keine neuen Jobs mehr annehmen, laufende zu Ende bringen
+        worker.stop()
+        if poller is not None:
+            poller.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    try:
+        worker.run_forever()
+    finally:
+        if poller_thread is not None:
+            poller_thread.join()
+            # Leases sofort freigeben, damit die anderen Worker übernehmen
+            coordinator.stop()
+        # Im Fallback ohne logging_setup gibt es nichts zu leeren
+        if 'logging_setup' in globals():
+            logging_setup.shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
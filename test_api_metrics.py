@@ -0,0 +1,72 @@
+import threading
+import time
+import unittest
+
+import api_metrics
+from riot_api_handler import RateLimiter
+
+
+class TestApiMetrics(unittest.TestCase):
+
+    def setUp(self):
+        api_metrics.reset()
+        api_metrics.set_budget_source(lambda: [(20, 1, 15), (100, 120, 80)])
+
+    def tearDown(self):
+        api_metrics.set_budget_source(None)
+
+    def test_request_histogram_and_status_counter(self):
+        api_metrics.observe_request('tft_league_by_puuid', 'euw1.api.riotgames.com', 0.2, 200)
+        api_metrics.observe_request('tft_league_by_puuid', 'euw1.api.riotgames.com', 3.0, 429)
+        text = api_metrics.render_prometheus()
+
+        labels = 'endpoint="tft_league_by_puuid",host="euw1.api.riotgames.com"'
+        self.assertIn(f'riot_api_request_duration_seconds_bucket{{{labels},le="0.25"}} 1', text)
+        self.assertIn(f'riot_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', text)
+        self.assertIn(f'riot_api_request_duration_seconds_count{{{labels}}} 2', text)
+        self.assertIn(f'riot_api_responses_total{{{labels},status="429"}} 1', text)
+
+    def test_rate_budget_is_read_at_render_time(self):
+        text = api_metrics.render_prometheus()
+        self.assertIn('riot_api_rate_budget_remaining{window="1s"} 15', text)
+        self.assertIn('riot_api_rate_budget_limit{window="120s"} 100', text)
+
+    def test_limiter_wait_histogram(self):
+        api_metrics.observe_limiter_wait(0.0)
+        api_metrics.observe_limiter_wait(2.0)
+        snapshot = api_metrics.get_snapshot()
+        self.assertEqual(snapshot['limiter_wait']['count'], 2)
+        self.assertIn('riot_api_limiter_wait_seconds_bucket{le="5.0"} 2', api_metrics.render_prometheus())
+
+
+
+class TestRateLimiterBudget(unittest.TestCase):
+
+    def test_remaining_does_not_wait_for_a_blocked_acquire(self):
+        limiter = RateLimiter([(2, 2)])
+        limiter.acquire()
+        limiter.acquire()
+        waiter = threading.Thread(target=limiter.acquire, daemon=True)
+        waiter.start()
+        time.sleep(0.1)
+        self.assertTrue(waiter.is_alive())
+
+        started = time.monotonic()
+        self.assertEqual(limiter.remaining(), [(2, 2, 0)])
+        self.assertLess(time.monotonic() - started, 0.1)
+        waiter.join(timeout=5)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(limiter.remaining(), [(2, 2, 1)])
+
+    def test_acquire_timeout_does_not_reserve(self):
+        limiter = RateLimiter([(1, 5)])
+        limiter.acquire()
+        started = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            limiter.acquire(timeout=0.5)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(limiter.remaining(), [(1, 5, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
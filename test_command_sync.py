@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import discord
+from discord import app_commands
+
+import discord_bot
+
+
+class TestCommandSync(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        state_dir = tempfile.mkdtemp(prefix="command_sync_")
+        patcher = mock.patch.object(discord_bot, 'COMMAND_SYNC_STATE_FILE', os.path.join(state_dir, 'state.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.bot = discord_bot.MyBot()
+        self.addAsyncCleanup(self.bot.job_queue.stop)
+        self.bot._connection.application_id = 1234
+
+        @app_commands.command(name="ping", description="Ping")
+        async def ping(interaction: discord.Interaction):
+            pass
+        self.bot.tree.add_command(ping)
+        self.bot.tree.sync = mock.AsyncMock(return_value=[])
+
+    def _add_command(self, name):
+        @app_commands.command(name=name, description=name)
+        async def command(interaction: discord.Interaction, value: int):
+            pass
+        self.bot.tree.add_command(command)
+
+    async def test_unchanged_tree_is_not_synced_again(self):
+        await self.bot.sync_command_tree()
+        await self.bot.sync_command_tree()
+        self.assertEqual(self.bot.tree.sync.await_count, 1)
+
+        self._add_command("pong")
+        await self.bot.sync_command_tree()
+        self.assertEqual(self.bot.tree.sync.await_count, 2)
+
+    async def test_force_sync(self):
+        await self.bot.sync_command_tree()
+        with mock.patch.object(discord_bot, 'FORCE_COMMAND_SYNC', True):
+            await self.bot.sync_command_tree()
+        self.assertEqual(self.bot.tree.sync.await_count, 2)
+
+    def test_hash_ignores_registration_order(self):
+        first = discord_bot.command_tree_hash(self.bot.tree, None)
+        self._add_command("alpha")
+        self._add_command("beta")
+        with_both = discord_bot.command_tree_hash(self.bot.tree, None)
+        self.bot.tree.remove_command("alpha")
+        self.bot.tree.remove_command("beta")
+        self._add_command("beta")
+        self._add_command("alpha")
+        self.assertNotEqual(first, with_both)
+        self.assertEqual(discord_bot.command_tree_hash(self.bot.tree, None), with_both)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+
+import event_buffer
+
+
+class _RecordingWriter:
+    def __init__(self, fail_times=0):
+        self.batches = []
+        self.fail_times = fail_times
+
+    def __call__(self, rows):
+        if self.fail_times:
+            self.fail_times -= 1
+            return None
+        self.batches.append(rows)
+        return len(rows)
+
+
+class TestWriteBehindBuffer(unittest.IsolatedAsyncioTestCase):
+
+    def _buffer(self, **kwargs):
+        self.servers = kwargs.pop('server_writer', _RecordingWriter())
+        self.accounts = kwargs.pop('account_writer', _RecordingWriter())
+        kwargs.setdefault('flush_seconds', 60)
+        return event_buffer.WriteBehindBuffer(server_writer=self.servers, account_writer=self.accounts, **kwargs)
+
+    async def test_updates_are_coalesced_per_id(self):
+        buffer = self._buffer()
+        buffer.record_member("1", "old")
+        buffer.record_member("1", "new")
+        buffer.record_member("2", "other")
+        buffer.record_server("10", "Guild", "1")
+        self.assertTrue(await buffer.flush())
+
+        self.assertEqual(self.accounts.batches, [[
+            {'discord_user_id': "1", 'username': "new", 'discriminator': None},
+            {'discord_user_id': "2", 'username': "other", 'discriminator': None},
+        ]])
+        self.assertEqual(len(self.servers.batches), 1)
+        self.assertEqual(buffer.stats()['coalesced'], 1)
+        self.assertEqual(buffer.pending(), 0)
+
+    async def test_batch_size_triggers_flush_in_batches(self):
+        buffer = self._buffer(max_batch=3)
+        buffer.start()
+        try:
+            for user_id in range(7):
+                buffer.record_member(str(user_id), f"user{user_id}")
+            for _ in range(50):
+                await asyncio.sleep(0.01)
+                if buffer.pending() == 0:
+                    break
+        finally:
+            await buffer.stop()
+        self.assertEqual(sorted(len(batch) for batch in self.accounts.batches), [1, 3, 3])
+
+    async def test_failed_flush_keeps_rows_without_overwriting_newer_ones(self):
+        buffer = self._buffer(account_writer=_RecordingWriter(fail_times=1))
+        buffer.record_member("1", "first")
+        buffer.record_member("2", "second")
+        self.assertFalse(await buffer.flush())
+        self.assertEqual(buffer.pending(), 2)
+
+        buffer.record_member("1", "renamed")
+        self.assertTrue(await buffer.flush())
+        written = {row['discord_user_id']: row['username'] for row in self.accounts.batches[0]}
+        self.assertEqual(written, {"1": "renamed", "2": "second"})
+
+    async def test_stop_flushes_pending_updates(self):
+        buffer = self._buffer()
+        buffer.start()
+        buffer.record_server("10", "Guild")
+        await buffer.stop()
+        self.assertEqual(self.servers.batches, [[{'server_id': "10", 'server_name': "Guild", 'owner_id': None}]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+# test_helpers.py
+"""Shared fixtures for the unittest modules."""
+import os
+import shutil
+import tempfile
+import unittest
+
+import sqlalchemy
+
+import database_crud as crud
+from ORM_models import Base
+
+
+def use_temp_sqlite(test_case: unittest.TestCase, prefix: str, filename: str = "test.db",
+                    **engine_kwargs) -> tuple[str, str]:
+    """
+    Creates the schema in a fresh SQLite file and points database_crud at it until the test ends.
+
+    Returns:
+        (temp_dir, db_path); the directory is removed in the test's cleanup.
+    """
+    temp_dir = tempfile.mkdtemp(prefix=prefix)
+    test_case.addCleanup(shutil.rmtree, temp_dir, ignore_errors=True)
+    db_path = os.path.join(temp_dir, filename)
+    engine = sqlalchemy.create_engine(f"sqlite:///{db_path}", **engine_kwargs)
+    Base.metadata.create_all(engine)
+    # Die anderen Testdateien laufen im selben Prozess gegen die Engine aus der .env
+    test_case.addCleanup(engine.dispose)
+    test_case.addCleanup(crud.configure_engine, crud.get_engine())
+    crud.configure_engine(engine)
+    return temp_dir, db_path
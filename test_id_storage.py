@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+import unittest
+import uuid
+
+import sqlalchemy
+from sqlalchemy import Column, Integer, MetaData, Table, select, text
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+import database_crud as crud
+import db_types
+from ORM_models import Base
+from test_helpers import use_temp_sqlite
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestCompactUUID(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sqlalchemy.create_engine("sqlite://")
+        self.addCleanup(self.engine.dispose)
+        self.table = Table('ids', MetaData(), Column('id', Integer, primary_key=True),
+                           Column('value', db_types.CompactUUID(), nullable=True))
+        self.table.metadata.create_all(self.engine)
+
+    def test_round_trip_through_sqlite(self):
+        value = db_types.new_uuid()
+        with self.engine.begin() as connection:
+            connection.execute(self.table.insert(), [{'id': 1, 'value': value}, {'id': 2, 'value': None},
+                                                     {'id': 3, 'value': value.upper()}])
+            stored = connection.execute(text("SELECT value FROM ids WHERE id = 1")).scalar_one()
+            self.assertEqual(stored, uuid.UUID(value).bytes)
+            rows = dict(connection.execute(select(self.table.c.id, self.table.c.value)).all())
+            # Vergleiche in WHERE binden den Parameter ebenfalls als 16 Bytes
+            found = connection.execute(select(self.table.c.id).where(self.table.c.value == value.upper())).scalars()
+        self.assertEqual(rows, {1: value, 2: None, 3: value})
+        self.assertEqual(sorted(found), [1, 3])
+
+    def test_dialect_types(self):
+        column_type = db_types.CompactUUID()
+        value = db_types.new_uuid()
+        self.assertIsInstance(column_type.load_dialect_impl(postgresql.dialect()), postgresql.UUID)
+        self.assertIsInstance(column_type.load_dialect_impl(mysql.dialect()), sqlalchemy.BINARY)
+        self.assertEqual(column_type.process_bind_param(value, postgresql.dialect()), value)
+        self.assertEqual(column_type.process_result_value(uuid.UUID(value), postgresql.dialect()), value)
+        self.assertEqual(column_type.process_result_value(bytearray(uuid.UUID(value).bytes), mysql.dialect()), value)
+        for dialect in (postgresql.dialect(), mysql.dialect(), sqlite.dialect()):
+            self.assertIsNone(column_type.process_bind_param(None, dialect))
+            self.assertIsNone(column_type.process_result_value(None, dialect))
+        with self.assertRaises(ValueError):
+            column_type.process_bind_param("not-a-uuid", sqlite.dialect())
+
+
+@unittest.skipUnless(db_types.ID_STORAGE == db_types.ID_STORAGE_STRING, "source database needs the string schema")
+class TestIdStorageMigration(unittest.TestCase):
+    """Migrates a small string-ID SQLite database and checks the compact copy."""
+
+    def setUp(self):
+        self.temp_dir, self.source_path = use_temp_sqlite(self, "id_migration_", "source.db")
+        self.target_path = os.path.join(self.temp_dir, "target.db")
+
+        crud.add_or_update_server("S1", "Server")
+        for index in range(3):
+            player = crud.add_player(f"Player {index}")
+            account = crud.add_or_update_riot_account(f"PUUID{index}", f"Name{index}", "TAG", "euw1")
+            crud.link_player_to_riot_account(player.player_id, account.riot_account_id, is_primary=True)
+            crud.add_player_to_server(player.player_id, "S1")
+            for lp in (10, 20 + index):
+                crud.add_lp_history_entry(account.riot_account_id, 'RANKED_TFT', lp, 'GOLD', 'II', lp, 1)
+        crud.update_player_display_name(player.player_id, "Renamed")
+        crud.add_or_update_riot_account("PUUID0", "Renamed0", "TAG", "euw1")
+
+    def _counts(self, path: str) -> dict:
+        engine = sqlalchemy.create_engine(f"sqlite:///{path}")
+        try:
+            with engine.connect() as connection:
+                return {table.name: connection.execute(text(f"SELECT COUNT(*) FROM {table.name}")).scalar_one()
+                        for table in Base.metadata.sorted_tables}
+        finally:
+            engine.dispose()
+
+    def test_migration_keeps_rows_and_references(self):
+        # Eigener Prozess: migrate_id_storage stellt beim Import auf das kompakte Schema um
+        subprocess.run(
+            [sys.executable, os.path.join(REPO_ROOT, "migrate_id_storage.py"),
+             "--source-url", f"sqlite:///{self.source_path}", "--target-url", f"sqlite:///{self.target_path}",
+             "--chunk-size", "2"],
+            cwd=self.temp_dir, env=dict(os.environ, LOG_LEVEL='ERROR'), stdout=subprocess.DEVNULL, check=True
+        )
+
+        source_counts = self._counts(self.source_path)
+        self.assertEqual(self._counts(self.target_path), source_counts)
+        self.assertEqual(source_counts['riot_account_lp_history'], 6)
+        self.assertEqual(source_counts['riot_account_current_rank'], 3)
+
+        engine = sqlalchemy.create_engine(f"sqlite:///{self.target_path}")
+        self.addCleanup(engine.dispose)
+        with engine.connect() as connection:
+            self.assertEqual(connection.execute(text("PRAGMA foreign_key_check")).all(), [])
+            id_lengths = connection.execute(text("SELECT DISTINCT length(riot_account_id) FROM riot_accounts")).all()
+            orphaned = connection.execute(text(
+                "SELECT COUNT(*) FROM riot_account_lp_history h "
+                "LEFT JOIN riot_accounts a ON a.riot_account_id = h.riot_account_id "
+                "WHERE a.riot_account_id IS NULL")).scalar_one()
+            current_keys = connection.execute(text(
+                "SELECT COUNT(*) FROM riot_account_current_rank c "
+                "JOIN riot_account_lp_history h ON h.lp_history_id = c.lp_history_id "
+                "WHERE h.league_points = c.league_points")).scalar_one()
+        self.assertEqual(id_lengths, [(16,)])
+        self.assertEqual(orphaned, 0)
+        self.assertEqual(current_keys, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+
+import job_queue
+
+
+class _RecordingJob(job_queue.Job):
+    kind = 'test'
+
+    def __init__(self, name, log, gate=None, fail=False):
+        super().__init__()
+        self.name = name
+        self.log = log
+        self.gate = gate
+        self.fail = fail
+        self.error = None
+        self.cancelled = False
+
+    def key(self):
+        return (self.name,)
+
+    async def run(self):
+        self.log.append(('start', self.name))
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.fail:
+            raise RuntimeError("boom")
+        self.log.append(('done', self.name))
+
+    async def on_error(self, error):
+        self.error = error
+
+    async def on_cancel(self):
+        self.cancelled = True
+
+
+class TestJobQueue(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.queue = job_queue.JobQueue(max_size=2, workers=1)
+        self.queue.start()
+
+    async def asyncTearDown(self):
+        await self.queue.stop()
+
+    async def test_duplicates_are_rejected_while_queued_or_running(self):
+        log, gate = [], asyncio.Event()
+        self.assertEqual(self.queue.submit(_RecordingJob('a', log, gate)), job_queue.QUEUED)
+        await asyncio.sleep(0)  # Worker übernimmt den Job
+        self.assertEqual(self.queue.submit(_RecordingJob('a', log, gate)), job_queue.DUPLICATE)
+
+        gate.set()
+        await self.queue.join()
+        # Nach Abschluss darf derselbe Job erneut eingereicht werden
+        self.assertEqual(self.queue.submit(_RecordingJob('a', log)), job_queue.QUEUED)
+        await self.queue.join()
+        self.assertEqual(self.queue.stats()['rejected_duplicate'], 1)
+        self.assertEqual(self.queue.stats()['processed'], 2)
+
+    async def test_full_queue_rejects_and_depth_is_visible(self):
+        log, gate = [], asyncio.Event()
+        self.queue.submit(_RecordingJob('running', log, gate))
+        await asyncio.sleep(0)
+        self.assertEqual(self.queue.submit(_RecordingJob('b', log, gate)), job_queue.QUEUED)
+        self.assertEqual(self.queue.submit(_RecordingJob('c', log, gate)), job_queue.QUEUED)
+        self.assertEqual(self.queue.submit(_RecordingJob('d', log, gate)), job_queue.QUEUE_FULL)
+
+        stats = self.queue.stats()
+        self.assertEqual((stats['queued'], stats['running'], stats['rejected_full']), (2, 1, 1))
+        gate.set()
+        await self.queue.join()
+        self.assertEqual([name for event, name in log if event == 'done'], ['running', 'b', 'c'])
+
+    async def test_failing_job_calls_on_error_and_worker_survives(self):
+        log = []
+        failing = _RecordingJob('bad', log, fail=True)
+        self.queue.submit(failing)
+        self.queue.submit(_RecordingJob('good', log))
+        await self.queue.join()
+
+        self.assertIsInstance(failing.error, RuntimeError)
+        self.assertIn(('done', 'good'), log)
+        self.assertEqual(self.queue.stats()['failed'], 1)
+
+    async def test_stop_answers_queued_and_running_jobs(self):
+        log, gate = [], asyncio.Event()
+        running, queued = _RecordingJob('running', log, gate), _RecordingJob('queued', log, gate)
+        self.queue.submit(running)
+        await asyncio.sleep(0)
+        self.queue.submit(queued)
+
+        await self.queue.stop()
+        self.assertTrue(running.cancelled)
+        self.assertTrue(queued.cancelled)
+        self.assertEqual(log, [('start', 'running')])
+        self.assertEqual(self.queue.depth(), 0)
+
+    async def test_concurrency_is_bounded_by_worker_count(self):
+        queue = job_queue.JobQueue(max_size=10, workers=3)
+        queue.start()
+        log, gate = [], asyncio.Event()
+        for index in range(6):
+            queue.submit(_RecordingJob(str(index), log, gate))
+        await asyncio.sleep(0.01)
+        self.assertEqual(queue.stats()['running'], 3)
+        gate.set()
+        await queue.join()
+        await queue.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+import ladder
+
+
+class TestLadderScore(unittest.TestCase):
+    """Tests for the integer tier/division/ladder score encodings in ladder.py."""
+
+    def test_divisions_are_ordered_within_a_tier(self):
+        scores = [ladder.compute_ladder_score('GOLD', division, 50) for division in ('IV', 'III', 'II', 'I')]
+        self.assertEqual(scores, sorted(scores))
+        self.assertEqual(scores[1] - scores[0], 100)
+
+    def test_tiers_are_ordered(self):
+        self.assertLess(ladder.compute_ladder_score('GOLD', 'I', 99),
+                        ladder.compute_ladder_score('PLATINUM', 'IV', 0))
+        self.assertLess(ladder.compute_ladder_score('DIAMOND', 'I', 99),
+                        ladder.compute_ladder_score('MASTER', 'I', 0))
+
+    def test_apex_tiers_share_one_lp_scale(self):
+        # Apex LP is one open-ended scale, the tier name does not add points
+        self.assertEqual(ladder.compute_ladder_score('MASTER', 'I', 500),
+                         ladder.compute_ladder_score('GRANDMASTER', 'I', 500))
+        self.assertLess(ladder.compute_ladder_score('GRANDMASTER', 'I', 400),
+                        ladder.compute_ladder_score('CHALLENGER', 'I', 900))
+
+    def test_lowest_rank_is_zero(self):
+        self.assertEqual(ladder.compute_ladder_score('IRON', 'IV', 0), 0)
+
+    def test_unranked_has_no_score(self):
+        self.assertIsNone(ladder.compute_ladder_score(None, None, 0))
+        self.assertIsNone(ladder.compute_ladder_score('UNKNOWN', 'I', 10))
+        self.assertIsNone(ladder.compute_ladder_score('GOLD', None, 10))
+
+    def test_small_int_codes(self):
+        self.assertEqual(ladder.encode_tier('iron'), 0)
+        self.assertEqual(ladder.encode_tier('CHALLENGER'), 9)
+        self.assertEqual(ladder.encode_division('I'), 1)
+        self.assertEqual(ladder.encode_division('IV'), 4)
+        self.assertEqual(ladder.decode_tier(ladder.encode_tier('EMERALD')), 'EMERALD')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import logging
+import queue
+import random
+import threading
+import unittest
+import unittest.mock
+
+import logging_setup
+
+
+class _CollectingHandler(logging.Handler):
+    """Keeps the formatted messages and the thread that emitted them."""
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        self.messages = []
+        self.threads = set()
+        self.flushed = False
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+        self.threads.add(threading.current_thread())
+
+    def flush(self):
+        self.flushed = True
+
+
+class TestQueueBackend(unittest.TestCase):
+
+    def setUp(self):
+        # Eigenes Backend statt des globalen, das die anderen Module bereits gestartet haben
+        self.output = _CollectingHandler()
+        log_queue = queue.Queue(maxsize=10000)
+        self.queue_handler = logging_setup.NonBlockingQueueHandler(log_queue)
+        self.listener = logging_setup._DrainingQueueListener(log_queue, self.output, respect_handler_level=True)
+        self.logger = logging.getLogger(f"TEST_LOGGING_SETUP_{id(self)}")
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        self.logger.addHandler(self.queue_handler)
+        self.addCleanup(self.logger.removeHandler, self.queue_handler)
+
+    def test_records_are_formatted_on_the_listener_thread(self):
+        self.listener.start()
+        self.logger.info("Player %s has %s LP", "Alpha", 42)
+        self.listener.stop()
+
+        self.assertEqual(self.output.messages, ["INFO Player Alpha has 42 LP"])
+        self.assertNotIn(threading.current_thread(), self.output.threads)
+
+    def test_shutdown_flushes_pending_records(self):
+        # Erst loggen, dann den Listener starten: alle Records liegen noch in der Queue
+        for index in range(500):
+            self.logger.debug("record %s", index)
+        self.listener.start()
+        with unittest.mock.patch.object(logging_setup, '_listener', self.listener), \
+                unittest.mock.patch.object(logging_setup, '_queue_handler', self.queue_handler):
+            logging_setup.shutdown_logging()
+            self.assertIsNone(logging_setup._listener)
+            # Ein zweiter Aufruf ist harmlos
+            logging_setup.shutdown_logging()
+
+        self.assertEqual(len(self.output.messages), 500)
+        self.assertEqual(self.output.messages[-1], "DEBUG record 499")
+        self.assertTrue(self.output.flushed)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = logging_setup.NonBlockingQueueHandler(queue.Queue(maxsize=2))
+        for index in range(5):
+            handler.handle(logging.LogRecord("t", logging.INFO, __file__, 0, "m %s", (index,), None))
+        self.assertEqual(handler.dropped, 3)
+
+
+class TestActionSamplingFilter(unittest.TestCase):
+
+    def _record(self, level, action):
+        record = logging.LogRecord("t", level, __file__, 0, "message", (), None)
+        if action is not None:
+            record.action = action
+        return record
+
+    def test_sampled_share_and_levels(self):
+        sampling = logging_setup.ActionSamplingFilter({'HOT': 0.1, 'MUTED': 0.0})
+        with unittest.mock.patch.object(logging_setup.random, 'random', random.Random(7).random):
+            passed = sum(sampling.filter(self._record(logging.INFO, 'HOT')) for _ in range(10000))
+            self.assertAlmostEqual(passed / 10000, 0.1, delta=0.02)
+            self.assertFalse(any(sampling.filter(self._record(logging.DEBUG, 'MUTED')) for _ in range(100)))
+            # Warnungen und Fehler werden nie gesampelt
+            for level in (logging.WARNING, logging.ERROR, logging.CRITICAL):
+                self.assertTrue(all(sampling.filter(self._record(level, 'MUTED')) for _ in range(100)))
+            self.assertTrue(sampling.filter(self._record(logging.INFO, 'OTHER')))
+            self.assertTrue(sampling.filter(self._record(logging.INFO, None)))
+
+    def test_parse_sample_rates(self):
+        self.assertEqual(logging_setup.parse_sample_rates("A=0.5, B=2,broken,C=x"), {'A': 0.5, 'B': 1.0})
+        self.assertEqual(logging_setup.parse_sample_rates(None), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import importlib.util
+import os
+import unittest
+from datetime import datetime
+
+import database_crud as crud
+import lp_archive
+from ORM_models import RiotAccountLPHistory
+from test_helpers import use_temp_sqlite
+
+
+@unittest.skipUnless(importlib.util.find_spec('pyarrow') and importlib.util.find_spec('pandas'),
+                     "the LP archive needs the optional pyarrow (and pandas) packages")
+class TestLPArchive(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir, _ = use_temp_sqlite(self, "lp_archive_", "archive.db")
+        self.archive_dir = os.path.join(temp_dir, "archive")
+
+        self.euw = crud.add_or_update_riot_account("ARCHIVE_EUW", "Euw", "TAG", "euw1").riot_account_id
+        self.na = crud.add_or_update_riot_account("ARCHIVE_NA", "Na", "TAG", "na1").riot_account_id
+        self.rows = [
+            (self.euw, datetime(2024, 1, 30, 10, 0), 10),
+            (self.na, datetime(2024, 1, 31, 12, 0), 20),
+            (self.euw, datetime(2024, 2, 2, 8, 30), 30),
+            (self.euw, datetime(2024, 2, 20, 9, 0), 40),
+        ]
+        with crud.session_scope() as session:
+            session.add_all(RiotAccountLPHistory(riot_account_id=account_id, queue_type='RANKED_TFT',
+                                                 league_points=lp, tier='GOLD', division='I', wins=lp, losses=1,
+                                                 ladder_score=1300 + lp, retrieved_at=retrieved_at)
+                            for account_id, retrieved_at, lp in self.rows)
+
+    def test_export_and_read_round_trip(self):
+        self.assertEqual(lp_archive.export_lp_history(self.archive_dir, before=datetime(2024, 2, 10)), 3)
+
+        manifest = lp_archive.load_manifest(self.archive_dir)
+        state = manifest['tables'][lp_archive.LP_HISTORY_TABLE]
+        self.assertEqual(state['exported_until'], datetime(2024, 2, 10).isoformat())
+        self.assertEqual(sorted((entry['month'], entry['region'], entry['rows']) for entry in state['files']),
+                         [('2024-01', 'euw1', 1), ('2024-01', 'na1', 1), ('2024-02', 'euw1', 1)])
+        for entry in state['files']:
+            self.assertTrue(os.path.exists(os.path.join(self.archive_dir, entry['path'])))
+
+        frame = lp_archive.read_lp_archive(self.archive_dir)
+        self.assertEqual(list(frame['league_points']), [10, 20, 30])
+        self.assertEqual([timestamp.to_pydatetime() for timestamp in frame['retrieved_at']],
+                         [retrieved_at for _, retrieved_at, _ in self.rows[:3]])
+        self.assertEqual(list(frame['riot_account_id']), [self.euw, self.na, self.euw])
+
+        euw_january = lp_archive.read_lp_archive(self.archive_dir, start=datetime(2024, 1, 1),
+                                                 end=datetime(2024, 2, 1), columns=['league_points'],
+                                                 regions=['EUW1'])
+        self.assertEqual(list(euw_january.columns), ['league_points'])
+        self.assertEqual(list(euw_january['league_points']), [10])
+
+    def test_incremental_exports_in_the_same_second_do_not_collide(self):
+        self.assertEqual(lp_archive.export_lp_history(self.archive_dir, before=datetime(2024, 2, 10)), 3)
+        # Wiederholung ohne neue Daten
+        self.assertEqual(lp_archive.export_lp_history(self.archive_dir, before=datetime(2024, 2, 10)), 0)
+        self.assertEqual(lp_archive.export_lp_history(self.archive_dir, before=datetime(2024, 3, 1)), 1)
+
+        files = lp_archive.load_manifest(self.archive_dir)['tables'][lp_archive.LP_HISTORY_TABLE]['files']
+        self.assertEqual(len({entry['path'] for entry in files}), 4)
+        self.assertEqual(list(lp_archive.read_lp_archive(self.archive_dir)['league_points']), [10, 20, 30, 40])
+
+
+if __name__ == '__main__':
+    unittest.main()
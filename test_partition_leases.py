@@ -0,0 +1,162 @@
+import multiprocessing
+import time
+import unittest
+
+import sqlalchemy
+
+import database_crud as crud
+import partition_leases
+import sync_worker
+from ORM_models import RiotAccount
+from test_helpers import use_temp_sqlite
+
+PARTITIONS = [f"p{index:02d}" for index in range(12)]
+
+
+def _run_worker(db_path, owner, seconds, results):
+    """Child process: heartbeats against the shared database, then reports its partitions."""
+    previous_engine = crud.get_engine()
+    engine = sqlalchemy.create_engine(f"sqlite:///{db_path}", connect_args={'timeout': 30})
+    crud.configure_engine(engine)
+    try:
+        coordinator = partition_leases.PartitionCoordinator(owner, PARTITIONS, lease_seconds=3)
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            coordinator.heartbeat()
+            time.sleep(0.2)
+        results.put((owner, coordinator.heartbeat()))
+    finally:
+        crud.configure_engine(previous_engine)
+        engine.dispose()
+
+
+class TestPartitionKeys(unittest.TestCase):
+
+    def test_partitions_cover_platforms(self):
+        partitions = partition_leases.all_partitions(buckets=1)
+        self.assertIn('euw1', partitions)
+        self.assertNotIn('esports', partitions)
+        self.assertEqual(len(partition_leases.all_partitions(buckets=4)), 4 * len(partitions))
+
+    def test_account_partition_is_stable(self):
+        key = partition_leases.partition_for_account('euw1', 'a3c1e6d2-0000-4000-8000-000000000000', buckets=4)
+        self.assertEqual(key, partition_leases.partition_for_account('euw1', 'a3c1e6d2-0000-4000-8000-000000000000', 4))
+        self.assertEqual(partition_leases.platform_of(key), 'euw1')
+        self.assertEqual(partition_leases.partition_for_account('euw1', 'x', buckets=1), 'euw1')
+
+    def test_typed_regions_map_to_platform_partitions(self):
+        account_id = 'a3c1e6d2-0000-4000-8000-000000000000'
+        expected = partition_leases.partition_for_account('euw1', account_id, buckets=4)
+        for region in ('EUW1', 'euw', ' Euw1 '):
+            self.assertEqual(partition_leases.partition_for_account(region, account_id, buckets=4), expected)
+
+    def test_rate_limits_are_scaled_to_the_platform_share(self):
+        limits = [(20, 1), (100, 120)]
+        self.assertEqual(partition_leases.rate_limit_share(limits, ['euw1', 'na1'], buckets=1), limits)
+        self.assertEqual(partition_leases.rate_limit_share(limits, [], buckets=4), limits)
+        # Ganze Plattform euw1, aber nur ein Viertel von na1: das kleinere Budget gilt für den einen Limiter
+        held = ['euw1:0', 'euw1:1', 'euw1:2', 'euw1:3', 'na1:2']
+        self.assertEqual(partition_leases.rate_limit_share(limits, held, buckets=4), [(5, 1), (25, 120)])
+        # Zwei Worker mit je der Hälfte von euw1 bleiben zusammen im Budget
+        half = partition_leases.rate_limit_share(limits, ['euw1:0', 'euw1:1'], buckets=4)
+        self.assertEqual([2 * count for count, _ in half], [20, 100])
+
+
+class TestPartitionLeases(unittest.TestCase):
+    """Several workers against one SQLite file."""
+
+    def setUp(self):
+        _, self.db_path = use_temp_sqlite(self, "partitions_", "leases.db", connect_args={'timeout': 30})
+
+    def test_processes_split_partitions_without_overlap(self):
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        processes = [context.Process(target=_run_worker, args=(self.db_path, f"worker-{index}", 4, results))
+                     for index in range(3)]
+        for process in processes:
+            process.start()
+        held = dict(results.get(timeout=60) for _ in processes)
+        for process in processes:
+            process.join(timeout=30)
+
+        all_held = [key for keys in held.values() for key in keys]
+        self.assertEqual(len(all_held), len(set(all_held)), held)
+        self.assertEqual(sorted(all_held), PARTITIONS)
+        self.assertEqual(sorted(len(keys) for keys in held.values()), [4, 4, 4])
+
+    def test_expired_partitions_are_taken_over(self):
+        crashed = partition_leases.PartitionCoordinator("crashed", PARTITIONS, lease_seconds=1)
+        survivor = partition_leases.PartitionCoordinator("survivor", PARTITIONS, lease_seconds=1)
+        self.assertEqual(crashed.heartbeat(), PARTITIONS)
+        self.assertEqual(survivor.heartbeat(), [])
+        # "crashed" sendet keine Heartbeats mehr; nach Ablauf übernimmt der andere Worker
+        time.sleep(2.1)
+        self.assertEqual(survivor.heartbeat(), PARTITIONS)
+        self.assertFalse(crashed.holds(PARTITIONS[0]))
+
+    def test_stop_releases_for_new_worker(self):
+        first = partition_leases.PartitionCoordinator("first", PARTITIONS, lease_seconds=30)
+        second = partition_leases.PartitionCoordinator("second", PARTITIONS, lease_seconds=30)
+        first.heartbeat()
+        second.heartbeat()
+        # Der neue Worker wird mitgezählt: der alte gibt die Hälfte ab
+        self.assertEqual(len(first.heartbeat()), 6)
+        self.assertEqual(len(second.heartbeat()), 6)
+        first.stop()
+        self.assertEqual(second.heartbeat(), PARTITIONS)
+
+    def test_on_change_reports_the_held_partitions(self):
+        changes = []
+        coordinator = partition_leases.PartitionCoordinator("worker", PARTITIONS, lease_seconds=30,
+                                                            on_change=changes.append)
+        coordinator.heartbeat()
+        coordinator.heartbeat()
+        self.assertEqual(changes, [PARTITIONS])
+
+    def test_poller_polls_held_partitions_once_per_interval(self):
+        crud.add_or_update_server("S1", "Server")
+        for index, region in enumerate(['euw1', 'euw1', 'na1']):
+            player = crud.add_player(f"Player {index}")
+            account = crud.add_or_update_riot_account(f"PUUID{index}", f"Name{index}", "TAG", region)
+            crud.link_player_to_riot_account(player.player_id, account.riot_account_id, is_primary=True)
+            crud.add_player_to_server(player.player_id, "S1")
+
+        coordinator = partition_leases.PartitionCoordinator("poller", ['euw1'], lease_seconds=30)
+        coordinator.heartbeat()
+        polled = []
+        poller = sync_worker.PartitionedRankPoller(coordinator, interval_seconds=3600,
+                                                   sync_account=lambda account: polled.append(account.puuid))
+        poller.buckets = 1
+        self.assertEqual(poller.run_once(), 1)
+        self.assertEqual(sorted(polled), ["PUUID0", "PUUID1"])
+        # Der letzte Durchlauf ist gespeichert; auch ein anderer Worker würde nicht erneut pollen
+        self.assertEqual(poller.run_once(), 0)
+
+    def test_poller_finds_accounts_stored_with_typed_regions(self):
+        crud.add_or_update_server("S1", "Server")
+        for index, region in enumerate(['euw1', 'EUW1', 'xx']):
+            player = crud.add_player(f"Player {index}")
+            account = crud.add_or_update_riot_account(f"PUUID{index}", f"Name{index}", "TAG", region)
+            crud.link_player_to_riot_account(player.player_id, account.riot_account_id, is_primary=True)
+            crud.add_player_to_server(player.player_id, "S1")
+        # Ein Altbestand, der noch vor der Normalisierung gespeichert wurde
+        with crud.session_scope() as session:
+            session.execute(sqlalchemy.update(RiotAccount).where(RiotAccount.puuid == "PUUID1").values(region='euw'))
+
+        coordinator = partition_leases.PartitionCoordinator("poller", ['euw1'], lease_seconds=30)
+        coordinator.heartbeat()
+        polled = []
+        poller = sync_worker.PartitionedRankPoller(coordinator, interval_seconds=3600,
+                                                   sync_account=lambda account: polled.append(account.puuid))
+        poller.buckets = 1
+        self.assertEqual(poller.run_once(), 1)
+        self.assertEqual(sorted(polled), ["PUUID0", "PUUID1"])
+        self.assertEqual(poller.check_unpartitioned_accounts(), 1)
+        self.assertEqual(poller.counters['accounts_unpartitioned'], 1)
+
+        self.assertEqual(crud.normalize_riot_account_regions(), 1)
+        self.assertEqual(crud.get_riot_account_by_puuid("PUUID1").region, 'euw1')
+
+
+if __name__ == '__main__':
+    unittest.main()
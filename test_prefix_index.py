@@ -0,0 +1,33 @@
+import unittest
+
+import prefix_index
+
+
+class TestPrefixIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = prefix_index.PrefixIndex()
+        for label, value in [("Zed Main", "p1"), ("zoe", "p2"), ("Ahri", "p3"), ("Zed Main", "p4"), ("Zyra", "p5")]:
+            self.index.add(label, value)
+
+    def test_prefix_search_is_case_insensitive_and_sorted(self):
+        self.assertEqual(self.index.search("ZE"), [("Zed Main", "p1"), ("Zed Main", "p4")])
+        self.assertEqual([value for _, value in self.index.search("z")], ["p1", "p4", "p2", "p5"])
+        self.assertEqual(self.index.search("x"), [])
+
+    def test_limit_and_empty_prefix(self):
+        self.assertEqual(len(self.index.search("", limit=3)), 3)
+
+    def test_remove_value_drops_all_labels(self):
+        self.index.add("Zed Alt", "p1")
+        self.index.remove_value("p1")
+        self.assertEqual(self.index.search("zed"), [("Zed Main", "p4")])
+        self.assertEqual(len(self.index), 4)
+
+    def test_region_index(self):
+        self.assertIn(("euw1", "euw1"), prefix_index.REGION_INDEX.search("eu"))
+        self.assertEqual(prefix_index.REGION_INDEX.search("esp"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import profiling_hooks
+
+
+class TestProfilingHooks(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp(prefix="profiles_")
+        self.addCleanup(shutil.rmtree, self.output_dir, ignore_errors=True)
+        for name, value in (('PROFILING_DIR', self.output_dir), ('_last_profiled', {})):
+            patcher = mock.patch.object(profiling_hooks, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _written(self, suffix):
+        return sorted(name for name in os.listdir(self.output_dir) if name.endswith(suffix))
+
+    def test_disabled_block_writes_nothing(self):
+        with mock.patch.object(profiling_hooks, '_enabled', False):
+            with profiling_hooks.profile_block('command.register'):
+                with profiling_hooks.phase('db'):
+                    pass
+        self.assertEqual(os.listdir(self.output_dir), [])
+
+    def test_forced_block_writes_profile_and_phases(self):
+        with profiling_hooks.profile_block('command.register', force=True, guild_id=42):
+            with profiling_hooks.phase('api'):
+                time.sleep(0.01)
+            # Phasen in Worker-Threads zählen über den kopierten Kontext mit
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                context = profiling_hooks.contextvars.copy_context()
+                pool.submit(context.run, self._db_phase).result()
+
+        self.assertEqual(len(self._written('.prof')), 1)
+        self.assertEqual(len(self._written('.txt')), 1)
+        with open(os.path.join(self.output_dir, self._written('.json')[0]), encoding='utf-8') as summary_file:
+            summary = json.load(summary_file)
+        self.assertEqual(summary['name'], 'command.register')
+        self.assertEqual(summary['guild_id'], 42)
+        self.assertGreaterEqual(summary['phases']['api']['ms'], 10)
+        self.assertEqual(summary['phases']['db']['count'], 1)
+
+    def test_nested_blocks_belong_to_the_outer_block(self):
+        with profiling_hooks.profile_block('sync.cycle', force=True):
+            with profiling_hooks.profile_block('sync.rank_account', force=True):
+                with profiling_hooks.phase('db'):
+                    pass
+        self.assertEqual(len(self._written('.json')), 1)
+
+    def test_block_on_the_event_loop_collects_only_phases(self):
+        async def command():
+            with profiling_hooks.profile_block('command.stats', force=True):
+                await asyncio.to_thread(self._db_phase)
+
+        asyncio.run(command())
+        self.assertEqual(self._written('.prof'), [])
+        with open(os.path.join(self.output_dir, self._written('.json')[0]), encoding='utf-8') as summary_file:
+            summary = json.load(summary_file)
+        self.assertFalse(summary['cprofile'])
+        self.assertEqual(summary['phases']['db']['count'], 1)
+
+    def test_each_block_name_is_profiled_once_per_interval(self):
+        with mock.patch.object(profiling_hooks, '_enabled', True):
+            for _ in range(3):
+                with profiling_hooks.profile_block('sync.race_progress'):
+                    pass
+            with profiling_hooks.profile_block('sync.rank_account'):
+                pass
+        self.assertEqual(len(self._written('.json')), 2)
+
+    def test_only_the_newest_profiles_are_kept(self):
+        with mock.patch.object(profiling_hooks, 'PROFILING_MAX_PROFILES', 2):
+            for index in range(4):
+                with profiling_hooks.profile_block(f'command.n{index}', force=True):
+                    pass
+        summaries = self._written('.json')
+        self.assertEqual([name.split('-', 1)[1] for name in summaries], ['command.n2.json', 'command.n3.json'])
+        self.assertEqual(len(self._written('.prof')), 2)
+
+    @staticmethod
+    def _db_phase():
+        with profiling_hooks.phase('db'):
+            pass
+
+
+class TestStartupTimer(unittest.TestCase):
+
+    def test_report_lists_phases(self):
+        timer = profiling_hooks.StartupTimer()
+        timer.add('imports', 0.25)
+        with timer.phase('load cogs.leaderboard'):
+            pass
+        report = timer.report()
+        self.assertIn('imports', report)
+        self.assertIn('0.250s', report)
+        self.assertIn('load cogs.leaderboard', report)
+        self.assertTrue(report.startswith('Startup took'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import sqlalchemy
+from sqlalchemy import text
+
+import query_instrumentation as qi
+
+
+class TestQueryInstrumentation(unittest.TestCase):
+    """Runs against an in-memory SQLite engine, no .env database needed."""
+
+    def setUp(self):
+        self.engine = sqlalchemy.create_engine("sqlite://")
+        qi.instrument_engine(self.engine)
+        qi.reset_stats()
+        with self.engine.begin() as connection:
+            connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(qi.fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?)"),
+                         qi.fingerprint("SELECT *\n  FROM t WHERE id IN (?)"))
+
+    def test_statements_are_tagged_with_caller(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("INSERT INTO items (name) VALUES ('a')"))
+        tags = {entry['tag'] for entry in qi.get_query_stats()}
+        self.assertIn(f"{__name__}.test_statements_are_tagged_with_caller", tags)
+
+    def test_repeated_statement_in_one_transaction_is_reported(self):
+        with self.engine.begin() as connection:
+            for index in range(qi.N_PLUS_ONE_THRESHOLD):
+                connection.execute(text("SELECT name FROM items WHERE id = :id"), {'id': index})
+        reports = qi.get_n_plus_one_reports()
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(reports[0]['count'], qi.N_PLUS_ONE_THRESHOLD)
+
+    def test_few_statements_are_not_reported(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("SELECT name FROM items WHERE id = 1"))
+            connection.execute(text("SELECT name FROM items WHERE id = 2"))
+        self.assertEqual(qi.get_n_plus_one_reports(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,256 @@
+import time
+import unittest
+import unittest.mock
+from datetime import datetime, timedelta
+
+import constants
+import database_crud as crud
+import race_engine
+from sql_functions import get_engine_and_session_factory
+from ORM_models import Base, Race, RaceParticipant, RiotAccountLPHistory, RiotAccountLPHourlyRollup
+
+
+class TestRaceStandings(unittest.TestCase):
+    """Tests the in-memory ordering of the standings without a database."""
+
+    def _participant(self, participant_id, starting_value=None, current_value=None, games_played=None,
+                     is_disqualified=False):
+        row = type('Row', (), dict(participant_id=participant_id, server_player_id=None, player_id=participant_id,
+                                   display_name=participant_id, riot_account_id=None, starting_value=starting_value,
+                                   current_value=current_value, games_played=games_played,
+                                   is_disqualified=is_disqualified))
+        return race_engine.Participant(row)
+
+    def test_lp_climb_orders_by_gain_and_shares_ties(self):
+        race = race_engine.RaceStandings("R", "Race", "S", constants.RACE_TYPE_LP_CLIMB, None)
+        race.put(self._participant("a", 1000, 1050))
+        race.put(self._participant("b", 900, 1000))
+        race.put(self._participant("c", 500, 550))
+        race.put(self._participant("d"))
+        race.put(self._participant("e", 0, 500, is_disqualified=True))
+        positions = [(position, participant.participant_id) for position, participant, _ in race.standings()]
+        self.assertEqual(positions, [(1, "b"), (2, "a"), (2, "c"), (None, "d"), (None, "e")])
+
+        climber = race.participants["c"]
+        climber.current_value = 700
+        race.put(climber)
+        self.assertEqual([participant.participant_id for _, participant, _ in race.standings(limit=2)], ["c", "b"])
+
+    def test_placement_average_ranks_lower_first(self):
+        race = race_engine.RaceStandings("R", "Race", "S", constants.RACE_TYPE_PLACEMENT_AVERAGE, None)
+        race.put(self._participant("a", current_value=12, games_played=3))
+        race.put(self._participant("b", current_value=5, games_played=2))
+        race.put(self._participant("c", current_value=0, games_played=0))
+        self.assertEqual([(position, participant.participant_id) for position, participant, _ in race.standings()],
+                         [(1, "b"), (2, "a"), (None, "c")])
+
+
+class TestRaceEngine(unittest.TestCase):
+    """Tests that the engine follows rank writes and match results and writes the running values."""
+    SERVER_ID = "RACE_ENGINE_SERVER"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine, _ = get_engine_and_session_factory()
+
+    def setUp(self):
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+        crud.add_or_update_server(self.SERVER_ID, "Race Server")
+        self.race_engine = race_engine.RaceEngine()
+        self.race_engine.subscribe_to_crud()
+
+    def tearDown(self):
+        self.race_engine.unsubscribe_from_crud()
+
+    def _race(self, race_type, count):
+        now = datetime.now()
+        race = crud.create_race(self.SERVER_ID, f"{race_type} Race", now, now + timedelta(days=7),
+                                status=constants.RACE_STATUS_ACTIVE, race_type=race_type)
+        accounts = []
+        for index in range(count):
+            player = crud.add_player(f"{race_type}Player{index}")
+            account = crud.add_or_update_riot_account(f"{race_type}_PUUID_{index}", f"Racer{index}", "EUW", "euw1")
+            crud.link_player_to_riot_account(player.player_id, account.riot_account_id, is_primary=True)
+            crud.add_lp_history_entry(account.riot_account_id, 'RANKED_TFT', 10, 'GOLD', 'II', 0, 0)
+            server_player = crud.add_player_to_server(player.player_id, self.SERVER_ID)
+            crud.add_participant_to_race(race.race_id, server_player.server_player_id)
+            accounts.append(account.riot_account_id)
+        return race.race_id, accounts
+
+    def _stored(self, race_id):
+        with crud.session_scope() as session:
+            return {row.participant_id: (row.starting_value, row.current_value, row.games_played)
+                    for row in session.query(RaceParticipant).filter(RaceParticipant.race_id == race_id)}
+
+    def test_rank_writes_update_only_affected_participants(self):
+        race_id, accounts = self._race(constants.RACE_TYPE_LP_CLIMB, 3)
+        self.assertTrue(self.race_engine.load())
+        # Erster Flush: Startwerte aus den vorhandenen Rängen
+        self.assertEqual(self.race_engine.flush(), 3)
+
+        crud.add_lp_history_entry(accounts[1], 'RANKED_TFT', 60, 'GOLD', 'II', 1, 0)
+        self.assertEqual(self.race_engine.flush(), 1)
+        self.assertEqual(self.race_engine.flush(), 0)
+
+        standings = self.race_engine.standings(race_id)
+        leader = standings[0][1]
+        self.assertEqual((standings[0][0], standings[0][2]), (1, 50))
+        stored = self._stored(race_id)
+        self.assertEqual(stored[leader.participant_id][:2], (leader.starting_value, leader.starting_value + 50))
+
+    def test_placement_races_count_match_results(self):
+        race_id, accounts = self._race(constants.RACE_TYPE_TOP4_COUNT, 2)
+        self.assertTrue(self.race_engine.load())
+        for placement in (1, 3, 7):
+            self.race_engine.record_match_result(accounts[0], placement)
+        self.race_engine.record_match_result(accounts[1], 5)
+        self.race_engine.flush()
+
+        standings = self.race_engine.standings(race_id)
+        self.assertEqual([(position, progress) for position, _, progress in standings], [(1, 2), (2, 0)])
+        self.assertEqual(sorted(value[1:] for value in self._stored(race_id).values()), [(0, 1), (2, 3)])
+
+    def test_unsaved_match_results_survive_a_race_refresh(self):
+        race_id, accounts = self._race(constants.RACE_TYPE_TOP4_COUNT, 1)
+        self.assertTrue(self.race_engine.load())
+        self.race_engine.flush()
+        self.race_engine.record_match_result(accounts[0], 2)
+        with unittest.mock.patch.object(crud, 'update_race_progress', return_value=None):
+            self.assertEqual(self.race_engine.flush(), 0)
+
+        # Das Rennen wird vor dem nächsten erfolgreichen Write neu gelesen
+        self.race_engine.notify_race_changed(race_id)
+        self.assertEqual(self.race_engine.flush(), 1)
+        self.assertEqual(self.race_engine.standings(race_id)[0][2], 1)
+        self.assertEqual(list(self._stored(race_id).values())[0][1:], (1, 1))
+
+    def test_race_changes_are_picked_up(self):
+        race_id, _ = self._race(constants.RACE_TYPE_LP_CLIMB, 1)
+        self.assertTrue(self.race_engine.load())
+        player = crud.add_player("Latecomer")
+        server_player = crud.add_player_to_server(player.player_id, self.SERVER_ID)
+        crud.add_participant_to_race(race_id, server_player.server_player_id)
+        self.race_engine.flush()
+        self.assertEqual(len(self.race_engine.standings(race_id)), 2)
+
+    def test_single_change_in_large_race_is_fast(self):
+        race_id, accounts = self._race(constants.RACE_TYPE_LP_CLIMB, 500)
+        self.assertTrue(self.race_engine.load())
+        self.race_engine.flush()
+
+        crud.add_lp_history_entry(accounts[250], 'RANKED_TFT', 90, 'GOLD', 'II', 1, 0)
+        started = time.perf_counter()
+        self.assertEqual(self.race_engine.flush(), 1)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(self.race_engine.standings(race_id, limit=1)[0][2], 80)
+        self.assertLess(elapsed, 0.5)
+
+
+class TestRaceFinalization(unittest.TestCase):
+    """Tests the set-based finalization of ended races."""
+    SERVER_ID = "RACE_FINAL_SERVER"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine, _ = get_engine_and_session_factory()
+
+    def setUp(self):
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+        crud.add_or_update_server(self.SERVER_ID, "Final Server")
+        self.end = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+        self.start = self.end - timedelta(days=7)
+        self.race_id = crud.create_race(self.SERVER_ID, "Final Race", self.start, self.end,
+                                        status=constants.RACE_STATUS_ACTIVE).race_id
+
+    def _participant(self, name, scores, primary=True, rollup_scores=None, **kwargs):
+        """Adds a participant whose account has the ladder scores {offset from start: score}."""
+        player = crud.add_player(name)
+        account = crud.add_or_update_riot_account(f"FINAL_{name}", name, "EUW", "euw1")
+        crud.link_player_to_riot_account(player.player_id, account.riot_account_id, is_primary=primary)
+        server_player = crud.add_player_to_server(player.player_id, self.SERVER_ID)
+        participant = crud.add_participant_to_race(self.race_id, server_player.server_player_id, **kwargs)
+        with crud.session_scope() as session:
+            for offset, score in scores.items():
+                session.add(RiotAccountLPHistory(riot_account_id=account.riot_account_id, queue_type='RANKED_TFT',
+                                                 league_points=score % 100, wins=0, losses=0, ladder_score=score,
+                                                 retrieved_at=self.start + offset))
+            for offset, score in (rollup_scores or {}).items():
+                at = self.start + offset
+                session.add(RiotAccountLPHourlyRollup(
+                    riot_account_id=account.riot_account_id, queue_type='RANKED_TFT', bucket_start=at,
+                    sample_count=1, first_at=at, last_at=at, first_lp=0, last_lp=0, min_lp=0, max_lp=0,
+                    first_score=score, last_score=score, min_score=score, max_score=score,
+                    first_wins=0, last_wins=0, first_losses=0, last_losses=0, wins_delta=0, losses_delta=0))
+        return participant.participant_id
+
+    def _results(self):
+        with crud.session_scope() as session:
+            return {row.participant_id: (row.starting_value, row.final_value, row.final_rank, row.is_disqualified)
+                    for row in session.query(RaceParticipant).filter(RaceParticipant.race_id == self.race_id)}
+
+    def test_final_values_and_ranks_as_of_end_time(self):
+        day = timedelta(days=1)
+        climber = self._participant("Climber", {-day: 1000, 3 * day: 1100, 8 * day: 2000})
+        steady = self._participant("Steady", {-day: 500, 2 * day: 600})
+        late = self._participant("Late", {2 * day: 800, 4 * day: 850})
+        # Der letzte Snapshot vor dem Ende liegt bereits in einem Stunden-Rollup
+        compacted = self._participant("Compacted", {}, rollup_scores={day: 1500}, starting_value=1200)
+        unlinked = self._participant("Unlinked", {-day: 100, 2 * day: 900}, primary=False)
+        silent = self._participant("Silent", {})
+
+        self.assertEqual(crud.finalize_race(self.race_id), 6)
+        results = self._results()
+        self.assertEqual(results[compacted], (1200, 1500, 1, False))
+        self.assertEqual(results[climber], (1000, 1100, 2, False))
+        self.assertEqual(results[steady], (500, 600, 2, False))
+        self.assertEqual(results[late], (800, 850, 4, False))
+        self.assertEqual(results[unlinked][2:], (None, True))
+        self.assertEqual(results[silent], (None, None, None, False))
+
+        # Ein erneuter Lauf ändert nichts
+        self.assertEqual(crud.finalize_race(self.race_id), 6)
+        self.assertEqual(self._results(), results)
+        with crud.session_scope() as session:
+            self.assertEqual(session.get(Race, self.race_id).status, constants.RACE_STATUS_FINISHED)
+
+    def test_ranks_by_progress_and_skips_running_races(self):
+        day = timedelta(days=1)
+        first = self._participant("First", {-day: 1000, day: 1300})
+        second = self._participant("Second", {-day: 1000, day: 1100})
+        third = self._participant("Third", {-day: 1000, day: 900})
+        running = crud.create_race(self.SERVER_ID, "Running", self.start, datetime.now() + day,
+                                   status=constants.RACE_STATUS_ACTIVE)
+
+        self.assertIs(crud.finalize_race(running.race_id), False)
+        self.assertEqual(crud.finalize_due_races(), [self.race_id])
+        results = self._results()
+        self.assertEqual([results[participant][2] for participant in (first, second, third)], [1, 2, 3])
+        self.assertEqual(crud.finalize_due_races(), [])
+
+    def test_start_snapshots_starting_values_and_edits_are_checked(self):
+        day = timedelta(days=1)
+        planned = crud.create_race(self.SERVER_ID, "Planned", self.start, self.end + 2 * day)
+        self.race_id = planned.race_id
+        snapshotted = self._participant("Snapshotted", {-2 * day: 900, -day: 1000, day: 1200})
+        preset = self._participant("Preset", {-day: 700}, starting_value=500)
+        newcomer = self._participant("Newcomer", {day: 300})
+
+        with self.assertRaises(ValueError):
+            crud.update_race(planned.race_id, server_id="OTHER")
+        self.assertIsNotNone(crud.update_race(planned.race_id, start_time=self.start + 10 * day))
+        self.assertIs(crud.start_race(planned.race_id), False)
+        crud.update_race(planned.race_id, start_time=self.start)
+
+        self.assertEqual(crud.start_race(planned.race_id), 1)
+        self.assertIs(crud.start_race(planned.race_id), False)
+        results = self._results()
+        self.assertEqual([results[participant][0] for participant in (snapshotted, preset, newcomer)],
+                         [1000, 500, None])
+        self.assertEqual([row.status for row in crud.get_race_schedule(planned.race_id)],
+                         [constants.RACE_STATUS_ACTIVE])
+
+
+if __name__ == '__main__':
+    unittest.main()
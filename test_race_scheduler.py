@@ -0,0 +1,136 @@
+import asyncio
+import time
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import constants
+import race_scheduler
+
+
+class _FakeRaces:
+    """Race rows and transitions in memory, with a clock that runs in real time."""
+    def __init__(self):
+        self.base = datetime(2024, 1, 1)
+        self.started = time.monotonic()
+        self.races = {}
+        self.calls = []
+        self.scheduler = None
+        # Anzahl der nächsten Aufrufe, die mit einem DB-Fehler (None) enden
+        self.failures = 0
+
+    def now(self):
+        return self.base + timedelta(seconds=time.monotonic() - self.started)
+
+    def add(self, race_id, status, start_in, end_in):
+        now = self.now()
+        self.races[race_id] = SimpleNamespace(race_id=race_id, server_id="S", status=status,
+                                              start_time=now + timedelta(seconds=start_in),
+                                              end_time=now + timedelta(seconds=end_in))
+
+    def load(self, race_id=None):
+        if race_id is not None:
+            return [self.races[race_id]] if race_id in self.races else []
+        return [race for race in self.races.values()
+                if race.status in (constants.RACE_STATUS_PLANNED, constants.RACE_STATUS_ACTIVE)]
+
+    def _transition(self, race_id, expected, new_status, name):
+        if self.failures:
+            self.failures -= 1
+            self.calls.append(('error', race_id))
+            return None
+        race = self.races.get(race_id)
+        if race is None or race.status not in expected:
+            return False
+        race.status = new_status
+        self.calls.append((name, race_id))
+        self.scheduler.notify_race_changed(race_id)
+        return 0
+
+    def start(self, race_id):
+        return self._transition(race_id, (constants.RACE_STATUS_PLANNED,), constants.RACE_STATUS_ACTIVE, 'start')
+
+    def finalize(self, race_id):
+        return self._transition(race_id, (constants.RACE_STATUS_PLANNED, constants.RACE_STATUS_ACTIVE),
+                                constants.RACE_STATUS_FINISHED, 'end')
+
+
+class TestRaceLifecycleScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.races = _FakeRaces()
+        self.scheduler = race_scheduler.RaceLifecycleScheduler(
+            schedule_loader=self.races.load, starter=self.races.start, finalizer=self.races.finalize,
+            clock=self.races.now, resync_seconds=3600, retry_seconds=0.1)
+        self.races.scheduler = self.scheduler
+
+    async def asyncTearDown(self):
+        await self.scheduler.stop()
+
+    async def _wait_for(self, count, timeout=3.0):
+        deadline = time.monotonic() + timeout
+        while len(self.races.calls) < count and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+
+    async def test_missed_transitions_are_recovered_in_order(self):
+        self.races.add("over", constants.RACE_STATUS_PLANNED, -20, -10)
+        self.races.add("running", constants.RACE_STATUS_PLANNED, -5, 3600)
+        self.races.add("ending", constants.RACE_STATUS_ACTIVE, -50, -1)
+        await self.scheduler.start()
+        await self._wait_for(4)
+
+        self.assertEqual(self.races.calls,
+                         [('start', "over"), ('end', "over"), ('start', "running"), ('end', "ending")])
+        self.assertEqual(self.scheduler.pending(), [("running", race_scheduler.TRANSITION_END)])
+
+    async def test_transitions_fire_when_due(self):
+        self.races.add("soon", constants.RACE_STATUS_PLANNED, 0.2, 0.4)
+        await self.scheduler.start()
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.races.calls, [])
+        await self._wait_for(2)
+        self.assertEqual(self.races.calls, [('start', "soon"), ('end', "soon")])
+
+    async def test_edits_reschedule_the_race(self):
+        self.races.add("edited", constants.RACE_STATUS_PLANNED, 3600, 7200)
+        self.races.add("cancelled", constants.RACE_STATUS_PLANNED, 0.3, 3600)
+        await self.scheduler.start()
+        await asyncio.sleep(0.05)
+
+        # Vorgezogener Start und abgesagte Race
+        self.races.races["edited"].start_time = self.races.now() + timedelta(seconds=0.1)
+        self.scheduler.notify_race_changed("edited")
+        self.races.races["cancelled"].status = constants.RACE_STATUS_CANCELLED
+        self.scheduler.notify_race_changed("cancelled")
+        await asyncio.sleep(0.6)
+
+        self.assertEqual(self.races.calls, [('start', "edited")])
+        self.assertEqual(self.scheduler.pending(), [("edited", race_scheduler.TRANSITION_END)])
+
+    async def test_database_errors_are_retried_with_backoff(self):
+        self.races.add("flaky", constants.RACE_STATUS_PLANNED, -1, 3600)
+        self.races.failures = 2
+        await self.scheduler.start()
+        await self._wait_for(1)
+        self.assertEqual(self.races.calls, [('error', "flaky")])
+        # Zweiter Versuch nach 0,1 s, dritter nach weiteren 0,2 s
+        await self._wait_for(3, timeout=1.0)
+
+        self.assertEqual(self.races.calls, [('error', "flaky"), ('error', "flaky"), ('start', "flaky")])
+        self.assertEqual(self.scheduler.pending(), [("flaky", race_scheduler.TRANSITION_END)])
+        self.assertEqual((self.scheduler.counters['retried'], self.scheduler.counters['started']), (2, 1))
+
+    async def test_not_applicable_transitions_are_not_retried(self):
+        self.races.add("taken", constants.RACE_STATUS_PLANNED, 0.2, 3600)
+        await self.scheduler.start()
+        await asyncio.sleep(0.05)
+        # Ein anderer Prozess startet die Race, ohne dass dieser Scheduler davon erfährt
+        self.races.races["taken"].status = constants.RACE_STATUS_ACTIVE
+        await asyncio.sleep(0.5)
+
+        self.assertEqual(self.races.calls, [])
+        self.assertEqual((self.scheduler.counters['skipped'], self.scheduler.counters['retried']), (1, 0))
+        self.assertEqual(self.scheduler.pending(), [("taken", race_scheduler.TRANSITION_END)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import importlib.util
+import math
+import unittest
+from datetime import datetime, timedelta
+
+import sqlalchemy
+
+import database_crud as crud
+import server_analytics
+from ORM_models import RiotAccountLPHistory, ServerPlayer
+from test_helpers import use_temp_sqlite
+
+START = datetime(2024, 4, 10)
+
+# (Account, Tage ab START, ladder_score, wins, losses)
+FIXTURE = [
+    ('A', -1, 1000, 10, 10),
+    ('A', 1, 1030, 12, 10),
+    ('A', 2, 1010, 12, 12),
+    ('A', 3, 1060, 14, 12),
+    # B hat keinen Punkt vor START: der erste Punkt im Zeitraum ist der Ausgangswert
+    ('B', 1, 500, 0, 0),
+    ('B', 2, 480, 0, 2),
+    ('C', 1, 700, 5, 5),
+]
+
+
+@unittest.skipUnless(importlib.util.find_spec('pandas') and importlib.util.find_spec('numpy'),
+                     "server analytics needs pandas and numpy")
+class TestAccountStats(unittest.TestCase):
+
+    def _points(self):
+        server_analytics._load_dataframe_libs()
+        return server_analytics.pd.DataFrame(
+            [{'riot_account_id': account, 'retrieved_at': START + timedelta(days=days), 'ladder_score': score,
+              'wins': wins, 'losses': losses} for account, days, score, wins, losses in FIXTURE])
+
+    def test_known_deltas(self):
+        stats = server_analytics.compute_account_stats(self._points(), START)
+
+        a, b, c = stats.loc['A'], stats.loc['B'], stats.loc['C']
+        self.assertEqual((a['current_score'], a['lp_gained'], a['games'], a['wins']), (1060, 60, 6, 4))
+        self.assertAlmostEqual(a['win_rate'], 4 / 6)
+        # Steigung von 1030, 1010, 1060 an Tag 1, 2, 3
+        self.assertAlmostEqual(a['velocity_per_day'], 15.0)
+        self.assertEqual((b['current_score'], b['lp_gained'], b['games'], b['wins']), (480, -20, 2, 0))
+        self.assertEqual(b['win_rate'], 0.0)
+        self.assertAlmostEqual(b['velocity_per_day'], -20.0)
+        self.assertEqual((c['lp_gained'], c['games']), (0, 0))
+        self.assertTrue(math.isnan(c['win_rate']))
+        self.assertTrue(math.isnan(c['velocity_per_day']))
+
+    def test_daily_trends(self):
+        trends = server_analytics.compute_daily_trends(self._points(), window_days=2)
+        a = trends[trends['riot_account_id'] == 'A'].reset_index(drop=True)
+        self.assertEqual(list(a['ladder_score']), [1000, 1030, 1010, 1060])
+        self.assertEqual(list(a['lp_change_rolling'].iloc[2:]), [10, 30])
+        self.assertAlmostEqual(a['win_rate_rolling'].iloc[3], 2 / 4)
+
+
+@unittest.skipUnless(importlib.util.find_spec('pandas') and importlib.util.find_spec('numpy'),
+                     "server analytics needs pandas and numpy")
+class TestServerStats(unittest.TestCase):
+
+    def setUp(self):
+        use_temp_sqlite(self, "analytics_", "analytics.db")
+
+        crud.add_or_update_server("S1", "Server")
+        self.account_ids = {}
+        for name in ('A', 'B', 'C', 'Left'):
+            player = crud.add_player(f"Player {name}")
+            account = crud.add_or_update_riot_account(f"PUUID_{name}", name, "TAG", "euw1")
+            crud.link_player_to_riot_account(player.player_id, account.riot_account_id, is_primary=True)
+            crud.add_player_to_server(player.player_id, "S1")
+            self.account_ids[name] = account.riot_account_id
+        left_player_id = player.player_id
+        with crud.session_scope() as session:
+            rows = FIXTURE + [('Left', 1, 2000, 0, 0), ('Left', 2, 2500, 1, 0)]
+            session.add_all(RiotAccountLPHistory(riot_account_id=self.account_ids[account], queue_type='RANKED_TFT',
+                                                 league_points=score % 100, wins=wins, losses=losses,
+                                                 ladder_score=score, retrieved_at=START + timedelta(days=days))
+                            for account, days, score, wins, losses in rows)
+            # Ein Snapshot außerhalb des Zeitraums zählt nicht
+            session.add(RiotAccountLPHistory(riot_account_id=self.account_ids['A'], queue_type='RANKED_TFT',
+                                             league_points=0, wins=99, losses=99, ladder_score=9999,
+                                             retrieved_at=START + timedelta(days=30)))
+            # "Left" hat den Server verlassen
+            session.execute(sqlalchemy.update(ServerPlayer).where(ServerPlayer.player_id == left_player_id)
+                            .values(is_active_on_server=False))
+
+    def test_server_stats_rank_members(self):
+        stats = server_analytics.get_server_stats("S1", days=7, end=START + timedelta(days=7))
+
+        self.assertEqual(list(stats.columns), server_analytics.STAT_COLUMNS)
+        self.assertEqual(list(stats['game_name']), ['A', 'C', 'B'])
+        self.assertEqual(list(stats['rank']), [1, 2, 3])
+        self.assertEqual(list(stats['lp_gained']), [60, 0, -20])
+        self.assertEqual(list(stats['games']), [6, 0, 2])
+
+        by_win_rate = server_analytics.get_server_stats("S1", days=7, sort_by='win_rate',
+                                                        end=START + timedelta(days=7))
+        # Ohne Spiele keine Winrate: landet am Ende
+        self.assertEqual(list(by_win_rate['game_name']), ['A', 'B', 'C'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+import sharding
+
+
+def guild_on_shard(shard_id: int, salt: int = 0) -> str:
+    # Die Shard ergibt sich aus den Bits ab Position 22 der Guild-ID
+    return str(((salt * 4 + shard_id) << 22) | 12345)
+
+
+class TestSharding(unittest.TestCase):
+
+    def test_shard_for_guild_matches_discord_formula(self):
+        self.assertEqual(sharding.shard_for_guild(guild_on_shard(3), 4), 3)
+        self.assertEqual(sharding.shard_for_guild(81384788765712384, 1), 0)
+
+    def test_shared_accounts_are_owned_by_exactly_one_process(self):
+        tracked = [
+            ('only_0', {guild_on_shard(0)}),
+            ('only_2', {guild_on_shard(2), guild_on_shard(2, salt=5)}),
+            ('shared_1_3', {guild_on_shard(3), guild_on_shard(1)}),
+            ('shared_0_2', {guild_on_shard(2), guild_on_shard(0, salt=7)}),
+            ('no_guilds', set()),
+        ]
+        process_a = sharding.partition_accounts(tracked, [0, 1], 4)
+        process_b = sharding.partition_accounts(tracked, [2, 3], 4)
+
+        self.assertEqual(process_a, ['only_0', 'shared_1_3', 'shared_0_2'])
+        self.assertEqual(process_b, ['only_2'])
+        self.assertFalse(set(process_a) & set(process_b))
+
+    def test_parse_shard_config(self):
+        self.assertEqual(sharding.parse_shard_config(None, None), (None, None))
+        self.assertEqual(sharding.parse_shard_config("4", "2, 0"), (4, [0, 2]))
+        with self.assertRaises(ValueError):
+            sharding.parse_shard_config(None, "0")
+        with self.assertRaises(ValueError):
+            sharding.parse_shard_config("2", "2")
+
+    def test_rate_limit_share(self):
+        self.assertEqual(sharding.rate_limit_share([(20, 1), (100, 120)], [0], 4), [(5, 1), (25, 120)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,29 @@
 import unittest
+import unittest.mock
 import logging
 import sys
+import threading
+import time
+from datetime import datetime, timedelta
+import requests
+from sqlalchemy import event, insert
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import joinedload, exc as orm_exc
 
 # --- Import all the components we need to test ---
 import database_crud as crud
+import db_maintenance
+import leaderboard_cache
+import lp_archive
+import lp_retention
+import prefix_index
+import riot_api_handler
+import sync_worker
 from data_manager import register_new_player_with_riot_id
 from sql_functions import get_engine_and_session_factory
-from ORM_models import Base, Player, RiotAccount, PlayerRiotAccountLink
+from ORM_models import (Base, Player, RiotAccount, PlayerRiotAccountLink, DiscordServer, DiscordAccount,
+                        RiotAccountLPHistory, RiotAccountCurrentRank, RiotAccountLPHourlyRollup,
+                        RiotAccountLPDailyRollup)
 
 # --- Basic Logging Setup for the Test ---
 # This helps see what's happening in the imported modules.
@@ -16,6 +32,19 @@ logging.basicConfig(level=logging.INFO, stream=sys.stdout,
 log = logging.getLogger("TEST_SUITE")
 
 
+def count_queries(function, *args):
+    """Runs `function(*args)` and returns (result, number of SQL statements executed)."""
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(crud.get_engine(), "before_cursor_execute", count)
+    try:
+        result = function(*args)
+    finally:
+        event.remove(crud.get_engine(), "before_cursor_execute", count)
+    return result, len(statements)
+
+
 class TestDatabaseAndRegistration(unittest.TestCase):
     """
     A full test suite for the database and registration logic.
@@ -147,6 +176,674 @@ class TestDatabaseAndRegistration(unittest.TestCase):
         print("✅ PASSED: DetachedInstanceError occurred as expected.")
 
 
+class TestLoadingProfiles(unittest.TestCase):
+    """
+    Tests that the named loading profiles load their object graph with a fixed
+    number of queries and that the results can be used after the session is closed.
+    Needs only the database, not the Riot API.
+    """
+    SERVER_ID = "PROFILE_TEST_SERVER"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine, _ = get_engine_and_session_factory()
+
+    def setUp(self):
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+        self.member_count = 0
+
+    def _create_members(self, count: int, race_id: str | None = None):
+        for index in range(self.member_count, self.member_count + count):
+            player = crud.add_player(f"ProfilePlayer{index}")
+            account = crud.add_or_update_riot_account(f"PROFILE_PUUID_{index}", f"Profile{index}", "PRO", "euw1")
+            crud.link_player_to_riot_account(player.player_id, account.riot_account_id, is_primary=True)
+            crud.add_lp_history_entry(account.riot_account_id, 'RANKED_TFT', 10 * index, 'GOLD', 'II', index, index)
+            server_player = crud.add_player_to_server(player.player_id, self.SERVER_ID)
+            if race_id:
+                crud.add_participant_to_race(race_id, server_player.server_player_id)
+        self.member_count += count
+
+    def test_server_members_profile_uses_fixed_query_count(self):
+        crud.add_or_update_server(self.SERVER_ID, "Profile Server")
+        self._create_members(2)
+        _, small_count = count_queries(crud.get_server_with_members, self.SERVER_ID)
+        self._create_members(5)
+        server, large_count = count_queries(crud.get_server_with_members, self.SERVER_ID)
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(server.server_players), 7)
+        # Zugriff nach geschlossener Session: alles muss bereits geladen sein
+        accounts = [sp.player.riot_account_links[0].riot_account for sp in server.server_players]
+        self.assertEqual(len({account.puuid for account in accounts}), 7)
+
+    def test_race_standings_profile_loads_current_ranks(self):
+        crud.add_or_update_server(self.SERVER_ID, "Profile Server")
+        now = datetime.now()
+        race = crud.create_race(self.SERVER_ID, "Profile Race", now, now + timedelta(days=7))
+        self._create_members(1, race.race_id)
+        _, small_count = count_queries(crud.get_race_with_participants, race.race_id)
+        self._create_members(4, race.race_id)
+        loaded_race, large_count = count_queries(crud.get_race_with_participants, race.race_id)
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(loaded_race.participants), 5)
+        for participant in loaded_race.participants:
+            account = participant.server_player.player.riot_account_links[0].riot_account
+            self.assertEqual(account.current_ranks[0].tier, 'GOLD')
+
+    def test_account_players_profile_skips_inactive_links(self):
+        player = crud.add_player("ProfileInactive")
+        account = crud.add_or_update_riot_account("PROFILE_INACTIVE", "Inactive", "PRO", "euw1")
+        crud.link_player_to_riot_account(player.player_id, account.riot_account_id)
+        crud.deactivate_riot_link(player.player_id, account.riot_account_id)
+
+        loaded = crud.get_riot_account_by_puuid("PROFILE_INACTIVE", profile='account_players')
+        self.assertEqual(loaded.player_links, [])
+
+    def test_profile_must_match_model(self):
+        with self.assertRaises(ValueError):
+            crud.load_profile('server_members', RiotAccount)
+
+
+class TestLeaderboardCache(unittest.TestCase):
+    """
+    Tests that /leaderboard pages are served from the per-guild cache and that
+    only changes to a cached ladder's members invalidate it.
+    """
+    SERVER_A = "LEADERBOARD_SERVER_A"
+    SERVER_B = "LEADERBOARD_SERVER_B"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine, _ = get_engine_and_session_factory()
+
+    def setUp(self):
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+        crud.add_or_update_server(self.SERVER_A, "Server A")
+        crud.add_or_update_server(self.SERVER_B, "Server B")
+        self.accounts = {}
+        for index, (server_id, lp) in enumerate([(self.SERVER_A, 10), (self.SERVER_A, 50), (self.SERVER_A, 30),
+                                                 (self.SERVER_B, 20)]):
+            player = crud.add_player(f"Board{index}")
+            account = crud.add_or_update_riot_account(f"BOARD_PUUID_{index}", f"Board{index}", "LB", "euw1")
+            crud.link_player_to_riot_account(player.player_id, account.riot_account_id, is_primary=True)
+            crud.add_lp_history_entry(account.riot_account_id, 'RANKED_TFT', lp, 'GOLD', 'II', 1, 1)
+            crud.add_player_to_server(player.player_id, server_id)
+            self.accounts[index] = account
+        self.cache = leaderboard_cache.LeaderboardCache(page_size=2)
+        self.cache.subscribe_to_crud()
+
+    def tearDown(self):
+        self.cache.unsubscribe_from_crud()
+
+    def test_pages_are_served_from_the_cached_ordering(self):
+        first, first_queries = count_queries(self.cache.get_page, self.SERVER_A, 1)
+        second, second_queries = count_queries(self.cache.get_page, self.SERVER_A, 2)
+
+        self.assertEqual(first_queries, 1)
+        self.assertEqual(second_queries, 0)
+        self.assertEqual((first.page_count, first.total), (2, 3))
+        self.assertTrue(first.text.startswith("**1.** Board1"))
+        self.assertIn("**3.** Board0", second.text)
+
+    def test_only_rank_changes_of_members_invalidate(self):
+        self.cache.get_page(self.SERVER_A)
+        self.cache.get_page(self.SERVER_B)
+
+        # Gleicher Rang, nur mehr Spiele: Rangliste bleibt gültig
+        crud.add_lp_history_entry(self.accounts[0].riot_account_id, 'RANKED_TFT', 10, 'GOLD', 'II', 2, 2)
+        self.assertEqual(self.cache.stats()['invalidations'], 0)
+
+        # Rangänderung auf Server B lässt Server A im Cache
+        crud.add_lp_history_entry(self.accounts[3].riot_account_id, 'RANKED_TFT', 90, 'GOLD', 'II', 2, 2)
+        _, server_a_queries = count_queries(self.cache.get_page, self.SERVER_A)
+        server_b, server_b_queries = count_queries(self.cache.get_page, self.SERVER_B)
+        self.assertEqual((server_a_queries, server_b_queries), (0, 1))
+        self.assertIn("90 LP", server_b.text)
+
+    def test_new_member_invalidates_server(self):
+        self.cache.get_page(self.SERVER_B)
+        crud.add_player_to_server(crud.get_riot_account_by_puuid(
+            "BOARD_PUUID_0", profile='account_players').player_links[0].player_id, self.SERVER_B)
+        page = self.cache.get_page(self.SERVER_B)
+        self.assertEqual(page.total, 2)
+
+    def test_is_cached_reports_misses_without_loading(self):
+        self.assertFalse(self.cache.is_cached(self.SERVER_A))
+        self.cache.get_page(self.SERVER_A)
+        self.assertTrue(self.cache.is_cached(self.SERVER_A))
+        self.assertFalse(self.cache.is_cached(self.SERVER_B))
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_command_resolves_typed_names_through_the_search_index(self):
+        from cogs.leaderboard import Leaderboard
+
+        index = prefix_index.SearchIndex()
+        self.assertTrue(index.load())
+        cog = Leaderboard(unittest.mock.Mock(search_index=index))
+        cog.cache.unsubscribe_from_crud()
+        cog.cache = self.cache
+        player_id = crud.get_riot_account_by_puuid("BOARD_PUUID_0", profile='account_players').player_links[0].player_id
+        # Board0 hat die wenigsten LP: Platz 3, also Seite 2
+        self.assertEqual(cog._page_of_player(self.SERVER_A, player_id), 2)
+        self.assertEqual(cog._page_of_player(self.SERVER_A, "board0"), 2)
+        self.assertEqual(cog._page_of_player(self.SERVER_A, "Board0#LB"), 2)
+        self.assertIsNone(cog._page_of_player(self.SERVER_A, "Unbekannt"))
+
+
+class TestSearchIndex(unittest.TestCase):
+    """Tests that the autocomplete index loads from the database and follows CRUD writes."""
+    SERVER_ID = "SEARCH_SERVER"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine, _ = get_engine_and_session_factory()
+
+    def setUp(self):
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+        crud.add_or_update_server(self.SERVER_ID, "Search Server")
+        self.player = crud.add_player("Alpha")
+        self.account = crud.add_or_update_riot_account("SEARCH_PUUID", "Gamma", "EUW", "euw1")
+        crud.link_player_to_riot_account(self.player.player_id, self.account.riot_account_id, is_primary=True)
+        crud.add_player_to_server(self.player.player_id, self.SERVER_ID)
+        self.index = prefix_index.SearchIndex()
+        self.index.subscribe_to_crud()
+        self.assertTrue(self.index.load())
+
+    def tearDown(self):
+        self.index.unsubscribe_from_crud()
+
+    def test_load_and_member_search(self):
+        self.assertEqual(self.index.search_members(self.SERVER_ID, "al"), [("Alpha", self.player.player_id)])
+        self.assertEqual(self.index.search_members(self.SERVER_ID, "gamma#"), [("Gamma#EUW", self.player.player_id)])
+        self.assertEqual(self.index.search_members("OTHER_SERVER", "al"), [])
+
+    def test_crud_writes_update_the_index(self):
+        crud.update_player_display_name(self.player.player_id, "Beta")
+        crud.add_or_update_riot_account("SEARCH_PUUID", "Delta", "EUW", "euw1")
+        newcomer = crud.add_player("Alpine")
+        crud.add_player_to_server(newcomer.player_id, self.SERVER_ID)
+        now = datetime.now()
+        race = crud.create_race(self.SERVER_ID, "Spring Sprint", now, now + timedelta(days=7))
+        # Die Events merken nur vor, erst flush() liest nach
+        self.assertEqual(self.index.search_members(self.SERVER_ID, "be"), [])
+        self.assertEqual(self.index.flush(), 3)
+
+        self.assertEqual(self.index.search_members(self.SERVER_ID, "al"), [("Alpine", newcomer.player_id)])
+        self.assertEqual(self.index.search_members(self.SERVER_ID, "be"), [("Beta", self.player.player_id)])
+        self.assertEqual(self.index.search(self.SERVER_ID, 'riot_ids', "g"), [])
+        self.assertEqual(self.index.search(self.SERVER_ID, 'riot_ids', "d"), [("Delta#EUW", self.player.player_id)])
+        self.assertEqual(self.index.search(self.SERVER_ID, 'races', "spr"), [("Spring Sprint", race.race_id)])
+        self.assertEqual(self.index.flush(), 0)
+
+    def test_events_during_load_are_replayed(self):
+        index = prefix_index.SearchIndex()
+        index.subscribe_to_crud()
+        self.addCleanup(index.unsubscribe_from_crud)
+        original_load = crud.get_race_search_entries
+
+        def load_races(*args, **kwargs):
+            # Umbenennung, nachdem die Mitglieder schon gelesen wurden
+            crud.update_player_display_name(self.player.player_id, "Renamed")
+            return original_load(*args, **kwargs)
+        with unittest.mock.patch.object(crud, 'get_race_search_entries', side_effect=load_races):
+            self.assertTrue(index.load())
+
+        self.assertEqual(index.search_members(self.SERVER_ID, "re"), [])
+        self.assertEqual(index.flush(), 1)
+        self.assertEqual(index.search_members(self.SERVER_ID, "re"), [("Renamed", self.player.player_id)])
+        self.assertEqual(index.search_members(self.SERVER_ID, "al"), [])
+
+    def test_failed_refresh_stays_pending(self):
+        crud.update_player_display_name(self.player.player_id, "Beta")
+        with unittest.mock.patch.object(crud, 'get_member_search_entries', return_value=None):
+            self.assertEqual(self.index.flush(), 0)
+        self.assertEqual(self.index.stats()['pending_players'], 1)
+        self.assertEqual(self.index.flush(), 1)
+        self.assertEqual(self.index.search_members(self.SERVER_ID, "be"), [("Beta", self.player.player_id)])
+
+    def test_failed_account_lookup_stays_pending(self):
+        self.index._on_riot_account_changed("NEWLY_LINKED_ACCOUNT")
+        with unittest.mock.patch.object(crud, 'get_player_ids_for_riot_account', return_value=None):
+            self.index.flush()
+        self.assertEqual(self.index.stats()['pending_players'], 1)
+        self.assertEqual(self.index.stats()['failed_refreshes'], 1)
+        self.index.flush()
+        self.assertEqual(self.index.stats()['pending_players'], 0)
+
+
+class TestBulkUpserts(unittest.TestCase):
+    """Tests the batched server and Discord account upserts used by the event buffer."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine, _ = get_engine_and_session_factory()
+
+    def setUp(self):
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+
+    def test_upsert_servers(self):
+        crud.add_or_update_server("S1", "Old Name", owner_id="OWNER")
+        changed = crud.upsert_servers([
+            {'server_id': "S1", 'server_name': "New Name", 'owner_id': None},
+            {'server_id': "S2", 'server_name': "Second", 'owner_id': "OWNER2"},
+        ])
+        self.assertEqual(changed, 2)
+        with crud.session_scope() as session:
+            servers = {server.server_id: server for server in session.query(DiscordServer)}
+            self.assertEqual(servers["S1"].server_name, "New Name")
+            self.assertEqual(servers["S1"].owner_discord_user_id, "OWNER")
+            self.assertEqual(servers["S2"].owner_discord_user_id, "OWNER2")
+        # Unveränderte Server werden nicht geschrieben
+        self.assertEqual(crud.upsert_servers([{'server_id': "S2", 'server_name': "Second"}]), 0)
+
+    def test_upsert_discord_accounts(self):
+        existing = crud.add_or_update_discord_account("U1", "old")
+        rows = [{'discord_user_id': "U1", 'username': "renamed"}]
+        rows += [{'discord_user_id': f"N{index}", 'username': f"user{index}"} for index in range(1200)]
+        self.assertEqual(crud.upsert_discord_accounts(rows), 1201)
+        with crud.session_scope() as session:
+            self.assertEqual(session.query(DiscordAccount).count(), 1201)
+            renamed = session.query(DiscordAccount).filter_by(discord_user_id="U1").one()
+            self.assertEqual(renamed.discord_account_id, existing.discord_account_id)
+            self.assertEqual(renamed.discord_username, "renamed")
+        self.assertEqual(crud.upsert_discord_accounts(rows[:10]), 0)
+
+
+class TestSyncJobs(unittest.TestCase):
+    """Tests the durable sync job queue: dedupe, leases, retries, dead-lettering and crash recovery."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine, _ = get_engine_and_session_factory()
+
+    def setUp(self):
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+
+    def test_dedupe_and_claim(self):
+        self.assertTrue(crud.enqueue_sync_job('refresh_rank', {'puuid': "P1"}, dedupe_key="A1"))
+        self.assertFalse(crud.enqueue_sync_job('refresh_rank', {'puuid': "P1"}, dedupe_key="A1"))
+        self.assertEqual(crud.enqueue_sync_jobs('refresh_rank', [
+            {'payload': {'puuid': "P1"}, 'dedupe_key': "A1"},
+            {'payload': {'puuid': "P2"}, 'dedupe_key': "A2"},
+            {'payload': {'puuid': "P2"}, 'dedupe_key': "A2"},
+        ]), 1)
+
+        first = crud.claim_sync_jobs("worker-1", 1, lease_seconds=60)
+        second = crud.claim_sync_jobs("worker-2", 5, lease_seconds=60)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(first[0].job_id, second[0].job_id)
+        self.assertEqual(first[0].payload, {'puuid': "P1"})
+        self.assertEqual(crud.claim_sync_jobs("worker-3", 5, lease_seconds=60), [])
+        # Der Lease gehört worker-1
+        self.assertFalse(crud.complete_sync_job(first[0].job_id, "worker-2"))
+        self.assertTrue(crud.complete_sync_job(first[0].job_id, "worker-1"))
+        self.assertTrue(crud.enqueue_sync_job('refresh_rank', {'puuid': "P1"}, dedupe_key="A1"))
+
+    def test_expired_lease_is_resumed_and_dead_lettered(self):
+        crud.enqueue_sync_job('register', {'game_name': "X"}, max_attempts=2)
+        # Negative Lease-Dauer: der Worker ist sofort "abgestürzt"
+        crashed = crud.claim_sync_jobs("crashed-worker", 1, lease_seconds=-10)
+        resumed = crud.claim_sync_jobs("worker-2", 1, lease_seconds=-10)
+        self.assertEqual(resumed[0].job_id, crashed[0].job_id)
+        self.assertEqual(resumed[0].attempts, 2)
+        self.assertEqual(crud.claim_sync_jobs("worker-3", 1, lease_seconds=60), [])
+        self.assertEqual(crud.get_sync_job_counts(), {crud.SYNC_JOB_DEAD: 1})
+        self.assertEqual(crud.requeue_dead_sync_jobs(), 1)
+        self.assertEqual(crud.get_sync_job_counts(), {crud.SYNC_JOB_QUEUED: 1})
+
+    def test_worker_retries_then_dead_letters(self):
+        calls = []
+
+        def flaky(payload):
+            calls.append(payload['n'])
+            if payload['n'] == 2:
+                raise RuntimeError("Riot API down")
+
+        crud.enqueue_sync_jobs('flaky', [{'payload': {'n': 1}}, {'payload': {'n': 2}}], max_attempts=2)
+        worker = sync_worker.SyncWorker(worker_id="test-worker", handlers={'flaky': flaky})
+        with unittest.mock.patch.object(sync_worker, 'retry_delay', return_value=-10):
+            self.assertEqual(worker.run_once(), 3)
+        self.assertEqual(sorted(calls), [1, 2, 2])
+        self.assertEqual(worker.counters, {'completed': 1, 'retried': 1, 'dead': 1, 'lost_leases': 0})
+        self.assertEqual(crud.get_sync_job_counts(), {crud.SYNC_JOB_DEAD: 1})
+
+    def _riot_response(self, status_code: int) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status_code
+        response.url = "https://europe.api.riotgames.com/riot/account"
+        return response
+
+    def _run_register_job(self, status_code: int, max_attempts: int = 2) -> list:
+        payload = {'game_name': "Name", 'tag_line': "TAG", 'region': "euw1",
+                   'application_id': "1", 'interaction_token': "token"}
+        crud.enqueue_sync_job('register', payload, max_attempts=max_attempts)
+        worker = sync_worker.SyncWorker(worker_id="test-worker")
+        replies = []
+        with unittest.mock.patch.object(riot_api_handler, '_get_latest_api_key', return_value="key"), \
+                unittest.mock.patch.object(riot_api_handler.requests, 'get',
+                                           return_value=self._riot_response(status_code)), \
+                unittest.mock.patch.object(sync_worker, 'retry_delay', return_value=-10), \
+                unittest.mock.patch.object(sync_worker, 'send_interaction_followup',
+                                           side_effect=lambda app, token, content: replies.append(content)):
+            worker.run_once()
+        return worker, replies
+
+    def test_transient_riot_failure_is_retried_and_answered_once(self):
+        worker, replies = self._run_register_job(503)
+        self.assertEqual(worker.counters, {'completed': 0, 'retried': 1, 'dead': 1, 'lost_leases': 0})
+        # Nur der letzte Versuch antwortet
+        self.assertEqual(len(replies), 1)
+        self.assertIn("Fehler bei der Registrierung", replies[0])
+
+    def test_unknown_riot_id_is_answered_without_retry(self):
+        worker, replies = self._run_register_job(404)
+        self.assertEqual(worker.counters, {'completed': 1, 'retried': 0, 'dead': 0, 'lost_leases': 0})
+        self.assertEqual(len(replies), 1)
+        # Außerhalb des Workers bleibt es bei None statt einer Exception
+        with unittest.mock.patch.object(riot_api_handler, '_get_latest_api_key', return_value="key"), \
+                unittest.mock.patch.object(riot_api_handler.requests, 'get', return_value=self._riot_response(503)):
+            self.assertIsNone(riot_api_handler.get_tft_league_entry_by_puuid("P", "euw1"))
+
+    def test_interaction_retries_stay_within_the_token_lifetime(self):
+        worker = sync_worker.SyncWorker(worker_id="test-worker")
+        now = crud.get_database_time()
+        job = unittest.mock.Mock(attempts=4, payload={'interaction_token': "token"},
+                                 created_at=now - timedelta(minutes=12))
+        with unittest.mock.patch.object(sync_worker, 'SYNC_JOB_RETRY_BASE_SECONDS', 300):
+            delay, give_up = worker._retry_plan(job)
+            self.assertFalse(give_up)
+            self.assertLessEqual(delay, sync_worker.INTERACTION_TOKEN_SECONDS
+                                 - sync_worker.INTERACTION_FOLLOWUP_MARGIN_SECONDS - 12 * 60 + 1)
+            job.created_at = now - timedelta(minutes=15)
+            self.assertEqual(worker._retry_plan(job), (0, True))
+            # Ohne Interaction greift nur das normale Maximum
+            job.payload = {}
+            self.assertEqual(worker._retry_plan(job), (sync_worker.retry_delay(4), False))
+
+    def test_leases_are_renewed_while_draining_after_stop(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow(payload):
+            started.set()
+            release.wait(5)
+
+        crud.enqueue_sync_job('slow', {})
+        worker = sync_worker.SyncWorker(worker_id="test-worker", lease_seconds=0.3, poll_seconds=0.05,
+                                        handlers={'slow': slow})
+        renewals = []
+        original_renew = crud.renew_sync_job_leases
+        def renew(*args):
+            renewals.append(args[1])
+            return original_renew(*args)
+
+        with unittest.mock.patch.object(crud, 'renew_sync_job_leases', side_effect=renew):
+            runner = threading.Thread(target=worker.run_forever)
+            runner.start()
+            self.assertTrue(started.wait(5))
+            # SIGTERM: keine neuen Jobs, aber der laufende hält seinen Lease
+            worker.stop()
+            renewals.clear()
+            time.sleep(0.5)
+            release.set()
+            runner.join(5)
+
+        self.assertFalse(runner.is_alive())
+        self.assertGreaterEqual(len(renewals), 2)
+        self.assertEqual(worker.counters['completed'], 1)
+        self.assertEqual(worker.counters['lost_leases'], 0)
+
+
+class TestCurrentRank(unittest.TestCase):
+    """Tests the materialized current rank: upsert, stale snapshots, concurrent first inserts and rebuilds."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine, _ = get_engine_and_session_factory()
+
+    def setUp(self):
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+        self.account_id = crud.add_or_update_riot_account("CURRENT_RANK", "Current", "EUW", "euw1").riot_account_id
+
+    def _add_entry(self, session, league_points: int, retrieved_at: datetime, queue_type='RANKED_TFT'):
+        entry = RiotAccountLPHistory(riot_account_id=self.account_id, queue_type=queue_type,
+                                     league_points=league_points, tier='GOLD', division='II', wins=1, losses=1,
+                                     ladder_score=1000 + league_points, retrieved_at=retrieved_at)
+        session.add(entry)
+        session.flush()
+        return entry
+
+    def test_newer_snapshot_updates_and_stale_snapshot_is_skipped(self):
+        now = datetime.now()
+        with crud.session_scope() as session:
+            self.assertTrue(crud._upsert_current_rank(session, self._add_entry(session, 40, now)))
+        with crud.session_scope() as session:
+            # Gleicher Stand: Zeile wird nachgezogen, aber keine Rangänderung gemeldet
+            self.assertFalse(crud._upsert_current_rank(session, self._add_entry(session, 40, now + timedelta(minutes=1))))
+            self.assertTrue(crud._upsert_current_rank(session, self._add_entry(session, 60, now + timedelta(minutes=2))))
+        with crud.session_scope() as session:
+            self.assertFalse(crud._upsert_current_rank(session, self._add_entry(session, 10, now - timedelta(hours=1))))
+
+        current = crud.get_current_rank(self.account_id)
+        self.assertEqual((current.league_points, current.ladder_score, current.retrieved_at),
+                         (60, 1060, now + timedelta(minutes=2)))
+
+    def test_concurrent_first_insert_keeps_the_history_entry(self):
+        now = datetime.now()
+        with crud.session_scope() as session:
+            other = self._add_entry(session, 20, now - timedelta(minutes=5))
+            session.execute(insert(RiotAccountCurrentRank).values(
+                riot_account_id=self.account_id, queue_type='RANKED_TFT', lp_history_id=other.lp_history_id,
+                league_points=20, tier='GOLD', division='II', wins=1, losses=1, ladder_score=1020,
+                retrieved_at=other.retrieved_at))
+
+        with crud.session_scope() as session:
+            entry = self._add_entry(session, 70, now)
+            original_get = session.get
+            lookups = []
+            def get(*args, **kwargs):
+                # Der erste Lookup sieht die Zeile des parallelen Writers noch nicht
+                lookups.append(args)
+                return None if len(lookups) == 1 else original_get(*args, **kwargs)
+            with unittest.mock.patch.object(session, 'get', side_effect=get):
+                self.assertTrue(crud._upsert_current_rank(session, entry))
+            entry_id = entry.lp_history_id
+
+        self.assertEqual(len(lookups), 2)
+        with crud.session_scope() as session:
+            self.assertIsNotNone(session.get(RiotAccountLPHistory, entry_id))
+        current = crud.get_current_rank(self.account_id)
+        self.assertEqual((current.lp_history_id, current.league_points), (entry_id, 70))
+
+    def test_rebuild_uses_the_latest_snapshot_per_queue(self):
+        now = datetime.now()
+        with crud.session_scope() as session:
+            for minutes, league_points in ((0, 10), (30, 55), (10, 99)):
+                self._add_entry(session, league_points, now + timedelta(minutes=minutes))
+            self._add_entry(session, 5, now, queue_type='RANKED_TFT_TURBO')
+            self._add_entry(session, 77, now + timedelta(hours=1), queue_type=None)
+            # Veraltete Zeile, die der Rebuild ersetzen muss
+            stale = self._add_entry(session, 1, now - timedelta(days=1))
+            session.execute(insert(RiotAccountCurrentRank).values(
+                riot_account_id=self.account_id, queue_type='RANKED_TFT', lp_history_id=stale.lp_history_id,
+                league_points=1, wins=1, losses=1, retrieved_at=stale.retrieved_at))
+
+        self.assertEqual(crud.rebuild_current_rank_table(), 2)
+        self.assertEqual(crud.get_current_rank(self.account_id).league_points, 55)
+        self.assertEqual(crud.get_current_rank(self.account_id, 'RANKED_TFT_TURBO').ladder_score, 1005)
+
+
+class TestLPRetention(unittest.TestCase):
+    """Tests the compaction of raw LP snapshots into hourly rollups."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine, _ = get_engine_and_session_factory()
+
+    def setUp(self):
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+        self.now = datetime(2024, 6, 1, 12, 0)
+        self.account_id = crud.add_or_update_riot_account("RETENTION", "Old", "EUW", "euw1").riot_account_id
+        # Zwei Stunden außerhalb des Rohdaten-Fensters, ein Snapshot innerhalb
+        self.old_hour = datetime(2024, 5, 1, 18, 0)
+        self.snapshots = [
+            (self.old_hour + timedelta(minutes=5), 20, 3, 1),
+            (self.old_hour + timedelta(minutes=20), 50, 4, 1),
+            (self.old_hour + timedelta(minutes=40), 10, 4, 2),
+            (self.old_hour + timedelta(hours=1, minutes=10), 30, 5, 2),
+            (self.now - timedelta(days=1), 70, 9, 4),
+        ]
+        with crud.session_scope() as session:
+            session.add_all(RiotAccountLPHistory(riot_account_id=self.account_id, queue_type='RANKED_TFT',
+                                                 league_points=lp, tier='GOLD', division='II', wins=wins,
+                                                 losses=losses, ladder_score=1000 + lp, retrieved_at=retrieved_at)
+                            for retrieved_at, lp, wins, losses in self.snapshots)
+
+    def _rollups(self) -> dict:
+        with crud.session_scope() as session:
+            return {row.bucket_start: lp_retention._summary_from_rollup(row)
+                    for row in session.query(RiotAccountLPHourlyRollup).all()}
+
+    def test_old_snapshots_collapse_into_hourly_rollups(self):
+        raw_cutoff, _ = lp_retention.get_retention_cutoffs(self.now)
+        # Kleine Batches: eine Stunde wird über zwei Transaktionen hinweg zusammengeführt
+        self.assertEqual(lp_retention.compact_raw_history(raw_cutoff, batch_size=2), 4)
+
+        rollups = self._rollups()
+        self.assertEqual(sorted(rollups), [self.old_hour, self.old_hour + timedelta(hours=1)])
+        first_hour = rollups[self.old_hour]
+        self.assertEqual(first_hour['sample_count'], 3)
+        self.assertEqual((first_hour['first_at'], first_hour['last_at']),
+                         (self.snapshots[0][0], self.snapshots[2][0]))
+        self.assertEqual((first_hour['first_lp'], first_hour['last_lp'], first_hour['min_lp'], first_hour['max_lp']),
+                         (20, 10, 10, 50))
+        self.assertEqual((first_hour['min_score'], first_hour['max_score'], first_hour['last_score']),
+                         (1010, 1050, 1010))
+        self.assertEqual((first_hour['last_wins'] - first_hour['first_wins'],
+                          first_hour['last_losses'] - first_hour['first_losses']), (1, 1))
+        self.assertEqual(rollups[self.old_hour + timedelta(hours=1)]['sample_count'], 1)
+
+        with crud.session_scope() as session:
+            remaining = session.query(RiotAccountLPHistory.retrieved_at).all()
+        self.assertEqual([row.retrieved_at for row in remaining], [self.snapshots[-1][0]])
+
+    def test_rerun_is_a_no_op(self):
+        lp_retention.run_retention_cycle(now=self.now)
+        rollups = self._rollups()
+        self.assertEqual(lp_retention.run_retention_cycle(now=self.now),
+                         {'raw_compacted': 0, 'hourly_compacted': 0, 'failed': False})
+        self.assertEqual(self._rollups(), rollups)
+
+    def test_lp_history_keeps_its_endpoints(self):
+        before = crud.get_lp_history(self.account_id)
+        lp_retention.run_retention_cycle(now=self.now)
+        after = crud.get_lp_history(self.account_id)
+
+        self.assertEqual([point['resolution'] for point in after], ['hour', 'hour', 'raw'])
+        # Letzter Stand, LP-Spanne und der Stand am Ende jeder verdichteten Stunde bleiben erhalten
+        self.assertEqual(after[-1], before[-1])
+        for key in ('retrieved_at', 'league_points', 'ladder_score', 'wins', 'losses'):
+            self.assertEqual(after[0][key], before[2][key])
+            self.assertEqual(after[1][key], before[3][key])
+        self.assertEqual(min(point['min_league_points'] for point in after),
+                         min(point['min_league_points'] for point in before))
+        self.assertEqual(max(point['max_league_points'] for point in after),
+                         max(point['max_league_points'] for point in before))
+
+    def _raw_count(self) -> int:
+        with crud.session_scope() as session:
+            return session.query(RiotAccountLPHistory).count()
+
+    def test_cli_does_not_compact_when_the_archive_export_fails(self):
+        with unittest.mock.patch.object(lp_archive, 'export_lp_history', side_effect=RuntimeError("no pyarrow")), \
+                unittest.mock.patch('builtins.print'):
+            self.assertEqual(db_maintenance.main(["lp-retention", "--archive-dir", "archive"]), 1)
+        self.assertEqual(self._raw_count(), len(self.snapshots))
+
+        with unittest.mock.patch.object(lp_archive, 'export_lp_history', return_value=4) as export, \
+                unittest.mock.patch('builtins.print'):
+            self.assertEqual(db_maintenance.main(["lp-retention", "--archive-dir", "archive"]), 0)
+        export.assert_called_once_with("archive")
+        # Ohne festes "now" ist gemessen an der Datenbankzeit jeder Snapshot alt
+        self.assertEqual(self._raw_count(), 0)
+
+    def test_cli_reports_failed_batches(self):
+        failure = OperationalError("stmt", {}, Exception("database is locked"))
+        with unittest.mock.patch.object(lp_retention, '_write_buckets', side_effect=failure), \
+                unittest.mock.patch('builtins.print'):
+            self.assertEqual(db_maintenance.main(["lp-retention", "--archive-dir", ""]), 1)
+        self.assertEqual(self._raw_count(), len(self.snapshots))
+
+
+class TestRanksAsOf(unittest.TestCase):
+    """Tests the bulk as-of rank lookup over raw snapshots and rollups."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine, _ = get_engine_and_session_factory()
+
+    def setUp(self):
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+
+    def test_last_snapshot_before_time_with_rollup_fallback(self):
+        base = datetime(2024, 3, 1, 12, 0)
+        raw_account = crud.add_or_update_riot_account("ASOF_RAW", "Raw", "EUW", "euw1").riot_account_id
+        old_account = crud.add_or_update_riot_account("ASOF_OLD", "Old", "EUW", "euw1").riot_account_id
+        late_account = crud.add_or_update_riot_account("ASOF_LATE", "Late", "EUW", "euw1").riot_account_id
+        with crud.session_scope() as session:
+            for hours, score in ((0, 1000), (2, 1040), (5, 1100)):
+                session.add(RiotAccountLPHistory(riot_account_id=raw_account, queue_type='RANKED_TFT',
+                                                 league_points=score % 100, wins=hours, losses=0,
+                                                 ladder_score=score, retrieved_at=base + timedelta(hours=hours)))
+            session.add(RiotAccountLPHistory(riot_account_id=late_account, queue_type='RANKED_TFT', league_points=0,
+                                             wins=0, losses=0, ladder_score=500, retrieved_at=base + timedelta(days=1)))
+            # Nur noch als Tages-Rollup vorhanden
+            day = base - timedelta(days=30)
+            session.add(RiotAccountLPDailyRollup(
+                riot_account_id=old_account, queue_type='RANKED_TFT', bucket_start=day, sample_count=5,
+                first_at=day, last_at=day + timedelta(hours=20), first_lp=0, last_lp=60, min_lp=0, max_lp=60,
+                first_score=800, last_score=860, min_score=800, max_score=860, last_tier='GOLD', last_division='II',
+                first_wins=0, last_wins=3, first_losses=0, last_losses=2, wins_delta=3, losses_delta=2))
+
+        ranks = crud.get_ranks_as_of([raw_account, old_account, late_account], base + timedelta(hours=3))
+        self.assertEqual(set(ranks), {raw_account, old_account})
+        self.assertEqual((ranks[raw_account]['ladder_score'], ranks[raw_account]['resolution']), (1040, 'raw'))
+        self.assertEqual((ranks[old_account]['ladder_score'], ranks[old_account]['resolution']), (860, 'day'))
+        self.assertEqual(crud.get_ranks_as_of([raw_account], base + timedelta(hours=5))[raw_account]['ladder_score'],
+                         1100)
+        self.assertEqual(crud.get_ranks_as_of([raw_account], base - timedelta(hours=1)), {})
+        self.assertEqual(crud.get_ranks_as_of([], base), {})
+
+    def test_many_accounts_use_one_query_per_chunk(self):
+        now = datetime.now()
+        account_ids = [crud.add_or_update_riot_account(f"ASOF_{index}", f"A{index}", "EUW", "euw1").riot_account_id
+                       for index in range(3)]
+        with crud.session_scope() as session:
+            session.add_all(RiotAccountLPHistory(riot_account_id=account_id, queue_type='RANKED_TFT',
+                                                 league_points=10 * index, wins=0, losses=0, ladder_score=10 * index,
+                                                 retrieved_at=now - timedelta(hours=1))
+                            for index, account_id in enumerate(account_ids))
+        ranks, statement_count = count_queries(
+            crud.get_ranks_as_of, account_ids + [f"missing-{index}" for index in range(600)], now)
+        self.assertEqual({account_id: rank['ladder_score'] for account_id, rank in ranks.items()},
+                         {account_id: 10 * index for index, account_id in enumerate(account_ids)})
+        # 603 IDs in Chunks zu 300, jede ID steht in allen drei Teilen der Union
+        self.assertEqual(statement_count, 3)
+
+    def test_database_error_returns_none(self):
+        with unittest.mock.patch.object(crud, '_ranks_as_of_query', side_effect=OperationalError("SELECT", {}, Exception("boom"))):
+            self.assertIsNone(crud.get_ranks_as_of(["any"], datetime.now()))
+
+
 if __name__ == '__main__':
     # This allows you to run the tests by executing `python test_suite.py`
     unittest.main()
\ No newline at end of file